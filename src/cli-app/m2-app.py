@@ -163,9 +163,10 @@ with cam(devMode = devMode) as n:
                                 print(f"\t0 = Do nothing, use all data to calculate avg and stddev")
                                 print(f"\t1 = Remove highest 10% of results before calculating")
                                 print(f"\t2 = Remove positive peaks from result based on a threshold")
-                                removeOutliers = int(CLI.options("Post processing mode?", options = [0,1,2], default = M.removeOutliers))
+                                print(f"\t3 = Same as 2, but vectorized in a single pass")
+                                removeOutliers = int(CLI.options("Post processing mode?", options = [0,1,2,3], default = M.removeOutliers))
 
-                                if removeOutliers == 2:
+                                if removeOutliers in [2, 3]:
                                     print(f"The threshold t is interpreted as such:")
                                     print(f"\t 0 < t <= 1: Percentage of the mean to use as the prominence threshold (e.g. 0.2 := 20% * Mean)")
                                     print(f"\t     t >  1: Absolute prominence threshold")
@@ -183,7 +184,7 @@ with cam(devMode = devMode) as n:
                             if useNanoScan:
                                 print(f"{CLI.COLORS.HEADER}Obtained:\n--- Wavelength     : {wavelength} nm\n--- Precision      : {precision} pps\n--- Rotation Rate  : {scanrate} Hz\n--- Save Raw Data  : {saveRaw}\n--- Post Processing: Mode {removeOutliers}")
 
-                                if removeOutliers == 2:
+                                if removeOutliers in [2, 3]:
                                     print(f"--- Threshold      : {threshold}")
 
                                 print(f"--- Other Metadata : {other}{CLI.COLORS.ENDC}")
@@ -3,6 +3,7 @@
 """File provides the class camera that all camera types should inherit"""
 
 import os,sys
+from typing import Optional, Tuple
 
 base_dir = os.path.dirname(os.path.realpath(__file__))
 root_dir = os.path.abspath(os.path.join(base_dir, ".."))
@@ -10,19 +11,42 @@ if root_dir not in sys.path:
     sys.path.insert(0, root_dir) 
 
 import common.helpers as h
+from common.clock import Clock, RealClock
 
 from cameras.all_constants import CameraAxes
 
 class Camera(h.LoggerMixIn):
     AXES = CameraAxes
-    def __init__(self):
+    def __init__(self, clock: Optional[Clock] = None):
+        """
+        Parameters
+        ----------
+        clock : Optional[common.clock.Clock], optional
+            Clock to wait with, by default None (`common.clock.RealClock()`)
+        """
         self.apertureOpen = False
+        self.clock        = clock if clock is not None else RealClock()
+
+        # Number of samples used by the last call to `self.getAxis_avg_D4Sigma()`
+        self.lastNumSamples = None
 
     def getAxis_avg_D4Sigma(self, axis: CameraAxes, numsamples: int = 20, returnRaw: bool = False, *args, **kwargs):
         raise NotImplementedError
 
     def wait_stable(self):
         raise NotImplementedError
+
+    def startStream(self):
+        """Prepares the camera for taking single samples using `self.getSample_D4Sigma()`, e.g. for a fly-scan"""
+        pass
+
+    def getSample_D4Sigma(self) -> Tuple[float, float]:
+        """Takes one sample of the d4sigma of both axes, in the form (x, y). Call `self.startStream()` beforehand."""
+        raise NotImplementedError
+
+    def stopStream(self):
+        """Restores the state of the camera from before `self.startStream()`"""
+        pass
     
     def __enter__(self):
         return self
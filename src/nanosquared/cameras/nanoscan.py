@@ -5,9 +5,10 @@
 
 import numbers
 import os,sys
-from typing import Tuple, List
+from typing import Optional, Tuple, List
 
 import scipy.signal
+import scipy.ndimage
 
 base_dir = os.path.dirname(os.path.realpath(__file__))
 root_dir = os.path.abspath(os.path.join(base_dir, ".."))
@@ -15,6 +16,8 @@ if root_dir not in sys.path:
     sys.path.insert(0, root_dir) 
 
 import cameras.camera as cam
+import common.helpers as h
+from common.trace import traced
 
 import logging
 import time
@@ -32,7 +35,18 @@ class NanoScan(cam.Camera):
 	
 	AXES = NsAxes
 
-	def __init__(self, devMode: bool = False, *args, **kwargs):
+	def __init__(self, devMode: bool = False, dll: "NanoScanDLL" = None, *args, **kwargs):
+		"""
+		Parameters
+		----------
+		devMode : bool, optional
+			If True, no NanoScanDLL will be used, by default False
+		dll : NanoScanDLL, optional
+			The client to the 32-bit server to use, by default None.
+			If None, a new NanoScanDLL is started. Use e.g. `cameras.nanoscan_standin.StandInNanoScanDLL` or `cameras.nanoscan_simulator.SimulatedNanoScan` to test without the device.
+		clock : Optional[common.clock.Clock], optional
+			Clock to wait with, see `cameras.camera.Camera`
+		"""
 		cam.Camera.__init__(self, *args, **kwargs)
 
 		self.log("Initializing NanoScan...", end="\r")
@@ -42,7 +56,7 @@ class NanoScan(cam.Camera):
 			self.log("devmode nanoscan: no NanoScanDLL will be available", logging.WARN)
 			self.NS = None
 		else:
-			self.NS = NanoScanDLL() # Init and Shutdown is done by the 32-bit server
+			self.NS = dll if dll is not None else NanoScanDLL() # Init and Shutdown is done by the 32-bit server
 
 		if not self.devMode:
 			assert self.NS.GetNumDevices() > 0, "No devices connected"
@@ -51,6 +65,8 @@ class NanoScan(cam.Camera):
 		self.daqState = False
 		self.roiIndex = 0
 
+		self._streamParams = None
+
 		if not self.devMode:
 			self._rotFreq = self.NS.GetRotationFrequency()
 			self.allowedRots = self.NS.GetHeadScanRates()
@@ -88,6 +104,7 @@ class NanoScan(cam.Camera):
 		self._rotFreq = freq
 
 	@staticmethod
+	@traced(cat = "camera")
 	def remove_spikes(arr: np.ndarray, threshold: float) -> np.ndarray:
 		"""Method to remove positive peaks from data.
 
@@ -137,7 +154,82 @@ class NanoScan(cam.Camera):
 
 		return arr_rem
 
-	def getAxis_avg_D4Sigma(self, axis: NsAxes, numsamples: int = 20, removeOutliers: int = 0, threshold: float = 0.2, returnRaw: bool = False, *args, **kwargs) -> Tuple[float, float]:
+	@staticmethod
+	@traced(cat = "camera")
+	def remove_spikes_windowed(arr: np.ndarray, threshold: float, window: int = 10) -> np.ndarray:
+		"""Removes positive peaks from data like `NanoScan.remove_spikes()`, but in a single vectorized pass.
+
+		The prominence of every point is computed with respect to the higher of the minima within `window` 
+		points to its left and to its right, similar to `scipy.signal.peak_prominences` with `wlen = 2 * window + 1`. 
+		Points with a prominence of more than `threshold` are removed. Neighbouring spikes are removed together, 
+		as long as there is a point that is not a spike within `window` points on either side.
+
+		Parameters
+		----------
+		arr : np.ndarray
+			Array to remove spikes from
+		threshold : float
+			Prominence as defined in scipy.signal
+		window : int, optional
+			Number of points on either side used to find the base of a peak, by default 10
+
+		Returns
+		-------
+		np.ndarray
+			result without spikes
+		"""
+		arr = np.asarray(arr)
+
+		if len(arr) < 2:
+			return arr
+
+		# Minimum of the point itself and the `window` points to its left, resp. right. 
+		# Including the point itself does not change the result: it can only be the minimum if its prominence is <= 0.
+		vals  = arr.astype(np.float64)
+		left  = scipy.ndimage.minimum_filter1d(vals, window + 1, mode = "constant", cval = np.inf, origin = window // 2)
+		right = scipy.ndimage.minimum_filter1d(vals, window + 1, mode = "constant", cval = np.inf, origin = -((window + 1) // 2))
+
+		# The first and last points only have a base on one side
+		left[0]   = -np.inf
+		right[-1] = -np.inf
+
+		prominence = arr - np.maximum(left, right)
+
+		return arr[prominence <= threshold]
+
+	@staticmethod
+	def filter_outliers(arr: np.ndarray, removeOutliers: int = 0, threshold: float = 0.2) -> np.ndarray:
+		"""Removes outliers from the samples of one axis. See `self.getAxis_avg_D4Sigma()` for the modes.
+
+		Parameters
+		----------
+		arr : np.ndarray
+			Rank-1, samples of one axis
+		removeOutliers : int, optional
+			Outlier removal mode, by default 0
+		threshold : float, optional
+			Threshold for modes 2 and 3, by default 0.2
+
+		Returns
+		-------
+		np.ndarray
+			The samples with the outliers removed
+		"""
+		if removeOutliers == 1:
+			# Throw away top 10% of values
+			throwout = int(np.around(0.1 * len(arr)))
+			return np.sort(arr)[:-throwout] if throwout > 0 else arr
+
+		if removeOutliers in [2, 3] and len(arr) > 2:
+			threshold = threshold * np.average(arr) if threshold <= 1 else threshold
+			if removeOutliers == 2:
+				return NanoScan.remove_spikes(arr, threshold)
+			return NanoScan.remove_spikes_windowed(arr, threshold)
+
+		return arr
+
+	@traced(cat = "camera")
+	def getAxis_avg_D4Sigma(self, axis: NsAxes, numsamples: int = 20, removeOutliers: int = 0, threshold: float = 0.2, returnRaw: bool = False, targetSEM: Optional[float] = None, minSamples: int = 10, *args, **kwargs) -> Tuple[float, float]:
 		"""Get the d4sigma in one `axis` and averages it over `numsamples` using the Sync1Rev implementation.
 
 		Using NsAxes somewhat changes the signature of this function in a strict sense, but at this point I think would make easier for me to check.
@@ -152,17 +244,18 @@ class NanoScan(cam.Camera):
 
 			This is a compromise I am willing to take. 
 		numsamples : int, optional
-			Number of samples to average over, by default 20
+			Number of samples to average over, by default 20. Maximum number of samples if `targetSEM` is given.
 		removeOutliers: int, optional
 			NanoScan has the tendency to output data with high variation. This setting can help to reduce the standard deviation of the results obtained by removing outliers.
 
 			0 = Do not remove outliers, calculate as is
 			1 = Remove highest 10% of results
 			2 = Remove positive peaks from result based on a threshold of 20% * Mean.
+			3 = Same as 2, but vectorized in a single pass (see `NanoScan.remove_spikes_windowed()`), faster on long series.
 
 			By default, 0
 		threshold: float, optional
-			Threshold of peak prominence, must be more than 0. Ignored if `removeOutliers` is not 2.
+			Threshold of peak prominence, must be more than 0. Ignored if `removeOutliers` is not 2 or 3.
 
 			If value is less than or equal to 1, then it represents the percentage of the mean to use as the prominence threshold.
 			If value is more than 1, then it represents the absolute prominence threshold.
@@ -176,6 +269,20 @@ class NanoScan(cam.Camera):
 			If set to True, the function returns the tuple (result, rawdata)
 
 			By default, False
+		targetSEM: float, optional
+			If given, the number of samples is chosen adaptively: revolutions are taken until the standard error of the mean 
+			of the requested axis (of both axes for `NsAxes.BOTH`) is at most `targetSEM`, 
+			but at least `minSamples` and at most `numsamples` revolutions. The statistics are updated with every revolution 
+			before any outliers are removed, so noisy data takes more samples. 
+
+			If value is less than or equal to 1, then it represents the percentage of the mean (e.g. 0.005 := 0.5% * Mean).
+			If value is more than 1, then it represents the absolute standard error in micrometer.
+
+			The number of samples taken is stored in `self.lastNumSamples`.
+
+			By default None, i.e. always take `numsamples` samples.
+		minSamples: int, optional
+			Minimum number of samples in adaptive mode, by default 10
 
 		Returns
 		-------
@@ -189,17 +296,23 @@ class NanoScan(cam.Camera):
 			self.log(f"Invalid axis {axis} selected, expected axis of type {NsAxes}.")
 			return ret
 
-		if removeOutliers not in [0, 1, 2]:
-			self.log(f"Invalid removeOutlier mode {removeOutliers}! Using mode 0: do nothing", loglevel = logging.warn)
+		if removeOutliers not in [0, 1, 2, 3]:
+			self.log(f"Invalid removeOutlier mode {removeOutliers}! Using mode 0: do nothing", loglevel = logging.WARN)
 			removeOutliers = 0 
 
-		if removeOutliers == 2:
+		if removeOutliers in [2, 3]:
 			# Check if the threshold is valid:
 			if not isinstance(threshold, numbers.Number) or threshold <= 0:
-				self.log(f"Invalid threshold {threshold}. Using 0.2.", loglevel = logging.warn)
+				self.log(f"Invalid threshold {threshold}. Using 0.2.", loglevel = logging.WARN)
 				threshold = 0.2
 
+		if targetSEM is not None and (not isinstance(targetSEM, numbers.Number) or targetSEM <= 0):
+			self.log(f"Invalid targetSEM {targetSEM}. Taking {numsamples} samples.", loglevel = logging.WARN)
+			targetSEM = None
+
 		if self.devMode:
+			self.lastNumSamples = numsamples
+
 			if axis == NsAxes.BOTH:
 				ret = np.array([[500,10], [600,25]])
 			else:
@@ -215,44 +328,25 @@ class NanoScan(cam.Camera):
 		self.NS.SelectParameters(originalParams | NsSP.BEAM_WIDTH_D4SIGMA)
 
 		# A stack of x, y values
-		out = np.array([list(self.oneRev()) for _ in range(numsamples + 10)])
+		if targetSEM is not None:
+			out = self.acquire_adaptive(axis, targetSEM = targetSEM, minSamples = minSamples, maxSamples = numsamples)
+		else:
+			out = self.acquireBatch(numsamples + 10)
+
+			# Throwaway the first 10 values
+			out = out[10:]
 
-		# Throwaway the first 10 values
-		out = out[10:]
+		self.lastNumSamples = len(out)
 
 		if returnRaw:
 			rawout = out
 
-		# Remove Outliers
-		if removeOutliers == 1:
-			# Throw away top 10% of values
-			throwout = int(np.around(0.1 * numsamples))
-			if axis == NsAxes.BOTH:
-				x_axis, y_axis = out[:,0], out[:,1]
-				x_axis, y_axis = np.sort(x_axis)[:-throwout], np.sort(y_axis)[:-throwout]
-
-				out = np.column_stack((x_axis, y_axis))
-			else:
-				out = np.sort(out)[:-throwout]
-
-		if removeOutliers == 2:
-			# Remove spike using 20% as the threshold
-			if axis == NsAxes.BOTH:
-				x_axis, y_axis = out[:,0], out[:,1]
-				if threshold <= 1:
-					x_axis, y_axis = NanoScan.remove_spikes(x_axis, threshold * np.average(x_axis)), NanoScan.remove_spikes(y_axis, threshold * np.average(y_axis))
-				else:
-					x_axis, y_axis = NanoScan.remove_spikes(x_axis, threshold), NanoScan.remove_spikes(y_axis, threshold)
+		# Remove Outliers, separately for each axis as the number of points removed may differ
+		x_axis = NanoScan.filter_outliers(out[:,0], removeOutliers = removeOutliers, threshold = threshold)
+		y_axis = NanoScan.filter_outliers(out[:,1], removeOutliers = removeOutliers, threshold = threshold)
 
-				out = np.column_stack((x_axis, y_axis))
-			else:
-				if threshold <= 1:
-					out = NanoScan.remove_spikes(out, threshold * np.average(out))
-				else:
-					out = NanoScan.remove_spikes(out, threshold)
-
-		average = np.average(out, axis = 0)
-		stddev  = np.std(out, axis = 0)
+		average = np.array([np.average(x_axis), np.average(y_axis)])
+		stddev  = np.array([np.std(x_axis), np.std(y_axis)])
 
 		self.log(f"average = {average}, stddev = {stddev}", loglevel = logging.DEBUG)
 
@@ -268,6 +362,40 @@ class NanoScan(cam.Camera):
 
 		return ret
 		
+	def startStream(self):
+		"""Prepares the NanoScan for taking single revolutions with `self.getSample_D4Sigma()`. 
+		Use `self.stopStream()` to restore the selected parameters.
+		"""
+		if self.devMode:
+			return
+
+		self.wait_stable()
+		self.NS.AutoFind()
+
+		self._streamParams = self.NS.GetSelectedParameters()
+		self.NS.SelectParameters(self._streamParams | NsSP.BEAM_WIDTH_D4SIGMA)
+
+	def getSample_D4Sigma(self) -> Tuple[float, float]:
+		"""Takes one revolution, see `self.oneRev()`
+
+		Returns
+		-------
+		(x, y) : Tuple[float, float]
+			d4sigma of both axes in micrometer
+		"""
+		if self.devMode:
+			return (500, 600)
+
+		return self.oneRev()
+
+	def stopStream(self):
+		if self.devMode or self._streamParams is None:
+			return
+
+		self.NS.SelectParameters(self._streamParams)
+		self._streamParams = None
+
+	@traced(cat = "camera")
 	def oneRev(self) -> Tuple[float, float]:
 		self.NS.AcquireSync1Rev()
 		self.NS.RunComputation()
@@ -278,6 +406,63 @@ class NanoScan(cam.Camera):
 
 		return (x, y)
 
+	@traced(cat = "camera")
+	def acquireBatch(self, n: int) -> np.ndarray:
+		"""Takes `n` revolutions like `self.oneRev()`, but with a single request to the 32-bit server. 
+		See `NanoScanServer.AcquireD4SigmaBatch()`
+
+		Parameters
+		----------
+		n : int
+			Number of revolutions
+
+		Returns
+		-------
+		out : np.ndarray
+			Array of shape (n, 2) with the d4sigma of (x, y) in micrometer for every revolution
+		"""
+		buf = self.NS.AcquireD4SigmaBatch(n, self.roiIndex)
+		out = np.frombuffer(buf, dtype = "<f4").reshape(n, 2).astype(np.float64)
+
+		self.log(f"Got {n} Readings of (x, y)", logging.DEBUG)
+
+		return out
+
+	ADAPTIVE_BATCH = 5 # Number of revolutions requested at once in adaptive mode
+
+	def acquire_adaptive(self, axis: NsAxes, targetSEM: float, minSamples: int = 10, maxSamples: int = 200) -> np.ndarray:
+		"""Takes revolutions until the standard error of the mean of `axis` is at most `targetSEM`. 
+		See `self.getAxis_avg_D4Sigma()` for the parameters. The first 10 revolutions are thrown away.
+
+		Returns
+		-------
+		out : np.ndarray
+			Array of shape (n, 2) with the d4sigma of (x, y) in micrometer, minSamples <= n <= maxSamples
+		"""
+		minSamples = max(2, min(minSamples, maxSamples))
+		cols       = [NsAxes.X, NsAxes.Y] if axis == NsAxes.BOTH else [axis]
+
+		self.acquireBatch(10) # Throwaway
+
+		stats = h.RunningStats(shape = (2,))
+		out   = []
+		while stats.n < maxSamples:
+			n     = max(minSamples - stats.n, self.ADAPTIVE_BATCH)
+			batch = self.acquireBatch(min(n, maxSamples - stats.n))
+
+			stats.update_batch(batch)
+			out.append(batch)
+
+			if stats.n >= minSamples:
+				target = targetSEM * np.abs(stats.mean) if targetSEM <= 1 else np.full(2, targetSEM)
+				if np.all(stats.sem[cols] <= target[cols]):
+					break
+
+		self.log(f"Adaptive: {stats.n} samples, sem = {stats.sem}", logging.DEBUG)
+
+		return np.concatenate(out)
+
+	@traced(cat = "camera")
 	def wait_stable(self) -> bool:
 		if self.devMode:
 			return True
@@ -338,7 +523,7 @@ class NanoScan(cam.Camera):
 		cnt = 0
 
 		while not daqState:
-			time.sleep(50e-3)
+			self.clock.sleep(50e-3)
 			centroidValue_X = self.NS.GetCentroidPosition(NsAxes.X, self.roiIndex)
 			centroidValue_Y = self.NS.GetCentroidPosition(NsAxes.Y, self.roiIndex)
 
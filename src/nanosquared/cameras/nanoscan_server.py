@@ -4,15 +4,17 @@
 # yudong.sun [at] mpq.mpg.de / yudong [at] outlook.de
 
 import os, sys
+import struct
 from msl.loadlib import Server32
 
-import clr
-import System
-
 class NanoScanServer(Server32):
     """Wrapper around a 32-bit C#.NET library 'NanoScanLibrary.dll'. WARNING: No GUI Features available."""
 
     def __init__(self, host, port, **kwargs):
+        # Only available in the 32-bit server
+        import clr
+        import System
+
         # Load the self compiled 'NanoScanLibrary.dll' shared-library file using pythonnet
         path64 = Server32.remove_site_packages_64bit()
 
@@ -48,6 +50,33 @@ class NanoScanServer(Server32):
 
         return list(self.NS.GetHeadScanRates())
 
+    def AcquireD4SigmaBatch(self, n: int, roiIndex: int = 0) -> bytes:
+        """Takes `n` revolutions and obtains the d4sigma of both axes for each revolution, i.e. `NanoScan.oneRev()` in a loop,
+        but inside the 32-bit server so that only one request has to be made.
+
+        Parameters
+        ----------
+        n : int
+            Number of revolutions
+        roiIndex : int, optional
+            Index of the ROI, by default 0
+
+        Returns
+        -------
+        buf : bytes
+            Packed little-endian float32 of shape (n, 2), i.e. x0, y0, x1, y1, ...
+            Use `np.frombuffer(buf, dtype = "<f4").reshape(n, 2)` to unpack. 
+            numpy is not used here as it might not be available to the 32-bit server.
+        """
+        vals = []
+        for _ in range(n):
+            self.NS.AcquireSync1Rev()
+            self.NS.RunComputation()
+            vals.append(self.NS.GetBeamWidth4Sigma(0, roiIndex)) # NsAxes.X
+            vals.append(self.NS.GetBeamWidth4Sigma(1, roiIndex)) # NsAxes.Y
+
+        return struct.pack(f"<{2 * n}f", *vals)
+
     def __getattr__(self, name):
         """Get the functions of self.NS directly. Possibly use python script to generate functions in this file.
         
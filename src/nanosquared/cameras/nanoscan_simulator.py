@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+
+# Made 2021, Sun Yudong
+# yudong.sun [at] mpq.mpg.de / yudong [at] outlook.de
+
+"""Provides a simulated NanoScan, so that the sampling and the outlier removal of `cameras.nanoscan.NanoScan`
+can be evaluated without the device.
+
+`SimulatedNanoScan` answers the same calls as `NanoScanDLL`, in-process. The d4sigma of every revolution is taken from
+a Gaussian beam at the current position of the stage, with the noise and the spikes seen in the raw revolutions of
+tests/outlier/datasets. Revolutions take 1/rotationFrequency s on the clock of the simulation, e.g. a `common.clock.VirtualClock`.
+
+Usage:
+    clock = VirtualClock()
+    with GSC01(devMode = True, clock = clock) as c:
+        ns = SimulatedNanoScan.fromController(c, beam = GaussianBeam(w0 = (100, 120), M2 = (1.1, 1.3)))
+        with NanoScan(dll = ns, clock = clock) as n:
+            c.move(1000)
+            n.getAxis_avg_D4Sigma(n.AXES.BOTH, removeOutliers = 3)
+"""
+
+import os,sys
+import math
+import struct
+from typing import Callable, Optional, Sequence, Union
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, ".."))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+import numpy as np
+
+from fitting.fit_functions import omega_z
+from common.clock import Clock, RealClock
+
+def _pair(value: Union[float, Sequence[float]]) -> np.ndarray:
+    """(x, y) from a value for both axes or a pair"""
+    return np.broadcast_to(np.asarray(value, dtype = np.float64), (2,)).copy()
+
+class GaussianBeam():
+    def __init__(self, w0: Union[float, Sequence[float]] = 100, z0: Union[float, Sequence[float]] = 0, wavelength: float = 2300, M2: Union[float, Sequence[float]] = 1) -> None:
+        """Gaussian beam with a waist in each axis. The defaults are those of `Measurement.simulate_beam()`.
+
+        Parameters
+        ----------
+        w0 : Union[float, Sequence[float]], optional
+            Waist radius in um, of both axes or (x, y), by default 100
+        z0 : Union[float, Sequence[float]], optional
+            Position of the waist in mm, by default 0
+        wavelength : float, optional
+            Wavelength in nm, by default 2300
+        M2 : Union[float, Sequence[float]], optional
+            Beam quality factor, by default 1
+        """
+        self.w0         = _pair(w0)
+        self.z0         = _pair(z0)
+        self.wavelength = wavelength
+        self.M2         = _pair(M2)
+
+    def radius(self, z: float) -> np.ndarray:
+        """Beam radius (half of the d4sigma) of (x, y) in um at the position `z` in mm, see `fitting.fit_functions.omega_z()`"""
+        return np.array([omega_z(params = [self.w0[k], self.z0[k], self.M2[k] * self.wavelength], z = z) for k in range(2)])
+
+    def diameter(self, z: float) -> np.ndarray:
+        """d4sigma of (x, y) in um at the position `z` in mm"""
+        return 2 * self.radius(z)
+
+    @property
+    def zR(self) -> np.ndarray:
+        """Rayleigh length of (x, y) in mm"""
+        return np.pi * self.w0**2 / (self.M2 * self.wavelength)
+
+    def __repr__(self) -> str:
+        return f"GaussianBeam(w0 = {self.w0.tolist()}, z0 = {self.z0.tolist()}, wavelength = {self.wavelength}, M2 = {self.M2.tolist()})"
+
+class SimulatedNanoScan():
+    # Noise of the raw revolutions in tests/outlier/datasets (dataset_*.dat): the d4sigma of x scatters by about 3 %
+    # of the median (robust standard deviation) and y by about 2.5 %. In 2 of 5 datasets, about 5 % of the revolutions
+    # of x are spikes of 20 % to 190 % above the median (median 50 %), in the others up to 40 %. y has no spikes.
+    NOISE       = (0.03, 0.025)
+    SPIKE_RATE  = (0.06, 0)
+    SPIKE_MIN   = 0.2
+    SPIKE_SCALE = 0.4
+
+    SYNC_GRACE  = 0.002 # s
+
+    def __init__(self,
+            beam: Optional[GaussianBeam] = None,
+            position: Optional[Callable[[], float]] = None,
+            rotationFrequency: float = 10.0,
+            noise: Union[float, Sequence[float]] = NOISE,
+            spikeRate: Union[float, Sequence[float]] = SPIKE_RATE,
+            spikeMin: float = SPIKE_MIN,
+            spikeScale: float = SPIKE_SCALE,
+            centroid: Union[float, Sequence[float]] = 4500,
+            clock: Optional[Clock] = None,
+            seed: Optional[int] = None
+        ) -> None:
+        """Drop-in replacement for `NanoScanDLL`, i.e. `NanoScan(dll = SimulatedNanoScan())`, simulating the NanoScanLibrary
+        and the functions of `NanoScanServer` in the same process.
+
+        Parameters
+        ----------
+        beam : Optional[GaussianBeam], optional
+            The beam that is measured, by default GaussianBeam()
+        position : Optional[Callable[[], float]], optional
+            Returns the position of the scan head along the beam in mm, by default None (always 0).
+            See `self.fromController()` to take it from the stage.
+        rotationFrequency : float, optional
+            Initial rotation frequency of the scan head in Hz, by default 10.0
+        noise : Union[float, Sequence[float]], optional
+            Relative standard deviation of the d4sigma of a revolution, of both axes or (x, y), by default `self.NOISE`
+        spikeRate : Union[float, Sequence[float]], optional
+            Probability that a revolution is a spike, by default `self.SPIKE_RATE`
+        spikeMin, spikeScale : float, optional
+            A spike is `spikeMin` plus an exponentially distributed excess with mean `spikeScale` above the d4sigma (relative),
+            by default `self.SPIKE_MIN` and `self.SPIKE_SCALE`
+        centroid : Union[float, Sequence[float]], optional
+            Centroid position in um reported once data is available, by default 4500 (centre of the 9 mm aperture)
+        clock : Optional[common.clock.Clock], optional
+            Clock on which the revolutions take their time, by default None (`common.clock.RealClock()`).
+            Use the clock of the controller and the camera, e.g. a `common.clock.VirtualClock` to run faster than real time.
+        seed : Optional[int], optional
+            Seed of the noise, by default None
+        """
+        self.beam       = beam if beam is not None else GaussianBeam()
+        self.position   = position if position is not None else (lambda: 0.0)
+        self.noise      = _pair(noise)
+        self.spikeRate  = _pair(spikeRate)
+        self.spikeMin   = spikeMin
+        self.spikeScale = spikeScale
+        self.centroid   = _pair(centroid)
+        self.clock      = clock if clock is not None else RealClock()
+
+        self.rng = np.random.default_rng(seed)
+
+        self.revolutions = 0    # number of revolutions acquired
+
+        self.rotFreq  = rotationFrequency
+        self.params   = 0
+        self.daq      = False
+        self.computed = None
+        self.z        = None    # position in mm of the last revolution
+
+        self._start    = self.clock.now()
+        self._phase    = self._now()    # start of a revolution
+        self._daqSince = None           # time at which the data acquisition was started
+
+    @classmethod
+    def fromController(cls, controller, **kwargs) -> "SimulatedNanoScan":
+        """Returns a simulated NanoScan at the position of the stage of `controller` (e.g. `stage.controller.GSC01`)
+
+        Parameters
+        ----------
+        controller : stage.controller.Controller
+            Controller with `controller.stage.position` in pulses and `controller.pulse_to_um()`. 
+            While the stage is jogging, e.g. during a fly-scan, its position is dirty, and the position estimated by
+            `controller.jogPosition()` is used instead, see `stage.controller.GSC01.jogPosition()`.
+        **kwargs
+            See `SimulatedNanoScan()`. The clock is that of `controller` by default.
+        """
+        kwargs.setdefault("clock", getattr(controller, "clock", None))
+        jogPosition = getattr(controller, "jogPosition", lambda: None)
+
+        def position() -> float:
+            pps = jogPosition()
+            if pps is None:
+                pps = controller.stage.position
+            return controller.pulse_to_um(pps) / 1000
+
+        return cls(position = position, **kwargs)
+
+    # Clock
+
+    def _now(self) -> float:
+        """Time in s since the start of the simulation"""
+        return self.clock.now() - self._start
+
+    @property
+    def elapsed(self) -> float:
+        """Time in s since the start of the simulation"""
+        return self._now()
+
+    @property
+    def revTime(self) -> float:
+        """Time in s of one revolution"""
+        return 1 / self.rotFreq
+
+    # NanoScanLibrary, see NanoScan.cs
+
+    def InitNS(self):
+        return 1
+
+    def ShutdownNS(self):
+        return 1
+
+    def GetNumDevices(self):
+        return 1
+
+    def GetDeviceID(self):
+        return 0
+
+    def GetRotationFrequency(self):
+        return self.rotFreq
+
+    def SetRotationFrequency(self, freq):
+        self.rotFreq = freq
+        self._phase  = self._now()
+
+    def GetHeadScanRates(self):
+        return [1.25, 2.5, 5.0, 10.0, 20.0]
+
+    def GetMaxSamplingResolution(self):
+        return 0
+
+    def SetSamplingResolution(self, res):
+        pass
+
+    def AutoFind(self):
+        pass
+
+    def GetSelectedParameters(self):
+        return self.params
+
+    def SelectParameters(self, params):
+        self.params = int(params)
+
+    def SetDataAcquisition(self, state):
+        self.daq       = state
+        self._daqSince = self._now() if state else None
+
+    def GetCentroidPosition(self, axis, roiIndex):
+        """0 until the first revolution after the start of the data acquisition, like the device.
+        On a simulated clock, the time until then passes with the call.
+        """
+        if not self.daq:
+            return 0.0
+
+        if self.clock.simulated:
+            self.clock.sleep(self._daqSince + self.revTime - self._now())
+
+        return float(self.centroid[int(axis)]) if self._now() - self._daqSince >= self.revTime - 1e-9 else 0.0
+
+    def AcquireSync1Rev(self):
+        """Waits for the start of the next revolution and acquires it. A revolution that has started less than
+        `self.SYNC_GRACE` s ago is still acquired, so that back-to-back calls acquire consecutive revolutions.
+        """
+        now  = self._now()
+        revs = math.ceil((now - self._phase - self.SYNC_GRACE) / self.revTime)
+        self.clock.sleep(self._phase + (revs + 1) * self.revTime - now)
+
+        self.z           = self.position()
+        self.revolutions += 1
+        self.computed    = None
+
+    def RunComputation(self):
+        d      = self.beam.diameter(self.z) * (1 + self.noise * self.rng.standard_normal(2))
+        spikes = self.rng.random(2) < self.spikeRate
+        d[spikes] *= 1 + self.spikeMin + self.rng.exponential(self.spikeScale, size = 2)[spikes]
+
+        self.computed = d
+
+    def GetBeamWidth4Sigma(self, axis, roiIndex):
+        return float(self.computed[int(axis)])
+
+    # NanoScanServer
+
+    def AcquireD4SigmaBatch(self, n: int, roiIndex: int = 0) -> bytes:
+        """See `NanoScanServer.AcquireD4SigmaBatch()`"""
+        vals = []
+        for _ in range(n):
+            self.AcquireSync1Rev()
+            self.RunComputation()
+            vals.append(self.GetBeamWidth4Sigma(0, roiIndex))
+            vals.append(self.GetBeamWidth4Sigma(1, roiIndex))
+
+        return struct.pack(f"<{2 * n}f", *vals)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, e_type, e_val, traceback):
+        return self.ShutdownNS()
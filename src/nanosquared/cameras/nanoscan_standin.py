@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+# Made 2021, Sun Yudong
+# yudong.sun [at] mpq.mpg.de / yudong [at] outlook.de
+
+"""Provides a local stand-in for the 32-bit NanoScan server, so that the NanoScan code path
+(including the inter-process requests) can be run and benchmarked without the device or Windows.
+
+The stand-in server runs `NanoScanServer` in a separate process with a simulated NanoScanLibrary
+and answers the requests over a local socket, similar to msl-loadlib.
+
+Usage:
+    with NanoScan(dll = StandInNanoScanDLL()) as n:
+        n.getAxis_avg_D4Sigma(n.AXES.BOTH)
+"""
+
+import os,sys
+import time
+import multiprocessing
+from multiprocessing.connection import Listener, Client
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, ".."))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+import numpy as np
+
+from cameras.nanoscan import NanoScanDLL
+from cameras.nanoscan_server import NanoScanServer
+
+class SimulatedNanoScanLibrary():
+    """Simulates the functions of NanoScanLibrary.dll used by `cameras.nanoscan.NanoScan`. See NanoScan.cs"""
+
+    def __init__(self, revTime: float = 0, diameter: tuple = (500, 600), noise: float = 0.02) -> None:
+        """
+        Parameters
+        ----------
+        revTime : float, optional
+            Time in seconds that one revolution takes, by default 0
+            The real device takes 1/rotationFrequency.
+        diameter : tuple, optional
+            d4sigma (x, y) of the simulated beam in micrometer, by default (500, 600)
+        noise : float, optional
+            Relative standard deviation of the simulated d4sigma, by default 0.02
+        """
+        self.revTime  = revTime
+        self.diameter = diameter
+        self.noise    = noise
+
+        self.rotFreq  = 10.0
+        self.params   = 0
+        self.daq      = False
+        self.rng      = np.random.default_rng()
+        self.computed = None
+
+    def InitNS(self):
+        return 1
+
+    def ShutdownNS(self):
+        return 1
+
+    def GetNumDevices(self):
+        return 1
+
+    def GetDeviceID(self):
+        return 0
+
+    def GetRotationFrequency(self):
+        return self.rotFreq
+
+    def SetRotationFrequency(self, freq):
+        self.rotFreq = freq
+
+    def GetHeadScanRates(self):
+        return [1.25, 2.5, 5.0, 10.0, 20.0]
+
+    def GetMaxSamplingResolution(self):
+        return 0
+
+    def SetSamplingResolution(self, res):
+        pass
+
+    def AutoFind(self):
+        pass
+
+    def GetSelectedParameters(self):
+        return self.params
+
+    def SelectParameters(self, params):
+        self.params = int(params)
+
+    def SetDataAcquisition(self, state):
+        self.daq = state
+
+    def GetCentroidPosition(self, axis, roiIndex):
+        return 1.0
+
+    def AcquireSync1Rev(self):
+        if self.revTime > 0:
+            time.sleep(self.revTime)
+        self.computed = None
+
+    def RunComputation(self):
+        self.computed = np.array(self.diameter) * (1 + self.noise * self.rng.standard_normal(2))
+
+    def GetBeamWidth4Sigma(self, axis, roiIndex):
+        return float(self.computed[int(axis)])
+
+class StandInNanoScanServer(NanoScanServer):
+    """`NanoScanServer` with a `SimulatedNanoScanLibrary` instead of the 32-bit DLL"""
+
+    def __init__(self, **kwargs):
+        # There is no library to load, so Server32.__init__ is not called
+        self.NS = SimulatedNanoScanLibrary(**kwargs)
+        assert self.NS.InitNS() == 1, "Failed to start NanoScan"
+
+def _serve(address, authkey: bytes, **kwargs):
+    server = StandInNanoScanServer(**kwargs)
+
+    with Client(address, authkey = authkey) as conn:
+        while True:
+            name, args, kwargs = conn.recv()
+            if name is None:
+                break
+
+            try:
+                conn.send((True, getattr(server, name)(*args, **kwargs)))
+            except Exception as e:
+                conn.send((False, e))
+
+class StandInNanoScanDLL(NanoScanDLL):
+    """Drop-in replacement for `NanoScanDLL` that starts a `StandInNanoScanServer` in a separate process"""
+
+    def __init__(self, **kwargs):
+        """
+        Parameters
+        ----------
+        **kwargs
+            Passed to `SimulatedNanoScanLibrary`
+        """
+        authkey = os.urandom(16)
+
+        with Listener(("localhost", 0), authkey = authkey) as listener:
+            self._proc = multiprocessing.Process(target = _serve, args = (listener.address, authkey), kwargs = kwargs, daemon = True)
+            self._proc.start()
+            self._conn = listener.accept()
+
+    def request32(self, name, *args, **kwargs):
+        self._conn.send((name, args, kwargs))
+        success, ret = self._conn.recv()
+
+        if not success:
+            raise ret
+
+        return ret
+
+    def shutdown_server32(self):
+        if self._proc.is_alive():
+            self._conn.send((None, None, None))
+            self._proc.join(timeout = 5)
+        self._conn.close()
+
+    def __exit__(self, e_type, e_val, traceback):
+        ret = self.ShutdownNS()
+        self.shutdown_server32()
+        return ret
@@ -10,9 +10,11 @@ root_dir = os.path.abspath(os.path.join(base_dir, ".."))
 if root_dir not in sys.path:
     sys.path.insert(0, root_dir) 
 
-from typing import Tuple
+from typing import Optional, Tuple
 
 import cameras.camera as cam
+import common.helpers as h
+from common.trace import traced
 from cameras.wincamd_constants import WinCamAxes, WCD_Profiles, OCX_Buttons, CLIP_MODES
 
 import logging
@@ -20,6 +22,7 @@ from PyQt5 import QtWidgets, QAxContainer
 # from PyQt5 import QtCore
 
 import queue
+import numbers
 
 import numpy as np
 from collections import namedtuple
@@ -63,6 +66,8 @@ class WinCamD(cam.Camera):
 
 		self.dataReadyCallbacks = queue.Queue() # Queue of callbacks to run when data ready
 
+		self._streamState = False # Aperture state before startStream()
+
 		# https://stackoverflow.com/questions/36442631/how-to-receive-activex-events-in-pyqt5
 		self.dataCtrl.DataReady.connect(self.on_DataReady)
 
@@ -97,6 +102,7 @@ class WinCamD(cam.Camera):
 		
 		self.log("End of one RTT\n", logging.DEBUG)
 	
+	@traced(cat = "camera")
 	def wait_DataReady_Tasks(self):
 		"""Waits for all the dataready callbacks to be called
 		"""
@@ -110,6 +116,7 @@ class WinCamD(cam.Camera):
 				# how to concurrency
 				QtWidgets.QApplication.processEvents()
 
+	@traced(cat = "camera")
 	def wait_stable(self, numevents: int = 10):
 		"""Blocks until `numevents` of DataReady has passed. Opens the camera if necessary, then restores the previous state. 
 
@@ -168,7 +175,7 @@ class WinCamD(cam.Camera):
 		return self.dataCtrl.dynamicCall(f"SetClipLevel({clip}, 0.5, {mode}, {CLIP_MODES.CLIP_LEVEL_METHOD})")
 
 	# Implementations
-	def getAxis_avg_D4Sigma(self, axis: WinCamAxes, numsamples: int = 20, returnRaw: bool = False, *args, **kwargs) -> Tuple[float, float]:
+	def getAxis_avg_D4Sigma(self, axis: WinCamAxes, numsamples: int = 20, returnRaw: bool = False, targetSEM: Optional[float] = None, minSamples: int = 10, *args, **kwargs) -> Tuple[float, float]:
 		"""Get the d4sigma in one `axis` and averages it over `numsamples`.
 		This function opens the camera where necessary, and returns it to the previous state after it is done.
 
@@ -181,9 +188,22 @@ class WinCamD(cam.Camera):
 		axis : str
 			May take values 'x' or 'y'
 		numsamples : int, optional
-			Number of samples to average over, by default 20
+			Number of samples to average over, by default 20. Maximum number of samples if `targetSEM` is given.
 		returnRaw : bool, optional
 			If set to True, return the raw data
+		targetSEM: float, optional
+			If given, the number of samples is chosen adaptively: frames are taken until the standard error of the mean 
+			of the requested axis (of both axes for 'xy') is at most `targetSEM`, but at least `minSamples` and at most 
+			`numsamples` frames, see `NanoScan.getAxis_avg_D4Sigma()`.
+
+			If value is less than or equal to 1, then it represents the percentage of the mean (e.g. 0.005 := 0.5% * Mean).
+			If value is more than 1, then it represents the absolute standard error in micrometer.
+
+			The number of samples taken is stored in `self.lastNumSamples`.
+
+			By default None, i.e. always take `numsamples` samples.
+		minSamples: int, optional
+			Minimum number of samples in adaptive mode, by default 10
 
 		Returns
 		-------
@@ -200,7 +220,12 @@ class WinCamD(cam.Camera):
 		if axis not in ['x', 'y', 'xy']:
 			return (None, None)
 
+		if targetSEM is not None and (not isinstance(targetSEM, numbers.Number) or targetSEM <= 0):
+			self.log(f"Invalid targetSEM {targetSEM}. Taking {numsamples} samples.", loglevel = logging.WARN)
+			targetSEM = None
+
 		if self.devMode:
+			self.lastNumSamples = numsamples
 			return (123, 10)
 
 		# Ensure we are in d4sigma mode:
@@ -214,7 +239,13 @@ class WinCamD(cam.Camera):
 			assert self.startDevice()
 		
 		# We discard the first data point because of some artefact
-		data = np.array([self.getAxis_D4Sigma(axis) for _ in range(numsamples + frames_needed_for_stable)][frames_needed_for_stable:])
+		if targetSEM is not None:
+			for _ in range(frames_needed_for_stable):
+				self.getAxis_D4Sigma(axis)
+			data = self.acquire_adaptive(axis, targetSEM = targetSEM, minSamples = minSamples, maxSamples = numsamples)
+		else:
+			data = np.array([self.getAxis_D4Sigma(axis) for _ in range(numsamples + frames_needed_for_stable)][frames_needed_for_stable:])
+		self.lastNumSamples = len(data)
 
 		if not _originalState:
 			self.stopDevice()
@@ -234,6 +265,34 @@ class WinCamD(cam.Camera):
 		else:
 			return ret
 
+	def acquire_adaptive(self, axis: WinCamAxes, targetSEM: float, minSamples: int = 10, maxSamples: int = 200) -> np.ndarray:
+		"""Takes frames until the standard error of the mean of `axis` is at most `targetSEM`. 
+		See `self.getAxis_avg_D4Sigma()` for the parameters. The camera must be running and stable.
+
+		Returns
+		-------
+		data : np.ndarray
+			The d4sigma of every frame in micrometer, of shape (n,) or (n, 2) for 'xy', minSamples <= n <= maxSamples
+		"""
+		minSamples = max(2, min(minSamples, maxSamples))
+
+		stats = h.RunningStats(shape = (2,) if axis == self.AXES.BOTH else ())
+		data  = []
+		while stats.n < maxSamples:
+			sample = np.asarray(self.getAxis_D4Sigma(axis), dtype = np.float64)
+
+			stats.update(sample)
+			data.append(sample)
+
+			if stats.n >= minSamples:
+				target = targetSEM * np.abs(stats.mean) if targetSEM <= 1 else targetSEM
+				if np.all(stats.sem <= target):
+					break
+
+		self.log(f"Adaptive: {stats.n} samples, sem = {stats.sem}", logging.DEBUG)
+
+		return np.array(data)
+
 	def getAxis_D4Sigma(self, axis: WinCamAxes):
 		"""Get the d4sigma in one `axis`, opens the camera if necessary, then restores the previous state that the camera was in.
 
@@ -278,6 +337,35 @@ class WinCamD(cam.Camera):
 
 		return self.D4Sigma_data
 
+	def startStream(self):
+		"""Opens the camera if necessary for taking samples with `self.getSample_D4Sigma()`. 
+		Use `self.stopStream()` to return to the previous state.
+		"""
+		self._streamState = self.apertureOpen
+
+		if self.devMode:
+			return
+
+		if not self.apertureOpen:
+			assert self.startDevice()
+
+	def getSample_D4Sigma(self) -> Tuple[float, float]:
+		"""Gets the d4sigma of both axes from the next DataReady event, see `self.getAxis_D4Sigma()`
+
+		Returns
+		-------
+		(x, y) : Tuple[float, float]
+			d4sigma of both axes in micrometer
+		"""
+		if self.devMode:
+			return (123, 123)
+
+		return self.getAxis_D4Sigma(self.AXES.BOTH)
+
+	def stopStream(self):
+		if not self.devMode and not self._streamState and self.apertureOpen:
+			self.stopDevice()
+
 	def getAxisProfile(self, axis: WinCamAxes):
 		"""Get the profile in one `axis` if the camera is running.
 		Note: Does not work, but not important 
@@ -1 +1,3 @@
-from . import helpers
\ No newline at end of file
+from . import helpers
+from . import clock
+from . import trace
\ No newline at end of file
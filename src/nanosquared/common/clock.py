@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+# Made 2021, Sun Yudong
+# yudong.sun [at] mpq.mpg.de / yudong [at] outlook.de
+
+"""Provides the clocks that controllers and cameras wait with, so that simulations can run faster than real time.
+
+Usage:
+	clock = VirtualClock()
+	with GSC01(devMode = True, clock = clock) as c:
+		c.move(20000)
+		c.waitClear()    # returns immediately, clock.now() has advanced by the duration of the move
+"""
+
+import abc
+import threading
+import time
+
+from typing import Optional
+
+class Clock(abc.ABC):
+	"""Abstract Base Class for a clock"""
+
+	# Whether the time is simulated, i.e. does not pass by itself
+	simulated = False
+
+	@abc.abstractmethod
+	def now(self) -> float:
+		"""Monotonic time in s, like `time.monotonic()`"""
+		pass
+
+	@abc.abstractmethod
+	def sleep(self, seconds: float):
+		"""Waits for `seconds` s, like `time.sleep()`"""
+		pass
+
+	@abc.abstractmethod
+	def time(self) -> float:
+		"""Time in s since the epoch, like `time.time()`, e.g. for timestamps"""
+		pass
+
+class RealClock(Clock):
+	"""The system clock"""
+
+	def now(self) -> float:
+		return time.monotonic()
+
+	def sleep(self, seconds: float):
+		if seconds > 0:
+			time.sleep(seconds)
+
+	def time(self) -> float:
+		return time.time()
+
+	def __repr__(self) -> str:
+		return "RealClock()"
+
+class VirtualClock(Clock):
+	simulated = True
+
+	def __init__(self, start: float = 0, epoch: Optional[float] = None) -> None:
+		"""Simulated clock that only advances when slept on, i.e. `self.sleep()` returns immediately.
+
+		Parameters
+		----------
+		start : float, optional
+			Initial value of `self.now()` in s, by default 0
+		epoch : Optional[float], optional
+			Value of `self.time()` at `self.now() = start`, by default None (the current time)
+		"""
+		self.start = start
+		self.epoch = time.time() if epoch is None else epoch
+
+		self._now  = start
+		self._lock = threading.Lock()
+
+	def now(self) -> float:
+		return self._now
+
+	def sleep(self, seconds: float):
+		if seconds > 0:
+			with self._lock:
+				self._now += seconds
+
+	def advance(self, seconds: float):
+		"""Lets `seconds` s pass, same as `self.sleep()`"""
+		self.sleep(seconds)
+
+	def time(self) -> float:
+		return self.epoch + (self._now - self.start)
+
+	@property
+	def elapsed(self) -> float:
+		"""Simulated time in s since the start"""
+		return self._now - self.start
+
+	def __repr__(self) -> str:
+		return f"VirtualClock(start = {self.start}, epoch = {self.epoch})"
@@ -12,6 +12,8 @@ if root_dir not in sys.path:
 import logging
 logging.captureWarnings(True)
 
+import numpy as np
+
 class LoggerMixIn():
 	LOGLEVEL_THRESHOLD = logging.DEBUG
 	
@@ -73,4 +75,47 @@ def ensureInt(x: int):
 		pass
 	
 	if error:
-		raise TypeError(f"Given input must be an integer, got: {x}")
\ No newline at end of file
+		raise TypeError(f"Given input must be an integer, got: {x}")
+
+class RunningStats():
+	"""Running mean and variance of a stream of samples using Welford's algorithm, 
+	so that the statistics can be checked after every sample without keeping or re-reading all samples.
+
+	Samples may be scalars or arrays of a fixed `shape`, in which case the statistics are element-wise
+	(e.g. shape = (2,) for the (x, y) diameters of one revolution).
+	"""
+
+	def __init__(self, shape: tuple = ()) -> None:
+		self.n     = 0
+		self.mean  = np.zeros(shape)
+		self._m2   = np.zeros(shape)
+
+	def update(self, x) -> None:
+		"""Adds one sample"""
+		self.n += 1
+		delta      = x - self.mean
+		self.mean  = self.mean + delta / self.n
+		self._m2   = self._m2 + delta * (x - self.mean)
+
+	def update_batch(self, xs) -> None:
+		"""Adds the samples in `xs` one by one, i.e. along the first axis"""
+		for x in xs:
+			self.update(x)
+
+	@property
+	def variance(self):
+		"""Population variance (ddof = 0), like `np.var`"""
+		return self._m2 / self.n if self.n > 0 else np.full_like(self._m2, np.nan)
+
+	@property
+	def std(self):
+		"""Population standard deviation (ddof = 0), like `np.std`"""
+		return np.sqrt(self.variance)
+
+	@property
+	def sem(self):
+		"""Standard error of the mean, using the sample standard deviation (ddof = 1). inf for less than 2 samples."""
+		if self.n < 2:
+			return np.full_like(self._m2, np.inf)
+
+		return np.sqrt(self._m2 / (self.n - 1) / self.n)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+# Made 2021, Sun Yudong
+# yudong.sun [at] mpq.mpg.de / yudong [at] outlook.de
+
+"""Provides lightweight span instrumentation, to see where the time of a measurement goes.
+
+Spans are recorded with monotonic timestamps into a ring buffer that keeps the last `Tracer.capacity` spans. They can
+be exported as a Chrome trace (chrome://tracing or https://ui.perfetto.dev) and summarised per name. The functions of
+the controller, the cameras, the measurement and the fitter that take time are wrapped with `traced()` and record into
+the shared `tracer`. `Measurement.take_measurements()` logs the summary of its spans at the end.
+
+Usage:
+	@traced(cat = "stage")
+	def waitClear(self):
+		...
+
+	with tracer.span("find_params", cat = "measurement", axis = "BOTH"):
+		...
+
+	mark = tracer.mark()
+	...
+	print(tracer.summaryTable(since = mark))
+	tracer.exportChromeTrace("trace.json", since = mark)
+"""
+
+import os,sys
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, ".."))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir) 
+
+import functools
+import json
+import threading
+
+from collections import deque, namedtuple
+from typing import Callable, Dict, List, Optional
+
+from common.clock import Clock, RealClock
+
+# A finished span, with the start and the end in s on the clock of the tracer
+Span = namedtuple("Span", ["name", "cat", "start", "end", "tid", "args"])
+
+class _ActiveSpan():
+	__slots__ = ("tracer", "name", "cat", "args", "start")
+
+	def __init__(self, tracer: "Tracer", name: str, cat: str, args: Optional[dict]) -> None:
+		self.tracer = tracer
+		self.name   = name
+		self.cat    = cat
+		self.args   = args
+		self.start  = None
+
+	def __enter__(self):
+		if self.tracer.enabled:
+			self.start = self.tracer.clock.now()
+		return self
+
+	def __exit__(self, e_type, e_val, traceback):
+		if self.start is not None:
+			self.tracer.record(self.name, self.cat, self.start, self.tracer.clock.now(), self.args)
+
+class Tracer():
+	def __init__(self, capacity: int = 100000, clock: Optional[Clock] = None, enabled: bool = True) -> None:
+		"""Records spans into a ring buffer
+
+		Parameters
+		----------
+		capacity : int, optional
+			Number of spans kept, the oldest spans are dropped first, by default 100000
+		clock : Optional[common.clock.Clock], optional
+			Clock of the timestamps, by default None (`common.clock.RealClock()`, i.e. `time.monotonic()`).
+			With a `common.clock.VirtualClock`, the spans show the simulated time instead of the time spent in Python.
+		enabled : bool, optional
+			Whether spans are recorded, by default True
+		"""
+		self.clock   = clock if clock is not None else RealClock()
+		self.enabled = enabled
+
+		self._spans   = deque(maxlen = capacity)
+		self._threads = {}  # thread id: name
+		self.dropped  = 0   # number of spans dropped from the ring buffer
+
+	@property
+	def capacity(self) -> int:
+		return self._spans.maxlen
+
+	def __len__(self) -> int:
+		return len(self._spans)
+
+	def record(self, name: str, cat: str, start: float, end: float, args: Optional[dict] = None):
+		"""Records a finished span from `start` to `end` in s on `self.clock`"""
+		tid = threading.get_ident()
+		if tid not in self._threads:
+			self._threads[tid] = threading.current_thread().name
+
+		if len(self._spans) == self._spans.maxlen:
+			self.dropped += 1
+
+		self._spans.append(Span(name, cat, start, end, tid, args))
+
+	def span(self, name: str, cat: str = "", **args) -> _ActiveSpan:
+		"""Context manager that records the time spent in its block as a span `name` of the category `cat`.
+		Keyword arguments are shown with the span in the Chrome trace.
+		"""
+		return _ActiveSpan(self, name, cat, args if args else None)
+
+	def mark(self) -> float:
+		"""Returns the current time of the clock, to select the spans started from now on with `since`"""
+		return self.clock.now()
+
+	def clear(self):
+		self._spans.clear()
+		self.dropped = 0
+
+	def spans(self, since: Optional[float] = None) -> List[Span]:
+		"""Returns the recorded spans, that started at or after `since` if given, in the order they ended"""
+		spans = list(self._spans)
+		if since is not None:
+			spans = [s for s in spans if s.start >= since]
+		return spans
+
+	def summary(self, since: Optional[float] = None) -> Dict[str, dict]:
+		"""Sums up the spans per name
+
+		Parameters
+		----------
+		since : Optional[float], optional
+			Only the spans started at or after this time, see `self.mark()`, by default None (all)
+
+		Returns
+		-------
+		summary : Dict[str, dict]
+			{ name: { "cat", "count", "total", "self", "max" } } with the times in s. "self" is the total minus the time
+			spent in spans nested within, e.g. the `GSC01.send` calls of a `Measurement.measure_at`.
+		"""
+		spans = self.spans(since = since)
+
+		# Time of the spans directly nested in each span, per thread
+		childTime = [0.0] * len(spans)
+		byThread  = {}
+		for i, s in enumerate(spans):
+			byThread.setdefault(s.tid, []).append(i)
+
+		for indices in byThread.values():
+			indices.sort(key = lambda i: (spans[i].start, -spans[i].end))
+			stack = []
+			for i in indices:
+				while stack and spans[stack[-1]].end < spans[i].end:
+					stack.pop()
+				if stack:
+					childTime[stack[-1]] += spans[i].end - spans[i].start
+				stack.append(i)
+
+		out = {}
+		for s, child in zip(spans, childTime):
+			dur = s.end - s.start
+			entry = out.setdefault(s.name, { "cat": s.cat, "count": 0, "total": 0.0, "self": 0.0, "max": 0.0 })
+			entry["count"] += 1
+			entry["total"] += dur
+			entry["self"]  += max(dur - child, 0.0)
+			entry["max"]    = max(entry["max"], dur)
+
+		return out
+
+	def summaryTable(self, since: Optional[float] = None) -> str:
+		"""Returns `self.summary()` as a table, sorted by the self time. The share is of the time from the start of the first
+		span to the end of the last span.
+		"""
+		spans = self.spans(since = since)
+		if not len(spans):
+			return "No spans recorded"
+
+		wall    = max(s.end for s in spans) - min(s.start for s in spans)
+		summary = sorted(self.summary(since = since).items(), key = lambda kv: kv[1]["self"], reverse = True)
+		width   = max(len(name) for name, _ in summary)
+
+		lines = [f"{'span':<{width}} {'category':>11} {'count':>7} {'total [s]':>10} {'self [s]':>10} {'share':>6} {'mean [ms]':>10} {'max [ms]':>9}"]
+		for name, e in summary:
+			share = e["self"] / wall if wall > 0 else 0
+			lines.append(f"{name:<{width}} {e['cat']:>11} {e['count']:>7} {e['total']:>10.3f} {e['self']:>10.3f} {100 * share:>5.1f}% {1e3 * e['total'] / e['count']:>10.3f} {1e3 * e['max']:>9.3f}")
+
+		lines.append(f"{len(spans)} spans in {wall:.3f} s" + (f", {self.dropped} dropped from the ring buffer" if self.dropped else ""))
+
+		return "\n".join(lines)
+
+	def chromeTrace(self, since: Optional[float] = None) -> dict:
+		"""Returns the spans in the Trace Event Format of chrome://tracing, as complete events with the times in us"""
+		spans  = self.spans(since = since)
+		events = [{ "name": "thread_name", "ph": "M", "pid": 0, "tid": tid, "args": { "name": name } } for tid, name in self._threads.items()]
+
+		for s in spans:
+			event = { "name": s.name, "cat": s.cat, "ph": "X", "ts": s.start * 1e6, "dur": (s.end - s.start) * 1e6, "pid": 0, "tid": s.tid }
+			if s.args:
+				event["args"] = { k: v if isinstance(v, (int, float, str, bool, type(None))) else str(v) for k, v in s.args.items() }
+			events.append(event)
+
+		return { "traceEvents": events, "displayTimeUnit": "ms", "otherData": { "clock": repr(self.clock), "dropped": self.dropped } }
+
+	def exportChromeTrace(self, filename: str, since: Optional[float] = None) -> str:
+		"""Writes `self.chromeTrace()` to `filename` as JSON, to be opened with chrome://tracing or https://ui.perfetto.dev
+
+		Returns
+		-------
+		filename : str
+		"""
+		with open(filename, "w") as f:
+			json.dump(self.chromeTrace(since = since), f)
+
+		return filename
+
+	def __repr__(self) -> str:
+		return f"Tracer(capacity = {self.capacity}, clock = {self.clock}, enabled = {self.enabled})"
+
+# The tracer of all instrumented functions
+tracer = Tracer()
+
+def traced(name: Optional[str] = None, cat: str = "") -> Callable:
+	"""Decorator that records every call of the function as a span of `tracer`
+
+	Parameters
+	----------
+	name : Optional[str], optional
+		Name of the span, by default None (the qualified name of the function, e.g. "GSC01.send")
+	cat : str, optional
+		Category of the span, e.g. "stage", by default ""
+	"""
+	def decorator(func: Callable) -> Callable:
+		label = name if name is not None else func.__qualname__
+
+		@functools.wraps(func)
+		def wrapper(*args, **kwargs):
+			if not tracer.enabled:
+				return func(*args, **kwargs)
+
+			start = tracer.clock.now()
+			try:
+				return func(*args, **kwargs)
+			finally:
+				tracer.record(label, cat, start, tracer.clock.now())
+
+		return wrapper
+
+	return decorator
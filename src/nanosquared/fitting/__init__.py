@@ -1,2 +1,3 @@
 from . import fit_functions
-from . import fitter
\ No newline at end of file
+from . import fitter
+from . import batch
\ No newline at end of file
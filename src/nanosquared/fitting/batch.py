@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+
+# Made 2021, Sun Yudong
+# yudong.sun [at] mpq.mpg.de / yudong [at] outlook.de
+
+"""Vectorized Levenberg-Marquardt fitting of many caustics at once
+
+Instead of fitting one caustic (or one set of initial guesses) after another with MsqODRFitter/MsqOCFFitter,
+all problems are stacked into arrays and iterated in lockstep with NumPy. Problems that have converged
+are masked out, so that the remaining iterations only work on the problems that are still running.
+
+Usage:
+    f = MsqBatchFitter(x = z, y = radii, yerror = err, wavelength = 1650, mode = MsqFitter.M2_MODE) # radii of shape (N, M)
+    f.estimateAndFit()
+    f.m_squared # shape (N, 2)
+"""
+
+import sys, os
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, ".."))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+import numpy as np
+
+from collections import namedtuple
+
+from fitting.fitter import MsqFitter
+
+def _solve(A, b):
+    """Solves the stack of linear systems A x = b, with A of shape (K, P, P) and b of shape (K, P)"""
+    try:
+        return np.linalg.solve(A, b[..., None])[..., 0]
+    except np.linalg.LinAlgError:
+        # At least one of the systems is singular, use the pseudo-inverse for all of them
+        return np.einsum('kij,kj->ki', np.linalg.pinv(A), b)
+
+def _numerical_jacb(func, params, x, rel: float = 1.49012e-08):
+    """Forward differences with respect to the parameters, params of shape (P, K, 1). Returns shape (P, K, M)"""
+    f0  = func(params, x)
+    jac = []
+    for i in range(len(params)):
+        h       = rel * np.maximum(np.abs(params[i]), 1)
+        p       = params.copy()
+        p[i]   += h
+        jac.append((func(p, x) - f0) / h)
+    return np.stack(jac)
+
+def batch_lm(func, x, y, p0, sigma = None, xerror = None, jacobian: bool = True, maxiter: int = 200, xtol: float = 1.49012e-08, ftol: float = 1.49012e-08, lambda0: float = 1e-3):
+    """Fits func to a stack of N problems with the Levenberg-Marquardt method, all problems at once.
+
+    Each problem minimizes sum(((y - func(beta, x)) / sigma)^2) like scipy.optimize.curve_fit(method = 'lm').
+    The problems are iterated in lockstep, and the problems that have converged are masked out of the remaining iterations.
+
+    Parameters
+    ----------
+    func : function
+        fcn(beta, x) --> y, see fit_functions. Must broadcast, i.e. accept beta of shape (P, K, 1) with x of shape (K, M).
+        If ``func.fjacb`` exists, it is used as the analytic Jacobian, otherwise forward differences are used.
+    x : array_like
+        Independent variable, shape (M,) for the same positions in all problems or (N, M)
+    y : array_like
+        Dependent variable, shape (M,) for the same data in all problems (e.g. with different initial guesses) or (N, M)
+    p0 : array_like
+        Initial guesses, shape (P,) for the same initial guesses in all problems or (N, P)
+    sigma : array_like, optional
+        Error in y, scalar or broadcastable to (N, M), by default None (= 1)
+    xerror : array_like, optional
+        Error in x, scalar or broadcastable to (N, M), by default None
+
+        If given, it is taken into account with the effective variance sigma^2 + (func'(x) * xerror)^2,
+        an approximation of the orthogonal distance regression of scipy.odr. Requires ``func.fjacd``.
+    jacobian : bool, optional
+        Use the analytic Jacobian ``func.fjacb`` if available, by default True
+    maxiter : int, optional
+        Maximum number of iterations, by default 200
+    xtol : float, optional
+        Relative error desired in the parameters, by default 1.49012e-08 (as curve_fit)
+    ftol : float, optional
+        Relative error desired in the sum of squares, by default 1.49012e-08 (as curve_fit)
+    lambda0 : float, optional
+        Initial damping parameter, by default 1e-3
+
+    Returns
+    -------
+    output : namedtuple
+        .beta      = fitted parameters, shape (N, P)
+        .sd_beta   = one standard deviation errors on the parameters, shape (N, P)
+        .cov_beta  = covariance matrices of the parameters (scaled by the reduced chi-squared like curve_fit), shape (N, P, P)
+        .chi_sq    = sum of squares of the weighted residuals, shape (N,)
+        .converged = whether the problem has converged, shape (N,)
+        .niter     = number of iterations, shape (N,)
+
+    Raises
+    ------
+    ValueError
+        If the shapes of the data and the initial guesses do not match, or xerror is given for a function without fjacd
+    """
+    x  = np.asarray(x , dtype = np.float64)
+    y  = np.asarray(y , dtype = np.float64)
+    p0 = np.asarray(p0, dtype = np.float64)
+
+    M = np.shape(y)[-1]
+    N = max(x.shape[0] if x.ndim == 2 else 1, y.shape[0] if y.ndim == 2 else 1, p0.shape[0] if p0.ndim == 2 else 1)
+    P = p0.shape[-1]
+
+    try:
+        x     = np.broadcast_to(x, (N, M))
+        y     = np.broadcast_to(y, (N, M))
+        sy    = np.broadcast_to(np.asarray(1 if sigma is None else sigma, dtype = np.float64), (N, M))
+        sx    = None if xerror is None else np.broadcast_to(np.asarray(xerror, dtype = np.float64), (N, M))
+        beta  = np.array(np.broadcast_to(p0, (N, P)))
+    except ValueError as e:
+        raise ValueError(f"Shapes do not match: x {x.shape}, y {y.shape}, p0 {p0.shape}") from e
+
+    if sx is not None and not hasattr(func, "fjacd"):
+        raise ValueError("xerror requires the derivative func.fjacd")
+
+    fjacb = func.fjacb if (jacobian and hasattr(func, "fjacb")) else (lambda params, xs: _numerical_jacb(func, params, xs))
+
+    def residuals(params, idx):
+        """Weighted residuals (K, M) and the errors (K, M) of the problems idx at params (K, P)"""
+        xs     = x[idx]
+        params = params.T[..., None]
+
+        s = sy[idx]
+        if sx is not None:
+            s = np.sqrt(s*s + (func.fjacd(params, xs) * sx[idx])**2)
+
+        return (y[idx] - func(params, xs)) / s, s
+
+    def weighted_jacobian(params, idx, s):
+        """Weighted Jacobian (K, M, P) of the problems idx at params (K, P)"""
+        return np.moveaxis(fjacb(params.T[..., None], x[idx]) / s, 0, -1)
+
+    res, s    = residuals(beta, np.arange(N))
+    jac       = weighted_jacobian(beta, np.arange(N), s)
+    chi_sq    = np.einsum('km,km->k', res, res)
+    lmbda     = np.full(N, lambda0)
+    done      = ~np.isfinite(chi_sq)
+    converged = np.zeros(N, dtype = bool)
+    niter     = np.zeros(N, dtype = int)
+    diag      = np.arange(P)
+
+    for _ in range(maxiter):
+        idx = np.flatnonzero(~done)
+        if not idx.size:
+            break
+
+        J = jac[idx]
+        A = np.einsum('kmi,kmj->kij', J, J)
+        g = np.einsum('kmi,km->ki', J, res[idx])
+
+        # Marquardt: damp with the diagonal of J^T J
+        A[:, diag, diag] += lmbda[idx, None] * np.maximum(A[:, diag, diag], np.finfo(np.float64).tiny)
+
+        step     = _solve(A, g)
+        newbeta  = beta[idx] + step
+        with np.errstate(invalid = 'ignore', divide = 'ignore', over = 'ignore'):
+            newres, news = residuals(newbeta, idx)
+        newchisq = np.einsum('km,km->k', newres, newres)
+
+        better = np.isfinite(newchisq) & (newchisq <= chi_sq[idx])
+        small  = better & (
+            np.all(np.abs(step) <= xtol * (np.abs(newbeta) + xtol), axis = 1) |
+            ((chi_sq[idx] - newchisq) <= ftol * chi_sq[idx])
+        )
+
+        # The Jacobian is only needed where the step was accepted
+        acc = idx[better]
+        beta[acc], res[acc], chi_sq[acc] = newbeta[better], newres[better], newchisq[better]
+        jac[acc] = weighted_jacobian(newbeta[better], acc, news[better])
+
+        lmbda[acc]          /= 10
+        lmbda[idx[~better]] *= 10
+        niter[idx]          += 1
+
+        converged[idx[small]] = True
+        done[idx[small]]      = True
+        # The damping has blown up without finding a better point
+        done[lmbda > 1e16]    = True
+
+    A       = np.einsum('kmi,kmj->kij', jac, jac)
+    dof     = M - P
+    scale   = chi_sq / dof if dof > 0 else np.full(N, np.inf)
+    cov     = np.linalg.pinv(A) * scale[:, None, None]
+    sd_beta = np.sqrt(np.abs(cov[:, diag, diag]))
+
+    output = {
+        "beta"     : beta,
+        "sd_beta"  : sd_beta,
+        "cov_beta" : cov,
+        "chi_sq"   : chi_sq,
+        "converged": converged,
+        "niter"    : niter
+    }
+
+    return namedtuple("Output", output.keys())(*output.values())
+
+class MsqBatchFitter(MsqFitter):
+    """Class to fit N caustics (or one caustic with N sets of initial guesses) for the M_Squared at once using batch_lm()
+
+    Parameters
+    ----------
+    x : array_like
+        Independent variable, shape (M,) for the same positions in all caustics or (N, M)
+    y : array_like
+        Dependent variable (radii), shape (M,) or (N, M)
+    yerror : array_like or function
+        Error in y, scalar, broadcastable to y, or func(y) --> yerror
+    wavelength : float_like
+        Wavelength of the laser, to be given manually for fitting
+    wavelength_err : float_like, optional
+        Error of the wavelength of the laser, to be used in error propagation to find the m_squared
+        By default: 0
+    mode: int
+        See MsqODRFitter, by default ISO_MODE
+    xerror : array_like or function, optional
+        Error in x, scalar, broadcastable to x, or func(x) --> xerror. By default None
+        See batch_lm() on how it is taken into account.
+    jacobian : bool, optional
+        Use the analytic Jacobians of the fit function, by default True
+
+    Attributes
+    ----------
+    data : namedtuple
+        .x, .y, .sx, .sy
+    output : namedtuple
+        See batch_lm()
+    initial_guesses : array_like
+        Shape (3,) or (N, 3)
+    m_squared : array_like
+        Shape (N, 2), ``[m_squared, m_squared_err]`` of each problem
+
+    """
+    def __init__(self, x, y, yerror, wavelength: float, wavelength_err: float = 0, mode: int = MsqFitter.ISO_MODE, xerror = None, jacobian: bool = True):
+        MsqFitter.__init__(self, wavelength = wavelength, wavelength_err = wavelength_err, mode = mode)
+
+        self.data     = None
+        self.output   = None
+        self.jacobian = jacobian
+
+        self.loadData(x, y, xerror, yerror)
+
+    def loadData(self, x, y, xerror, yerror):
+        x = np.asarray(x, dtype = np.float64)
+        y = np.asarray(y, dtype = np.float64)
+
+        xerror = xerror(x) if callable(xerror) else xerror
+        yerror = yerror(y) if callable(yerror) else yerror
+
+        data = {
+            "x"  : x,
+            "y"  : y,
+            "sx" : xerror,
+            "sy" : yerror
+        }
+        self.data = namedtuple("Data", data.keys())(*data.values())
+
+    def setInitialGuesses(self, w_0 = 1, z_0 = 1, M_sq = 1):
+        """Sets the initial guesses, only for mode = 0 or 1.
+
+        Parameters
+        ----------
+        w_0, z_0, M_sq : float or array_like
+            Guesses for the beam waist radius, the focal point position and M_sq (M_sq_lmbda for mode 0).
+            Arrays of length N give one set of guesses per problem.
+        """
+        if self.mode == self.M2_MODE or self.mode == self.M2LAMBDA_MODE:
+            self.initial_guesses = np.stack(np.broadcast_arrays(*np.atleast_1d(w_0, z_0, M_sq)), axis = -1).astype(np.float64)
+
+    def estimateInitialGuesses(self):
+        """Estimates the initial guesses of every problem like MsqFitter.estimateInitialGuesses(), vectorized"""
+        x = np.broadcast_to(self.data.x, np.broadcast_shapes(self.data.x.shape, self.data.y.shape))
+        y = np.broadcast_to(self.data.y, x.shape)
+
+        if self.mode == self.M2_MODE or self.mode == self.M2LAMBDA_MODE:
+            min_w = np.argmin(y, axis = -1)[..., None]
+
+            z_0 = np.take_along_axis(x, min_w, axis = -1)[..., 0]
+            w_0 = np.take_along_axis(y, min_w, axis = -1)[..., 0]
+
+            self.setInitialGuesses(w_0 = w_0, z_0 = z_0, M_sq = 1)
+
+        elif self.mode == self.ISO_MODE:
+            # Weighted linear least squares of d^2 = a + bz + cz^2, see MsqFitter.solveLinearISO()
+            A, d2, weights = self.linearISOSystem(x, y, self.data.sy)
+
+            normal = np.einsum('...mi,...m,...mj->...ij', A, weights, A)
+            rhs    = np.einsum('...mi,...m,...m->...i', A, weights, d2)
+
+            self.initial_guesses = _solve(normal.reshape(-1, 3, 3), rhs.reshape(-1, 3)).reshape(rhs.shape)
+
+    def fit(self, **kwargs):
+        """Fits all problems using self.initial_guesses and batch_lm()
+
+        Parameters
+        ----------
+        **kwargs
+            Passed to batch_lm()
+
+        Returns
+        -------
+        self.output : namedtuple
+            See batch_lm() for more information
+
+        """
+        self._m_squared_calculated = False
+
+        self.output = batch_lm(
+            func     = self.funcs[self.mode],
+            x        = self.data.x,
+            y        = self.data.y,
+            p0       = self.initial_guesses,
+            sigma    = self.data.sy,
+            xerror   = self.data.sx,
+            jacobian = self.jacobian,
+            **kwargs
+        )
+
+        return self.output
+
+    def estimateAndFit(self, **kwargs):
+        """Equivalent to running ``estimateInitialGuesses()`` then ``fit()``"""
+        self.estimateInitialGuesses()
+        return self.fit(**kwargs)
@@ -29,6 +29,25 @@ def convertODRtoOCF(func):
 	
 	return newFunc
 
+def convertODRJacobianToOCF(jac):
+	"""Generates a Jacobian for scipy.optimize.curve_fit (`jac = `) based on a Jacobian for scipy.odr (`fjacb = `)
+
+	Parameters
+	----------
+	jac : function
+		fjacb(beta, x) --> array of shape (len(beta), len(x))
+
+	Returns
+	-------
+	jac : function
+		jac(x, *beta) --> array of shape (len(x), len(beta))
+
+	"""
+	def newJac(x, *args):
+		return np.transpose(jac(args, x))
+
+	return newJac
+
 def omega_z(params, z):
 	"""Beam Radii Function to be fitted, according to https://docs.scipy.org/doc/scipy/reference/odr.html
 
@@ -60,6 +79,56 @@ def omega_z(params, z):
 		)**2)
 	)
 
+def _omega_z_derivatives(w_0, z_0, M_sq_lmbda, z):
+	"""Partial derivatives of omega_z with respect to (w_0, z_0, M_sq_lmbda, z)
+
+	With u = z - z_0, k = M_sq_lmbda / (pi * w_0^2) and S = 1 + u^2 k^2, omega_z = w_0 * sqrt(S)
+	"""
+	u     = z - z_0
+	k     = M_sq_lmbda / (np.pi * (w_0**2))
+	sqrtS = np.sqrt(1 + (u*k)**2)
+
+	dw_0  = (1 - (u*k)**2) / sqrtS
+	dz    = w_0 * (k**2) * u / sqrtS
+	dM    = (u**2) * k / (np.pi * w_0 * sqrtS)
+
+	return dw_0, -dz, dM, dz
+
+def omega_z_jacb(params, z):
+	"""Jacobian of omega_z with respect to the parameters, for scipy.odr.Model(fjacb = ) 
+
+	Parameters
+	----------
+	params : array_like
+		rank-1 array of length 3 where ``beta = array([w_0, z_0, M_sq_lmbda])``
+	z : array_like
+		rank-1 array of positions along an axis
+
+	Returns
+	-------
+	jac : array_like
+		Array of shape (3, *z.shape), the derivatives with respect to (w_0, z_0, M_sq_lmbda)
+
+	"""
+	w_0, z_0, M_sq_lmbda = params
+	dw_0, dz_0, dM, _ = _omega_z_derivatives(w_0, z_0, M_sq_lmbda, np.asarray(z, dtype = np.float64))
+	return np.stack((dw_0, dz_0, dM))
+
+def omega_z_jacd(params, z):
+	"""Derivative of omega_z with respect to z, for scipy.odr.Model(fjacd = )
+
+	Returns
+	-------
+	jac : array_like
+		Rank-1 array of length len(z)
+
+	"""
+	w_0, z_0, M_sq_lmbda = params
+	return _omega_z_derivatives(w_0, z_0, M_sq_lmbda, np.asarray(z, dtype = np.float64))[3]
+
+omega_z.fjacb = omega_z_jacb
+omega_z.fjacd = omega_z_jacd
+
 def omega_z_lambda(wavelength: float):
 	"""Returns a w_0 Function to be fitted, according to https://docs.scipy.org/doc/scipy/reference/odr.html that has wavelength already included
 
@@ -87,6 +156,18 @@ def omega_z_lambda(wavelength: float):
 			)**2)
 		)
 
+	def fjacb(params, z):
+		w_0, z_0, M_sq = params
+		dw_0, dz_0, dM, _ = _omega_z_derivatives(w_0, z_0, M_sq * wavelength, np.asarray(z, dtype = np.float64))
+		return np.stack((dw_0, dz_0, dM * wavelength))
+
+	def fjacd(params, z):
+		w_0, z_0, M_sq = params
+		return _omega_z_derivatives(w_0, z_0, M_sq * wavelength, np.asarray(z, dtype = np.float64))[3]
+
+	omega_z.fjacb = fjacb
+	omega_z.fjacd = fjacd
+
 	return omega_z
 
 def iso_omega_z(params, z):
@@ -129,10 +210,46 @@ def iso_omega_z(params, z):
 		is necessary for accurate D4σ measurements
 
 	"""
-	print(params)
 	a, b, c = params
 	return 0.5 * np.sqrt(a + b*z + c*(z**2))
 
+def iso_omega_z_jacb(params, z):
+	"""Jacobian of iso_omega_z with respect to the parameters, for scipy.odr.Model(fjacb = )
+
+	Parameters
+	----------
+	params : array_like
+		rank-1 array of length 3 where ``beta = array([a, b, c])``
+	z : array_like
+		rank-1 array of positions along an axis
+
+	Returns
+	-------
+	jac : array_like
+		Array of shape (3, *z.shape), the derivatives with respect to (a, b, c)
+
+	"""
+	a, b, c = params
+	z = np.asarray(z, dtype = np.float64)
+	f = 0.25 / np.sqrt(a + b*z + c*(z**2))
+	return np.stack((f, f*z, f*(z**2)))
+
+def iso_omega_z_jacd(params, z):
+	"""Derivative of iso_omega_z with respect to z, for scipy.odr.Model(fjacd = )
+
+	Returns
+	-------
+	jac : array_like
+		Rank-1 array of length len(z)
+
+	"""
+	a, b, c = params
+	z = np.asarray(z, dtype = np.float64)
+	return 0.25 * (b + 2*c*z) / np.sqrt(a + b*z + c*(z**2))
+
+iso_omega_z.fjacb = iso_omega_z_jacb
+iso_omega_z.fjacd = iso_omega_z_jacd
+
 def umath_omega_z(params, z):
 	"""Beam Radii Function to be fitted, according to https://docs.scipy.org/doc/scipy/reference/odr.html
 
@@ -239,6 +356,5 @@ def umath_iso_omega_z(params, z):
 		is necessary for accurate D4σ measurements
 
 	"""
-	print(params)
 	a, b, c = params
 	return 0.5 * umath.sqrt(a + b*z + c*(z**2))
\ No newline at end of file
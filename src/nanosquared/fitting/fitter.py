@@ -24,6 +24,7 @@ import matplotlib.pyplot as pyplot
 from collections import namedtuple
 
 import common.helpers as h
+from common.trace import traced
 
 from uncertainties import ufloat
 
@@ -108,6 +109,10 @@ class OCFFitter(Fitter):
         This is based on scipy.odr. It will be converted to 
         a function suitable for scipy.optimize.curve_fit where necessary.
 
+        If ``func.fjacb`` exists (see fit_functions), it is used as the analytic Jacobian
+    jacobian : bool, optional
+        Use the analytic Jacobian of ``func`` if available, otherwise estimate it by finite differences, by default True
+
     Attributes
     ----------
     data : namedtuple
@@ -119,14 +124,16 @@ class OCFFitter(Fitter):
     output: namedtuple
         .beta = params
         .sd_beta = one standard deviation errors on the parameters
+        .cov_beta = covariance matrix of the parameters
     
     """
 
-    def __init__(self, x, y, yerror, func) -> None:
+    def __init__(self, x, y, yerror, func, jacobian: bool = True) -> None:
         self.data   = None
         self.loadData(x, y, yerror)
 
         self.func   = fit_functions.convertODRtoOCF(func)
+        self.jac    = fit_functions.convertODRJacobianToOCF(func.fjacb) if (jacobian and hasattr(func, "fjacb")) else None
         self.output = None
 
         self.figure = None
@@ -156,6 +163,7 @@ class OCFFitter(Fitter):
         }
         self.data = namedtuple("Data", data.keys())(*data.values())
 
+    @traced(cat = "fitting")
     def fit(self, initial_params):
         """Fit the data using ``scipy.optimize.curve_fit()`` and saves the output to ``self.output``
 
@@ -184,11 +192,13 @@ class OCFFitter(Fitter):
             p0     = initial_params, 
             sigma  = self.data.sy,
             method = 'lm',
+            jac    = self.jac
         )
 
         output = {
-            "beta"   : popt,
-            "sd_beta": np.sqrt(np.diag(pcov))
+            "beta"    : popt,
+            "sd_beta" : np.sqrt(np.diag(pcov)),
+            "cov_beta": pcov
         }
 
         print(popt, "\n")
@@ -248,6 +258,10 @@ class ODRFitter(Fitter):
     func : function
         fcn(beta, x) --> y
 
+        If ``func.fjacb`` and ``func.fjacd`` exist (see fit_functions), they are used as the analytic Jacobians
+    jacobian : bool, optional
+        Use the analytic Jacobians of ``func`` if available, otherwise let ODRPACK estimate them by finite differences, by default True
+
     Attributes
     ----------
     model : scipy.odr.Model Instance
@@ -261,8 +275,11 @@ class ODRFitter(Fitter):
     
     """
 
-    def __init__(self, x, y, xerror, yerror, func):
-        self.model = scipy.odr.Model(func)
+    def __init__(self, x, y, xerror, yerror, func, jacobian: bool = True):
+        if jacobian and hasattr(func, "fjacb") and hasattr(func, "fjacd"):
+            self.model = scipy.odr.Model(func, fjacb = func.fjacb, fjacd = func.fjacd)
+        else:
+            self.model = scipy.odr.Model(func)
 
         self.data = None
         self.loadData(x, y, xerror, yerror)
@@ -296,6 +313,7 @@ class ODRFitter(Fitter):
         
         self.data = scipy.odr.RealData(x, y, sx=xerror, sy=yerror)
 
+    @traced(cat = "fitting")
     def fit(self, initial_params):
         """Fit the data using the odr Model and saves the output to ``self.output``
 
@@ -319,6 +337,9 @@ class ODRFitter(Fitter):
         """
 
         self.odr = scipy.odr.ODR(self.data, self.model, beta0 = initial_params)
+        if self.model.fjacb is not None:
+            # ODRPACK ignores user-supplied derivatives unless told to use them, 3 = do not check them
+            self.odr.set_job(deriv = 3)
         self.output = self.odr.run()
         return self.output
 
@@ -426,7 +447,7 @@ class MsqFitter():
 
     def estimateInitialGuesses(self):
         """Estimates the initial parameters w_0, z_0 from the data given using the minimum y-value and save it into self.initial_guesses.
-           Only for mode = 0 or 1
+           For mode = 2, the initial parameters a, b, c are taken from self.solveLinearISO()
         """
 
         if self.mode == self.M2_MODE or self.mode == self.M2LAMBDA_MODE:
@@ -440,22 +461,141 @@ class MsqFitter():
             # TODO: estimate M^2 here
 
         elif self.mode == self.ISO_MODE:
-            self.mode = self.M2_MODE
-            self.estimateInitialGuesses()
-            self.func = fit_functions.convertODRtoOCF(self.funcs[self.mode])
-            self.fit()
-
-            w_0, z_0, Msq = self.output.beta
-
-            c = Msq**2 * (self.wavelength[0]/(np.pi*w_0))**2
-            a = w_0**2 + c*(z_0**2)
-            b = -2*z_0*c
-            
-            self.initial_guesses = np.array([a,b,c])
-
-            self.mode = self.ISO_MODE
-            self.func = fit_functions.convertODRtoOCF(self.funcs[self.mode])
-            
+            # The ISO model is linear in (a, b, c), so the weighted linear solution is used directly
+            self.initial_guesses, _ = self.solveLinearISO()
+
+    @staticmethod
+    def linearISOSystem(z, y, sy = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Sets up the weighted linear least squares problem of the ISO model d^2 = a + bz + cz^2, see self.solveLinearISO().
+        Broadcasts, e.g. z and y of shape (N, M) for N caustics of M points each. 
+
+        Parameters
+        ----------
+        z : array_like
+            Positions
+        y : array_like
+            Radii, converted to d^2 = (2y)^2
+        sy : array_like, optional
+            Errors of the radii, propagated to sd(d^2) = 8 * y * sy, by default None (equal weights)
+
+        Returns
+        -------
+        (A, d2, weights) : Tuple[np.ndarray, np.ndarray, np.ndarray]
+            The design matrix [1, z, z^2] of shape (..., M, 3), d^2 and the weights 1/sd(d^2)^2 of shape (..., M)
+        """
+        z = np.asarray(z, dtype = np.float64)
+        d = 2 * np.asarray(y, dtype = np.float64)
+        z, d = np.broadcast_arrays(z, d)
+
+        d2 = d * d
+
+        if sy is None:
+            weights = np.ones_like(d2)
+        else:
+            sd2     = 4 * d * np.asarray(sy, dtype = np.float64)
+            weights = np.broadcast_to(1 / (sd2 * sd2), d2.shape)
+
+        A = np.stack((np.ones_like(z), z, z * z), axis = -1)
+
+        return A, d2, weights
+
+    def solveLinearISO(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Solves the ISO model d^2 = a + bz + cz^2 (see fit_functions.iso_omega_z) for (a, b, c) 
+        by weighted linear least squares, i.e. exactly and without iterations. 
+
+        The data (radii) is converted to d^2 = (2y)^2 with the propagated errors sd(d^2) = 8 * y * sy, 
+        and the weighted least squares problem min |W^1/2 (A beta - d^2)| with W = diag(1/sd(d^2)^2) is solved. 
+        Like scipy.optimize.curve_fit, the covariance (A^T W A)^-1 is scaled by the reduced chi-squared. 
+        Errors in z (ODR) are not taken into account. 
+
+        The problem is solved with the singular value decomposition of W^1/2 A rather than the normal equations, 
+        which square its condition number: for z far away from 0 relative to their spread, the normal equations 
+        lose most of the digits of beta.
+
+        Returns
+        -------
+        (beta, cov_beta) : Tuple[np.ndarray, np.ndarray]
+            beta = np.array([a, b, c]) and its 3x3 covariance matrix
+
+        Raises
+        ------
+        ValueError
+            If there are less than 3 distinct positions z, which do not determine a, b and c, 
+            or if the positions z are too far from 0 relative to their spread
+        """
+        A, d2, weights = self.linearISOSystem(self.data.x, self.data.y, self.data.sy)
+
+        sw = np.sqrt(weights)
+        U, sv, Vt = np.linalg.svd(A * sw[:, None], full_matrices = False)
+
+        # Numerical rank, with the tolerance of np.linalg.matrix_rank
+        if sv[-1] <= sv[0] * max(A.shape) * np.finfo(np.float64).eps:
+            distinct = len(np.unique(self.data.x))
+            if distinct < 3:
+                raise ValueError(f"The ISO model needs at least 3 distinct positions z, got {distinct}")
+            raise ValueError("The ISO model cannot be solved for positions z this far from 0 relative to their spread")
+
+        dw         = d2 * sw
+        proj       = U.T @ dw
+        V          = Vt.T / sv
+        beta       = V @ proj
+        inv_normal = V @ V.T
+
+        # The weighted residuals, without the cancellation of d2 - A @ beta for z far away from 0
+        residuals = dw - U @ proj
+        dof       = len(d2) - len(beta)
+        chi_sq    = np.sum(residuals * residuals)
+
+        cov_beta  = inv_normal * (chi_sq / dof if dof > 0 else np.inf)
+
+        return beta, cov_beta
+
+    @traced(cat = "fitting")
+    def fitLinear(self, refine: bool = False):
+        """Fits the data in ISO_MODE using the closed-form solution of self.solveLinearISO()
+
+        Parameters
+        ----------
+        refine : bool, optional
+            Whether to refine the linear solution with the nonlinear fit of this fitter (i.e. self.fit()), by default False
+
+        Returns
+        -------
+        self.output : namedtuple
+            .beta     = np.array([a, b, c])
+            .sd_beta  = one standard deviation errors on the parameters
+            .cov_beta = covariance matrix of the parameters
+
+            If `refine` is set, the output of self.fit() instead.
+
+        Raises
+        ------
+        RuntimeError
+            If the fitter is not in ISO_MODE
+        ValueError
+            If the positions z do not determine the ISO model, see self.solveLinearISO()
+        """
+        if self.mode != self.ISO_MODE:
+            raise RuntimeError(f"Linear fit only available for ISO_MODE, got mode {self.mode}")
+
+        beta, cov_beta = self.solveLinearISO()
+
+        if refine:
+            self.initial_guesses = beta
+            return self.fit()
+
+        self._m_squared_calculated = False
+
+        output = {
+            "beta"    : beta,
+            "sd_beta" : np.sqrt(np.diag(cov_beta)),
+            "cov_beta": cov_beta
+        }
+
+        self.output = namedtuple("Output", output.keys())(*output.values())
+
+        return self.output
+    
     
     @property
     def m_squared(self):
@@ -470,6 +610,8 @@ class MsqFitter():
             np.array([m_squared, m_squared_err]) of floats
             Value of the fitted m_squared and its corresponding error
 
+            For a stack of fits (see fitting.batch), shape (N, 2)
+
         Raises
         ------
         RuntimeWarning
@@ -487,19 +629,19 @@ class MsqFitter():
 
             if self.mode == 1:
                 # The fitted quantity is directly m2
-                self._m_squared = np.array([self.output.beta[2], self.output.sd_beta[2]], dtype = np.float64) 
+                self._m_squared = np.stack([self.output.beta[..., 2], self.output.sd_beta[..., 2]], axis = -1).astype(np.float64)
 
             elif self.mode == 0:
-                m_sq = self.output.beta[2] / self.wavelength[0]
+                m_sq = self.output.beta[..., 2] / self.wavelength[0]
                 m_sq_error = m_sq * np.sqrt(
-                        (self.output.sd_beta[2]/self.output.beta[2]) ** 2 +
+                        (self.output.sd_beta[..., 2]/self.output.beta[..., 2]) ** 2 +
                         (self.wavelength[1]    /self.wavelength[0] ) ** 2 
                     )
 
                 # Error propagation with gauss method
                 # delta M / M = sqrt((delta b/b)^2 + (delta l/l)^2)
 
-                self._m_squared = np.array([m_sq, m_sq_error], dtype = np.float64)
+                self._m_squared = np.stack([m_sq, m_sq_error], axis = -1).astype(np.float64)
 
             elif self.mode == 2:
                 # ISO Method
@@ -507,8 +649,8 @@ class MsqFitter():
                 # ISSUE HERE: ERROR TOO BIG
                 # TODO
 
-                a , b , c  = self.output.beta
-                da, db, dc = self.output.sd_beta
+                a , b , c  = np.moveaxis(self.output.beta, -1, 0)
+                da, db, dc = np.moveaxis(self.output.sd_beta, -1, 0)
                 wv, dwv    = self.wavelength
 
                 m_sq = (np.pi / (8 * wv)) * np.sqrt((4*a*c) - (b*b))
@@ -520,44 +662,90 @@ class MsqFitter():
                 dM_dwv  = - (np.pi * _faktor) / (8*wv*wv)
 
                 arr     = np.array([dM_da * da, dM_db * db, dM_dc * dc, dM_dwv * dwv])
-                m_sq_error = np.sqrt(np.sum(np.square(arr)))
+                m_sq_error = np.sqrt(np.sum(np.square(arr), axis = 0))
 
                 # Error propagation with gauss method
                 # delta M = sqrt(sum (dM_di*DI)2)
 
-                self._m_squared = np.array([m_sq, m_sq_error], dtype = np.float64)
+                self._m_squared = np.stack([m_sq, m_sq_error], axis = -1).astype(np.float64)
 
             self._m_squared_calculated = True
         
         return self._m_squared
 
-    def conf_interval(self, z: float | np.ndarray) -> float | np.ndarray:
-        """Rudimentary implementation of getting confidence interval using error propagation
+    def covariance(self) -> np.ndarray:
+        """Returns the covariance matrix of the fitted parameters, consistent with ``self.output.sd_beta``
+
+        scipy.odr does not scale its ``cov_beta`` with the residual variance, unlike curve_fit and fitLinear().
+        If the output has no covariance, the parameters are taken to be uncorrelated.
+
+        Returns
+        -------
+        cov_beta : np.ndarray
+            3x3 covariance matrix
+        """
+        if self.output is None:
+            raise RuntimeWarning(".fit() has not been run. Please run .fit() before running covariance()")
+
+        cov_beta = getattr(self.output, "cov_beta", None)
+
+        if cov_beta is None:
+            return np.diag(np.square(self.output.sd_beta))
+
+        if hasattr(self.output, "res_var"):
+            # scipy.odr.Output
+            return cov_beta * self.output.res_var
+
+        return cov_beta
+
+    def conf_interval(self, z: float | np.ndarray, method: str = "delta") -> float | np.ndarray:
+        """Confidence interval (one standard deviation) of the fitted beam radius using error propagation
 
         Parameters
         ----------
         z : float | np.ndarray
             The z-positions to calculate the confidence interval
+        method : str, optional
+            "delta" : Delta method, sqrt(J C J^T) with the analytic gradient J of the fit function 
+                      (fit_functions, .fjacb) and the full covariance matrix C of the fit, 
+                      evaluated for all z at once (Default)
+            "uncertainties" : Reference implementation that evaluates the umath fit function with ufloats one z at a time.
+                      Only uses ``sd_beta``, i.e. ignores the correlations between the parameters
         
         Returns
         -------
         errors : float | np.ndarray
             The corresponding errors for each point
+
+        Raises
+        ------
+        ValueError
+            If the method is unknown
         """
         if self.output is None:
             raise RuntimeWarning(".fit() has not been run. Please run .fit() before running conf_interval()")
-        
-        # Make the ufloats
-        ubetas = [ufloat(*tup) for tup in zip(self.output.beta, self.output.sd_beta)]
 
         assert isinstance(self.mode, int)
 
-        if isinstance(z, Iterable):
-            errors = np.array([ self.umath_funcs[self.mode](ubetas, element).std_dev for element in z ])
-        else:
-            errors = self.umath_funcs[self.mode](ubetas, z)
+        if method == "delta":
+            J      = self.funcs[self.mode].fjacb(self.output.beta, np.asarray(z, dtype = np.float64))
+            C      = self.covariance()
+            errors = np.sqrt(np.einsum('i...,ij,j...->...', J, C, J))
+
+            return errors if isinstance(z, Iterable) else float(errors)
+
+        elif method == "uncertainties":
+            # Make the ufloats
+            ubetas = [ufloat(*tup) for tup in zip(self.output.beta, self.output.sd_beta)]
+
+            if isinstance(z, Iterable):
+                errors = np.array([ self.umath_funcs[self.mode](ubetas, element).std_dev for element in z ])
+            else:
+                errors = self.umath_funcs[self.mode](ubetas, z).std_dev
+
+            return errors
 
-        return errors
+        raise ValueError(f"Unknown method: {method}")
 
 class MsqODRFitter(ODRFitter, MsqFitter):
     """Class to fit for an M_Squared using fit_functions.omega_z (Guassian Beam Profile function) using ODR,
@@ -594,6 +782,8 @@ class MsqODRFitter(ODRFitter, MsqFitter):
         If using `mode = 0`, fits using M_sq_lambda instead of just M_sq. This allows the error of the wavelength to be taken into account.
         The ISO Fitting method also takes into account the error of the wavelength.
         If using `mode = 1`, the error of the wavelength is disregarded.  
+    jacobian : bool, optional
+        Use the analytic Jacobians of the fit function, by default True
 
     Attributes
     ----------
@@ -615,11 +805,11 @@ class MsqODRFitter(ODRFitter, MsqFitter):
         Flag to fit to M_sq_lambda or M_sq 
 
     """
-    def __init__(self, x, y, xerror, yerror, wavelength: float, wavelength_err: float = 0, mode: int = 3):          
+    def __init__(self, x, y, xerror, yerror, wavelength: float, wavelength_err: float = 0, mode: int = 3, jacobian: bool = True):          
         # NOTE: To use ``fit_functions.omega_z`` as a default value in a function: https://stackoverflow.com/a/41921291
         
         MsqFitter.__init__(self, wavelength = wavelength, wavelength_err = wavelength_err, mode = mode)
-        ODRFitter.__init__(self, x, y, xerror, yerror, self.funcs[self.mode])
+        ODRFitter.__init__(self, x, y, xerror, yerror, self.funcs[self.mode], jacobian = jacobian)
 
     @property
     def m_squared(self):
@@ -630,7 +820,7 @@ class MsqODRFitter(ODRFitter, MsqFitter):
         #    4 : iteration limit reached
         # >= 5 : questionable results or fatal errors detected
 
-        if (self.output.info >= 4):
+        if (getattr(self.output, "info", 0) >= 4): # The output of self.fitLinear() has no info
             warnings.warn("Fit is dubious. Reasons for convergence:\n\t{}".format('\n\t'.join(self.output.stopreason)))
         
         return super()._calc_msq()
@@ -648,6 +838,7 @@ class MsqODRFitter(ODRFitter, MsqFitter):
 
         return super().fit(initial_params = self.initial_guesses)
 
+    @traced(cat = "fitting")
     def estimateAndFit(self):
         """Equivalent to running ``estimateInitialGuesses()`` then ``fit()``
 
@@ -693,6 +884,8 @@ class MsqOCFFitter(OCFFitter, MsqFitter):
         If using `mode = 0`, fits using M_sq_lambda instead of just M_sq. This allows the error of the wavelength to be taken into account.
         The ISO Fitting method also takes into account the error of the wavelength.
         If using `mode = 1`, the error of the wavelength is disregarded.  
+    jacobian : bool, optional
+        Use the analytic Jacobians of the fit function, by default True
 
     Attributes
     ----------
@@ -706,11 +899,11 @@ class MsqOCFFitter(OCFFitter, MsqFitter):
         Flag to fit to M_sq_lambda or M_sq 
 
     """
-    def __init__(self, x, y, yerror, wavelength: float, wavelength_err: float = 0, mode: int = 3):        
+    def __init__(self, x, y, yerror, wavelength: float, wavelength_err: float = 0, mode: int = 3, jacobian: bool = True):        
         # NOTE: To use ``fit_functions.omega_z`` as a default value in a function: https://stackoverflow.com/a/41921291
         
         MsqFitter.__init__(self, wavelength = wavelength, wavelength_err = wavelength_err, mode = mode)
-        OCFFitter.__init__(self, x, y, yerror, self.funcs[self.mode])
+        OCFFitter.__init__(self, x, y, yerror, self.funcs[self.mode], jacobian = jacobian)
     
     def fit(self):
         """Fits using self.initial_guesses and OCFFitter.fit()
@@ -725,6 +918,7 @@ class MsqOCFFitter(OCFFitter, MsqFitter):
 
         return super().fit(initial_params = self.initial_guesses)
 
+    @traced(cat = "fitting")
     def estimateAndFit(self):
         """Equivalent to running ``estimateInitialGuesses()`` then ``fit()``
 
@@ -1,2 +1,8 @@
 from . import errors
+from . import cache
+from . import buffer
+from . import loader
+from . import rawfile
+from . import checkpoint
+from . import scheduler
 from . import measure
\ No newline at end of file
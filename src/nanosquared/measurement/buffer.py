@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+# Made 2021, Sun Yudong
+# yudong.sun [at] mpq.mpg.de / yudong [at] outlook.de
+
+"""Provides an append-only buffer for the points of a caustic, see `CausticBuffer`"""
+
+import time
+from typing import Hashable, Iterator, Optional, Tuple
+
+import numpy as np
+
+class CausticBuffer():
+    # The fields are laid out such that [z, x_diam, dx] and [z, y_diam, dy] are both equally spaced in memory,
+    # so that each axis can be viewed as a (n, 3) float array without copying, see self.axis()
+    FIELDS = ("z", "x_diam", "dx", "y_diam", "dy", "n_samples", "timestamp")
+    DTYPE  = np.dtype({
+        "names"   : list(FIELDS),
+        "formats" : [np.float64, np.float64, np.float64, np.float64, np.float64, np.int64, np.float64],
+        "offsets" : [0, 8, 16, 24, 48, 32, 40],
+        "itemsize": 56
+    })
+
+    # Offset of [diam, ddiam] of each axis in units of float64
+    _AXIS_STRIDES = (1, 3)
+
+    def __init__(self, axes: Tuple[Hashable, Hashable] = ("x", "y"), capacity: int = 32, metadata: Optional[dict] = None) -> None:
+        """Preallocated, growable structured array of the points of a caustic with the fields
+        z[mm], x_diam[um], dx[um], y_diam[um], dy[um], n_samples and timestamp.
+
+        Appending is amortized O(1), the capacity is doubled when full.
+
+        For backward compatibility with the former `Measurement.data = { AXES.X: xdata, AXES.Y: ydata }`,
+        `buffer[axis]` returns a (n, 3) array [z, diam, delta_diam] of that axis, which is a view on the buffer,
+        or None if the buffer is empty.
+
+        Parameters
+        ----------
+        axes : Tuple[Hashable, Hashable], optional
+            The designations of the (x, y) axes used for `buffer[axis]`, e.g. `(camera.AXES.X, camera.AXES.Y)`, by default ("x", "y")
+        capacity : int, optional
+            Initial number of points, by default 32
+        metadata : Optional[dict], optional
+            Metadata of the caustic, e.g. as read from the header of a data file, by default None
+        """
+        self.axes     = tuple(axes)
+        self.metadata = dict(metadata) if metadata is not None else dict()
+        self._buf     = np.zeros(max(1, int(capacity)), dtype = self.DTYPE)
+        self._size    = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buf)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the points in the buffer, in bytes"""
+        return self._size * self.DTYPE.itemsize
+
+    @property
+    def records(self) -> np.ndarray:
+        """Structured array of the points in the buffer (view)"""
+        return self._buf[:self._size]
+
+    def _reserve(self, n: int):
+        if n <= len(self._buf):
+            return
+
+        newbuf = np.zeros(max(n, 2 * len(self._buf)), dtype = self.DTYPE)
+        newbuf[:self._size] = self._buf[:self._size]
+        self._buf = newbuf
+
+    def append(self, z: float, x_diam: float, dx: float, y_diam: float, dy: float, n_samples: int = 0, timestamp: Optional[float] = None):
+        """Appends one point
+
+        Parameters
+        ----------
+        z : float
+            Position in mm
+        x_diam, dx, y_diam, dy : float
+            Diameters and their errors in um
+        n_samples : int, optional
+            Number of samples the point is averaged over, by default 0 (unknown)
+        timestamp : Optional[float], optional
+            Time of the point, by default None (i.e. now, `time.time()`)
+        """
+        self._reserve(self._size + 1)
+        self._buf[self._size] = (z, x_diam, dx, y_diam, dy, n_samples, time.time() if timestamp is None else timestamp)
+        self._size += 1
+
+    def extend(self, z, x_diam, dx, y_diam, dy, n_samples = 0, timestamp = np.nan):
+        """Appends many points at once. The parameters are array_like of the same length (or scalars), see self.append()"""
+        columns = (z, x_diam, dx, y_diam, dy, n_samples, timestamp)
+        n       = max(np.size(c) for c in columns)
+
+        self._reserve(self._size + n)
+        new = self._buf[self._size:self._size + n]
+        for name, col in zip(self.FIELDS, columns):
+            new[name] = col     # scalars are broadcast by numpy
+        self._size += n
+
+    def clear(self):
+        """Removes all points, but keeps the allocated memory"""
+        self._size = 0
+
+    def axis(self, axis: Hashable) -> np.ndarray:
+        """Returns the (n, 3) array [z, diam, delta_diam] of one axis. This is a view on the buffer, i.e. not a copy.
+
+        Parameters
+        ----------
+        axis : Hashable
+            One of self.axes, or 0 (x) / 1 (y)
+
+        Returns
+        -------
+        data : np.ndarray
+            View of shape (n, 3). Only valid until the next append, as the buffer might be reallocated.
+
+        Raises
+        ------
+        KeyError
+            If the axis is unknown
+        """
+        if axis in self.axes:
+            idx = self.axes.index(axis)
+        elif axis in (0, 1):
+            idx = axis
+        else:
+            raise KeyError(f"Unknown axis {axis}, expected one of {self.axes}")
+
+        itemsize = self.DTYPE.itemsize
+        step     = self._AXIS_STRIDES[idx] * np.dtype(np.float64).itemsize
+
+        return np.ndarray(shape = (self._size, 3), dtype = np.float64, buffer = self._buf, offset = 0, strides = (itemsize, step))
+
+    def __getitem__(self, axis: Hashable) -> Optional[np.ndarray]:
+        return self.axis(axis) if self._size > 0 else None
+
+    def __contains__(self, axis: Hashable) -> bool:
+        return axis in self.axes
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.axes)
+
+    def keys(self):
+        return self.axes
+
+    def items(self):
+        return [(ax, self[ax]) for ax in self.axes]
+
+    def __repr__(self) -> str:
+        return f"CausticBuffer({self._size} points, capacity {self.capacity})"
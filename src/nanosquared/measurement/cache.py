@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+# Made 2021, Sun Yudong
+# yudong.sun [at] mpq.mpg.de / yudong [at] outlook.de
+
+"""Provides a cache for measurements taken during one measurement session, keyed by the stage position"""
+
+import os,sys
+from typing import Optional, Hashable, Any
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, ".."))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+import logging
+import common.helpers as h
+from common.clock import Clock, RealClock
+
+class MeasurementCache(h.LoggerMixIn):
+    def __init__(self, ttl: Optional[float] = 300, invalidateOnHome: bool = True, bothAxis: Hashable = None, axesIndex: Optional[dict] = None, clock: Optional[Clock] = None) -> None:
+        """Cache of the results of `Measurement.measure_at()`, keyed by (position, axis, numsamples, removeOutliers, threshold).
+
+        A cached result is also used for a request with fewer samples, as long as all other settings are the same.
+        If `bothAxis` and `axesIndex` are given, a result for both axes is also used for a request for a single axis.
+
+        Parameters
+        ----------
+        ttl : Optional[float], optional
+            Time in seconds after which a cached result is considered stale and is no longer used, by default 300.
+            If set to None, results never become stale.
+        invalidateOnHome : bool, optional
+            Whether to clear the cache when the stage is homed, by default True.
+            Homing redefines the origin of the stage, so positions before and after homing might not be the same.
+        bothAxis : Hashable, optional
+            The axis designation for both axes of the camera (e.g. `camera.AXES.BOTH`), by default None
+        axesIndex : Optional[dict], optional
+            Mapping of single axis to the index in the result for both axes, e.g. `{ camera.AXES.X: 0, camera.AXES.Y: 1 }`,
+            by default None
+        clock : Optional[common.clock.Clock], optional
+            Clock of the timestamps of the results, by default None (`common.clock.RealClock()`, i.e. `time.monotonic()`).
+            Use the clock of the controller, such that the TTL runs on the simulated time of a `common.clock.VirtualClock`.
+        """
+
+        self.ttl              = ttl
+        self.invalidateOnHome = invalidateOnHome
+        self.bothAxis         = bothAxis
+        self.axesIndex        = axesIndex if axesIndex is not None else dict()
+        self.clock            = clock if clock is not None else RealClock()
+
+        # { (pos, axis, removeOutliers, threshold) : { numsamples: (timestamp, result) } }
+        self._entries = dict()
+
+        self.hits   = 0
+        self.misses = 0
+
+    def _key(self, pos: int, axis: Hashable, removeOutliers: int, threshold: float) -> tuple:
+        return (int(pos), axis, removeOutliers, threshold)
+
+    def _lookup(self, key: tuple, numsamples: int, now: float) -> Optional[tuple]:
+        entries = self._entries.get(key, None)
+        if not entries:
+            return None
+
+        best = None
+        for n, (timestamp, result) in list(entries.items()):
+            if self.ttl is not None and (now - timestamp) > self.ttl:
+                # stale
+                del entries[n]
+                continue
+
+            # A result with more samples than requested is also acceptable
+            if n >= numsamples and (best is None or n > best[0]):
+                best = (n, result)
+
+        return best
+
+    def get(self, pos: int, axis: Hashable, numsamples: int, removeOutliers: int = 0, threshold: float = 0, returnNumsamples: bool = False) -> Optional[Any]:
+        """Gets a cached result, or None if there is no valid cached result. Counts the hits and misses.
+
+        Parameters
+        ----------
+        pos : int
+            Position in pps
+        axis : Hashable
+            The axis measured
+        numsamples : int
+            Number of samples requested
+        removeOutliers : int, optional
+            Outlier removal mode, by default 0
+        threshold : float, optional
+            Threshold for the outlier removal, by default 0
+        returnNumsamples : bool, optional
+            Whether to also return the number of samples of the cached result, by default False
+
+        Returns
+        -------
+        result : Optional[Any]
+            The cached result, as returned by `Measurement.measure_at()`, or None if not found
+            If `returnNumsamples`, the tuple (result, numsamples), or (None, None) if not found
+        """
+        now    = self.clock.now()
+        found  = self._lookup(self._key(pos, axis, removeOutliers, threshold), numsamples, now)
+
+        if found is None and axis != self.bothAxis and axis in self.axesIndex:
+            both = self._lookup(self._key(pos, self.bothAxis, removeOutliers, threshold), numsamples, now)
+            if both is not None:
+                found = (both[0], both[1][self.axesIndex[axis]])
+
+        n, result = found if found is not None else (None, None)
+
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.log(f"Cache hit at {pos} for axis {axis}: {result}", loglevel = logging.DEBUG)
+
+        if returnNumsamples:
+            return result, n
+
+        return result
+
+    def put(self, pos: int, axis: Hashable, numsamples: int, result: Any, removeOutliers: int = 0, threshold: float = 0) -> None:
+        """Stores a result in the cache. See `self.get()` for the parameters."""
+        key = self._key(pos, axis, removeOutliers, threshold)
+        self._entries.setdefault(key, dict())[numsamples] = (self.clock.now(), result)
+
+    def homed(self) -> None:
+        """To be called after the stage has been homed. Clears the cache if `self.invalidateOnHome` is set"""
+        if self.invalidateOnHome:
+            self.log("Stage homed, clearing the measurement cache", loglevel = logging.DEBUG)
+            self.clear(resetStats = False)
+
+    def clear(self, resetStats: bool = True) -> None:
+        """Clears all cached results
+
+        Parameters
+        ----------
+        resetStats : bool, optional
+            Whether to reset the hit and miss counters, by default True
+        """
+        self._entries = dict()
+
+        if resetStats:
+            self.hits   = 0
+            self.misses = 0
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate  = (100 * self.hits / total) if total else 0
+        return f"{self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate)"
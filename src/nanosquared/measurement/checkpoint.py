@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+# Made 2021, Sun Yudong
+# yudong.sun [at] mpq.mpg.de / yudong [at] outlook.de
+
+"""Provides checkpoints of `Measurement.take_measurements()`, such that an interrupted measurement can be resumed
+with `Measurement.resume()`.
+
+A checkpoint is a text file with one JSON record per line, which is only ever appended to:
+    { "type": "start",  "params": { parameters of take_measurements() } }
+    { "type": "params", "center": [...], "rayleighLength": [...] }           # in pulses
+    { "type": "plan",   "points": [...] }                                    # in pulses
+    { "type": "point",  "pos": int, "z": float, "x": [diam, ddiam], "y": [diam, ddiam], "n_samples": int }
+    { "type": "done",   "file": str }
+
+Every record is written with a single `os.write()` to a file opened with O_APPEND and synced to the disk,
+so a crash can at most cut off the last line, which is then ignored when loading, and cut off before appending further
+records. Once the measurement has been completed, `Measurement.take_measurements()` deletes its checkpoint.
+"""
+
+import os,sys
+import json
+import time
+from typing import Dict, List, Optional
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, ".."))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+import logging
+import common.helpers as h
+
+class Checkpoint(h.LoggerMixIn):
+    def __init__(self, filename: str, fsync: bool = True) -> None:
+        """Appends records to the checkpoint file `filename`, which is created if necessary.
+        Use `Checkpoint.load()` to read an existing checkpoint.
+
+        Parameters
+        ----------
+        filename : str
+            The checkpoint file
+        fsync : bool, optional
+            Whether to sync every record to the disk, by default True
+
+        Attributes
+        ----------
+        params : Optional[dict]
+            The parameters of `take_measurements()`
+        center, rayleighLength : Optional[List[int]]
+            Center and Rayleigh length in pulses, with one element per axis
+        plan : Optional[List[int]]
+            The points to measure in pulses
+        points : Dict[int, dict]
+            The completed points, by position in pulses
+        finished : Optional[str]
+            The data file, if the measurement has been completed
+        """
+        self.filename = filename
+        self.fsync    = fsync
+
+        self.params         = None
+        self.center         = None
+        self.rayleighLength = None
+        self.plan           = None
+        self.points         = dict()
+        self.finished       = None
+
+        self._fd = None
+
+    def _open(self):
+        """Opens the file for appending. An incomplete last record, as left by a crash, is cut off first, 
+        such that the next record starts on a new line.
+        """
+        self._fd = os.open(self.filename, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+
+        size = os.fstat(self._fd).st_size
+        if not size:
+            return
+
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        content = b""
+        while len(content) < size:
+            chunk = os.read(self._fd, size - len(content))
+            if not chunk:
+                break
+            content += chunk
+
+        if content.endswith(b"\n"):
+            return
+
+        end = content.rfind(b"\n") + 1
+        try:
+            json.loads(content[end:])
+            # Only the line break is missing
+            os.write(self._fd, b"\n")
+        except ValueError:
+            self.log(f"{self.filename}: cutting off the incomplete last record", logging.WARN)
+            os.ftruncate(self._fd, end)
+
+    def _append(self, record: dict):
+        if self._fd is None:
+            self._open()
+
+        record = { **record, "time": time.time() }
+        os.write(self._fd, (json.dumps(record, default = str) + "\n").encode("utf-8"))
+
+        if self.fsync:
+            os.fsync(self._fd)
+
+        self._apply(record)
+
+    def _apply(self, record: dict):
+        kind = record.get("type")
+        if kind == "start":
+            self.params = record["params"]
+        elif kind == "params":
+            self.center         = record["center"]
+            self.rayleighLength = record["rayleighLength"]
+        elif kind == "plan":
+            self.plan = record["points"]
+        elif kind == "point":
+            self.points[record["pos"]] = record
+        elif kind == "done":
+            self.finished = record["file"]
+
+    def start(self, params: dict):
+        """Records the parameters of the measurement"""
+        self._append({ "type": "start", "params": params })
+
+    def setParams(self, center, rayleighLength):
+        """Records the center and Rayleigh length in pulses"""
+        self._append({ "type": "params", "center": [int(c) for c in center], "rayleighLength": [int(r) for r in rayleighLength] })
+
+    def setPlan(self, points):
+        """Records the points to be measured in pulses"""
+        self._append({ "type": "plan", "points": [int(p) for p in points] })
+
+    def addPoint(self, pos: int, z: float, x, y, n_samples: Optional[int] = None):
+        """Records a completed point
+
+        Parameters
+        ----------
+        pos : int
+            Position in pulses
+        z : float
+            Position in mm
+        x, y : array_like
+            [diam, ddiam] of each axis in um
+        n_samples : Optional[int], optional
+            Number of samples taken, by default None
+        """
+        self._append({ "type": "point", "pos": int(pos), "z": float(z), "x": [float(v) for v in x], "y": [float(v) for v in y], "n_samples": n_samples })
+
+    def finish(self, filename: Optional[str]):
+        """Records that the measurement has been completed and written to `filename`"""
+        self._append({ "type": "done", "file": filename })
+
+    def remaining(self) -> List[int]:
+        """Returns the planned points that have not been measured yet"""
+        return [p for p in (self.plan or []) if p not in self.points]
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def remove(self):
+        """Closes and deletes the checkpoint file, once the measurement has been completed"""
+        self.close()
+        try:
+            os.remove(self.filename)
+        except OSError as e:
+            self.log(f"{self.filename}: OSError {e}, the checkpoint could not be deleted", logging.WARN)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, e_type, e_val, traceback):
+        self.close()
+
+    @classmethod
+    def load(cls, filename: str) -> "Checkpoint":
+        """Reads a checkpoint. Further records are appended to the same file.
+
+        Parameters
+        ----------
+        filename : str
+            The checkpoint file
+
+        Returns
+        -------
+        checkpoint : Checkpoint
+
+        Raises
+        ------
+        OSError
+            If the file cannot be read
+        ValueError
+            If the file does not contain the parameters of a measurement
+        """
+        ckpt = cls(filename)
+
+        with open(filename, 'r') as f:
+            lines = f.read().split("\n")
+
+        for n, line in enumerate(lines):
+            if not line.strip():
+                continue
+            try:
+                ckpt._apply(json.loads(line))
+            except (ValueError, KeyError) as e:
+                # Only the last record may be incomplete
+                if n < len(lines) - 1 and any(l.strip() for l in lines[n + 1:]):
+                    raise ValueError(f"{filename}: corrupt record in line {n + 1}: {e}")
+                ckpt.log(f"{filename}: ignoring the incomplete last record", logging.WARN)
+
+        if ckpt.params is None:
+            raise ValueError(f"{filename}: not a checkpoint of a measurement")
+
+        return ckpt
+
+    def summary(self) -> str:
+        planned = len(self.plan) if self.plan is not None else "?"
+        return f"{len(self.points)}/{planned} points measured" + (f", finished: {self.finished}" if self.finished else "")
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+
+# Made 2021, Sun Yudong
+# yudong.sun [at] mpq.mpg.de / yudong [at] outlook.de
+
+"""Provides a fast loader for the data files written by `Measurement.write_to_file()`, and for directories of them
+
+Usage:
+    loader = CausticLoader()
+    data   = loader.read("nanosquared-data/M2/2022-03-30_180005_xxxxxxxx.dat")   # CausticBuffer
+    runs   = loader.read_directory("nanosquared-data/M2")                         # CausticRuns
+    runs.records["x_diam"], runs.run_index
+"""
+
+import io
+import os,sys
+import glob
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Hashable, List, Optional, Tuple
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, ".."))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+import numpy as np
+
+import logging
+import common.helpers as h
+
+from measurement.buffer import CausticBuffer
+
+class CausticRuns():
+    def __init__(self, files: List[str], buffers: List[CausticBuffer]) -> None:
+        """Caustics of several runs, stacked into one structured array
+
+        Attributes
+        ----------
+        files : List[str]
+            The files of the runs
+        metadata : List[dict]
+            The metadata of each run
+        records : np.ndarray
+            Structured array of all points of all runs, with the fields of `CausticBuffer.DTYPE`
+        offsets : np.ndarray
+            The points of run i are `records[offsets[i]:offsets[i + 1]]`
+        run_index : np.ndarray
+            Index of the run of each point
+        """
+        self.files     = list(files)
+        self.metadata  = [b.metadata for b in buffers]
+        self._buffers  = list(buffers)
+
+        lengths        = np.array([len(b) for b in buffers], dtype = np.int64)
+        self.offsets   = np.concatenate(([0], np.cumsum(lengths)))
+        self.run_index = np.repeat(np.arange(len(buffers)), lengths)
+        self.records   = np.concatenate([b.records for b in buffers]) if len(buffers) else np.zeros(0, dtype = CausticBuffer.DTYPE)
+
+    def __len__(self) -> int:
+        return len(self._buffers)
+
+    def __getitem__(self, i: int) -> CausticBuffer:
+        return self._buffers[i]
+
+    def __repr__(self) -> str:
+        return f"CausticRuns({len(self)} runs, {len(self.records)} points)"
+
+class CausticLoader(h.LoggerMixIn):
+    DATA_COLUMNS   = ("position[mm]", "x_diam[um]", "dx_diam[um]", "y_diam[um]", "dy_diam[um]")
+    WRITTEN_PREFIX = "Data written on "
+
+    def __init__(self, axes: Tuple[Hashable, Hashable] = ("x", "y"), workers: Optional[int] = None, processes: bool = False) -> None:
+        """Loads data files written by `Measurement.write_to_file()` into `CausticBuffer`s.
+
+        The format is a header of comment lines with the metadata as `#\\t[key]: [value]`,
+        followed by tab-separated columns position[mm], x_diam[um], dx_diam[um], y_diam[um], dy_diam[um].
+        The header is read once, and the body is parsed with a single call to `np.loadtxt`.
+
+        Parameters
+        ----------
+        axes : Tuple[Hashable, Hashable], optional
+            The axes of the returned `CausticBuffer`s, e.g. `(camera.AXES.X, camera.AXES.Y)`, by default ("x", "y")
+        workers : Optional[int], optional
+            Number of threads (or processes) to load the files of a directory with, by default None 
+            (see `ThreadPoolExecutor` and `ProcessPoolExecutor`)
+        processes : bool, optional
+            Whether to load the files in separate processes instead of threads, by default False. 
+            `np.loadtxt` holds the GIL while it parses, so threads only overlap the reading of the files, e.g. from a 
+            network drive. Processes also parse in parallel, but have to be started and pass the results back, 
+            which only pays off for many or large files. On Windows, the calling script then needs an 
+            `if __name__ == '__main__':` guard.
+        """
+        self.axes      = axes
+        self.workers   = workers
+        self.processes = processes
+
+    @classmethod
+    def parse_header(cls, header: List[str]) -> Tuple[dict, Optional[List[str]]]:
+        """Parses the comment lines at the top of a data file
+
+        Parameters
+        ----------
+        header : List[str]
+            The comment lines, including the leading '#'
+
+        Returns
+        -------
+        (metadata, columns) : Tuple[dict, Optional[List[str]]]
+            The metadata as written with `Measurement.write_to_file(metadata = )`, including "Data written on",
+            and the column names (None if there is no line with column names)
+        """
+        metadata = dict()
+        columns  = None
+
+        for line in header:
+            l = line.lstrip("#").strip()
+
+            if l.startswith(cls.WRITTEN_PREFIX):
+                metadata[cls.WRITTEN_PREFIX.strip()] = l[len(cls.WRITTEN_PREFIX):]
+            elif l.startswith("===="):
+                continue
+            elif l.startswith(cls.DATA_COLUMNS[0]):
+                columns = l.split("\t")
+            elif ": " in l:
+                key, val = l.split(": ", 1)
+                metadata[key.strip()] = val.strip()
+
+        return metadata, columns
+
+    def read(self, filename: str) -> CausticBuffer:
+        """Reads one data file
+
+        Parameters
+        ----------
+        filename : str
+            The data file
+
+        Returns
+        -------
+        data : CausticBuffer
+            The points of the file, with the metadata of the header in `data.metadata`.
+            `n_samples` is taken from the metadata "Samples per Point" if available, otherwise 0.
+            `timestamp` is the time the file was written, NaN if unknown.
+
+        Raises
+        ------
+        OSError
+            If the file cannot be read
+        ValueError
+            If the file is not a data file of the expected format
+        """
+        with open(filename, 'r') as f:
+            text = f.read()
+
+        # Split off the header
+        header = []
+        pos    = 0
+        while text.startswith("#", pos):
+            end = text.find("\n", pos)
+            end = len(text) if end < 0 else end
+            header.append(text[pos:end])
+            pos = end + 1
+
+        metadata, columns = self.parse_header(header)
+        metadata["File"]  = os.path.abspath(filename)
+
+        if columns is not None and tuple(c.strip() for c in columns) != self.DATA_COLUMNS:
+            raise ValueError(f"{filename}: not a data file, expected the columns {self.DATA_COLUMNS}, got {columns}")
+
+        body = np.loadtxt(io.StringIO(text[pos:]), delimiter = "\t", ndmin = 2, dtype = np.float64)
+
+        if body.size and body.shape[1] != len(self.DATA_COLUMNS):
+            raise ValueError(f"{filename}: expected {len(self.DATA_COLUMNS)} columns, got {body.shape[1]}")
+
+        n_samples = 0
+        if "Samples per Point" in metadata:
+            try:
+                samples = np.array(metadata["Samples per Point"].split(","), dtype = np.int64)
+                if len(samples) == len(body):
+                    n_samples = samples
+            except ValueError:
+                pass
+
+        timestamp = np.nan
+        if self.WRITTEN_PREFIX.strip() in metadata:
+            try:
+                timestamp = datetime.strptime(metadata[self.WRITTEN_PREFIX.strip()], "%Y-%m-%d at %H:%M:%S").timestamp()
+            except ValueError:
+                pass
+
+        data = CausticBuffer(axes = self.axes, capacity = len(body), metadata = metadata)
+        if len(body):
+            data.extend(*body.T, n_samples = n_samples, timestamp = timestamp)
+
+        return data
+
+    def _try_read(self, filename: str) -> Optional[CausticBuffer]:
+        try:
+            return self.read(filename)
+        except (OSError, ValueError) as e:
+            self.log(f"Skipping {filename}: {e}", logging.WARN)
+            return None
+
+    def read_files(self, files: List[str]) -> CausticRuns:
+        """Reads several data files in parallel, in threads or processes (see `self.processes`). 
+        Files that are not data files are skipped with a warning.
+
+        Parameters
+        ----------
+        files : List[str]
+            The data files
+
+        Returns
+        -------
+        runs : CausticRuns
+            The runs in the order of `files`
+        """
+        if self.processes:
+            # Hand the files to the processes in chunks, a task each would cost more than parsing a file
+            workers = self.workers if self.workers is not None else (os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers = workers) as executor:
+                results = list(executor.map(self._try_read, files, chunksize = max(1, len(files) // (4 * workers))))
+        else:
+            with ThreadPoolExecutor(max_workers = self.workers) as executor:
+                results = list(executor.map(self._try_read, files))
+
+        loaded = [(f, r) for f, r in zip(files, results) if r is not None]
+
+        return CausticRuns(files = [f for f, _ in loaded], buffers = [r for _, r in loaded])
+
+    def read_directory(self, directory: str, pattern: str = "*.dat", recursive: bool = False) -> CausticRuns:
+        """Reads all data files in a directory (e.g. nanosquared-data/M2) in parallel, sorted by filename (i.e. by date)
+
+        Parameters
+        ----------
+        directory : str
+            The directory
+        pattern : str, optional
+            Glob pattern of the data files, by default "*.dat"
+        recursive : bool, optional
+            Whether to also search the subdirectories, by default False
+
+        Returns
+        -------
+        runs : CausticRuns
+            See self.read_files()
+        """
+        files = sorted(glob.glob(os.path.join(directory, "**", pattern) if recursive else os.path.join(directory, pattern), recursive = recursive))
+        self.log(f"Reading {len(files)} files from {directory}", logging.DEBUG)
+
+        return self.read_files(files)
@@ -5,11 +5,11 @@
 
 """File provides the backend for the GUI. It is meant to combine all the modules together"""
 
-from io import TextIOWrapper
 import numbers
 import os,sys
 import signal
-from typing import Optional, Tuple, Union, TextIO
+import time
+from typing import Optional, Tuple, Union
 import numpy as np
 import scipy
 
@@ -39,14 +39,23 @@ from fitting.fit_functions import omega_z
 
 import logging
 import common.helpers as h
+from common.trace import tracer, traced
+from common.clock import VirtualClock
 
 import measurement.errors as me
+from measurement.cache import MeasurementCache
+from measurement.buffer import CausticBuffer
+from measurement.loader import CausticLoader
+from measurement.rawfile import RawWriter, AsyncRawWriter
+from measurement.checkpoint import Checkpoint
+from measurement.scheduler import PointScheduler, Schedule
 
 class Measurement(h.LoggerMixIn):
     def __init__(self, 
             camera: Camera         = None, 
             controller: Controller = None,
-            devMode: bool          = True
+            devMode: bool          = True,
+            useCache: bool         = True
         ) -> None:
         """Backend to the GUI
 
@@ -57,17 +66,22 @@ class Measurement(h.LoggerMixIn):
             If set to `None`, `WinCamD(devMode = devMode)` is used.
         controller : stage.controller.Controller, optional
             Instance of a `stage-controller` to be used, by default None.
-            If set to `None`, `GSC01(devMode = devMode)` is used, which by default uses `stage._stage.SGSP26_200()`
+            If set to `None`, `GSC01(devMode = devMode)` is used, which by default uses `stage._stage.SGSP26_200()`.
+            In devMode, it runs on a `common.clock.VirtualClock`, so that simulated moves and fly-scans take no real time.
+            Travel times and timestamps are taken from `controller.clock`, see `common.clock`.
         devMode: bool, optional
             If dev mode is set, all actions are simulated. This is passed on to `controller` if `controller` is set
             to `None`. 
+        useCache: bool, optional
+            Whether `measure_at()` should reuse results of positions that have already been measured 
+            in the current measurement session. See `measurement.cache.MeasurementCache`. By default True.
 
         """
 
         self.devMode = devMode
 
         if controller is None:
-            controller = GSC01(devMode = devMode)
+            controller = GSC01(devMode = devMode, clock = VirtualClock() if devMode else None)
         
         if camera is None:
             camera = WinCamD(devMode = devMode)
@@ -79,22 +93,51 @@ class Measurement(h.LoggerMixIn):
         self.controller = controller
         self.camera     = camera
 
-        self.data   = { self.camera.AXES.X : None, self.camera.AXES.Y : None }
+        self.data   = self._new_buffer()
         self.fitter = None
 
+        self.useCache = useCache
+        self.cache    = MeasurementCache(
+            bothAxis  = self.camera.AXES.BOTH, 
+            axesIndex = { self.camera.AXES.X : 0, self.camera.AXES.Y : 1 },
+            clock     = self.controller.clock
+        )
+
         if not self.devMode:
             self.camera.wait_stable()
 
-        self.controller.homeStage()
+        self.homeStage()
         self.controller.findRange()
 
         self.removeOutliers = 0
         self.threshold      = 0.2     
 
+        # Number of samples of the last measurement from self.measure_at()
+        self.lastNumSamples = None
+
+        # Time in s the last self.measure_at() spent moving the stage, None if it did not move
+        self.lastMoveTime = None
+
+        # Order in which self.take_measurements() visits the points, e.g. PointScheduler(approach = +1) to approach
+        # every point from below. The schedule of the last measurement, with the travel times, is self.lastSchedule
+        self.scheduler    = PointScheduler()
+        self.lastSchedule = None
+
         self.openedFile = None
+
+        # Checkpoint of the running self.take_measurements(), see self.resume()
+        self.checkpoint = None
+
+        # Settings of the background writer of the raw data, see measurement.rawfile.AsyncRawWriter
+        self.rawFlushInterval = 1.0      # s
+        self.rawFlushBytes    = 1 << 20  # bytes
         
         self.startSignalHandlers()
 
+    def _new_buffer(self, capacity: int = 32) -> CausticBuffer:
+        """Returns an empty `CausticBuffer` for `self.data` with the axes of the camera"""
+        return CausticBuffer(axes = (self.camera.AXES.X, self.camera.AXES.Y), capacity = capacity)
+
     def startSignalHandlers(self):
         """ Starts appropriate signal handlers to handle e.g. keyboard interrupts. 
         Ensures safe exit and disconnecting of controller.
@@ -115,25 +158,40 @@ class Measurement(h.LoggerMixIn):
         """
 
         print("^C Detected: Closing any open file")
+        if self.checkpoint is not None:
+            print(f"The measurement can be continued with Measurement.resume(\"{self.checkpoint.filename}\")")
         self.closeAnyOpenFile()
         raise KeyboardInterrupt
         # use os._exit(1) to avoid raising any SystemExit exception
 
     def closeAnyOpenFile(self):
-        if isinstance(self.openedFile, TextIOWrapper):
+        if isinstance(self.openedFile, RawWriter):
             try:
                 self.openedFile.close()
                 self.openedFile = None
             except OSError as e:
                 pass
 
+        if self.checkpoint is not None:
+            try:
+                self.checkpoint.close()
+                self.checkpoint = None
+            except OSError as e:
+                pass
+
     def __enter__(self):
         return self
 
     def __exit__(self, e_type, e_val, traceback):
         return self.closeAnyOpenFile()
 
-    def take_measurements(self, axis: Camera.AXES = None, center: int = None, rayleighLength: float = None, precision: int = 100, numsamples: int = 50, writeToFile: Optional[str] = None, metadata: dict = dict(), removeOutliers: int = 0, threshold: float = 0.2, saveRaw: bool = False):
+    def homeStage(self):
+        """Homes the stage and invalidates the measurement cache, since the origin of the stage may have changed."""
+        ret = self.controller.homeStage()
+        self.cache.homed()
+        return ret
+
+    def take_measurements(self, axis: Camera.AXES = None, center: int = None, rayleighLength: float = None, precision: int = 100, numsamples: int = 50, writeToFile: Optional[str] = None, metadata: dict = dict(), removeOutliers: int = 0, threshold: float = 0.2, saveRaw: Union[bool, str] = False, strategy: str = "ternary", targetSEM: Optional[float] = None, minSamples: int = 10, checkpoint: Union[bool, str] = True, trace: Union[bool, str] = False):
         """Function that takes the necessary measurements for M^2, automatically selects the range based
         on the given Rayleigh Length.
 
@@ -145,6 +203,10 @@ class Measurement(h.LoggerMixIn):
 
         This means, we need the travel range of approximately +- 3 z_0
 
+        The points are measured in the order with the least predicted travel time from the position the search for
+        the center and the Rayleigh length ended at, see `self.scheduler` and `self.schedule_points()`.
+        The predicted and the actual travel time are written to the metadata.
+
         Parameters
         ----------
         axis : Camera.AXES, optional
@@ -178,70 +240,442 @@ class Measurement(h.LoggerMixIn):
             See documentation in nanoscan.getAxis_avg_D4Sigma()
 
             By default = 0.2
-        saveRaw: bool, optional
-            If set to True, writes raw data to a temp file. 
+        saveRaw: Union[bool, str], optional
+            If set to True, writes the raw samples of every point to a binary raw file next to the data file,
+            see `measurement.rawfile`. The file is written point by point during the acquisition.
+            If set to a path, the raw file is written there.
 
             By default, false
+        strategy: str, optional
+            Search strategy to pass to find_center, see self.find_center()
+
+            By default, "ternary"
+        targetSEM: float, optional
+            If given, the number of samples at every point is chosen adaptively, with `numsamples` as the maximum. 
+            The number of samples taken at every point is written to the metadata. 
+            See documentation in nanoscan.getAxis_avg_D4Sigma()
+
+            By default, None
+        minSamples: int, optional
+            Minimum number of samples at every point if `targetSEM` is given, by default 10
+        checkpoint: Union[bool, str], optional
+            If set, the center, the Rayleigh length, the planned points and every completed point are appended to 
+            a checkpoint file, see `measurement.checkpoint`. An interrupted measurement can be continued with `self.resume()`. 
+            If set to True, the checkpoint is written to `writeToFile + ".ckpt"`, or next to the data file if `writeToFile` is None. 
+            If set to a path, the checkpoint is written there. An existing checkpoint of an unfinished measurement at that path 
+            is renamed to `<name>.unfinished.ckpt` instead of being overwritten. The checkpoint is deleted once the measurement 
+            has been completed.
+
+            By default, True
+        trace: Union[bool, str], optional
+            At the end, the time spent in the instrumented functions of the stage, the camera and the measurement is
+            logged per function, see `common.trace`. If set, the spans are also written as a Chrome trace, to be opened
+            with chrome://tracing or https://ui.perfetto.dev.
+            If set to True, the trace is written next to the data file, with the extension ".trace.json".
+            If set to a path, the trace is written there.
+
+            By default, False
+
+        Returns
+        -------
+        self.data : CausticBuffer
+            The measured caustic
+        """
+
+        params = {
+            "axis"           : axis.name if isinstance(axis, self.camera.AXES) else None,
+            "center"         : np.asarray(center).tolist() if center is not None else None,
+            "rayleighLength" : np.asarray(rayleighLength).tolist() if rayleighLength is not None else None,
+            "precision"      : precision,
+            "numsamples"     : numsamples,
+            "writeToFile"    : writeToFile,
+            "metadata"       : metadata,
+            "removeOutliers" : removeOutliers,
+            "threshold"      : threshold,
+            "saveRaw"        : saveRaw,
+            "strategy"       : strategy,
+            "targetSEM"      : targetSEM,
+            "minSamples"     : minSamples,
+            "trace"          : trace
+        }
+
+        ckpt = None
+        if checkpoint:
+            ckpt = self.get_checkpoint(checkpoint = checkpoint if isinstance(checkpoint, str) else None, writeToFile = writeToFile)
+            if ckpt is not None:
+                ckpt.start(params)
+
+        return self._take_measurements(**{ **params, "axis": axis, "center": center, "rayleighLength": rayleighLength }, checkpoint = ckpt)
+
+    def resume(self, checkpoint: str):
+        """Continues a measurement of `self.take_measurements()` that has been interrupted, from its checkpoint file.
+
+        The measurement is continued with the same parameters. The center and Rayleigh length are only searched for if 
+        they had not been found yet, and the points that have already been measured are taken from the checkpoint. 
+        The stage is homed first if necessary. If the raw data was written to a given path, the raw data of the rest of the
+        measurement is written to `<name>.resumed.<ext>` next to it, such that the raw data already recorded is kept.
+
+        Parameters
+        ----------
+        checkpoint : str
+            The checkpoint file, see `self.take_measurements(checkpoint = )`
+
+        Returns
+        -------
+        self.data : CausticBuffer
+            The measured caustic, see `self.take_measurements()`
+
+        Raises
+        ------
+        OSError
+            If the checkpoint cannot be read
+        ValueError
+            If the file is not a checkpoint
+        """
+        ckpt = Checkpoint.load(checkpoint)
+        self.log(f"Resuming from {checkpoint}: {ckpt.summary()}", logging.INFO)
+
+        if ckpt.finished is not None:
+            self.log(f"The measurement has already been completed, reading {ckpt.finished}", logging.WARN)
+            self.data = self._new_buffer()
+            self.read_from_file(ckpt.finished, raiseError = True)
+            return self.data
+
+        params = dict(ckpt.params)
+        params["axis"]     = self.camera.AXES[params["axis"]] if params["axis"] is not None else None
+        params["metadata"] = { **params["metadata"], "Resumed From": os.path.realpath(checkpoint) }
+
+        if isinstance(params["saveRaw"], str) and os.path.exists(params["saveRaw"]):
+            # Keep the raw data recorded before the interruption
+            params["metadata"]["Raw Data File (before resuming)"] = os.path.realpath(params["saveRaw"])
+            params["saveRaw"] = self._unused_path(params["saveRaw"], "resumed")
+
+        try:
+            return self._take_measurements(**params, checkpoint = ckpt)
+        finally:
+            ckpt.close()
+
+    def get_checkpoint(self, checkpoint: Optional[str] = None, writeToFile: Optional[str] = None) -> Optional[Checkpoint]:
+        """Creates a checkpoint file for `self.take_measurements()`
+
+        Parameters
+        ----------
+        checkpoint : Optional[str], optional
+            The checkpoint file, by default None
+            If set to `None`, `writeToFile + ".ckpt"` is used, or a file `<datetime>_<random string>.ckpt` in the M2 directory
+        writeToFile : Optional[str], optional
+            The data file of the measurement, by default None
+
+        Returns
+        -------
+        ckpt : Optional[Checkpoint]
+            The checkpoint, or None if the file cannot be created
         """
+        pfad = checkpoint
+
+        if pfad is None and isinstance(writeToFile, str):
+            pfad = f"{writeToFile}.ckpt"
 
-        if removeOutliers not in [0, 1, 2]:
-            self.log(f"Invalid removeOutlier mode {removeOutliers}! Using mode 0: do nothing", loglevel = logging.warn)
+        try:
+            if pfad is None:
+                tempdir = os.path.join(root_dir, ".." ,"nanosquared-data", "M2")
+                Path(tempdir).mkdir(parents=True, exist_ok=True)
+                fd, pfad = tempfile.mkstemp(suffix = ".ckpt" if not self.devMode else ".dev.ckpt", prefix = datetime.now().strftime("%Y-%m-%d_%H%M%S_"), dir = tempdir)
+                os.close(fd)
+            else:
+                if os.path.exists(pfad):
+                    try:
+                        unfinished = Checkpoint.load(pfad).finished is None
+                    except ValueError:
+                        unfinished = False
+
+                    if unfinished:
+                        rotated = self._unused_path(pfad, "unfinished")
+                        os.replace(pfad, rotated)
+                        self.log(f"{pfad} holds an unfinished measurement, moved to {rotated}. It can be continued with Measurement.resume(\"{rotated}\")", logging.WARN)
+
+                # Start a new checkpoint
+                open(pfad, 'w').close()
+        except OSError as e:
+            self.log(f"{pfad}: OSError {e}, no checkpoint will be written", logging.ERROR)
+            return None
+
+        self.log(f"Writing checkpoint to {pfad}", logging.INFO)
+
+        return Checkpoint(pfad)
+
+    @staticmethod
+    def _unused_path(pfad: str, tag: str) -> str:
+        """Returns `pfad` with `tag` before its extension, e.g. "caustic.unfinished.ckpt" for "caustic.ckpt", 
+        numbered as "caustic.unfinished-2.ckpt" etc. if the file exists already
+        """
+        root, ext = os.path.splitext(pfad)
+        new = f"{root}.{tag}{ext}"
+        n   = 1
+        while os.path.exists(new):
+            n  += 1
+            new = f"{root}.{tag}-{n}{ext}"
+        return new
+
+    def _take_measurements(self, axis: Camera.AXES, center: int, rayleighLength: float, precision: int, numsamples: int, writeToFile: Optional[str], metadata: dict, removeOutliers: int, threshold: float, saveRaw: Union[bool, str], strategy: str, targetSEM: Optional[float], minSamples: int, trace: Union[bool, str] = False, checkpoint: Optional[Checkpoint] = None):
+        """Takes the measurements for `self.take_measurements()` and `self.resume()`, see there for the parameters.
+        The points already in `checkpoint` are not measured again.
+        """
+        # Spans of this measurement, see common.trace
+        traceMark = tracer.mark()
+
+        if removeOutliers not in [0, 1, 2, 3]:
+            self.log(f"Invalid removeOutlier mode {removeOutliers}! Using mode 0: do nothing", loglevel = logging.WARN)
             removeOutliers = 0 
 
-        if removeOutliers == 2:
+        if removeOutliers in [2, 3]:
             # Check if the threshold is valid:
             if not isinstance(threshold, numbers.Number) or threshold <= 0:
-                self.log(f"Invalid threshold {threshold}. Using 0.2.", loglevel = logging.warn)
+                self.log(f"Invalid threshold {threshold}. Using 0.2.", loglevel = logging.WARN)
                 threshold = 0.2
 
         self.removeOutliers = removeOutliers
         self.threshold      = threshold
 
+        # Results from a previous session may no longer be valid (e.g. the beam was adjusted)
+        self.cache.clear()
+
         if not self.devMode and self.controller.stage.dirty:
-            self.controller.homeStage()
+            self.homeStage()
         
         if axis is None or not isinstance(axis, self.camera.AXES):
             axis = self.camera.AXES.BOTH
             self.log(f"Defaulting to both axis measurement")
 
         if saveRaw:
-            saveRaw = self.get_raw_file(metadata = metadata)
+            saveRaw = self.get_raw_file(writeToFile = saveRaw if isinstance(saveRaw, str) else None, metadata = metadata)
             self.openedFile = saveRaw
             
         # initialization
-        self.data = { self.camera.AXES.X : None, self.camera.AXES.Y : None }
+        self.data = self._new_buffer()
 
-        # find params
-        # TODO: CHECK IF CENTER IS CORRECT FOR AXIS CHOSEN
-        # TODO: Check if rayleigh length is correct size for axis chosen
-        if isinstance(saveRaw, TextIOWrapper):
-            saveRaw.write("# === Finding Center ===\n")
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
 
-        if axis == self.camera.AXES.BOTH:
-            _center    = self.find_center_xy(precision = precision, saveRaw = saveRaw)          if center is None else center
+        # find params
+        if checkpoint is not None and checkpoint.center is not None:
+            _center, rayleighLength = np.array(checkpoint.center), np.array(checkpoint.rayleighLength)
+            self.log(f"Center {_center}, Rayleigh length {rayleighLength} from the checkpoint")
         else:
-            _center    = np.array([self.find_center(precision = precision, saveRaw = saveRaw)]) if center is None else center
+            _center, rayleighLength = self.find_params(axis = axis, center = center, rayleighLength = rayleighLength, precision = precision, saveRaw = saveRaw, strategy = strategy)
+            if checkpoint is not None:
+                checkpoint.setParams(np.atleast_1d(_center), np.atleast_1d(rayleighLength))
 
-        if rayleighLength is None:
-            try:
-                if isinstance(saveRaw, TextIOWrapper):
-                    saveRaw.write("# === Finding Rayleigh Length ===\n")
-                rayleighLength = np.array(self.find_zR_pps(center = _center, axis = axis, precision = precision, saveRaw = saveRaw))
-            except me.StageOutOfRangeError as e:
-                raise me.ConfigurationError(f"The travel range of the stage does not support the current configuration")
+        if checkpoint is not None and checkpoint.plan is not None:
+            points = np.array(checkpoint.plan)
         else:
-            rayleighLength = np.around(self.controller.um_to_pulse(um = rayleighLength * 1000)).astype(int)
+            points = self.plan_points(center = _center, rayleighLength = rayleighLength)
+            if checkpoint is not None:
+                checkpoint.setPlan(points)
 
-            if np.shape(_center) != np.shape(rayleighLength):
-                rayleighLength = np.broadcast_to(rayleighLength, np.shape(_center))
+        totalpts = len(points)
+        digits   = len(str(totalpts))
+
+        if isinstance(saveRaw, RawWriter):
+            saveRaw.setPhase("Caustic")
+
+        # { pos: ((y_x, y_y), numSamples) }
+        results = dict()
+
+        if checkpoint is not None:
+            for pt in points:
+                done = checkpoint.points.get(int(pt))
+                if done is not None:
+                    results[int(pt)] = ((done["x"], done["y"]), done["n_samples"])
+
+            if len(results):
+                self.log(f"{len(results)}/{totalpts} points from the checkpoint")
 
+        # Visit the remaining points in the order with the least travel time from the current position
+        schedule          = self.schedule_points(points = [pt for pt in points if int(pt) not in results])
+        self.lastSchedule = schedule
+
+        # Take the measurements
+        with tracer.span("caustic", cat = "measurement", points = len(schedule)):
+            for n, (pt, via) in enumerate(schedule):
+                x = self.controller.pulse_to_um(pps = pt) / 1000 # Convert to mm
+
+                # https://stackoverflow.com/a/25293744
+                self.log(f"Point [{(len(results)+1): >{digits}}/{totalpts}]: {pt}")
+
+                # Approach the point from the side set in self.scheduler
+                moveTime = 0
+                if via is not None:
+                    t_start = self.controller.clock.now()
+                    self.controller.move(pos = via)
+                    self.controller.waitClear()
+                    moveTime = self.controller.clock.now() - t_start
+
+                (y_x, y_y) = self.measure_at(pos = pt, numsamples = numsamples, axis = self.camera.AXES.BOTH, saveRaw = saveRaw, targetSEM = targetSEM, minSamples = minSamples)
+                numSamples = self.lastNumSamples
+
+                if via is not None or self.lastMoveTime is not None:
+                    schedule.record(n, moveTime + (self.lastMoveTime or 0))
+
+                results[int(pt)] = ((y_x, y_y), numSamples)
+
+                if checkpoint is not None:
+                    checkpoint.addPoint(pos = pt, z = x, x = y_x, y = y_y, n_samples = numSamples)
+
+        if len(schedule):
+            self.log(f"Travel: {schedule.summary()}")
+
+        # self.data is sorted by position, independent of the order of the measurements
+        samplesTaken = []
+        for pt in points:
+            x = self.controller.pulse_to_um(pps = pt) / 1000 # Convert to mm
+
+            (y_x, y_y), numSamples = results[int(pt)]
+            samplesTaken.append(numSamples)
+
+            self.data.append(x, y_x[0], y_x[1], y_y[0], y_y[1], n_samples = numSamples if numSamples is not None else 0)
+            
+            # for ax in [self.camera.AXES.X, self.camera.AXES.Y]:
+            #     y = self.measure_at(pos = pt, numsamples = numsamples, axis = ax)
+
+        # self.data is a CausticBuffer, which can be used like the former dict
+        # self.data = {'x': xdata, 'y': ydata }
+        # where {x,y}data = self.data[axis] is an nparray with each element the format [z, diam, delta_diam]
+
+        if isinstance(saveRaw, RawWriter):
+            saveRaw.close()
+            self.openedFile = None
+
+            if isinstance(saveRaw, AsyncRawWriter):
+                self.log(f"Raw data writer: {saveRaw.summary()}")
+
+        default_meta = {
+            "Rayleigh Length": f"{self.controller.pulse_to_um(pps = rayleighLength) / 1000} mm"
+        }
+
+        metadata = {**default_meta, **metadata}
+
+        if isinstance(saveRaw, RawWriter):
+            metadata["Raw Data File"] = os.path.realpath(saveRaw.name)
+        
+        if isinstance(self.camera, NanoScan):
+            postProcMethod = ["0: Do Nothing", "1: Remove top 10%", "2: Remove positive peaks from data", "3: Remove positive peaks from data (windowed)"]
+            metadata["Post Processing Mode"] = postProcMethod[removeOutliers]
+            if removeOutliers in [2, 3]:
+                metadata["Threshold"] = threshold
+
+        if targetSEM is not None:
+            metadata["Target SEM"]        = f"{targetSEM * 100}% of mean" if targetSEM <= 1 else f"{targetSEM} um"
+            metadata["Samples per Point"] = ", ".join(str(n) for n in samplesTaken)
+            self.log(f"Adaptive sampling: {sum(samplesTaken)} samples in total, at most {numsamples * totalpts}")
+
+        if len(schedule):
+            metadata["Travel Time"] = f"predicted {schedule.predictedTotal:.1f} s, actual {schedule.actualTotal:.1f} s"
+
+        pfad = self.write_to_file(writeToFile = writeToFile, metadata = metadata)
+
+        if checkpoint is not None:
+            # The done record remains should the checkpoint not be deleted
+            checkpoint.finish(pfad)
+            checkpoint.remove()
+            self.checkpoint = None
+
+        if self.useCache:
+            self.log(f"Measurement cache: {self.cache.summary()}")
+
+        if tracer.enabled:
+            self.log(f"Time per function:\n{tracer.summaryTable(since = traceMark)}", logging.INFO)
+
+        if trace:
+            self.write_trace(writeToFile = trace if isinstance(trace, str) else None, dataFile = pfad, since = traceMark)
+
+        return self.data
+
+    def write_trace(self, writeToFile: Optional[str] = None, dataFile: Optional[str] = None, since: Optional[float] = None) -> Optional[str]:
+        """Writes the spans of `common.trace.tracer` as a Chrome trace, see `Tracer.exportChromeTrace()`
+
+        Parameters
+        ----------
+        writeToFile : Optional[str], optional
+            The filepath to write to, by default None
+            If set to `None`, the trace is written next to `dataFile`, with the extension ".trace.json"
+        dataFile : Optional[str], optional
+            The data file of the measurement, by default None
+        since : Optional[float], optional
+            Only the spans started at or after this time, see `Tracer.mark()`, by default None (all)
+
+        Returns
+        -------
+        pfad : Optional[str]
+            The file that has been written to, or None if no file was written
+        """
+        pfad = writeToFile if writeToFile is not None else (f"{os.path.splitext(dataFile)[0]}.trace.json" if dataFile is not None else None)
+
+        if pfad is None:
+            self.log("No data file to write the trace next to. Skipping writing the trace.", logging.WARNING)
+            return None
+
+        try:
+            tracer.exportChromeTrace(pfad, since = since)
+        except OSError as e:
+            self.log(f"{pfad}: OSError {e}", logging.ERROR)
+            return None
+
+        self.log(f"Trace written to {pfad}", logging.INFO)
+
+        return pfad
+
+    def schedule_points(self, points: np.ndarray) -> Schedule:
+        """Orders the points with `self.scheduler` to minimise the travel time from the current position of the stage,
+        predicted with the motion model of the controller (see `GSC01.scanMotion`).
+
+        Parameters
+        ----------
+        points : np.ndarray
+            The points in pulses
+
+        Returns
+        -------
+        schedule : measurement.scheduler.Schedule
+            The points in the order to measure them, see `PointScheduler.schedule()`
+        """
+        stg    = self.controller.stage
+        kwargs = { "start": stg.position, "model": self.controller.scanMotion, "lower": stg.LIMIT_LOWER, "upper": stg.LIMIT_UPPER }
+
+        schedule = self.scheduler.schedule(points, **kwargs)
+        inOrder  = self.scheduler.predict(np.sort(points), **kwargs)
+
+        self.log(f"Scheduled {len(schedule)} points from {stg.position}: predicted travel time {schedule.predictedTotal:.2f} s ({inOrder.predictedTotal:.2f} s in sorted order)", loglevel = logging.DEBUG)
+
+        return schedule
+
+    def plan_points(self, center: np.ndarray, rayleighLength: np.ndarray) -> np.ndarray:
+        """Returns the points at which to measure the caustic, see `self.take_measurements()`
+
+        Parameters
+        ----------
+        center : np.ndarray
+            The center in pulses, with one element per axis
+        rayleighLength : np.ndarray
+            The Rayleigh length in pulses, with one element per axis
+
+        Returns
+        -------
+        points : np.ndarray
+            The sorted points in pulses
+
+        Raises
+        ------
+        measurement.errors.ConfigurationError
+            If the points do not fit within the travel range of the stage
+        """
         _within_points    = np.linspace(start=-rayleighLength, stop=rayleighLength, endpoint = True, num = 10, dtype = np.integer)        
         _without_points_1 = np.linspace(start=2*rayleighLength, stop=3*rayleighLength, endpoint = True, num = 5, dtype = np.integer) 
         _without_points_2 = -_without_points_1
 
         #                                                                              v the center
         points = np.concatenate([_within_points, _without_points_1, _without_points_2, np.zeros_like(_within_points[0:1])])
-        points = points + _center
+        points = points + center
 
         # Now we have all the points in a 1D or 2D array depending on number of axes.
         points = np.unique(points.flatten())          # We flatten and get the unique points we need to measure
@@ -256,7 +690,7 @@ class Measurement(h.LoggerMixIn):
             asym_without_points = np.linspace(start=2*rayleighLength, stop=3*rayleighLength, endpoint = True, num = 10, dtype = np.integer) 
             
             points = np.concatenate([_within_points, asym_without_points, np.zeros_like(_within_points[0:1])])
-            points = points + _center
+            points = points + center
 
             points = np.unique(points.flatten())
             points = np.sort(points, kind = 'stable')
@@ -272,54 +706,339 @@ class Measurement(h.LoggerMixIn):
                 
         self.log(points)
 
-        totalpts = len(points)
-        digits   = len(str(totalpts))
+        return points
 
-        # Take the measurements
-        for n, pt in enumerate(points):
-            # https://stackoverflow.com/a/25293744
-            self.log(f"Point [{(n+1): >{digits}}/{totalpts}]: {pt}")
+    def plan_bins(self, center: np.ndarray, rayleighLength: np.ndarray) -> np.ndarray:
+        """Returns the z-bins of `self.take_measurements_flyscan()`: for every axis, 10 bins within one Rayleigh length 
+        on either side of the beam waist, and 5 bins from 2 to 3 Rayleigh lengths on either side.
 
-            (y_x, y_y) = self.measure_at(pos = pt, numsamples = numsamples, axis = self.camera.AXES.BOTH, saveRaw = saveRaw)
-            x = self.controller.pulse_to_um(pps = pt) / 1000 # Convert to mm
+        The bins of the axes are merged into one set of bins that do not overlap, split at the edges of the bins of 
+        every axis, such that every sample is counted in one bin only.
 
-            dtpt_x = np.array([x, y_x[0], y_x[1]])
-            dtpt_y = np.array([x, y_y[0], y_y[1]])
+        Parameters
+        ----------
+        center : np.ndarray
+            The center in pulses, with one element per axis
+        rayleighLength : np.ndarray
+            The Rayleigh length in pulses, with one element per axis
 
-            self.data[self.camera.AXES.X] = dtpt_x if self.data[self.camera.AXES.X] is None else np.vstack((self.data[self.camera.AXES.X], dtpt_x))
-            self.data[self.camera.AXES.Y] = dtpt_y if self.data[self.camera.AXES.Y] is None else np.vstack((self.data[self.camera.AXES.Y], dtpt_y))
-            
-            # for ax in [self.camera.AXES.X, self.camera.AXES.Y]:
-            #     y = self.measure_at(pos = pt, numsamples = numsamples, axis = ax)
+        Returns
+        -------
+        bins : np.ndarray
+            Array of shape (n, 2) of the sorted [lower, upper) bounds of each bin in pulses, see `self.fly_scan()`
+        """
+        bins = []
+        for c, z_R in zip(np.atleast_1d(center), np.atleast_1d(rayleighLength)):
+            for lo, hi, num in [(-z_R, z_R, 10), (2*z_R, 3*z_R, 5), (-3*z_R, -2*z_R, 5)]:
+                edges = c + np.linspace(lo, hi, num = num + 1, endpoint = True)
+                bins.append(np.column_stack((edges[:-1], edges[1:])))
 
-        # self.data has the format
-        # self.data = {'x': xdata, 'y': ydata }
-        # where {x,y}data is an nparray with each element the format [z, diam, delta_diam]
+        bins  = np.concatenate(bins)
+        edges = np.unique(bins)
+
+        # Keep the pieces between the edges that lie within a bin of any axis
+        mid    = (edges[:-1] + edges[1:]) / 2
+        inside = np.any((mid[:, None] >= bins[:, 0]) & (mid[:, None] < bins[:, 1]), axis = 1)
+
+        return np.column_stack((edges[:-1], edges[1:]))[inside]
+
+    @traced(cat = "measurement")
+    def find_params(self, axis: Camera.AXES, center: int = None, rayleighLength: float = None, precision: int = 100, saveRaw: Optional[RawWriter] = None, strategy: str = "ternary") -> Tuple[np.ndarray, np.ndarray]:
+        """Finds the center and Rayleigh length of the beam where they are not given. See self.take_measurements() for the parameters.
+
+        Returns
+        -------
+        (center, rayleighLength) : Tuple[np.ndarray, np.ndarray]
+            The center and Rayleigh length in pulses, with one element per axis
+
+        Raises
+        ------
+        measurement.errors.ConfigurationError
+            If the Rayleigh length cannot be found within the travel range of the stage
+        """
+
+        # TODO: CHECK IF CENTER IS CORRECT FOR AXIS CHOSEN
+        # TODO: Check if rayleigh length is correct size for axis chosen
+        if isinstance(saveRaw, RawWriter):
+            saveRaw.setPhase("Finding Center")
+
+        if axis == self.camera.AXES.BOTH:
+            _center    = self.find_center_xy(precision = precision, saveRaw = saveRaw, strategy = strategy)          if center is None else center
+        else:
+            _center    = np.array([self.find_center(precision = precision, saveRaw = saveRaw, strategy = strategy)]) if center is None else center
+
+        if rayleighLength is None:
+            try:
+                if isinstance(saveRaw, RawWriter):
+                    saveRaw.setPhase("Finding Rayleigh Length")
+                if axis == self.camera.AXES.BOTH:
+                    # Both axes are searched jointly, every measurement narrows the search of both
+                    rayleighLength = self.find_zR_pps_xy(center = _center, precision = precision, saveRaw = saveRaw)
+                else:
+                    rayleighLength = np.array(self.find_zR_pps(center = _center, axis = axis, precision = precision, saveRaw = saveRaw))
+            except me.StageOutOfRangeError as e:
+                raise me.ConfigurationError(f"The travel range of the stage does not support the current configuration")
+        else:
+            rayleighLength = np.around(self.controller.um_to_pulse(um = rayleighLength * 1000)).astype(int)
+
+            if np.shape(_center) != np.shape(rayleighLength):
+                rayleighLength = np.broadcast_to(rayleighLength, np.shape(_center))
+
+        return _center, rayleighLength
+
+    def take_measurements_flyscan(self, axis: Camera.AXES = None, center: int = None, rayleighLength: float = None, precision: int = 100, jogSpeed: int = 500, sweeps: int = 2, writeToFile: Optional[str] = None, metadata: dict = dict(), removeOutliers: int = 0, threshold: float = 0.2, saveRaw: Union[bool, str] = False, strategy: str = "ternary"):
+        """Takes the measurements for M^2 like self.take_measurements(), but acquires the caustic with a continuous fly-scan 
+        (see self.fly_scan()) instead of stopping at every point. 
+
+        The z-bins are distributed according to ISO 11146-1:2021 like the points in self.take_measurements(): 
+        10 bins within one Rayleigh length on either side of the beam waist, and 5 bins from 2 to 3 Rayleigh lengths on either side.
+        For both axes, the bins of the two axes are merged such that they do not overlap, see self.plan_bins().
+
+        Parameters
+        ----------
+        jogSpeed : int, optional
+            Speed of the stage during the fly-scan in pps, see GSC01.setSpeed(), by default 500
+        sweeps : int, optional
+            Number of sweeps over the caustic, alternating in direction, by default 2
+        
+        For the other parameters, see self.take_measurements()
 
-        if isinstance(saveRaw, TextIOWrapper):
+        Returns
+        -------
+        self.data : CausticBuffer
+            See self.take_measurements()
+        """
+
+        if removeOutliers not in [0, 1, 2, 3]:
+            self.log(f"Invalid removeOutlier mode {removeOutliers}! Using mode 0: do nothing", loglevel = logging.WARN)
+            removeOutliers = 0 
+
+        self.removeOutliers = removeOutliers
+        self.threshold      = threshold
+
+        self.cache.clear()
+
+        if not self.devMode and self.controller.stage.dirty:
+            self.homeStage()
+        
+        if axis is None or not isinstance(axis, self.camera.AXES):
+            axis = self.camera.AXES.BOTH
+            self.log(f"Defaulting to both axis measurement")
+
+        if saveRaw:
+            saveRaw = self.get_raw_file(writeToFile = saveRaw if isinstance(saveRaw, str) else None, metadata = metadata)
+            self.openedFile = saveRaw
+
+        _center, rayleighLength = self.find_params(axis = axis, center = center, rayleighLength = rayleighLength, precision = precision, saveRaw = saveRaw, strategy = strategy)
+
+        bins = self.plan_bins(center = _center, rayleighLength = rayleighLength)
+
+        if (bins.min() < (self.controller.stage.LIMIT_LOWER + 10)) or (bins.max() > (self.controller.stage.LIMIT_UPPER - 10)):
+            raise me.ConfigurationError(f"The travel range of the stage does not support the current configuration: Travel Range = [{self.controller.stage.LIMIT_LOWER}, {self.controller.stage.LIMIT_UPPER}], Bins = [{bins.min()}, {bins.max()}]")
+
+        if isinstance(saveRaw, RawWriter):
+            saveRaw.setPhase("Fly-Scan")
+
+        self.fly_scan(start = np.floor(bins.min()).astype(int), stop = np.ceil(bins.max()).astype(int), jogSpeed = jogSpeed, bins = bins, sweeps = sweeps, removeOutliers = removeOutliers, threshold = threshold, saveRaw = saveRaw)
+
+        if isinstance(saveRaw, RawWriter):
             saveRaw.close()
             self.openedFile = None
 
+            if isinstance(saveRaw, AsyncRawWriter):
+                self.log(f"Raw data writer: {saveRaw.summary()}")
+
         default_meta = {
-            "Rayleigh Length": f"{self.controller.pulse_to_um(pps = rayleighLength) / 1000} mm"
+            "Rayleigh Length"  : f"{self.controller.pulse_to_um(pps = rayleighLength) / 1000} mm",
+            "Acquisition Mode" : f"Fly-Scan, {sweeps} sweep(s) at {jogSpeed} pps"
         }
 
         metadata = {**default_meta, **metadata}
 
-        if isinstance(saveRaw, TextIOWrapper):
+        if isinstance(saveRaw, RawWriter):
             metadata["Raw Data File"] = os.path.realpath(saveRaw.name)
-        
-        if isinstance(self.camera, NanoScan):
-            postProcMethod = ["0: Do Nothing", "1: Remove top 10%", "2: Remove positive peaks from data"]
-            metadata["Post Processing Mode"] = postProcMethod[removeOutliers]
-            if removeOutliers == 2:
-                metadata["Threshold"] = threshold
 
         self.write_to_file(writeToFile = writeToFile, metadata = metadata)
 
         return self.data
 
-    def get_raw_file(self, writeToFile: Optional[str] = None, metadata: Optional[dict] = None) -> TextIO:
+    def fly_scan(self, start: int, stop: int, jogSpeed: int = 500, bins: Optional[np.ndarray] = None, numbins: int = 20, sweeps: int = 1, warmup: int = 10, minSamples: int = 3, removeOutliers: int = None, threshold: float = None, saveRaw: Optional[RawWriter] = None) -> dict:
+        """Acquires the caustic continuously: the stage jogs at a constant speed between `start` and `stop` 
+        while the camera streams samples. Each sample is timestamped, and the position of the stage at that time is 
+        interpolated from timestamped readouts of the stage position. The samples are then binned along z. 
+
+        Overwrites `self.data` with the binned data in the same format as self.take_measurements(). 
+
+        Parameters
+        ----------
+        start : int
+            Start position in pps
+        stop : int
+            Stop position in pps
+        jogSpeed : int, optional
+            Speed of the stage during the scan in pps, see GSC01.setSpeed(), by default 500
+        bins : Optional[np.ndarray], optional
+            Array of shape (n, 2) of the [lower, upper) bounds of each z-bin in pps, by default None
+            If set to None, `numbins` equally spaced bins between `start` and `stop` are used. 
+        numbins : int, optional
+            Number of bins if `bins` is not given, by default 20
+        sweeps : int, optional
+            Number of sweeps, alternating between start -> stop and stop -> start, by default 1
+        warmup : int, optional
+            Number of samples to throw away before the first sweep, by default 10
+        minSamples : int, optional
+            Minimum number of samples for a bin to be used, by default 3
+        removeOutliers : int, optional
+            See cameras.nanoscan.NanoScan.getAxis_avg_D4Sigma(), applied to the samples of each bin. 
+            By default, None (i.e. use self.removeOutliers)
+        threshold : float, optional
+            By default, None (i.e. use self.threshold)
+        saveRaw : RawWriter, optional
+            Raw file to write the timestamped raw samples of every sweep to, by default None
+
+        Returns
+        -------
+        self.data : CausticBuffer
+            See self.take_measurements()
+        """
+
+        if removeOutliers is None:
+            removeOutliers = self.removeOutliers
+        
+        if threshold is None or threshold < 0:
+            threshold = self.threshold
+
+        if bins is None:
+            edges = np.linspace(min(start, stop), max(start, stop), num = numbins + 1, endpoint = True)
+            bins  = np.column_stack((edges[:-1], edges[1:]))
+
+        orig_speed = self.controller.stage.speed.jog
+        self.controller.setSpeed(jogSpeed = jogSpeed)
+        jogSpeed = self.controller.stage.speed.jog # In case it was rounded
+
+        z, samples = [], []
+
+        # The samples are timestamped on the clock of the controller, the raw file takes the time since the epoch
+        epoch = time.time() - self.controller.clock.now()
+
+        self.camera.startStream()
+        try:
+            for _ in range(warmup):
+                self.camera.getSample_D4Sigma()
+
+            for sweep in range(sweeps):
+                sweep_start, sweep_stop = (start, stop) if (sweep % 2 == 0) else (stop, start)
+
+                self.controller.move(pos = sweep_start)
+                self.controller.waitClear()
+
+                t_pos, pos, t_smp, smp = self._fly_sweep(start = sweep_start, stop = sweep_stop, jogSpeed = jogSpeed)
+
+                # Only use samples taken while we know where the stage is
+                valid = (t_smp >= t_pos[0]) & (t_smp <= t_pos[-1])
+                z_smp = np.interp(t_smp[valid], t_pos, pos)
+
+                self.log(f"Fly-Scan sweep [{sweep + 1}/{sweeps}]: {sweep_start} -> {sweep_stop}, {np.count_nonzero(valid)} samples", loglevel = logging.INFO)
+
+                if isinstance(saveRaw, RawWriter):
+                    saveRaw.writePoint(z = self.controller.pulse_to_um(pps = z_smp) / 1000, x = smp[valid][:,0], y = smp[valid][:,1], t = epoch + t_smp[valid], sweep = sweep + 1)
+
+                z.append(z_smp)
+                samples.append(smp[valid])
+        finally:
+            self.camera.stopStream()
+            self.controller.setSpeed(jogSpeed = orig_speed)
+
+        z       = np.concatenate(z)
+        samples = np.concatenate(samples)
+
+        self.data = self._new_buffer(capacity = len(bins))
+
+        for lo, hi in sorted(bins, key = lambda b: b[0]):
+            mask = (z >= lo) & (z < hi)
+            if np.count_nonzero(mask) < minSamples:
+                self.log(f"Bin [{lo}, {hi}) has only {np.count_nonzero(mask)} samples, skipping", loglevel = logging.WARN)
+                continue
+
+            pos_mm = self.controller.pulse_to_um(pps = np.average(z[mask])) / 1000 # Convert to mm
+
+            diams = []
+            for i in range(2):
+                vals = NanoScan.filter_outliers(samples[mask, i], removeOutliers = removeOutliers, threshold = threshold)
+                diams += [np.average(vals), np.std(vals)]
+
+            self.data.append(pos_mm, *diams, n_samples = np.count_nonzero(mask))
+
+        return self.data
+
+    def _fly_sweep(self, start: int, stop: int, jogSpeed: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """One sweep of the fly-scan from `start` to `stop`. The stage is assumed to be at `start`.
+
+        Stage positions and samples are taken alternately, each timestamped on `self.controller.clock` with the midpoint 
+        of the call. A controller in devMode simulates the jog (see `GSC01.jogPosition()`), and a camera in devMode 
+        simulates one revolution per sample with self.simulate_beam(). Simulated devices advance the clock of the 
+        controller, so that a simulation on a `common.clock.VirtualClock` takes no real time. 
+
+        Returns
+        -------
+        (t_pos, pos, t_smp, smp) : Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+            Timestamps and stage positions, timestamps and samples of shape (n, 2)
+        """
+        direction = 1 if stop >= start else -1
+        timeout   = 1.5 * np.abs(stop - start) / jogSpeed + 5 # seconds
+
+        clock   = self.controller.clock
+        sim_rev = 1 / getattr(self.camera, "rotationFrequency", 10.0) # seconds per sample of a camera in devMode
+
+        t_pos, pos, t_smp, smp = [], [], [], []
+
+        t_start = clock.now()
+        self.controller.jog(positive = (direction > 0))
+        try:
+            while True:
+                t0 = clock.now()
+                p  = self.controller.getPositionReadOut()
+                t_pos.append((t0 + clock.now()) / 2)
+                pos.append(p)
+
+                if (direction * (p - stop) >= 0) or (clock.now() - t_start) > timeout:
+                    break
+
+                t0 = clock.now()
+                if self.camera.devMode:
+                    # The beam is sampled halfway through the revolution
+                    clock.sleep(sim_rev / 2)
+                    p_smp  = self.controller.getPositionReadOut()
+                    clock.sleep(sim_rev / 2)
+                    sample = (self.simulate_beam(pos = p_smp)[0], self.simulate_beam(pos = (p_smp - 100))[0])
+                else:
+                    sample = self.camera.getSample_D4Sigma()
+                t_smp.append((t0 + clock.now()) / 2)
+                smp.append(sample)
+        finally:
+            self.controller.stop()
+            self.controller.waitClear()
+            self.controller.syncPosition()
+
+        return np.array(t_pos), np.array(pos), np.array(t_smp), np.array(smp).reshape(-1, 2)
+
+    def get_raw_file(self, writeToFile: Optional[str] = None, metadata: Optional[dict] = None) -> Optional[RawWriter]:
+        """Opens a binary raw file for the raw samples of a measurement, see `measurement.rawfile`
+
+        Parameters
+        ----------
+        writeToFile : Optional[str], optional
+            The filepath to write to, by default None
+            If set to `None`, a file `<datetime>_<random string>.raw` is generated in the M2 directory
+        metadata : Optional[dict], optional
+            Metadata to write to the header of the file, by default None
+
+        Returns
+        -------
+        f : Optional[AsyncRawWriter]
+            The opened raw file, which is written in the background, or None if no file could be opened.
+            See `self.rawFlushInterval` and `self.rawFlushBytes`.
+        """
         f = None
         pfad = writeToFile
 
@@ -328,18 +1047,19 @@ class Measurement(h.LoggerMixIn):
         if pfad is not None and isinstance(pfad, str):
             # We use the given file
             try:
-                f = open(pfad, 'w')
+                f = open(pfad, 'wb')
             except OSError as e:
                 self.log(f"{pfad}: OSError {e}", logging.ERROR)
+                return None
         elif pfad is None:
             # We create a file in the M2 directory to save the data.
 
             tempdir = os.path.join(root_dir, ".." ,"nanosquared-data", "M2")
             Path(tempdir).mkdir(parents=True, exist_ok=True)
-            fd, pfad = tempfile.mkstemp(suffix = ".raw.log" if not self.devMode else ".dev.raw.log", prefix = now.strftime("%Y-%m-%d_%H%M%S_"), dir = tempdir, text = True)
+            fd, pfad = tempfile.mkstemp(suffix = ".raw" if not self.devMode else ".dev.raw", prefix = now.strftime("%Y-%m-%d_%H%M%S_"), dir = tempdir)
             # Returns a file descriptor instead of the file
 
-            f = os.fdopen(fd, 'w')
+            f = os.fdopen(fd, 'wb')
         else:
             self.log(f"Invalid parameter WriteToFile: {writeToFile}. Skipping writing to file.", logging.WARNING)
 
@@ -347,19 +1067,13 @@ class Measurement(h.LoggerMixIn):
         
         self.log(f"Saving raw data file to {pfad}", logging.INFO)
 
-        f.write(f"# Log started on {now.strftime('%Y-%m-%d at %H:%M:%S')}\n")
-
-        if metadata is not None and isinstance(metadata, dict):
-            f.write("# ==== Metadata ====\n")
-            for key, val in metadata.items():
-                f.write(f"#\t{key}: {val}\n")
-        elif metadata is not None:
+        if metadata is not None and not isinstance(metadata, dict):
             self.log(f"No metadata written, invalid metadata received: {metadata}", logging.WARN)
-        
-        f.write("# ====== Data ======\n")
+            metadata = None
 
-        return f
+        return AsyncRawWriter(f, metadata = metadata, name = pfad, flushInterval = self.rawFlushInterval, flushBytes = self.rawFlushBytes)
 
+    @traced(cat = "measurement")
     def write_to_file(self, writeToFile: Optional[str] = None, metadata: Optional[dict] = None) -> Union[str, None]:
         """Writes `self.data` to a file given by the parameter `writeToFile`.
 
@@ -434,40 +1148,44 @@ class Measurement(h.LoggerMixIn):
         return pfad
 
     def read_from_file(self, filename: str, raiseError = False):
-        """Read from a file written by `self.write_to_file()`
+        """Read from a file written by `self.write_to_file()` and append it to `self.data`. 
+        See `measurement.loader.CausticLoader` to read many files.
 
         Parameters
         ----------
         filename : str
             File to read from
+        raiseError : bool, optional
+            Whether to raise an error if the file cannot be read, by default False
+
+        Returns
+        -------
+        metadata : dict
+            The metadata in the header of the file, None if the file could not be read
+
+        Raises
+        ------
+        OSError
+            If `raiseError` is set and the file cannot be read
+        ValueError
+            If `raiseError` is set and the file has an unexpected format
         """
         try:
-            f = open(filename, 'r')
-        except OSError as e:
-            self.log(f"Unable to read file: {filename}: OSError {e}", logging.WARN)
+            loaded = CausticLoader(axes = self.data.axes).read(filename)
+        except (OSError, ValueError) as e:
+            self.log(f"Unable to read file: {filename}: {type(e).__name__} {e}", logging.WARN)
             if raiseError:
-                raise OSError(e)
+                raise e
             return 
         
         # We assume the format position[mm] x_diam[um] dx_diam[um] y_diam[um] dy_diam[um]
-        for line in f:
-            l = line.strip()
-            if l[0] != "#":
-                pos, x_diam, dx_diam, y_diam, dy_diam = [ float(x) for x in l.split("\t") ]
-                
-                omega   = { self.camera.AXES.X : x_diam,  self.camera.AXES.Y: y_diam  }
-                d_omega = { self.camera.AXES.X : dx_diam, self.camera.AXES.Y: dy_diam }
+        records = loaded.records
+        self.data.extend(*[records[name] for name in CausticBuffer.FIELDS])
 
-                for ax in [self.camera.AXES.X, self.camera.AXES.Y]:
-                    dtpt = np.array([pos, omega[ax], d_omega[ax]])
-                    if self.data[ax] is None:
-                        self.data[ax] = dtpt
-                    else:
-                        self.data[ax] = np.vstack((self.data[ax], dtpt))
-
-        f.close()
+        return loaded.metadata
 
-    def fit_data(self, axis: CameraAxes, wavelength: float, wavelength_error: float = 0, mode: int = MsqFitter.M2_MODE, useODR: bool = False, xerror: float = None) -> np.ndarray:
+    @traced(cat = "measurement")
+    def fit_data(self, axis: CameraAxes, wavelength: float, wavelength_error: float = 0, mode: int = MsqFitter.M2_MODE, useODR: bool = False, xerror: float = None, linear: bool = False) -> np.ndarray:
         """Fits the data as measured by `self.take_measurements()`. Creates a new fitter object every time and overwrites the `self.fitter` object. 
 
         Parameters
@@ -487,6 +1205,9 @@ class Measurement(h.LoggerMixIn):
             If using ODR, `xerror` needs to be provided. 
             If set to None and `useODR` is set to `True`, `xerror` will be taken as 1 pulse (converted into mm).
             By default None
+        linear: bool, optional
+            Only for ISO_MODE. Whether to only use the closed-form weighted linear solution without the nonlinear fit, 
+            see `MsqFitter.fitLinear()`. By default False
 
         Returns 
         -------
@@ -526,15 +1247,22 @@ class Measurement(h.LoggerMixIn):
             kwargs["xerror"] = xerror if xerror is not None else (self.controller.stage.um_per_pulse(1) / 1000)
 
         self.fitter = MsqODRFitter(**kwargs) if useODR else MsqOCFFitter(**kwargs)
-        self.fitter.estimateAndFit()
+
+        if linear and mode == MsqFitter.ISO_MODE:
+            self.fitter.fitLinear(refine = False)
+        else:
+            self.fitter.estimateAndFit()
 
         return self.fitter.m_squared     
 
-    def find_center(self, axis: CameraAxes = None, precision: int = 100, left: int = None, right: int = None, saveRaw: Optional[TextIO] = None) -> int:
-        """Finds the approximate position of the beam waist using ternary search. 
+    CENTER_STRATEGIES = ("ternary", "golden")
+
+    def find_center(self, axis: CameraAxes = None, precision: int = 100, left: int = None, right: int = None, saveRaw: Optional[RawWriter] = None, strategy: str = "ternary") -> int:
+        """Finds the approximate position of the beam waist using ternary or golden-section search. 
         If `left` or `right` is set to None, the limits of the stage are taken
 
         Code Reference: https://en.wikipedia.org/wiki/Ternary_search
+                        https://en.wikipedia.org/wiki/Golden-section_search
 
         Parameters
         ----------
@@ -547,10 +1275,17 @@ class Measurement(h.LoggerMixIn):
             The smallest possible position, by default None
         right : int, optional
             The biggest possible position, by default None
-        saveRaw : TextIO, optional
+        saveRaw : RawWriter, optional
             See self.measure_at()
 
             By default, None
+        strategy : str, optional
+            Search strategy, one of `Measurement.CENTER_STRATEGIES`:
+            - "ternary": Measures 2 new points per iteration, shrinking the interval to 2/3.
+            - "golden" : Golden-section search. Carries one interior measurement forward, so that only 
+                         1 new point is measured per iteration while shrinking the interval to 1/phi ~ 0.618.
+
+            By default, "ternary"
 
         Returns
         -------
@@ -558,6 +1293,10 @@ class Measurement(h.LoggerMixIn):
             The approximate beam-waist position
         """
 
+        if strategy not in self.CENTER_STRATEGIES:
+            self.log(f"Invalid strategy {strategy}! Using ternary search", loglevel = logging.WARN)
+            strategy = "ternary"
+
         if axis is None:
             axis = self.camera.AXES.X
 
@@ -566,7 +1305,7 @@ class Measurement(h.LoggerMixIn):
         
         #### USE XY if XY
         if axis == self.camera.AXES.BOTH:
-            return self.find_center_xy(precision = precision, left = left, right = right, saveRaw = saveRaw)
+            return self.find_center_xy(precision = precision, left = left, right = right, saveRaw = saveRaw, strategy = strategy)
         #################
         
         if self.devMode:
@@ -583,31 +1322,59 @@ class Measurement(h.LoggerMixIn):
 
         absolute_precision = precision
 
-        # We implement the iterative method
-        while np.abs(right - left) >= absolute_precision:
-            left_third  = np.around(left  + (right - left) / 3).astype(int)
-            right_third = np.around(right - (right - left) / 3).astype(int)
-            
-            l = self.measure_at(axis = axis, pos = left_third, saveRaw = saveRaw)
-            r = self.measure_at(axis = axis, pos = right_third, saveRaw = saveRaw)
+        if strategy == "golden":
+            # We implement the golden-section search, only one new point is measured per iteration
+            invphi = 1 / scipy.constants.golden
+
+            # Interior points: left < c < d < right
+            c, fc = None, None
+            d, fd = None, None
+
+            while np.abs(right - left) >= absolute_precision:
+                if c is None:
+                    c  = np.around(right - invphi * (right - left)).astype(int)
+                    fc = self.measure_at(axis = axis, pos = c, saveRaw = saveRaw)
+                if d is None:
+                    d  = np.around(left  + invphi * (right - left)).astype(int)
+                    fd = self.measure_at(axis = axis, pos = d, saveRaw = saveRaw)
+
+                if fc[0] > fd[0]:
+                    # Minimum in [c, right], d is carried forward as the new left interior point
+                    left  = c
+                    c, fc = d, fd
+                    d, fd = None, None
+                else:
+                    # Minimum in [left, d], c is carried forward as the new right interior point
+                    right = d
+                    d, fd = c, fc
+                    c, fc = None, None
+        else:
+            # We implement the iterative method
+            while np.abs(right - left) >= absolute_precision:
+                left_third  = np.around(left  + (right - left) / 3).astype(int)
+                right_third = np.around(right - (right - left) / 3).astype(int)
+                
+                l = self.measure_at(axis = axis, pos = left_third, saveRaw = saveRaw)
+                r = self.measure_at(axis = axis, pos = right_third, saveRaw = saveRaw)
 
-            # absolute_precision = np.max([l[1], r[1], default_abs_pres])
+                # absolute_precision = np.max([l[1], r[1], default_abs_pres])
 
-            if l[0] > r[0]:
-                left = left_third
-            else:
-                right = right_third
+                if l[0] > r[0]:
+                    left = left_third
+                else:
+                    right = right_third
 
         # Left and right are the current bounds; the maximum is between them
         cen = np.around((left + right) / 2).astype(int)
         self.log(f"Center at {cen}")
         return cen
 
-    def find_center_xy(self, precision: int = 100, left: Tuple[int, int] = None, right: Tuple[int, int] = None, saveRaw: Optional[TextIO] = None) -> Tuple[int, int]:
-        """Finds the approximate position of the beam waist using ternary search. 
+    def find_center_xy(self, precision: int = 100, left: Tuple[int, int] = None, right: Tuple[int, int] = None, saveRaw: Optional[RawWriter] = None, strategy: str = "ternary") -> Tuple[int, int]:
+        """Finds the approximate position of the beam waist using ternary or golden-section search. 
         If `left` or `right` is set to None, the limits of the stage are taken
 
         Code Reference: https://en.wikipedia.org/wiki/Ternary_search
+                        https://en.wikipedia.org/wiki/Golden-section_search
 
         Parameters
         ----------
@@ -620,10 +1387,14 @@ class Measurement(h.LoggerMixIn):
             The smallest possible position, by default None
         right : int, optional
             The biggest possible position, by default None
-        saveRaw : TextIO, optional
+        saveRaw : RawWriter, optional
             See self.measure_at()
 
             By default, None
+        strategy : str, optional
+            Search strategy, see self.find_center()
+
+            By default, "ternary"
 
         Returns
         -------
@@ -634,6 +1405,10 @@ class Measurement(h.LoggerMixIn):
         # if self.devMode:
         #     return (15, 15)
 
+        if strategy not in self.CENTER_STRATEGIES:
+            self.log(f"Invalid strategy {strategy}! Using ternary search", loglevel = logging.WARN)
+            strategy = "ternary"
+
         if not self.controller.stage.ranged and (left is None or right is None):
             self.controller.findRange()
 
@@ -661,40 +1436,89 @@ class Measurement(h.LoggerMixIn):
 
         step = 0
 
-        # We implement the iterative method
-        while remaining_axes: # Loop while remaining_axes not empty
-            # We first do ternary search on the x-axis, but keep track of the bounds of the y-axis
-            # once the x-center is found, it does ternary search on the y-axis using the limits already found
+        if strategy == "golden":
+            # Golden-section search on the current axis, one interior measurement is carried forward. 
+            # The bounds of the remaining axes are tracked like in the ternary search. 
+            invphi = 1 / scipy.constants.golden
+
+            c, fc = None, None
+            d, fd = None, None
+
+            while remaining_axes:
+                step += 1
+                current_axis = remaining_axes[0]
+
+                span = right[current_axis] - left[current_axis]
+                if c is None:
+                    c  = np.around(right[current_axis] - invphi * span).astype(int)
+                    fc = self.measure_at(axis = self.camera.AXES.BOTH, pos = c, saveRaw = saveRaw)
+                if d is None:
+                    d  = np.around(left[current_axis]  + invphi * span).astype(int)
+                    fd = self.measure_at(axis = self.camera.AXES.BOTH, pos = d, saveRaw = saveRaw)
+
+                self.log(f"[{step}] Axes Remaining : {remaining_axes}: Current: {current_axis},\tLeft: {left},\tRight: {right}", loglevel = logging.DEBUG)
+                self.log(f"=== LEFT  POINT: [{c}]\t{fc}", loglevel = logging.DEBUG)
+                self.log(f"=== RIGHT POINT: [{d}]\t{fd}", loglevel = logging.DEBUG)
+                self.log("", loglevel = logging.DEBUG)
+
+                for axis in remaining_axes:
+                    # The other axes only use the pair if it lies within their bounds, 
+                    # as the points are chosen for the bounds of the current axis
+                    if axis != current_axis and not (left[axis] <= c and d <= right[axis]):
+                        continue
+
+                    if fc[axis][0] > fd[axis][0]:
+                        left[axis]  = c
+                    else:
+                        right[axis] = d
 
-            step += 1
-            current_axis = remaining_axes[0] # front of deque is the last element?
-            
-            one_third   = np.abs(right[current_axis] - left[current_axis]) / 3
-            left_third  = np.around(left[current_axis]  + one_third).astype(int)
-            right_third = np.around(right[current_axis] - one_third).astype(int)
-
-            self.log(f"[{step}] Axes Remaining : {remaining_axes}: Current: {current_axis},\tLeft: {left},\tRight: {right}", loglevel = logging.DEBUG)
-            self.log(f"Search between [{left[current_axis]}, {right[current_axis]}]", loglevel = logging.DEBUG)
-            l = self.measure_at(axis = self.camera.AXES.BOTH, pos = left_third, saveRaw = saveRaw)
-            self.log(f"=== LEFT  POINT: [{left_third}]\t{l}", loglevel = logging.DEBUG)
-            r = self.measure_at(axis = self.camera.AXES.BOTH, pos = right_third, saveRaw = saveRaw)
-            self.log(f"=== RIGHT POINT: [{right_third}]\t{r}", loglevel = logging.DEBUG)
-            self.log("", loglevel = logging.DEBUG)
-
-            for axis in remaining_axes:
-                if l[axis][0] > r[axis][0]:
-                    left[axis]  = left_third
+                if fc[current_axis][0] > fd[current_axis][0]:
+                    c, fc = d, fd
+                    d, fd = None, None
                 else:
-                    # if axis != current_axis and np.abs(l[axis][0] - r[axis][0]) <= np.max(l[axis][1], r[axis][1]):
-                    #     # if not the current axis, and l and r are within error of each other, assume there is a problem and we do nothing
-                    #     pass
-                    # else:
-                    #     # Under normal circumstances
-                    right[axis] = right_third
+                    d, fd = c, fc
+                    c, fc = None, None
+
+                if np.abs(right[current_axis] - left[current_axis]) <= absolute_precision:
+                    remaining_axes.popleft()
+                    # The carried point only belongs to the bounds of the axis we just found
+                    c, fc = None, None
+                    d, fd = None, None
+        else:
+            # We implement the iterative method
+            while remaining_axes: # Loop while remaining_axes not empty
+                # We first do ternary search on the x-axis, but keep track of the bounds of the y-axis
+                # once the x-center is found, it does ternary search on the y-axis using the limits already found
+
+                step += 1
+                current_axis = remaining_axes[0] # front of deque is the last element?
+            
+                one_third   = np.abs(right[current_axis] - left[current_axis]) / 3
+                left_third  = np.around(left[current_axis]  + one_third).astype(int)
+                right_third = np.around(right[current_axis] - one_third).astype(int)
+
+                self.log(f"[{step}] Axes Remaining : {remaining_axes}: Current: {current_axis},\tLeft: {left},\tRight: {right}", loglevel = logging.DEBUG)
+                self.log(f"Search between [{left[current_axis]}, {right[current_axis]}]", loglevel = logging.DEBUG)
+                l = self.measure_at(axis = self.camera.AXES.BOTH, pos = left_third, saveRaw = saveRaw)
+                self.log(f"=== LEFT  POINT: [{left_third}]\t{l}", loglevel = logging.DEBUG)
+                r = self.measure_at(axis = self.camera.AXES.BOTH, pos = right_third, saveRaw = saveRaw)
+                self.log(f"=== RIGHT POINT: [{right_third}]\t{r}", loglevel = logging.DEBUG)
+                self.log("", loglevel = logging.DEBUG)
+
+                for axis in remaining_axes:
+                    if l[axis][0] > r[axis][0]:
+                        left[axis]  = left_third
+                    else:
+                        # if axis != current_axis and np.abs(l[axis][0] - r[axis][0]) <= np.max(l[axis][1], r[axis][1]):
+                        #     # if not the current axis, and l and r are within error of each other, assume there is a problem and we do nothing
+                        #     pass
+                        # else:
+                        #     # Under normal circumstances
+                        right[axis] = right_third
 
-            if np.abs(right[current_axis] - left[current_axis]) <= absolute_precision:
-                remaining_axes.popleft()
-                # we have found that center, remove from the list
+                if np.abs(right[current_axis] - left[current_axis]) <= absolute_precision:
+                    remaining_axes.popleft()
+                    # we have found that center, remove from the list
 
         # convert the left and right into numpy arrays
         left  = np.array(left)
@@ -705,7 +1529,7 @@ class Measurement(h.LoggerMixIn):
         self.log(f"Center at {cen}")
         return cen
 
-    def find_zR_pps(self, center: int, axis: Camera.AXES, precision: int = 10, other: int = None, kappa1: float = 0, kappa2: float = scipy.constants.golden, saveRaw: Optional[TextIO] = None) -> Union[int, Tuple[int, int]]:
+    def find_zR_pps(self, center: int, axis: Camera.AXES, precision: int = 10, other: int = None, kappa1: float = 0, kappa2: float = scipy.constants.golden, saveRaw: Optional[RawWriter] = None) -> Union[int, Tuple[int, int]]:
         """Using the center, automatically finds the approximate Rayleigh Length
 
         IMPORTANT: Assumes that find_center has been run, or that somehow the stage is homed properly
@@ -732,7 +1556,7 @@ class Measurement(h.LoggerMixIn):
             Should be in the range [1, 1+\phi) where \phi is the golden ratio (scipy.constants.golden)
             For use in the ITP Method
             By default scipy.constants.golden
-        saveRaw : TextIO, optional
+        saveRaw : RawWriter, optional
             See self.measure_at()
 
             By default, None
@@ -744,173 +1568,316 @@ class Measurement(h.LoggerMixIn):
             The rayleigh length in pulses
         """
 
-        BOTH = (axis == self.camera.AXES.BOTH)
+        if axis == self.camera.AXES.BOTH:
+            return self.find_zR_pps_xy(center = center, precision = precision, other = other, kappa1 = kappa1, kappa2 = kappa2, saveRaw = saveRaw)
 
         if self.devMode:
             sim_zr = self.SIMULATION_PARAMS["z_R"] * 1000
             self.log(f"Simulating Beam with z_R = {self.controller.um_to_pulse(um = sim_zr, asint = True)}")
-            # return (100, 200) if BOTH else 100
 
         # We first get the beam width at the center
-        if BOTH:
-            # omega_0 = np.array([
-            #         self.measure_at(axis = self.camera.AXES.X, pos = center[0]),
-            #         self.measure_at(axis = self.camera.AXES.Y, pos = center[1])
-            #     ])
-            omega_0 = None
-        else:
-            omega_0 = np.array(self.measure_at(axis = axis, pos = center, saveRaw = saveRaw))
-
-        if omega_0 is not None:
-            sqrt2_omega = np.sqrt(2) * omega_0
+        omega_0     = np.array(self.measure_at(axis = axis, pos = center, saveRaw = saveRaw))
+        sqrt2_omega = np.sqrt(2) * omega_0
 
         def evaluate(pos: int):
             data = self.measure_at(axis = axis, pos = pos, saveRaw = saveRaw)
-            return data - sqrt2_omega if BOTH else (data - sqrt2_omega)[0]
+            return (data - sqrt2_omega)[0]
 
-        # We implement the ITP Method and somehow improve it so that it keeps track of the other axis as well
+        # We implement the ITP Method
         # https://en.wikipedia.org/wiki/ITP_method#The_method
 
-        # Implement for 1 axis first (x-axis)
-
         ## TODO Check if the center is the correct size
 
-        result = (None, None) if BOTH else None
+        if other is None:
+            other = self.controller.stage.LIMIT_UPPER
 
-        if not BOTH:
-            if other is None:
-                other = self.controller.stage.LIMIT_UPPER
+        # We search from the origin outwards
+        origin, bound = center, other
+        it = 0
+        remaining_tries = 1 # the other direction
+        err = ""
+        while True:
+            it += 1
 
-            # We search from the origin outwards
-            origin, bound = center, other
-            it = 0
-            remaining_tries = 1 # the other direction
-            err = ""
-            while True:
-                it += 1
+            # We first search for a point that is positive
+            # Search from the origin to the bound
+            x = np.around(origin + (bound - origin) / 3).astype(int)
+            y = evaluate(pos = x)
 
-                # We first search for a point that is positive
-                # Search from the origin to the bound
-                x = np.around(origin + (bound - origin) / 3).astype(int)
-                y = evaluate(pos = x)
+            self.log(f"Bounding Search [{it}]: \t[{origin} -> {bound}] \t==> f({x}) = {y}")
 
-                self.log(f"Bounding Search [{it}]: \t[{origin} -> {bound}] \t==> f({x}) = {y}")
+            if y > 0:
+                break
+            elif y == 0: # unlikely but just in case
+                return x
+            else:
+                origin = x
 
-                if y > 0:
-                    break
-                elif y == 0: # unlikely but just in case
-                    return x
+            if np.abs(bound - origin) <= precision:
+                # We have not found it
+                if not err:
+                    err += f"Unable to find a point > z_R! Search Range [{origin}, {bound}]"
                 else:
-                    origin = x
+                    err += f" and [{origin}, {bound}]"
 
-                if np.abs(bound - origin) <= precision:
-                    # We have not found it
-                    if not err:
-                        err += f"Unable to find a point > z_R! Search Range [{origin}, {bound}]"
-                    else:
-                        err += f" and [{origin}, {bound}]"
-
-                    self.log(err, logging.ERROR)
-                    
-                    if remaining_tries > 0:
-                        remaining_tries -= 1
-                        origin = center
-                        bound  = self.controller.stage.LIMIT_LOWER if (other > center) else self.controller.stage.LIMIT_UPPER
-                    else:
-                        raise me.StageOutOfRangeError(err)
+                self.log(err, logging.ERROR)
+                
+                if remaining_tries > 0:
+                    remaining_tries -= 1
+                    origin = center
+                    bound  = self.controller.stage.LIMIT_LOWER if (other > center) else self.controller.stage.LIMIT_UPPER
+                else:
+                    raise me.StageOutOfRangeError(err)
 
-            waist = (omega_0 - sqrt2_omega)[0] if not self.devMode else evaluate(center)
+        waist = (omega_0 - sqrt2_omega)[0] if not self.devMode else evaluate(center)
 
-            if x > center:
-                x_a, y_a = center, waist
-                x_b, y_b = x, y
+        if x > center:
+            x_a, y_a = center, waist
+            x_b, y_b = x, y
+        else:
+            x_a, y_a = x, y
+            x_b, y_b = center, waist
+
+        self.log(f"Initial Values: f({x_a}) = {y_a}, f({x_b}) = {y_b}")
+
+        kappa_1 = kappa1 # (0, inf)
+        kappa_2 = kappa2 # [1, 1+\phi) = [1, 1 + scipy.constants.golden] where \phi = 1/2(1+sqrt(5))
+        n_0     = 0 # [0, inf) slack variable 
+
+        n_half = np.ceil(np.log2((x_b - x_a)/(2*precision)))
+        self.log(f"nhalf = {n_half}", loglevel = logging.DEBUG)
+        n_max  = n_half + n_0
+        j = 0
+
+        while(x_b - x_a > 2*precision):
+            self.log(f"[{j + 1}]: \tf({x_a}) = {y_a} \t<-->\t f({x_b}) = {y_b}", loglevel = logging.INFO)
+            x_itp = self._itp_point(x_a = x_a, y_a = y_a, x_b = x_b, y_b = y_b, precision = precision, n_max = n_max, j = j, kappa_1 = kappa_1, kappa_2 = kappa_2)
+
+            # 4) Updating Interval
+            y_itp = evaluate(pos = x_itp)
+            orientation = np.sign(y_b - y_a)
+            if y_itp * orientation > 0:
+                x_b = x_itp; y_b = y_itp
+            elif y_itp * orientation < 0: 
+                x_a = x_itp; y_a = y_itp
             else:
-                x_a, y_a = x, y
-                x_b, y_b = center, waist
-
-            self.log(f"Initial Values: f({x_a}) = {y_a}, f({x_b}) = {y_b}")
-
-            kappa_1 = kappa1 # (0, inf)
-            kappa_2 = kappa2 # [1, 1+\phi) = [1, 1 + scipy.constants.golden] where \phi = 1/2(1+sqrt(5))
-            n_0     = 0 # [0, inf) slack variable 
-
-            n_half = np.ceil(np.log2((x_b - x_a)/(2*precision)))
-            self.log(f"nhalf = {n_half}", loglevel = logging.DEBUG)
-            n_max  = n_half + n_0
-            j = 0
-
-            while(x_b - x_a > 2*precision):
-                self.log(f"[{j + 1}]: \tf({x_a}) = {y_a} \t<-->\t f({x_b}) = {y_b}", loglevel = logging.INFO)
-                # Calculating Parameters
-                x_half = (x_a + x_b) / 2
-                r = precision * np.power(2, n_max - j) - ((x_b - x_a) / 2)
-                delta = kappa_1*np.power((x_b - x_a), kappa_2)
-                self.log(f"\t\t|| Calculating Params: x_half = {x_half}, r = {r}, delta = {delta}", loglevel = logging.DEBUG)
-
-                # 1) Interpolation
-                #    Calculate the Regula Falsi
-                x_f = (y_b*x_a - y_a*x_b)/(y_b - y_a) 
-                self.log(f"\t\t|| falsi = {x_f}", loglevel = logging.DEBUG)
-
-                # 2) Truncation
-                #    Perturb the estimator x_t towards x_half 
-                #    (but maximally to x_half)
-                distance = x_half - x_f
-                sigma    = np.sign(distance)
-                x_t      = x_f + sigma*delta if delta <= np.abs(distance) else x_half
-                self.log(f"\t\t|| sigma = {sigma}, x_t = {x_t}", loglevel = logging.DEBUG)
-
-                # Alternativ:
-                #    delta = np.min([delta, np.abs(distance)])
-                #    x_t = x_f + sigma*delta
-
-                # 3) Projection
-                #    Project the estimator to minmax interval (?)
-                distance = x_t    - x_half 
-                x_itp    = x_half - sigma*r if r < np.abs(distance) else x_t
-                self.log(f"\t\t|| x_itp = {x_itp}", loglevel = logging.DEBUG)
-                # Alternativ:
-                #    r = np.min([r, distance])
-                #    x_itp = x_half - sigma*r
-
-                x_itp = np.around(x_itp).astype(int)
-
-                # 4) Updating Interval
-                y_itp = evaluate(pos = x_itp)
-                orientation = np.sign(y_b - y_a)
-                if y_itp * orientation > 0:
-                    x_b = x_itp; y_b = y_itp
-                elif y_itp * orientation < 0: 
-                    x_a = x_itp; y_a = y_itp
+                # Unlikely but alright
+                x_a = x_itp; x_b = x_itp
+            j += 1
+
+        result = np.around((x_a + x_b)/2).astype(int)
+
+        z_R = np.abs(result - center)
+        self.log(f"z_R = {self.controller.pulse_to_um(z_R)/1000} mm")
+
+        return z_R
+
+    def _itp_point(self, x_a: int, y_a: float, x_b: int, y_b: float, precision: int, n_max: float, j: int, kappa_1: float, kappa_2: float) -> int:
+        """Calculates the next point to evaluate using the ITP Method for the interval [x_a, x_b], x_a < x_b.
+        See self.find_zR_pps() for the parameters.
+
+        Code Reference: https://en.wikipedia.org/wiki/ITP_method#The_method
+
+        Returns
+        -------
+        x_itp : int
+            The next point to evaluate
+        """
+        # Calculating Parameters
+        x_half = (x_a + x_b) / 2
+        r = precision * np.power(2, n_max - j) - ((x_b - x_a) / 2)
+        delta = kappa_1*np.power((x_b - x_a), kappa_2)
+        self.log(f"\t\t|| Calculating Params: x_half = {x_half}, r = {r}, delta = {delta}", loglevel = logging.DEBUG)
+
+        # 1) Interpolation
+        #    Calculate the Regula Falsi
+        x_f = (y_b*x_a - y_a*x_b)/(y_b - y_a) 
+        self.log(f"\t\t|| falsi = {x_f}", loglevel = logging.DEBUG)
+
+        # 2) Truncation
+        #    Perturb the estimator x_t towards x_half 
+        #    (but maximally to x_half)
+        distance = x_half - x_f
+        sigma    = np.sign(distance)
+        x_t      = x_f + sigma*delta if delta <= np.abs(distance) else x_half
+        self.log(f"\t\t|| sigma = {sigma}, x_t = {x_t}", loglevel = logging.DEBUG)
+
+        # Alternativ:
+        #    delta = np.min([delta, np.abs(distance)])
+        #    x_t = x_f + sigma*delta
+
+        # 3) Projection
+        #    Project the estimator to minmax interval (?)
+        distance = x_t    - x_half 
+        x_itp    = x_half - sigma*r if r < np.abs(distance) else x_t
+        self.log(f"\t\t|| x_itp = {x_itp}", loglevel = logging.DEBUG)
+        # Alternativ:
+        #    r = np.min([r, distance])
+        #    x_itp = x_half - sigma*r
+
+        return np.around(x_itp).astype(int)
+
+    def find_zR_pps_xy(self, center: Tuple[int, int], precision: int = 10, other: int = None, kappa1: float = 0, kappa2: float = scipy.constants.golden, saveRaw: Optional[RawWriter] = None) -> np.ndarray:
+        """Finds the approximate Rayleigh Length of both axes simultaneously. 
+
+        Keeps track of a separate bounding search and ITP interval for each axis, but every measurement 
+        (using `self.camera.AXES.BOTH`) is used to update both axes. Where possible, the next point is chosen such that
+        it lies within the intervals of both axes, so that both intervals are tightened at once. 
+
+        If no point > z_R can be found for an axis in the direction of `other`, that axis falls back to 
+        `self.find_zR_pps()`, which also searches in the other direction.
+
+        IMPORTANT: Assumes that find_center has been run, or that somehow the stage is homed properly
+
+        Parameters
+        ----------
+        center : (int, int)
+            The position in pulses of the center of the caustic in the form [x, y]
+        precision, other, kappa1, kappa2, saveRaw: 
+            See self.find_zR_pps()
+
+        Returns
+        -------
+        rayleighLength : np.ndarray of (int, int)
+            The rayleigh length in pulses in the form [x, y]
+
+        Raises
+        ------
+        measurement.errors.StageOutOfRangeError
+            If no point > z_R can be found for one of the axes
+        """
+
+        center = np.array(center).flatten()
+        axes   = [self.camera.AXES.X, self.camera.AXES.Y]
+
+        if other is None:
+            other = self.controller.stage.LIMIT_UPPER
+
+        # Direction of the search
+        sgn = 1 if other >= np.max(center) else -1
+
+        def measure(pos: int) -> np.ndarray:
+            data = self.measure_at(axis = self.camera.AXES.BOTH, pos = pos, saveRaw = saveRaw)
+            return np.array([data[0][0], data[1][0]])
+
+        # We first get the beam width at the centers
+        at_center   = { pos: measure(pos = pos) for pos in np.unique(center) }
+        omega_0     = np.array([at_center[center[i]][i] for i in range(2)])
+        sqrt2_omega = np.sqrt(2) * omega_0
+
+        # For each axis, a = the furthest point from the center with f(a) < 0 (starting with the center), 
+        # and b = the closest point with f(b) > 0 (in the direction of the search)
+        a   = center.copy()
+        y_a = omega_0 - sqrt2_omega
+        b   = [None, None]
+        y_b = [None, None]
+
+        def update(pos: int, widths: np.ndarray, axes_to_update: list):
+            y = widths - sqrt2_omega
+            for i in axes_to_update:
+                dist = sgn * (pos - center[i])
+                if dist <= 0:
+                    # behind the center
+                    continue
+                if b[i] is not None and dist >= sgn * (b[i] - center[i]):
+                    continue
+
+                if y[i] > 0:
+                    b[i], y_b[i] = pos, y[i]
+                elif dist > sgn * (a[i] - center[i]):
+                    a[i], y_a[i] = pos, y[i]
+
+        # Bounding Search, in the direction of `other`
+        bound = other
+        it    = 0
+        while any(x is None for x in b):
+            it += 1
+            unbounded = [i for i in range(2) if b[i] is None]
+            origin    = min([a[i] for i in unbounded], key = lambda pos: sgn * pos)
+
+            if np.abs(bound - origin) <= precision:
+                self.log(f"Unable to find a point > z_R for axes {unbounded}! Search Range [{origin}, {bound}]", logging.WARN)
+                break
+
+            x = np.around(origin + (bound - origin) / 3).astype(int)
+            w = measure(pos = x)
+            update(pos = x, widths = w, axes_to_update = range(2))
+
+            self.log(f"Bounding Search [{it}]: \t[{origin} -> {bound}] \t==> f({x}) = {w - sqrt2_omega}")
+
+        kappa_1 = kappa1 # (0, inf)
+        kappa_2 = kappa2 # [1, 1+\phi) = [1, 1 + scipy.constants.golden] where \phi = 1/2(1+sqrt(5))
+        n_0     = 0 # [0, inf) slack variable 
+
+        # Intervals [x_lo, y_lo, x_hi, y_hi] of the bounded axes
+        intervals = dict()
+        n_max     = dict()
+        j         = dict()
+        for i in range(2):
+            if b[i] is None:
+                continue
+            intervals[i] = [a[i], y_a[i], b[i], y_b[i]] if a[i] < b[i] else [b[i], y_b[i], a[i], y_a[i]]
+            n_max[i]     = np.ceil(np.log2(max(intervals[i][2] - intervals[i][0], 1)/(2*precision))) + n_0
+            j[i]         = 0
+            self.log(f"Initial Values [{axes[i]}]: f({intervals[i][0]}) = {intervals[i][1]}, f({intervals[i][2]}) = {intervals[i][3]}")
+
+        step = 0
+        while True:
+            active = [i for i in intervals if intervals[i][2] - intervals[i][0] > 2*precision]
+            if not active:
+                break
+
+            step += 1
+            candidates = { i : self._itp_point(*intervals[i], precision = precision, n_max = n_max[i], j = j[i], kappa_1 = kappa_1, kappa_2 = kappa_2) for i in active }
+
+            # Prefer the point of an axis that also lies within the intervals of the other axes,
+            # otherwise we tighten the widest interval
+            choice = None
+            for i in active:
+                if all(intervals[k][0] < candidates[i] < intervals[k][2] for k in active if k != i):
+                    choice = i
+                    break
+            if choice is None:
+                choice = max(active, key = lambda i: intervals[i][2] - intervals[i][0])
+
+            x_itp = candidates[choice]
+            y_itp = measure(pos = x_itp) - sqrt2_omega
+
+            self.log(f"[{step}]: Axis {axes[choice]}: {', '.join([f'f_{axes[i]}({x_itp}) = {y_itp[i]}' for i in active])}", loglevel = logging.INFO)
+
+            # Updating Intervals
+            for i in active:
+                x_lo, y_lo, x_hi, y_hi = intervals[i]
+                if not (x_lo <= x_itp <= x_hi):
+                    continue
+
+                orientation = np.sign(y_hi - y_lo)
+                if y_itp[i] * orientation > 0:
+                    intervals[i][2], intervals[i][3] = x_itp, y_itp[i]
+                elif y_itp[i] * orientation < 0: 
+                    intervals[i][0], intervals[i][1] = x_itp, y_itp[i]
                 else:
                     # Unlikely but alright
-                    x_a = x_itp; x_b = x_itp
-                j += 1
-
-            result = np.around((x_a + x_b)/2).astype(int)
+                    intervals[i][0] = x_itp; intervals[i][2] = x_itp
 
-        if BOTH:
-            # Dirty way: we just run this function twice
-            x_axis = self.find_zR_pps(center = center[0], axis = self.camera.AXES.X, precision = precision)
-            y_axis = self.find_zR_pps(center = center[1], axis = self.camera.AXES.Y, precision = precision)
-            self.log(f"BOTH: X-Axis {x_axis}, Y-axis {y_axis}")
-            
-            center = np.array(center)
-            result = np.array([x_axis, y_axis])
+            j[choice] += 1
 
-        try:
-            if not BOTH: 
-                # Since for BOTH, we already have the correct z_R and not the position
-                z_R = np.abs(result - center)
+        z_R = np.zeros(2, dtype = int)
+        for i in range(2):
+            if i in intervals:
+                result = np.around((intervals[i][0] + intervals[i][2])/2).astype(int)
+                z_R[i] = np.abs(result - center[i])
+            else:
+                # Fallback, searches in both directions, may raise StageOutOfRangeError
+                z_R[i] = self.find_zR_pps(center = center[i], axis = axes[i], precision = precision, other = other, kappa1 = kappa1, kappa2 = kappa2, saveRaw = saveRaw)
 
-            self.log(f"z_R = {self.controller.pulse_to_um(z_R)/1000} mm")
-        except Exception as e:
-            # When result == None
-            z_R = result
+        self.log(f"BOTH: X-Axis {z_R[0]}, Y-axis {z_R[1]}")
+        self.log(f"z_R = {self.controller.pulse_to_um(z_R)/1000} mm")
 
         return z_R
         
-    def measure_at(self, axis: CameraAxes, pos: int, numsamples: int = 10, removeOutliers: int = None, threshold: float = None, saveRaw: Optional[TextIO] = None):
+    @traced(cat = "measurement")
+    def measure_at(self, axis: CameraAxes, pos: int, numsamples: int = 10, removeOutliers: int = None, threshold: float = None, saveRaw: Optional[RawWriter] = None, useCache: Optional[bool] = None, targetSEM: Optional[float] = None, minSamples: int = 10):
         """Moves the stage to that position and takes a measurement for the diameter
 
         If both axis: X: center = 0, Y: center = 100
@@ -923,28 +1890,36 @@ class Measurement(h.LoggerMixIn):
             Position to measure at in pps
         numsamples: int
             Number of samples to take, by default 10
+            If `targetSEM` is given, the maximum number of samples to take. 
         removeOutliers: int, optional
             By default, None (i.e. use self.removeOutliers)
         threshold: int, optional
             By default, None (i.e. use self.threshold)
-        saveRaw: TextIO
-            File to write to. If set to an open file, the raw data will be written to this file.
+        saveRaw: RawWriter
+            Raw file to write to. If set to an open `RawWriter`, the raw samples will be written to this file.
 
             Ignored for devMode.
 
             By default, None.
+        useCache: bool, optional
+            Whether to return a previously measured result at the same position and settings instead of measuring again.
+            No raw data is written for a cached result. 
+
+            By default, None (i.e. use self.useCache)
+        targetSEM: float, optional
+            Target standard error of the mean for adaptive sampling, see documentation in nanoscan.getAxis_avg_D4Sigma()
+
+            By default, None (i.e. always take `numsamples` samples)
+        minSamples: int, optional
+            Minimum number of samples if `targetSEM` is given, by default 10
+
+        The number of samples actually used is stored in `self.lastNumSamples`, the time spent moving the stage in `self.lastMoveTime`.
 
         Returns
         -------
         d4sigma : Tuple[float, float]
             d4Sigma diameter obtained in the form: [diam, delta diam]
         """
-        
-        self.controller.move(pos = pos)
-        self.controller.waitClear()
-
-        if self.camera.devMode:
-            return (self.simulate_beam(pos = pos), self.simulate_beam(pos = (pos - 100))) if axis == self.camera.AXES.BOTH else self.simulate_beam(pos = pos)
 
         if removeOutliers is None:
             removeOutliers = self.removeOutliers
@@ -952,27 +1927,71 @@ class Measurement(h.LoggerMixIn):
         if threshold is None or threshold < 0:
             threshold = self.threshold
 
-        if isinstance(saveRaw, TextIOWrapper):
-            ret, rawout = self.camera.getAxis_avg_D4Sigma(axis, numsamples = numsamples, removeOutliers = removeOutliers, threshold = threshold, returnRaw = True)
+        if useCache is None:
+            useCache = self.useCache
+
+        self.lastMoveTime = None
+
+        cacheKey = {
+            "pos"           : pos, 
+            "axis"          : axis, 
+            "numsamples"    : numsamples, 
+            "removeOutliers": removeOutliers, 
+            "threshold"     : threshold if removeOutliers in [2, 3] else 0
+        }
+
+        # With adaptive sampling, a cached result with at least `numsamples` (the maximum) samples is at least as good
+        if useCache:
+            ret, n = self.cache.get(**cacheKey, returnNumsamples = True)
+            if ret is not None:
+                self.lastNumSamples = n
+                if isinstance(saveRaw, RawWriter):
+                    saveRaw.writePoint(z = self.controller.pulse_to_um(pps = pos) / 1000, cached = True)
+                return ret
+
+        ret = self._measure_at(axis = axis, pos = pos, numsamples = numsamples, removeOutliers = removeOutliers, threshold = threshold, saveRaw = saveRaw, targetSEM = targetSEM, minSamples = minSamples)
+
+        if useCache:
+            self.cache.put(result = ret, **{ **cacheKey, "numsamples": self.lastNumSamples })
+
+        return ret
+
+    def _measure_at(self, axis: CameraAxes, pos: int, numsamples: int, removeOutliers: int, threshold: float, saveRaw: Optional[RawWriter] = None, targetSEM: Optional[float] = None, minSamples: int = 10):
+        """Moves the stage to that position and takes a measurement for the diameter, without using the cache.
+        See self.measure_at() for the parameters.
+        """
+        
+        t_start = self.controller.clock.now()
+        self.controller.move(pos = pos)
+        self.controller.waitClear()
+        self.lastMoveTime = self.controller.clock.now() - t_start
+
+        if self.camera.devMode:
+            self.lastNumSamples = numsamples
+            return (self.simulate_beam(pos = pos), self.simulate_beam(pos = (pos - 100))) if axis == self.camera.AXES.BOTH else self.simulate_beam(pos = pos)
+
+        if isinstance(saveRaw, RawWriter):
+            t_start = self.controller.clock.time()
+            ret, rawout = self.camera.getAxis_avg_D4Sigma(axis, numsamples = numsamples, removeOutliers = removeOutliers, threshold = threshold, returnRaw = True, targetSEM = targetSEM, minSamples = minSamples)
+            self.lastNumSamples = self.camera.lastNumSamples
             
+            # The samples of a point are not timestamped individually, t is the start of the acquisition
             position = self.controller.pulse_to_um(pps = pos) / 1000 # Convert to mm
-            if axis == self.camera.AXES.BOTH:
-                x_axis, y_axis = rawout[:,0], rawout[:,1]
-                saveRaw.write(f"# position[mm]\tx_diam[um]\ty_diam[um]\n")
-                for i in range(len(x_axis)):
-                    saveRaw.write(f"{position}\t{x_axis[i]}\t{y_axis[i]}\n")
+            rawout   = np.asarray(rawout)
+            if rawout.ndim == 2:
+                # Both axes have been acquired (e.g. the NanoScan always returns both)
+                saveRaw.writePoint(z = position, x = rawout[:,0], y = rawout[:,1], t = t_start)
+            elif axis == self.camera.AXES.X:
+                saveRaw.writePoint(z = position, x = rawout, t = t_start)
             else:
-                mapping = {
-                    self.camera.AXES.X: "x_diam[um]",
-                    self.camera.AXES.Y: "y_diam[um]"
-                }
-                saveRaw.write(f"# position[mm]\t{mapping[axis]}\n")
-                for i in range(len(rawout)):
-                    saveRaw.write(f"{position}\t{rawout[i]}\n")
+                saveRaw.writePoint(z = position, y = rawout, t = t_start)
 
             return ret
         
-        return self.camera.getAxis_avg_D4Sigma(axis, numsamples = numsamples, removeOutliers = removeOutliers, threshold = threshold)
+        ret = self.camera.getAxis_avg_D4Sigma(axis, numsamples = numsamples, removeOutliers = removeOutliers, threshold = threshold, targetSEM = targetSEM, minSamples = minSamples)
+        self.lastNumSamples = self.camera.lastNumSamples
+
+        return ret
 
     SIMULATION_PARAMS = {
         "z_R"   : 13.65909849, # mm
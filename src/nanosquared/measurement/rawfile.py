@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+
+# Made 2021, Sun Yudong
+# yudong.sun [at] mpq.mpg.de / yudong [at] outlook.de
+
+"""Provides a binary, chunked and columnar format for the raw samples of a measurement, see `RawWriter` and `RawReader`
+
+Layout of a raw file (all integers little-endian):
+    b"\\x93NSRAW" + version (2 bytes)
+    uint32 length of the header + JSON header { "columns", "dtype", "t0", "created", "metadata" }, padded to 16 bytes
+    For every point, in the order of acquisition:
+        b"PNT\\x00", int32 point_id, uint32 count, uint32 length of the attributes
+        JSON attributes of the point { "point_id", "phase", "position", ... }, padded to 4 bytes
+        count float32 of each column, column after column: t, z, x, y, point_id
+    When the file is closed:
+        JSON index { "offsets", "counts", "points" } + uint64 offset of the index + b"NSRAWIDX"
+
+`RawWriter` writes and flushes each point as soon as it has been measured, `AsyncRawWriter` does so in a background thread.
+If the acquisition is interrupted before the index is written, `RawReader` rebuilds it by hopping from chunk header to chunk header.
+
+Usage:
+    with RawWriter("file.raw", metadata = { "Wavelength": "2300 nm" }) as w:
+        w.setPhase("Caustic")
+        w.writePoint(z = 12.5, x = x_samples, y = y_samples)
+
+    with RawReader("file.raw") as r:
+        r[3]["x"]           # samples of point 3 (view on the memory-mapped file)
+        r.column("x")       # all samples
+"""
+
+import os,sys
+import json
+import queue
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, ".."))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+import numpy as np
+
+import logging
+import common.helpers as h
+from common.trace import traced
+
+MAGIC         = b"\x93NSRAW"
+VERSION       = (1, 0)
+INDEX_MAGIC   = b"NSRAWIDX"
+CHUNK_MAGIC   = b"PNT\x00"
+
+COLUMNS       = ("t", "z", "x", "y", "point_id")
+DTYPE         = np.dtype("<f4")
+
+_HEADER_LEN   = struct.Struct("<I")
+_CHUNK_HEADER = struct.Struct("<4siII")
+_TRAILER      = struct.Struct("<Q8s")
+
+def _padded(data: bytes, alignment: int, offset: int = 0) -> bytes:
+    """Pads `data` with spaces, such that `offset + len(data)` is a multiple of `alignment`"""
+    return data + b" " * (-(offset + len(data)) % alignment)
+
+class RawWriter(h.LoggerMixIn):
+    def __init__(self, file: Union[str, BinaryIO], metadata: Optional[dict] = None, t0: Optional[float] = None, name: Optional[str] = None) -> None:
+        """Writes the raw samples of a measurement point by point into a raw file, see the layout in the module docstring.
+
+        Parameters
+        ----------
+        file : Union[str, BinaryIO]
+            Path of the file, or a file opened for binary writing (e.g. from `tempfile.mkstemp`). The file is overwritten.
+        metadata : Optional[dict], optional
+            Metadata of the measurement, written to the header, by default None. Values that are not JSON serializable are written as str.
+        t0 : Optional[float], optional
+            Reference time of the column t, by default None (i.e. now, `time.time()`).
+            t is stored as float32 in seconds since t0, as float32 cannot resolve seconds since the epoch.
+        name : Optional[str], optional
+            Path of the file if `file` is a file object without one (e.g. from `os.fdopen`), by default None
+        """
+        self._f    = open(file, 'wb') if isinstance(file, str) else file
+        self.name  = file if isinstance(file, str) else (name if name is not None else getattr(self._f, "name", None))
+        self.t0    = time.time() if t0 is None else float(t0)
+        self.phase = None
+        self.fsync = False
+
+        self._nextId  = 0
+        self._offsets = []
+        self._counts  = []
+        self._points  = []
+
+        header = json.dumps({
+            "columns"  : list(COLUMNS),
+            "dtype"    : DTYPE.str,
+            "t0"       : self.t0,
+            "created"  : datetime.now().strftime('%Y-%m-%d at %H:%M:%S'),
+            "metadata" : metadata if metadata is not None else dict()
+        }, default = str).encode("utf-8")
+        header = _padded(header, 16, offset = len(MAGIC) + 2 + _HEADER_LEN.size)
+
+        self._f.write(MAGIC + bytes(VERSION) + _HEADER_LEN.pack(len(header)) + header)
+        self._pos = self._f.tell()
+        self._f.flush()
+
+    @property
+    def closed(self) -> bool:
+        return self._f.closed
+
+    def __len__(self) -> int:
+        return self._nextId
+
+    def setPhase(self, phase: Optional[str]):
+        """Sets the phase of the measurement (e.g. "Finding Center"), which is stored with every following point"""
+        self.phase = phase
+
+    def writePoint(self, z, x = None, y = None, t = None, **attrs) -> int:
+        """Appends the samples of one point (or one sweep of a fly-scan) and flushes them to the file
+
+        Parameters
+        ----------
+        z : Union[float, array_like]
+            Position in mm, either of the point or of every sample
+        x, y : Optional[array_like], optional
+            The samples of each axis in um, by default None (i.e. not measured, written as NaN)
+        t : Optional[Union[float, array_like]], optional
+            Time of the samples (`time.time()`), either of every sample or of the point, by default None (i.e. now)
+        **attrs
+            Further JSON serializable attributes of the point, e.g. `cached = True`
+
+        Returns
+        -------
+        point_id : int
+            Index of the point in the file
+        """
+        point_id = self._nextId
+        self._nextId += 1
+
+        self._writeChunks([self._pack(point_id, self.phase, z, x, y, time.time() if t is None else t, attrs)])
+        self._f.flush()
+
+        return point_id
+
+    def _pack(self, point_id: int, phase: Optional[str], z, x, y, t, attrs: dict) -> Tuple[bytes, bytes, int, dict]:
+        """Serializes one point into (chunk header with attributes, column data, count, attributes)"""
+        # A point without samples (e.g. a cached result) only has its attributes
+        sizes = [np.size(c) for c in (z, x, y, t) if c is not None and np.ndim(c) > 0]
+        n     = max(sizes) if sizes else (0 if x is None and y is None else 1)
+
+        data     = np.empty((len(COLUMNS), n), dtype = DTYPE)
+        data[0]  = np.asarray(t, dtype = np.float64) - self.t0
+        data[1]  = z
+        data[2]  = np.nan if x is None else x
+        data[3]  = np.nan if y is None else y
+        data[4]  = point_id
+
+        info = { "point_id": point_id, "phase": phase }
+        if np.ndim(z) == 0:
+            info["position"] = float(z)
+        info.update(attrs)
+
+        packed = _padded(json.dumps(info, default = str).encode("utf-8"), 4)
+        header = _CHUNK_HEADER.pack(CHUNK_MAGIC, point_id, n, len(packed))
+
+        return header + packed, data.tobytes(), n, json.loads(packed)
+
+    @traced(cat = "file")
+    def _writeChunks(self, chunks: List[Tuple[bytes, bytes, int, dict]]):
+        """Writes packed points with a single write and updates the index"""
+        for header, data, n, info in chunks:
+            self._offsets.append(self._pos + len(header))
+            self._counts.append(n)
+            self._points.append(info)
+            self._pos += len(header) + len(data)
+
+        self._f.write(b"".join(part for header, data, _, _ in chunks for part in (header, data)))
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self):
+        """Writes the index and closes the file"""
+        if self._f.closed:
+            return
+
+        index = json.dumps({ "offsets": self._offsets, "counts": self._counts, "points": self._points }).encode("utf-8")
+        self._f.write(index + _TRAILER.pack(self._pos, INDEX_MAGIC))
+        self._f.flush()
+        if self.fsync:
+            os.fsync(self._f.fileno())
+        self._f.close()
+
+        self.log(f"Raw data of {len(self)} points written to {self.name}", logging.DEBUG)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, e_type, e_val, traceback):
+        self.close()
+
+class AsyncRawWriter(RawWriter):
+    def __init__(self, file: Union[str, BinaryIO], metadata: Optional[dict] = None, t0: Optional[float] = None, name: Optional[str] = None, maxQueue: int = 256, flushInterval: float = 1.0, flushBytes: int = 1 << 20, fsync: bool = True) -> None:
+        """Like `RawWriter`, but the points are packed and written by a background thread. `writePoint()` only copies 
+        the samples into a bounded queue, such that the acquisition does not wait for the disk.
+
+        The writer thread collects the points and writes them with a single write when `flushInterval` has passed since 
+        the last write or `flushBytes` are pending, whichever comes first. `close()` writes all queued points and the index.
+
+        Parameters
+        ----------
+        file, metadata, t0, name
+            See `RawWriter`
+        maxQueue : int, optional
+            Maximum number of points in the queue, by default 256. `writePoint()` only blocks if the writer is that far behind.
+        flushInterval : float, optional
+            Maximum time in s that a point stays in memory, by default 1.0
+        flushBytes : int, optional
+            Maximum number of bytes that are kept in memory, by default 1 MiB
+        fsync : bool, optional
+            Whether to `os.fsync()` the file on `close()`, such that the data are on the disk even on a power failure, by default True
+        """
+        super().__init__(file, metadata = metadata, t0 = t0, name = name)
+
+        self.flushInterval = flushInterval
+        self.flushBytes    = flushBytes
+        self.fsync         = fsync
+
+        self._queue = queue.Queue(maxsize = maxQueue)
+        self._stop  = threading.Event()
+        self._error = None
+
+        # Statistics, see self.stats()
+        self.maxQueueDepth = 0
+        self.flushes       = 0
+        self.bytesWritten  = 0
+        self.pointsWritten = 0
+        self.lastLatency   = 0.0
+        self.maxLatency    = 0.0
+        self._sumLatency   = 0.0
+
+        self._thread = threading.Thread(target = self._run, name = f"AsyncRawWriter {self.name}", daemon = True)
+        self._thread.start()
+
+    @property
+    def queueDepth(self) -> int:
+        """Number of points waiting to be packed"""
+        return self._queue.qsize()
+
+    def _raiseError(self):
+        if self._error is not None:
+            raise self._error
+
+    def writePoint(self, z, x = None, y = None, t = None, **attrs) -> int:
+        """Queues the samples of one point for writing, see `RawWriter.writePoint()`. The samples are copied.
+
+        Raises
+        ------
+        OSError
+            If the writer thread failed to write a previous point
+        """
+        self._raiseError()
+
+        point_id = self._nextId
+        self._nextId += 1
+
+        copy = lambda c: None if c is None else np.array(c)
+        self._queue.put((time.perf_counter(), point_id, self.phase, copy(z), copy(x), copy(y), time.time() if t is None else copy(t), attrs))
+
+        self.maxQueueDepth = max(self.maxQueueDepth, self._queue.qsize())
+
+        return point_id
+
+    def _run(self):
+        pending   = []  # Packed points not written yet
+        enqueued  = []  # Time at which they were queued
+        size      = 0
+        lastFlush = time.perf_counter()
+
+        while True:
+            try:
+                item = self._queue.get(timeout = 0.1)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, threading.Event):
+                # Explicit flush requested by self.flush()
+                pending, enqueued, size = self._flushPending(pending, enqueued)
+                lastFlush = time.perf_counter()
+                item.set()
+                continue
+
+            if item is not None and self._error is None:
+                try:
+                    chunk = self._pack(*item[1:])
+                    pending.append(chunk)
+                    enqueued.append(item[0])
+                    size += len(chunk[0]) + len(chunk[1])
+                except Exception as e:
+                    self._error = e
+
+            stopping = self._stop.is_set() and self._queue.empty()
+
+            if pending and (stopping or size >= self.flushBytes or time.perf_counter() - lastFlush >= self.flushInterval):
+                pending, enqueued, size = self._flushPending(pending, enqueued)
+                lastFlush = time.perf_counter()
+
+            if stopping:
+                return
+
+    @traced(cat = "file")
+    def _flushPending(self, pending: list, enqueued: list) -> Tuple[list, list, int]:
+        if self._error is None:
+            try:
+                if pending:
+                    self._writeChunks(pending)
+                self._f.flush()
+            except OSError as e:
+                self._error = e
+                self.log(f"{self.name}: failed to write raw data: {e}", logging.ERROR)
+                return [], [], 0
+
+            now = time.perf_counter()
+            for t in enqueued:
+                self.lastLatency  = now - t
+                self.maxLatency   = max(self.maxLatency, self.lastLatency)
+                self._sumLatency += self.lastLatency
+
+            self.flushes       += 1
+            self.pointsWritten += len(pending)
+            self.bytesWritten  += sum(len(header) + len(data) for header, data, _, _ in pending)
+
+        return [], [], 0
+
+    def flush(self):
+        """Blocks until all queued points have been written to the file"""
+        if self._thread.is_alive():
+            done = threading.Event()
+            self._queue.put(done)
+            done.wait()
+
+        self._raiseError()
+
+    def close(self):
+        """Writes all queued points and the index, and closes the file. Blocks until the data are on the disk."""
+        if self._f.closed:
+            return
+
+        self._stop.set()
+        self._thread.join()
+
+        super().close()
+
+        if self._error is not None:
+            self.log(f"{self.name}: raw data incomplete, {self.pointsWritten} of {len(self)} points written: {self._error}", logging.ERROR)
+
+    def stats(self) -> dict:
+        """Returns the statistics of the writer for monitoring
+
+        Returns
+        -------
+        stats : dict
+            "queued"        : number of points waiting in the queue
+            "maxQueueDepth" : maximum number of points that were waiting
+            "points"        : number of points written
+            "bytes"         : number of bytes written
+            "flushes"       : number of writes
+            "latency"       : (last, mean, max) time in s from `writePoint()` until the point has been written
+        """
+        mean = self._sumLatency / self.pointsWritten if self.pointsWritten else 0.0
+        return {
+            "queued"        : self.queueDepth,
+            "maxQueueDepth" : self.maxQueueDepth,
+            "points"        : self.pointsWritten,
+            "bytes"         : self.bytesWritten,
+            "flushes"       : self.flushes,
+            "latency"       : (self.lastLatency, mean, self.maxLatency)
+        }
+
+    def summary(self) -> str:
+        st = self.stats()
+        return f"{st['points']} points, {st['bytes'] / 1024:.1f} KiB in {st['flushes']} writes, max queue depth {st['maxQueueDepth']}, latency mean {1e3 * st['latency'][1]:.1f} ms / max {1e3 * st['latency'][2]:.1f} ms"
+
+class RawReader(h.LoggerMixIn):
+    def __init__(self, filename: str) -> None:
+        """Reads a raw file written by `RawWriter`. The file is memory-mapped, and the samples of a point are
+        read through the index without touching the rest of the file.
+
+        Attributes
+        ----------
+        metadata : dict
+            The metadata of the measurement
+        t0 : float
+            Reference time of the column t
+        points : List[dict]
+            The attributes of each point, e.g. "phase", "position", "cached"
+        offsets, counts : np.ndarray
+            Byte offset of the data and number of samples of each point
+        complete : bool
+            Whether the file has been closed properly. If not, the index has been rebuilt from the chunks.
+
+        Parameters
+        ----------
+        filename : str
+            The raw file
+
+        Raises
+        ------
+        ValueError
+            If the file is not a raw file
+        """
+        self.filename = filename
+        self._mm      = np.memmap(filename, dtype = np.uint8, mode = 'r')
+
+        mm = self._mm
+        if bytes(mm[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{filename}: not a raw file")
+
+        self.version = tuple(mm[len(MAGIC):len(MAGIC) + 2])
+        pos          = len(MAGIC) + 2
+        (hlen,)      = _HEADER_LEN.unpack(bytes(mm[pos:pos + _HEADER_LEN.size]))
+        pos         += _HEADER_LEN.size
+        header       = json.loads(bytes(mm[pos:pos + hlen]))
+
+        self.columns  = tuple(header["columns"])
+        self.dtype    = np.dtype(header["dtype"])
+        self.t0       = header["t0"]
+        self.created  = header.get("created")
+        self.metadata = header["metadata"]
+
+        self._dataStart = pos + hlen
+
+        self.complete = self._readIndex()
+        if not self.complete:
+            self.log(f"{filename}: no index found, the acquisition was probably interrupted. Rebuilding it from {len(self.points)} points.", logging.WARN)
+
+    def _readIndex(self) -> bool:
+        mm = self._mm
+
+        if len(mm) >= self._dataStart + _TRAILER.size:
+            offset, magic = _TRAILER.unpack(bytes(mm[-_TRAILER.size:]))
+            if magic == INDEX_MAGIC:
+                index        = json.loads(bytes(mm[offset:len(mm) - _TRAILER.size]))
+                self.offsets = np.array(index["offsets"], dtype = np.int64)
+                self.counts  = np.array(index["counts"], dtype = np.int64)
+                self.points  = index["points"]
+                return True
+
+        # Rebuild the index from the chunk headers
+        offsets, counts, points = [], [], []
+        pos    = self._dataStart
+        stride = len(self.columns) * self.dtype.itemsize
+        while pos + _CHUNK_HEADER.size <= len(mm):
+            magic, point_id, count, ilen = _CHUNK_HEADER.unpack(bytes(mm[pos:pos + _CHUNK_HEADER.size]))
+            start = pos + _CHUNK_HEADER.size + ilen
+            if magic != CHUNK_MAGIC or start + count * stride > len(mm):
+                break
+
+            offsets.append(start)
+            counts.append(count)
+            points.append(json.loads(bytes(mm[pos + _CHUNK_HEADER.size:start])))
+            pos = start + count * stride
+
+        self.offsets = np.array(offsets, dtype = np.int64)
+        self.counts  = np.array(counts, dtype = np.int64)
+        self.points  = points
+
+        return False
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def point(self, i: int) -> np.ndarray:
+        """Returns the samples of point `i` as an array of shape (len(self.columns), count), which is a view on the file"""
+        n     = int(self.counts[i])
+        start = int(self.offsets[i])
+        return self._mm[start:start + len(self.columns) * n * self.dtype.itemsize].view(self.dtype).reshape(len(self.columns), n)
+
+    def __getitem__(self, i: int) -> Dict[str, np.ndarray]:
+        """Returns the columns of point `i`, as views on the file"""
+        return dict(zip(self.columns, self.point(i)))
+
+    def column(self, name: str, points: Optional[List[int]] = None) -> np.ndarray:
+        """Returns one column of several points
+
+        Parameters
+        ----------
+        name : str
+            One of self.columns
+        points : Optional[List[int]], optional
+            The points, by default None (i.e. all)
+
+        Returns
+        -------
+        column : np.ndarray
+            The concatenated samples (copy)
+        """
+        c = self.columns.index(name)
+        points = range(len(self)) if points is None else points
+
+        return np.concatenate([self.point(i)[c] for i in points]) if len(points) else np.zeros(0, dtype = self.dtype)
+
+    def times(self, i: int) -> np.ndarray:
+        """Returns the time of the samples of point `i` in seconds since the epoch (`time.time()`)"""
+        return self.t0 + self.point(i)[self.columns.index("t")].astype(np.float64)
+
+    def close(self):
+        # np.memmap has no close(), the file is unmapped when the last reference is gone
+        self._mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, e_type, e_val, traceback):
+        self.close()
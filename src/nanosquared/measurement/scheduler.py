@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+
+# Made 2021, Sun Yudong
+# yudong.sun [at] mpq.mpg.de / yudong [at] outlook.de
+
+"""Provides the order in which `Measurement.take_measurements()` visits the points of the caustic
+
+Usage:
+    scheduler = PointScheduler(approach = +1, backlash = 200)   # approach every point from below
+    schedule  = scheduler.schedule(points, start = controller.stage.position, model = controller.motion)
+    for i, (pos, via) in enumerate(schedule):
+        ...
+        schedule.record(i, seconds)
+    schedule.summary()
+"""
+
+import os,sys
+from typing import Iterator, List, Optional, Tuple
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, ".."))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+import numpy as np
+
+from stage.motion import MotionModel
+
+class Schedule():
+    def __init__(self, points: np.ndarray, via: List[Optional[int]], predicted: np.ndarray, start: int) -> None:
+        """The order of the points, with the predicted and the actual travel time to each of them
+
+        Attributes
+        ----------
+        points : np.ndarray
+            The points in pulses, in the order to be visited
+        via : List[Optional[int]]
+            For each point, the position to move to first in order to approach the point from the correct side,
+            or None
+        predicted : np.ndarray
+            Predicted travel time to each point in s, including the move to `via`
+        actual : np.ndarray
+            Measured travel time to each point in s, NaN until recorded with `self.record()`
+        start : int
+            The position of the stage before the first move in pulses
+        """
+        self.points    = np.asarray(points, dtype = np.int64)
+        self.via       = list(via)
+        self.predicted = np.asarray(predicted, dtype = np.float64)
+        self.actual    = np.full(len(self.points), np.nan)
+        self.start     = start
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def __iter__(self) -> Iterator[Tuple[int, Optional[int]]]:
+        return iter(zip(self.points.tolist(), self.via))
+
+    def record(self, i: int, seconds: float):
+        """Records the measured travel time to the i-th point"""
+        self.actual[i] = seconds
+
+    @property
+    def predictedTotal(self) -> float:
+        return float(np.sum(self.predicted))
+
+    @property
+    def actualTotal(self) -> float:
+        """Sum of the recorded travel times in s"""
+        return float(np.nansum(self.actual))
+
+    def summary(self) -> str:
+        recorded = np.isfinite(self.actual)
+        return f"{len(self)} points, predicted travel time {self.predictedTotal:.2f} s, actual {self.actualTotal:.2f} s " \
+               f"(predicted {np.sum(self.predicted[recorded]):.2f} s for the {np.count_nonzero(recorded)} points moved to)"
+
+class PointScheduler():
+    def __init__(self, approach: int = 0, backlash: int = 100) -> None:
+        """Orders the points of a scan to minimise the predicted travel time from the current position of the stage
+
+        The points are visited such that the visited points always form an interval, which is extended by either the next
+        point below or the next point above. The best such order is found by dynamic programming over the intervals.
+        This includes sweeping the points in either direction, as well as first visiting the nearer end.
+        With a unidirectional approach, the order is further improved by moving single points or short runs of points
+        to other places in the order.
+
+        Parameters
+        ----------
+        approach : int, optional
+            Direction from which every point is approached, by default 0 (any direction).
+            +1 to always arrive moving in the positive direction, -1 for the negative direction.
+            A point that would be reached in the other direction is approached via a position `backlash` pulses before it,
+            so that the backlash of the stage is always taken up in the same direction.
+        backlash : int, optional
+            Overshoot in pulses for the unidirectional approach, by default 100
+        """
+        assert approach in [-1, 0, 1], f"approach should be -1, 0 or +1, got {approach}"
+
+        self.approach = approach
+        self.backlash = abs(backlash)
+
+    def _moveCosts(self, nodes: np.ndarray, model: MotionModel, lower: Optional[int], upper: Optional[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the travel times T[a, b] from nodes[a] to nodes[b], whether the move goes via an intermediate position,
+        and the intermediate positions V[a, b]
+        """
+        delta = nodes[None, :] - nodes[:, None]
+        times = model.moveTime(delta)
+        via   = np.zeros(delta.shape, dtype = np.int64)
+        needs = np.zeros(delta.shape, dtype = bool)
+
+        if self.approach:
+            target = nodes - self.approach * self.backlash
+            if lower is not None or upper is not None:
+                target = np.clip(target, lower, upper)
+
+            # Moves in the wrong direction go past the point first
+            needs  = (np.sign(delta) == -self.approach) & (target != nodes)[None, :]
+            detour = model.moveTime(target[None, :] - nodes[:, None]) + model.moveTime(nodes - target)[None, :]
+
+            times  = np.where(needs, detour, times)
+            via    = np.where(needs, target[None, :], via)
+
+        return times, needs, via
+
+    def predict(self, points: np.ndarray, start: int, model: MotionModel, lower: Optional[int] = None, upper: Optional[int] = None) -> Schedule:
+        """Returns the schedule visiting `points` in the given order, e.g. to compare it with `self.schedule()`.
+        See `self.schedule()` for the parameters.
+        """
+        points = np.asarray(points, dtype = np.int64).flatten()
+        nodes  = np.concatenate([[start], points])
+
+        times, needs, via = self._moveCosts(nodes, model, lower, upper)
+        idx               = np.arange(len(points))
+
+        return Schedule(
+            points    = points,
+            via       = [int(v) if need else None for need, v in zip(needs[idx, idx + 1], via[idx, idx + 1])],
+            predicted = times[idx, idx + 1],
+            start     = start
+        )
+
+    def schedule(self, points: np.ndarray, start: int, model: MotionModel, lower: Optional[int] = None, upper: Optional[int] = None) -> Schedule:
+        """Orders the points to minimise the predicted travel time
+
+        Parameters
+        ----------
+        points : np.ndarray
+            The points to visit in pulses
+        start : int
+            The current position of the stage in pulses
+        model : MotionModel
+            Model of the duration of a move, e.g. `controller.motion`
+        lower, upper : Optional[int], optional
+            Limits of the stage for the positions of the unidirectional approach, by default None
+
+        Returns
+        -------
+        schedule : Schedule
+            The points in the order to visit them
+        """
+        pts = np.sort(np.asarray(points, dtype = np.int64).flatten(), kind = 'stable')
+        n   = len(pts)
+
+        if n == 0:
+            return Schedule(points = pts, via = [], predicted = np.zeros(0), start = start)
+
+        # nodes[0] is the start, nodes[k + 1] = pts[k]
+        nodes       = np.concatenate([[start], pts])
+        times, _, _ = self._moveCosts(nodes, model, lower, upper)
+        T           = times.tolist()
+
+        # cost[i][j][s]: least time to visit pts[i..j], ending at pts[i] (s = 0) or at pts[j] (s = 1)
+        # prev[i][j][s]: the side s of the interval before the last point was added
+        cost = [[[np.inf, np.inf] for _ in range(n)] for _ in range(n)]
+        prev = [[[0, 0] for _ in range(n)] for _ in range(n)]
+
+        for k in range(n):
+            cost[k][k] = [T[0][k + 1], T[0][k + 1]]
+
+        for length in range(1, n):
+            for i in range(n - length):
+                j = i + length
+
+                # Arrive at pts[i], coming from pts[i + 1] or pts[j]
+                fromLeft, fromRight = cost[i + 1][j][0] + T[i + 2][i + 1], cost[i + 1][j][1] + T[j + 1][i + 1]
+                cost[i][j][0], prev[i][j][0] = (fromLeft, 0) if fromLeft <= fromRight else (fromRight, 1)
+
+                # Arrive at pts[j], coming from pts[i] or pts[j - 1]
+                fromLeft, fromRight = cost[i][j - 1][0] + T[i + 1][j + 1], cost[i][j - 1][1] + T[j][j + 1]
+                cost[i][j][1], prev[i][j][1] = (fromLeft, 0) if fromLeft <= fromRight else (fromRight, 1)
+
+        # Walk back from the best final state
+        i, j  = 0, n - 1
+        side  = 0 if cost[0][n - 1][0] <= cost[0][n - 1][1] else 1
+        order = []
+        while True:
+            order.append(i if side == 0 else j)
+            if i == j:
+                break
+            side, i, j = (prev[i][j][0], i + 1, j) if side == 0 else (prev[i][j][1], i, j - 1)
+
+        order = order[::-1]
+
+        if self.approach:
+            # Moves against the approach direction are expensive, so that runs in the approach direction
+            # that wrap around (e.g. from the start upwards, then from the lowest point upwards) may be better
+            sweep  = list(range(n)) if self.approach > 0 else list(range(n - 1, -1, -1))
+            rolled = min((sweep[k:] + sweep[:k] for k in range(n)), key = lambda o: self._pathCost(T, o))
+            order  = self._improve(T, min(order, rolled, key = lambda o: self._pathCost(T, o)))
+
+        return self.predict(pts[order], start = start, model = model, lower = lower, upper = upper)
+
+    @staticmethod
+    def _pathCost(T: List[List[float]], order: List[int]) -> float:
+        """Travel time of visiting the points in `order`, with T the travel times between the start (0) and the points (k + 1)"""
+        nodes = [0] + [k + 1 for k in order]
+        return sum(T[a][b] for a, b in zip(nodes[:-1], nodes[1:]))
+
+    def _improve(self, T: List[List[float]], order: List[int], maxSegment: int = 3) -> List[int]:
+        """Moves segments of up to `maxSegment` consecutive points to other places in the order, as long as this
+        reduces the travel time (Or-opt)
+        """
+        best     = self._pathCost(T, order)
+        improved = True
+        while improved:
+            improved = False
+            for length in range(1, maxSegment + 1):
+                for i in range(len(order) - length + 1):
+                    segment = order[i:i + length]
+                    rest    = order[:i] + order[i + length:]
+                    for j in range(len(rest) + 1):
+                        if j == i:
+                            continue
+                        candidate = rest[:j] + segment + rest[j:]
+                        cost      = self._pathCost(T, candidate)
+                        if cost < best - 1e-9:
+                            order, best, improved = candidate, cost, True
+                            break
+                    if improved:
+                        break
+                if improved:
+                    break
+
+        return order
+
+    def __repr__(self) -> str:
+        return f"PointScheduler(approach = {self.approach}, backlash = {self.backlash})"
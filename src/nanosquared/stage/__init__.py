@@ -1,3 +1,5 @@
 from . import controller
 from . import errors
-from . import _stage
\ No newline at end of file
+from . import _stage
+from . import motion
+from . import emulator
\ No newline at end of file
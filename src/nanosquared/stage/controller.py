@@ -32,15 +32,18 @@ import abc
 
 import stage.errors
 import stage._stage as Stg
+from stage.motion import MotionModel, ProfileOptimizer
 
 import common.helpers as h
+from common.clock import Clock, RealClock
+from common.trace import traced
 
 import logging
 
 class Controller(abc.ABC, h.LoggerMixIn):
     """Abstract Base Class for a controller"""
 
-    def __init__(self, devMode: bool = True, implementation: bool = False):
+    def __init__(self, devMode: bool = True, implementation: bool = False, clock: Optional[Clock] = None):
         """
 
         Parameters
@@ -50,8 +53,12 @@ class Controller(abc.ABC, h.LoggerMixIn):
             When development mode is turned on, no device communication will be started 
         subclass : bool, optional
             To indicate if calling from subclass
+        clock : Optional[common.clock.Clock], optional
+            Clock to wait with, by default None (`common.clock.RealClock()`).
+            Use a `common.clock.VirtualClock` to run simulations faster than real time.
         """
         self.devMode = devMode
+        self.clock   = clock if clock is not None else RealClock()
 
         if not implementation:
             self.stage = Stg.Stage() # which should throw an error
@@ -219,7 +226,7 @@ class SerialController(Controller, abc.ABC):
                     self.dev.close()
                     self.dev.open()
 
-                time.sleep(2)
+                self.clock.sleep(2)
                 print("Initalised serial communication")
                 # END SERIAL SETUP
 
@@ -277,6 +284,30 @@ class GSC01(SerialController):
         super().__init__(implementation = True, *args, **kwargs)
 
         self.ENTER = b'\x0D\x0A' # CRLF
+
+        # Received bytes not yet returned by self.readLine()
+        self._rxbuf = bytearray()
+
+        # Prediction of the duration of moves, updated by self.setSpeed(). See self.predictMove()
+        self.motion       = None
+        self.lastDuration = None  # Predicted duration of the last move in s, None if unknown
+        self._moveEnd     = None  # self.clock.now() at which the running move is predicted to end
+        self._jog         = None  # (started, position, direction) of the running jog, see self.jogPosition()
+
+        # self.waitClear() sleeps until `waitMargin` s before the predicted end of a move, and then polls the controller
+        # every `pollInterval` s until `waitSlack` s after the predicted end, and every 100 ms after that
+        self.waitMargin   = 0.01
+        self.pollInterval = 0.01
+        self.waitSlack    = 0.5
+
+        # Speed profile for self.move() and self.rmove(), see self.optimizeSpeed(). None keeps the set speeds.
+        # Opt-in, e.g. `controller.optimizer = ProfileOptimizer()`, once the stage is known to hold the speeds of the optimizer 
+        # without losing steps: by default, it moves at up to twice the maximum speed of `self.initSpeed`.
+        self.optimizer = None
+
+        # Last speeds sent to the controller, see self.setSpeed()
+        self._sentProfile = None  # (minSpeed, maxSpeed, acdcTime)
+        self._sentJog     = None
         
         self.waitClear() # To make sure controller is on
 
@@ -349,7 +380,8 @@ class GSC01(SerialController):
                        minSpeed: Optional[int] = None, \
                        maxSpeed: Optional[int] = None, \
                        acdcTime: Optional[int] = None,
-                       init    : Optional[bool]= False):
+                       init    : Optional[bool]= False,
+                       force   : Optional[bool]= False):
         """Sets the driving speed of the stage.
 
         Set speed in units of 100 PPS. Values less than 100 PPS are rounded down.
@@ -383,11 +415,14 @@ class GSC01(SerialController):
         init     : Optional[bool], optional
             Resets the speeds to the initial values. If set to True, other parameters are ignored.
             By default False.
+        force    : Optional[bool], optional
+            Sends the speeds even if they are the same as the last speeds sent, by default False.
+            Otherwise, the `D:` (min/max/acdc) and `S:` (jog) commands are only sent if their values have changed.
 
         Returns
         -------
         (retSpeed, retJog) : Statuses
-            See GSC01.safesend()
+            See GSC01.safesend(), True for a command that has not been sent as the value is unchanged
 
         Raises
         ------
@@ -432,12 +467,45 @@ class GSC01(SerialController):
         self.stage.speed = namedtuple("StageSpeed", keys)(*combine[:3])
         self.stage.acdcTime  = combine[3]
 
+        self.motion = MotionModel.fromStage(self.stage)
+
         self.log("Setting speed: Jog = {}, min = {}, max = {}, acdctime = {}".format(*combine), loglevel = logging.INFO)
 
-        a = self.safesend(f"D:{self.axis}S{self.stage.speed.min}F{self.stage.speed.max}R{self.stage.acdcTime}")
-        b = self.safesend(f"S:J{self.stage.speed.jog}")
+        a, b    = True, True
+        profile = self.motion.profile
+
+        if force or profile != self._sentProfile:
+            a = self.safesend(f"D:{self.axis}S{self.stage.speed.min}F{self.stage.speed.max}R{self.stage.acdcTime}")
+            self._sentProfile = profile
+
+        if force or self.stage.speed.jog != self._sentJog:
+            b = self.safesend(f"S:J{self.stage.speed.jog}")
+            self._sentJog = self.stage.speed.jog
 
         return a, b
+
+    def optimizeSpeed(self, distance: int):
+        """Sets the speed profile chosen by `self.optimizer` for a move over `distance` pulses, see `ProfileOptimizer.choose()`.
+        Nothing is sent to the controller if the profile stays the same.
+
+        Parameters
+        ----------
+        distance : int
+            Distance of the next move in pulses
+        """
+        if self.optimizer is None or self.motion is None:
+            return
+
+        best = self.optimizer.choose(distance, current = self.motion)
+        if best.profile != self.motion.profile:
+            self.setSpeed(minSpeed = best.minSpeed, maxSpeed = best.maxSpeed, acdcTime = best.acdcTime)
+
+    @property
+    def scanMotion(self) -> MotionModel:
+        """Model of the moves of a scan with many moves, e.g. to schedule the points of a measurement.
+        This is the profile of `self.optimizer` if set, which is used after the first long move, else `self.motion`.
+        """
+        return self.optimizer.fastest if self.optimizer is not None else self.motion
             
     @stage.errors.FailSilently # To be deleted with GUI
     def homeStage(self):
@@ -453,6 +521,7 @@ class GSC01(SerialController):
         self.log("Homing stage...", end="\r", loglevel = logging.INFO)
 
         ret = self.safesend(f"H:{self.axis}")
+        self._expectMove(None)
         self.waitClear()
 
         # We reset dirtiness
@@ -549,17 +618,24 @@ class GSC01(SerialController):
 
         self.safesend(f"J:{self.axis}{direction}")
 
+        # A jog may start while another one is still running, e.g. in self.findRange()
+        origin = self.jogPosition()
+        origin = origin if origin is not None else self.stage._position
+
         ret = self.safesend("G:")
+        self._expectMove(None)
+        self._jog = (self.clock.now(), origin, 1 if positive else -1)
         self.stage.dirty = True
 
         if secs is not None and secs >= 0:
-            time.sleep(secs)
+            self.clock.sleep(secs)
             return self.stop()
         elif secs is not None and secs < 0:
             raise ValueError(f"Jog Time cannot be negative, got {secs}.")
         
         return ret
     
+    @traced(cat = "stage")
     @stage.errors.FailWithWarning
     def move(self, pos: int):
         """Absolution move to coordinate `pos`
@@ -581,13 +657,24 @@ class GSC01(SerialController):
 
         """
         direction = "+" if pos >= 0 else "-"
+        start     = None if self.stage.dirty else self.stage.position
         
         # Sanity Check, may raise error
         self.stage.position = pos
 
+        if start is not None:
+            self.optimizeSpeed(distance = pos - start)
+
+        duration  = self.predictRmove(pos - start) if start is not None else None
+
         self.safesend(f"A:{self.axis}{direction}P{abs(pos)}")
-        return self.safesend("G:")
+        started = self.clock.now()
+        ret     = self.safesend("G:")
+        self._expectMove(duration, started)
+
+        return ret
 
+    @traced(cat = "stage")
     @stage.errors.FailWithWarning
     def rmove(self, delta: int):
         """Relative move by `delta` pulses
@@ -613,8 +700,68 @@ class GSC01(SerialController):
         # Sanity Check, may raise error
         self.stage.position += delta
 
+        self.optimizeSpeed(distance = delta)
+
+        duration  = self.predictRmove(delta)
+
         self.safesend(f"M:{self.axis}{direction}P{abs(delta)}")
-        return self.safesend("G:")
+        started = self.clock.now()
+        ret     = self.safesend("G:")
+        self._expectMove(duration, started)
+
+        return ret
+
+    def predictMove(self, pos: int) -> Optional[float]:
+        """Predicts the duration of `self.move(pos)` from the current position, see `stage.motion.MotionModel`
+
+        Parameters
+        ----------
+        pos : int
+            Absolute coordinate to move to (in units of pulses)
+
+        Returns
+        -------
+        duration : Optional[float]
+            Predicted duration in s, None if the position of the stage is dirty
+        """
+        if self.motion is None or self.stage.dirty:
+            return None
+
+        return self.motion.moveTime(pos - self.stage.position)
+
+    def predictRmove(self, delta: int) -> Optional[float]:
+        """Predicts the duration of `self.rmove(delta)`, see `self.predictMove()`"""
+        if self.motion is None:
+            return None
+
+        return self.motion.moveTime(delta)
+
+    def _expectMove(self, duration: Optional[float], started: Optional[float] = None):
+        """Records the predicted duration of a move started at self.clock.now() = `started`, None if unknown.
+        Every command that moves or stops the stage ends a running jog.
+        """
+        self.lastDuration = duration
+        self._moveEnd     = (started + duration) if duration is not None else None
+        self._jog         = None
+
+    def jogPosition(self) -> Optional[int]:
+        """Estimates the position of the running jog from where it started and `self.stage.speed.jog`, without asking
+        the controller. The jog stops at the limits of the stage, like at the limit switches.
+
+        In devMode, this is the position of the simulated jog, see `self.getStatus1()`.
+
+        Returns
+        -------
+        pos : Optional[int]
+            Position in pulses, None if the stage is not jogging
+        """
+        if self._jog is None:
+            return None
+
+        started, origin, direction = self._jog
+        pos = origin + direction * self.stage.speed.jog * (self.clock.now() - started)
+
+        return int(np.clip(np.around(pos), self.stage.LIMIT_LOWER, self.stage.LIMIT_UPPER))
     
     @stage.errors.FailWithWarning
     def releaseMotor(self):
@@ -684,7 +831,8 @@ class GSC01(SerialController):
             - ACK3: B = Busy Status, R = Ready Status
         """
         if self.devMode:
-            return "0,K,K,R"
+            pos = self.jogPosition()
+            return [str(pos if pos is not None else self.stage._position), "K", "K", "R"]
 
         return self.safesend("Q:", *args, **kwargs).split(b",")
 
@@ -726,6 +874,13 @@ class GSC01(SerialController):
             Set to True to use immediate stop instead of decelerate and stop, by default False
 
         """
+        jogged = self.jogPosition()
+        self._expectMove(None)
+
+        if self.devMode and jogged is not None:
+            # The simulated jog stops where it has got to
+            self.stage.position = jogged
+
         if emergency:
             return self.safesend("L:E")
 
@@ -748,6 +903,7 @@ class GSC01(SerialController):
 
         return ret
     
+    @traced(cat = "stage")
     def send(self, cmd: Union[bytearray, str], waitClear: bool = False, raw: bool = False, waitTime: float = 0):
         """Sends a command to the GSC-01 Controller
 
@@ -776,31 +932,94 @@ class GSC01(SerialController):
         # Writes cmd to the serial channel, returns the data as a list
         cmd = cmd.encode("ascii") + self.ENTER if not raw else cmd
 
-        time.sleep(waitTime)
+        self.clock.sleep(waitTime)
 
         if waitClear:
             self.waitClear()
 
+        # Discard anything left over from earlier commands, e.g. a late answer after a timeout
+        self._rxbuf.clear()
+        waiting = self.dev.inWaiting()
+        if waiting:
+            self.dev.read(waiting)
+
         self.dev.write(cmd)
 
         return self.read()
 
     def read(self):
-        time.sleep(0.05)
+        """Reads one answer of the controller
+
+        Returns
+        -------
+        out : Optional[bytes]
+            The answer with all whitespace removed, e.g. b'OK' or b'-1000,K,K,R', None if there is no answer
+            within the timeout of the serial port (`self.cfg["timeout"]`)
+        """
+        line = self.readLine()
+
+        return self.parseResponse(line) if line is not None else None
+
+    def readLine(self) -> Optional[bytes]:
+        """Reads up to the CRLF terminator. Blocks until the terminator arrives or the timeout of the serial port has passed.
 
-        out = b''
-        while self.dev.inWaiting() > 0:
-            out += self.dev.read(1)
+        Bytes after the terminator are kept in `self._rxbuf` for the next call.
 
-        out = out.strip().split() if len(out) else ''
+        Returns
+        -------
+        line : Optional[bytes]
+            The line without the terminator. None if nothing was received, the incomplete line if the terminator is missing.
+        """
+        # The timeout of the serial port is in real time, whatever self.clock
+        buf      = self._rxbuf
+        deadline = time.monotonic() + self.cfg["timeout"]
+
+        while True:
+            end = buf.find(self.ENTER)
+            if end >= 0:
+                line = bytes(buf[:end])
+                del buf[:end + len(self.ENTER)]
+                return line
 
-        out = out[0] if len(out) == 1 else b''.join([x.strip() for x in out])
+            if time.monotonic() > deadline:
+                break
+
+            # Take everything that has arrived, or block for the next byte
+            waiting = self.dev.inWaiting()
+            chunk   = self.dev.read(waiting if waiting > 0 else 1)
+            if not chunk:
+                break
+
+            buf += chunk
+
+        if not len(buf):
+            return None
+
+        line = bytes(buf)
+        buf.clear()
+        self.log(f"Incomplete answer from the controller: {line}", loglevel = logging.WARN)
+
+        return line
+
+    @staticmethod
+    def parseResponse(line: bytes) -> Optional[bytes]:
+        """Removes all whitespace of an answer, e.g. the padding of the coordinate in b'-      1000,K,K,R'.
+        Returns None for an empty answer.
+        """
+        out = b''.join(line.split())
 
         return out if len(out) else None
 
+    @traced(cat = "stage")
     def waitClear(self):
         """Waits for the device to be ready.
 
+        If the duration of the running move has been predicted (see `self.predictMove()`), sleeps until shortly before
+        its predicted end, and then polls the controller every `self.pollInterval` s.
+
+        In devMode, moves take no time, except on a simulated clock (`self.clock.simulated`), which is advanced to the
+        predicted end of the move.
+
         Returns
         -------
         True
@@ -813,8 +1032,14 @@ class GSC01(SerialController):
         """
         # we wait until all commands are done running and the controller is ready
         if self.devMode:
+            if self.clock.simulated and self._moveEnd is not None:
+                self.clock.sleep(self._moveEnd - self.clock.now())
+            self._moveEnd = None
             return True
 
+        if self._moveEnd is not None:
+            self.clock.sleep(self._moveEnd - self.clock.now() - self.waitMargin)
+
         timeoutCount = 0
         timeoutLimit = 5
         waitTime = 0
@@ -836,9 +1061,12 @@ class GSC01(SerialController):
                 # We try again but quit if 2nd time still none
 
             # print("Waiting for stack to clear...", end="\r")
-            time.sleep(0.1)
+            nearEnd = self._moveEnd is not None and self.clock.now() < self._moveEnd + self.waitSlack
+            self.clock.sleep(self.pollInterval if nearEnd else 0.1)
         # print("Waiting for stack to clear...cleared")
 
+        self._moveEnd = None
+
         return True
         
 
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+
+# Made 2021, Sun Yudong
+# yudong.sun [at] mpq.mpg.de / yudong [at] outlook.de
+
+"""Provides an emulator of the GSC-01 controller on a pseudo-terminal, for testing and benchmarking `GSC01` without hardware.
+
+Usage:
+    with GSC01Emulator(latency = 0.002) as emu:
+        with GSC01(devMode = False, devConfig = emu.devConfig) as c:   # or { "port": emu.port }
+            c.move(1000)
+            c.waitClear()
+
+    emu.failNext(command = "G:")    # the next move fails
+
+Only available on POSIX systems.
+"""
+
+import os,sys
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, ".."))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+import random
+import select
+import threading
+import time
+
+from typing import Optional
+
+import logging
+import common.helpers as h
+from common.clock import Clock, RealClock
+
+from stage.motion import MotionModel
+
+class GSC01Emulator(h.LoggerMixIn):
+    ENTER = b'\x0D\x0A' # CRLF
+
+    DRIVE    = ["A:", "M:", "G:", "H:", "J:", "R:", "D:", "S:", "C:"]  # commands refused while the stage moves
+    SPEED_RANGE = (1, 20000)    # PPS
+    ACDC_RANGE  = (0, 1000)     # ms
+
+    def __init__(self, latency: float = 0, lower: int = -50278, upper: int = 50278, errorRate: float = 0, seed: Optional[int] = None, clock: Optional[Clock] = None) -> None:
+        """Answers the commands of the GSC-01 on a pseudo-terminal, whose device is `self.port` once started.
+
+        Moves take as long as they would on the stage with the speeds set with D: and S:J (see `stage.motion.MotionModel`).
+        The stage is busy until the move has ended, and reports its position along the way. Jogging runs until L: or until
+        a limit sensor is reached. Stopping with L: is immediate. Homing with H: moves to the mechanical origin at the fixed
+        homing speeds, which is the centre of the stage, and R: makes the current position the origin of the coordinates.
+        Drive commands sent while the stage is busy or invalid commands are answered with NG.
+
+        Parameters
+        ----------
+        latency : float, optional
+            Time in s the controller takes to answer a command, by default 0
+        lower, upper : int, optional
+            Positions of the limit sensors in pulses from the mechanical origin, by default -50278 and 50278 (SGSP26-200)
+        errorRate : float, optional
+            Probability that a command is answered with NG without being executed, by default 0. See also `self.failNext()`
+        seed : Optional[int], optional
+            Seed for the injected errors, by default None
+        clock : Optional[common.clock.Clock], optional
+            Clock of the motion, by default None (`common.clock.RealClock()`). Share a `common.clock.VirtualClock` with `GSC01`
+            to run moves faster than real time. The answer latency is always in real time.
+        """
+        self.latency   = latency
+        self.lower     = lower
+        self.upper     = upper
+        self.errorRate = errorRate
+        self.clock     = clock if clock is not None else RealClock()
+        self.port      = None
+
+        self.target   = 0       # in the coordinates of the controller
+        self.commands = 0       # number of commands received
+        self.errors   = 0       # number of NG answers
+
+        # Speeds, as set by the GSC-01 configuration app for the stage
+        self.minSpeed = 500
+        self.maxSpeed = 5000
+        self.acdcTime = 200
+        self.jogSpeed = 500
+        self.powered  = True
+
+        self._mech      = 0     # position from the mechanical origin when the last motion ended or started
+        self._origin    = 0     # mechanical position of the origin of the coordinates
+        self._motion    = None  # (started, start, end, duration, limit, model) of the running motion, see self._startMotion()
+        self._jog       = None  # direction of J:, None if G: starts the move set by A: or M:
+        self._limitStop = False
+        self._lastError = False
+        self._failures  = []    # command prefixes (or None for any command) of the errors to inject next
+
+        self._random = random.Random(seed)
+        self._lock   = threading.RLock()
+
+        self._master = None
+        self._slave  = None
+        self._thread = None
+        self._stop   = threading.Event()
+
+    def start(self) -> str:
+        """Opens the pseudo-terminal and starts answering in a background thread
+
+        Returns
+        -------
+        port : str
+            The device of the pseudo-terminal, e.g. /dev/pts/3, to be used as the `port` of `GSC01`
+        """
+        import tty # POSIX only
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target = self._run, name = "GSC01Emulator", daemon = True)
+        self._thread.start()
+
+        self.log(f"GSC-01 emulator on {self.port}", loglevel = logging.DEBUG)
+
+        return self.port
+
+    def stop(self):
+        """Stops answering and closes the pseudo-terminal"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+        for fd in [self._master, self._slave]:
+            if fd is not None:
+                os.close(fd)
+
+        self._master, self._slave = None, None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, e_type, e_val, traceback):
+        self.stop()
+
+    @property
+    def devConfig(self) -> dict:
+        """Configuration for `SerialController.loadConfig()` to connect to the emulator, e.g. `GSC01(devMode = False, devConfig = emu.devConfig)`.
+        It can also be saved as a config file, such as config.local.json.
+        """
+        return { "port": self.port }
+
+    @property
+    def position(self) -> int:
+        """Current position in the coordinates of the controller"""
+        with self._lock:
+            return self._mechAt(self.clock.now()) - self._origin
+
+    @property
+    def busy(self) -> bool:
+        with self._lock:
+            self._settle(self.clock.now())
+            return self._motion is not None
+
+    def failNext(self, count: int = 1, command: Optional[str] = None):
+        """Answers the next `count` commands starting with `command` (e.g. "G:"), or any next `count` commands if None, with NG"""
+        with self._lock:
+            self._failures += [command] * count
+
+    @property
+    def model(self) -> MotionModel:
+        """The speed profile of moves"""
+        return MotionModel(minSpeed = self.minSpeed, maxSpeed = self.maxSpeed, acdcTime = self.acdcTime, jogSpeed = self.jogSpeed)
+
+    def _mechAt(self, now: float) -> int:
+        """Mechanical position at self.clock.now() = `now`"""
+        self._settle(now)
+        if self._motion is None:
+            return self._mech
+
+        started, start, end, duration, limit, model = self._motion
+        if model is None:
+            covered = self.jogSpeed * (now - started)
+        else:
+            covered = model.travelled(end - start, now - started)
+
+        return start + int(round(covered)) * (1 if end >= start else -1)
+
+    def _settle(self, now: float):
+        """Ends the running motion if it is over"""
+        if self._motion is not None:
+            started, start, end, duration, limit, model = self._motion
+            if now >= started + duration:
+                self._mech      = end
+                self._motion    = None
+                self._limitStop = limit
+
+    def _startMotion(self, end: int, model: Optional[MotionModel] = None):
+        """Starts moving from the current position to the mechanical position `end`, with the speed profile `model`, or jogging if None.
+        Moves beyond the limit sensors stop at the sensor, and jogging always does.
+        """
+        now     = self.clock.now()
+        start   = self._mech
+        clipped = min(max(end, self.lower), self.upper)
+
+        duration = model.moveTime(clipped - start) if model is not None else abs(clipped - start) / self.jogSpeed
+
+        self._limitStop = False
+        self._motion    = (now, start, clipped, duration, clipped != end or model is None, model)
+        self._settle(now)
+
+    def _stopMotion(self):
+        now             = self.clock.now()
+        self._mech      = self._mechAt(now)
+        self._motion    = None
+
+    def _injectError(self, cmd: str) -> bool:
+        for i, prefix in enumerate(self._failures):
+            if prefix is None or cmd.startswith(prefix):
+                del self._failures[i]
+                return True
+
+        return self.errorRate > 0 and self._random.random() < self.errorRate
+
+    @staticmethod
+    def _parseSpeed(value: str, lo: int, hi: int) -> int:
+        speed = int(value)
+        if not lo <= speed <= hi:
+            raise ValueError(f"{speed} not within {lo} and {hi}")
+        return speed
+
+    def respond(self, cmd: str) -> Optional[str]:
+        """Returns the answer of the controller to `cmd` (without the terminator)"""
+        with self._lock:
+            self.commands += 1
+
+            try:
+                reply = "NG" if self._injectError(cmd) else self._execute(cmd)
+            except (ValueError, IndexError):
+                reply = "NG"
+
+            if reply == "NG":
+                self.errors += 1
+                self._lastError = True
+            elif cmd not in ["Q:", "!:"]:
+                self._lastError = False
+
+            return reply
+
+    def _execute(self, cmd: str) -> str:
+        now  = self.clock.now()
+        mech = self._mechAt(now)
+        busy = self._motion is not None
+
+        if cmd == "Q:":
+            pos  = mech - self._origin
+            sign = "-" if pos < 0 else " "
+            return f"{sign}{abs(pos):>9},{'X' if self._lastError else 'K'},{'L' if self._limitStop else 'K'},{'B' if busy else 'R'}"
+
+        if cmd == "!:":
+            return "B" if busy else "R"
+
+        if cmd[:2] == "L:":
+            if cmd[2:] not in ["1", "W", "E"]:
+                return "NG"
+            self._stopMotion()
+            return "OK"
+
+        if cmd[:2] in self.DRIVE and busy:
+            return "NG"
+
+        if cmd[:2] in ["A:", "M:"]:
+            if cmd[2] not in "1W" or cmd[3] not in "+-" or cmd[4] != "P":
+                return "NG"
+            delta = (-1 if cmd[3] == "-" else 1) * int(cmd[5:])
+            self.target = delta if cmd[0] == "A" else mech - self._origin + delta
+            self._jog   = None
+            return "OK"
+
+        if cmd == "G:":
+            if not self.powered:
+                return "NG"
+            if self._jog is not None:
+                self._startMotion(self.upper if self._jog > 0 else self.lower)
+            else:
+                self._startMotion(self.target + self._origin, model = self.model)
+            return "OK"
+
+        if cmd[:2] == "J:":
+            if cmd[2:] not in ["1+", "1-", "W+", "W-"]:
+                return "NG"
+            self._jog = 1 if cmd[3] == "+" else -1
+            return "OK"
+
+        if cmd[:2] == "H:":
+            if not self.powered:
+                return "NG"
+            # Homing always uses the default speeds, see GSC01.homeStage()
+            self._origin = 0
+            self.target  = 0
+            self._startMotion(0, model = MotionModel(minSpeed = 500, maxSpeed = 5000, acdcTime = 200))
+            return "OK"
+
+        if cmd[:2] == "R:":
+            self._origin = mech
+            self.target  = 0
+            return "OK"
+
+        if cmd[:2] == "D:":
+            # D:1S500F5000R200
+            s, rest = cmd[4:].split("F")
+            f, r    = rest.split("R")
+            S, F    = self._parseSpeed(s, *self.SPEED_RANGE), self._parseSpeed(f, *self.SPEED_RANGE)
+            R       = self._parseSpeed(r, *self.ACDC_RANGE)
+            if cmd[2] not in "1W" or cmd[3] != "S" or S > F:
+                return "NG"
+            self.minSpeed, self.maxSpeed, self.acdcTime = S, F, R
+            return "OK"
+
+        if cmd[:3] == "S:J":
+            self.jogSpeed = self._parseSpeed(cmd[3:], *self.SPEED_RANGE)
+            return "OK"
+
+        if cmd in ["C:11", "C:W1", "C:10", "C:W0"]:
+            self.powered = cmd[3] == "1"
+            return "OK"
+
+        return "NG"
+
+    def _run(self):
+        buf = bytearray()
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self._master], [], [], 0.05)
+            if not ready:
+                continue
+
+            try:
+                buf += os.read(self._master, 1024)
+            except OSError:
+                break
+
+            while True:
+                end = buf.find(self.ENTER)
+                if end < 0:
+                    break
+
+                cmd = bytes(buf[:end]).decode("ascii", errors = "replace").strip()
+                del buf[:end + len(self.ENTER)]
+
+                reply = self.respond(cmd)
+                if self.latency:
+                    time.sleep(self.latency)
+                if reply is not None:
+                    os.write(self._master, reply.encode("ascii") + self.ENTER)
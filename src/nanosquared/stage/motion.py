@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+
+# Made 2021, Sun Yudong
+# yudong.sun [at] mpq.mpg.de / yudong [at] outlook.de
+
+"""Provides a model of the time the stage needs for a move
+
+The GSC-01 starts every move at the minimum speed S, accelerates linearly to the maximum speed F within the
+acceleration time R, and decelerates in the same way before the target (see `GSC01.setSpeed()`). A move is therefore
+a trapezoid in the speed, or a triangle if the distance is too short to reach F.
+Jogging runs at the jog speed without acceleration.
+
+Usage:
+    model = MotionModel.fromStage(controller.stage)   # or controller.motion
+    model.moveTime(10000)                             # s
+    model.pathTime([-5000, 0, 5000], start = 20000)   # s
+
+    optimizer = ProfileOptimizer(maxSpeed = 10000)      # or controller.optimizer
+    optimizer.choose(40000, current = model)            # the profile to use for a move of 40000 pulses
+"""
+
+import os,sys
+import math
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, ".."))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+import stage._stage as Stg
+
+class MotionModel():
+    def __init__(self, minSpeed: int, maxSpeed: int, acdcTime: int, jogSpeed: Optional[int] = None, overhead: float = 0):
+        """Trapezoidal speed profile of a move
+
+        Parameters
+        ----------
+        minSpeed : int
+            Speed at the start and at the end of a move in PPS
+        maxSpeed : int
+            Maximum speed in PPS
+        acdcTime : int
+            Time to accelerate from `minSpeed` to `maxSpeed` (and to decelerate) in ms
+        jogSpeed : Optional[int], optional
+            Jog speed in PPS, by default None (`minSpeed`)
+        overhead : float, optional
+            Constant time added to every move in s, e.g. for the communication with the controller, by default 0
+
+        Raises
+        ------
+        ValueError
+            If `maxSpeed` is not positive or less than `minSpeed`
+        """
+        if maxSpeed <= 0 or minSpeed > maxSpeed:
+            raise ValueError(f"Invalid speeds: min = {minSpeed}, max = {maxSpeed}")
+
+        self.minSpeed = minSpeed
+        self.maxSpeed = maxSpeed
+        self.acdcTime = acdcTime
+        self.jogSpeed = jogSpeed if jogSpeed else minSpeed
+        self.overhead = overhead
+
+    @classmethod
+    def fromStage(cls, stage: Stg.GSC01_Stage, overhead: float = 0) -> "MotionModel":
+        """Returns the model for the current speed settings of `stage`, see `GSC01.setSpeed()`"""
+        return cls(minSpeed = stage.speed.min, maxSpeed = stage.speed.max, acdcTime = stage.acdcTime, jogSpeed = stage.speed.jog, overhead = overhead)
+
+    @property
+    def profile(self) -> Tuple[int, int, int]:
+        """(minSpeed, maxSpeed, acdcTime) as sent to the controller with `GSC01.setSpeed()`"""
+        return (self.minSpeed, self.maxSpeed, self.acdcTime)
+
+    @property
+    def rampDistance(self) -> float:
+        """Distance in pulses of the acceleration and the deceleration together. Shorter moves do not reach `maxSpeed`."""
+        return (self.minSpeed + self.maxSpeed) * self.acdcTime / 1000
+
+    def moveTime(self, distance: Union[int, np.ndarray]) -> Union[float, np.ndarray]:
+        """Returns the duration of a move
+
+        Parameters
+        ----------
+        distance : Union[int, np.ndarray]
+            Distance of the move in pulses, the sign is ignored
+
+        Returns
+        -------
+        time : Union[float, np.ndarray]
+            Duration in s, 0 for a distance of 0
+        """
+        d = np.abs(np.asarray(distance, dtype = np.float64))
+
+        S, F, R = self.minSpeed, self.maxSpeed, self.acdcTime / 1000
+
+        if R <= 0 or F == S:
+            t = d / F
+        else:
+            a    = (F - S) / R
+            peak = np.sqrt(S**2 + a * d)     # peak speed of a triangular profile
+
+            t = np.where(d >= self.rampDistance, 2 * R + (d - self.rampDistance) / F, 2 * (peak - S) / a)
+
+        t = np.where(d > 0, t + self.overhead, 0)
+
+        return float(t) if t.ndim == 0 else t
+
+    def travelled(self, distance: int, elapsed: float) -> float:
+        """Returns the distance covered `elapsed` s after the start of a move over `distance` pulses, the inverse of
+        `self.moveTime()` (without the overhead)
+        """
+        d = abs(distance)
+        if d == 0 or elapsed <= 0:
+            return 0.0
+
+        S, F, R = self.minSpeed, self.maxSpeed, self.acdcTime / 1000
+
+        if R <= 0 or F == S:
+            return float(min(F * elapsed, d))
+
+        a    = (F - S) / R
+        peak = min(F, np.sqrt(S**2 + a * d))   # speed at the end of the acceleration
+        tAc  = (peak - S) / a
+        dAc  = (S + peak) / 2 * tAc
+        tEnd = 2 * tAc + (d - 2 * dAc) / peak
+
+        if elapsed >= tEnd:
+            return float(d)
+        if elapsed < tAc:
+            return float(S * elapsed + a * elapsed**2 / 2)
+        if elapsed < tEnd - tAc:
+            return float(dAc + peak * (elapsed - tAc))
+
+        left = tEnd - elapsed
+        return float(d - (S * left + a * left**2 / 2))
+
+    def pathTime(self, points: Sequence[int], start: int) -> float:
+        """Returns the duration of the moves from `start` to each of `points` in turn in s"""
+        nodes = np.concatenate([[start], np.asarray(points).flatten()])
+        return float(np.sum(self.moveTime(np.diff(nodes))))
+
+    def jogTime(self, distance: Union[int, np.ndarray]) -> Union[float, np.ndarray]:
+        """Returns the time to jog over `distance` pulses in s"""
+        return np.abs(distance) / self.jogSpeed
+
+    def __repr__(self) -> str:
+        return f"MotionModel(minSpeed = {self.minSpeed}, maxSpeed = {self.maxSpeed}, acdcTime = {self.acdcTime}, jogSpeed = {self.jogSpeed}, overhead = {self.overhead})"
+
+class ProfileOptimizer():
+    SPEED_RANGE = (100, 20000)  # PPS, in steps of 100
+    ACDC_RANGE  = (0, 1000)     # ms
+
+    def __init__(self, maxSpeed: int = 10000, maxStartSpeed: int = 500, maxAcceleration: Optional[float] = 22500, switchTime: float = 0.06):
+        """Chooses the speed profile (minSpeed, maxSpeed, acdcTime) of a move, see `GSC01.setSpeed()`.
+
+        Within the limits of the motor, the fastest profile starts at `maxStartSpeed` and accelerates at `maxAcceleration`
+        up to `maxSpeed`, whatever the distance. Since sending a new profile to the controller takes time, a move keeps
+        the current profile unless the fastest profile saves more than `switchTime`. Short moves, which do not reach the
+        maximum speed of either profile, therefore do not change the profile.
+
+        The default limits keep the start speed and the acceleration of the default profile of `GSC01` (500 PPS, 500 to 5000 PPS
+        in 200 ms), and allow twice its maximum speed. Check that the stage holds `maxSpeed` without losing steps before
+        setting `GSC01.optimizer`, which is None by default.
+
+        Parameters
+        ----------
+        maxSpeed : int, optional
+            Highest maximum speed in PPS, by default 10000
+        maxStartSpeed : int, optional
+            Highest speed at which the motor starts without losing steps in PPS, by default 500
+        maxAcceleration : Optional[float], optional
+            Highest acceleration in PPS/s, by default 22500. None for no limit.
+        switchTime : float, optional
+            Time in s to send a new profile to the controller, by default 0.06
+        """
+        self.maxSpeed        = maxSpeed
+        self.maxStartSpeed   = maxStartSpeed
+        self.maxAcceleration = maxAcceleration
+        self.switchTime      = switchTime
+
+        self._fastest = None
+
+    def _legalSpeed(self, speed: float) -> int:
+        lo, hi = self.SPEED_RANGE
+        return int(min(max((int(speed) // 100) * 100, lo), hi))
+
+    @property
+    def fastest(self) -> MotionModel:
+        """The fastest profile within the limits and the legal range of the controller"""
+        if self._fastest is None:
+            S = self._legalSpeed(self.maxStartSpeed)
+            F = max(self._legalSpeed(self.maxSpeed), S)
+
+            if self.maxAcceleration is None or F == S:
+                R = 0
+            else:
+                # The acceleration time is limited, which limits the speed that can be reached
+                F = max(min(F, self._legalSpeed(S + self.maxAcceleration * self.ACDC_RANGE[1] / 1000)), S)
+                R = min(math.ceil(1000 * (F - S) / self.maxAcceleration), self.ACDC_RANGE[1])
+
+            self._fastest = MotionModel(minSpeed = S, maxSpeed = F, acdcTime = R)
+
+        return self._fastest
+
+    def choose(self, distance: int, current: Optional[MotionModel] = None) -> MotionModel:
+        """Returns the profile for a move over `distance` pulses: `current`, or the fastest profile if that is
+        faster by more than `self.switchTime`
+        """
+        best = self.fastest
+
+        if current is not None and (current.profile == best.profile or current.moveTime(distance) <= best.moveTime(distance) + self.switchTime):
+            return current
+
+        return best
+
+    def __repr__(self) -> str:
+        return f"ProfileOptimizer(maxSpeed = {self.maxSpeed}, maxStartSpeed = {self.maxStartSpeed}, maxAcceleration = {self.maxAcceleration}, switchTime = {self.switchTime})"
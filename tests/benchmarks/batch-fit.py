@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+# Benchmarks the start-parameter sweep of tests/processstartparam.py (one caustic, NUM x NUM initial guesses for
+# z_0 and w_0, mode 0, with x-errors) on a simulated caustic: MsqODRFitter one start at a time against MsqBatchFitter.
+# The ODR loop is only run on every `stride`-th start and extrapolated.
+# Usage: python3 batch-fit.py [NUM] [stride]
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+import time
+import warnings
+import numpy as np
+
+from fitting.fitter import MsqFitter, MsqODRFitter
+from fitting.batch import MsqBatchFitter
+import fitting.fit_functions as ff
+
+# w_0 [um], z_0 [mm], M_sq, lambda [nm], as the diode data of processstartparam.py
+W_0, Z_0, M_SQ, WAVELENGTH = 150, 20, 1.2, 1650
+BEREICH = 10
+
+if __name__ == '__main__':
+    NUM    = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    stride = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    warnings.simplefilter("ignore")
+
+    z_R = np.pi * W_0**2 / (M_SQ * WAVELENGTH)
+    x   = Z_0 + np.linspace(-3*z_R, 3*z_R, num = 19)
+    y   = ff.omega_z_lambda(wavelength = WAVELENGTH)([W_0, Z_0, M_SQ], x) + np.random.default_rng(0).standard_normal(len(x))
+
+    min_w    = np.argmin(y)
+    z_0s     = x[min_w] + np.linspace(-BEREICH, BEREICH, endpoint = True, num = NUM)
+    w_0s     = y[min_w] + np.linspace(-BEREICH, BEREICH, endpoint = True, num = NUM)
+    allcombi = np.transpose([np.tile(z_0s, len(w_0s)), np.repeat(w_0s, len(z_0s))])
+
+    kwargs = dict(x = x, y = y, xerror = 0.5, yerror = 1, wavelength = WAVELENGTH, wavelength_err = 0, mode = MsqFitter.M2LAMBDA_MODE)
+
+    f = MsqODRFitter(**kwargs)
+    m2_odr = []
+    t0 = time.perf_counter()
+    for (z_0, w_0) in allcombi[::stride]:
+        f.setInitialGuesses(w_0 = w_0, z_0 = z_0)
+        f.fit()
+        m2_odr.append(f.m_squared if f.output.info < 4 else [np.nan, np.nan])
+    t_odr = (time.perf_counter() - t0) * len(allcombi) / len(m2_odr)
+    m2_odr = np.array(m2_odr)
+
+    b = MsqBatchFitter(**kwargs)
+    b.setInitialGuesses(w_0 = allcombi[:,1], z_0 = allcombi[:,0])
+    t0 = time.perf_counter()
+    b.fit()
+    t_batch = time.perf_counter() - t0
+
+    m2_batch = np.where(b.output.converged[:, None], b.m_squared, np.nan)[::stride]
+    agree    = np.isclose(np.abs(m2_batch[:,0]), np.abs(m2_odr[:,0]), rtol = 1e-3)
+
+    print(f"{len(allcombi)} starts of a {len(x)}-point caustic")
+    print(f"  ODR loop : {t_odr:8.3f} s (extrapolated from {len(m2_odr)} starts), {np.sum(np.isnan(m2_odr[:,0]))} did not converge")
+    print(f"  batch LM : {t_batch:8.3f} s, {b.output.niter.max()} iterations max, {np.sum(~b.output.converged)} did not converge")
+    print(f"  speedup  : {t_odr / t_batch:.1f}x")
+    print(f"  M^2 agrees (rtol 1e-3) in {np.sum(agree)}/{len(agree)} of the compared starts")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+# Benchmarks the accumulation of caustic points: the former dict of per-axis arrays grown with np.vstack
+# against measurement.buffer.CausticBuffer, for the number of points of a step-scan up to dense fly-scans.
+# Usage: python3 caustic-buffer.py [maxpoints]
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+import timeit
+import numpy as np
+
+from measurement.buffer import CausticBuffer
+
+def fill_vstack(rows):
+    data = { "x" : None, "y" : None }
+    for z, x, dx, y, dy in rows:
+        dtpt_x = np.array([z, x, dx])
+        dtpt_y = np.array([z, y, dy])
+        data["x"] = dtpt_x if data["x"] is None else np.vstack((data["x"], dtpt_x))
+        data["y"] = dtpt_y if data["y"] is None else np.vstack((data["y"], dtpt_y))
+    return data
+
+def fill_buffer(rows):
+    data = CausticBuffer()
+    for row in rows:
+        data.append(*row, n_samples = 10)
+    return data
+
+if __name__ == '__main__':
+    maxpoints = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    print(f"{'points':>7} {'vstack [ms]':>12} {'buffer [ms]':>12} {'speedup':>8} {'vstack [B/pt]':>14} {'buffer [B/pt]':>14}")
+    for num in [21, 200, 2000, maxpoints]:
+        rows = [tuple(r) for r in np.random.default_rng(0).random((num, 5))]
+
+        res = {}
+        for name, f in [("vstack", fill_vstack), ("buffer", fill_buffer)]:
+            repeat    = max(1, min(20, int(2000 / num)))
+            res[name] = min(timeit.repeat(lambda: f(rows), number = 1, repeat = repeat))
+
+        d = fill_vstack(rows)
+        b = fill_buffer(rows)
+        assert np.array_equal(d["x"], b["x"]) and np.array_equal(d["y"], b["y"])
+
+        # The buffer also holds n_samples and a timestamp per point
+        vstack_bytes = (d["x"].nbytes + d["y"].nbytes) / num
+        print(f"{num:>7} {1e3 * res['vstack']:>12.3f} {1e3 * res['buffer']:>12.3f} {res['vstack'] / res['buffer']:>7.1f}x {vstack_bytes:>14.0f} {b.nbytes / num:>14.0f}")
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+# Benchmarks MsqFitter.conf_interval() with the vectorized delta method against the uncertainties reference
+# for all modes, on the 4096 points that getPlotOfFit() uses by default.
+# Usage: python3 conf-interval.py [numpoints]
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+import io, contextlib
+import timeit
+import numpy as np
+
+from fitting.fitter import MsqFitter, MsqOCFFitter
+import fitting.fit_functions as ff
+
+# w_0 [um], z_0 [mm], M_sq, lambda [nm]
+W_0, Z_0, M_SQ, WAVELENGTH = 100, 2, 1.3, 2300
+
+if __name__ == '__main__':
+    numpoints = int(sys.argv[1]) if len(sys.argv) > 1 else 4096
+
+    z_R   = np.pi * W_0**2 / (M_SQ * WAVELENGTH)
+    z     = Z_0 + np.linspace(-3*z_R, 3*z_R, num = 19)
+    w     = ff.omega_z_lambda(wavelength = WAVELENGTH)([W_0, Z_0, M_SQ], z)
+    w_err = 0.01 * w
+    w_obs = w + w_err * np.random.default_rng(0).standard_normal(len(z))
+
+    z_plot = np.linspace(z.min(), z.max(), num = numpoints)
+
+    print(f"{'mode':>4} {'uncertainties [ms]':>19} {'delta [ms]':>11} {'speedup':>8} {'max rel. diff (correlations)':>29}")
+    for mode in [MsqFitter.M2LAMBDA_MODE, MsqFitter.M2_MODE, MsqFitter.ISO_MODE]:
+        f = MsqOCFFitter(x = z, y = w_obs, yerror = w_err, wavelength = WAVELENGTH, mode = mode)
+        with contextlib.redirect_stdout(io.StringIO()):
+            f.estimateAndFit()
+
+        t_ref   = min(timeit.repeat(lambda: f.conf_interval(z_plot, method = "uncertainties"), number = 1, repeat = 3))
+        num     = 100
+        t_delta = min(timeit.repeat(lambda: f.conf_interval(z_plot), number = num, repeat = 3)) / num
+
+        diff = np.max(np.abs(f.conf_interval(z_plot) / f.conf_interval(z_plot, method = "uncertainties") - 1))
+        print(f"{mode:>4} {1e3 * t_ref:>19.3f} {1e3 * t_delta:>11.3f} {t_ref / t_delta:>7.0f}x {diff:>29.3f}")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+# Counts the model and Jacobian evaluations of curve_fit and ODR for all fit models, with the analytic
+# Jacobians from fitting.fit_functions against finite differences, and times the fits.
+# Usage: python3 fit-jacobians.py [repeats]
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+import timeit
+import numpy as np
+
+from fitting.fitter import MsqFitter, MsqOCFFitter, OCFFitter, ODRFitter
+import fitting.fit_functions as ff
+
+# w_0 [um], z_0 [mm], M_sq, lambda [nm]
+W_0, Z_0, M_SQ, WAVELENGTH = 100, 2, 1.02, 2300
+
+class Counted():
+    """Wraps a fit function and counts the calls of it and its Jacobians"""
+    def __init__(self, func):
+        self.func   = func
+        self.counts = { "f" : 0, "jac" : 0 }
+
+        if hasattr(func, "fjacb"):
+            self.fjacb = self._count(func.fjacb)
+            self.fjacd = self._count(func.fjacd)
+
+    def _count(self, jac):
+        def wrapped(params, z):
+            self.counts["jac"] += 1
+            return jac(params, z)
+        return wrapped
+
+    def __call__(self, params, z):
+        self.counts["f"] += 1
+        return self.func(params, z)
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    z_R   = np.pi * W_0**2 / (M_SQ * WAVELENGTH)
+    z     = Z_0 + np.linspace(-3*z_R, 3*z_R, num = 21)
+    w     = ff.omega_z_lambda(wavelength = WAVELENGTH)([W_0, Z_0, M_SQ], z)
+    w_err = 0.01 * w
+    w_obs = w + w_err * np.random.default_rng(3).standard_normal(len(w))
+
+    print(f"{'mode':>4} {'fitter':>9} {'jacobian':>9} {'f evals':>8} {'jac evals':>9} {'time [ms]':>10} {'M_sq':>9}")
+    for mode in [MsqFitter.M2LAMBDA_MODE, MsqFitter.M2_MODE, MsqFitter.ISO_MODE]:
+        msq = MsqOCFFitter(x = z, y = w_obs, yerror = w_err, wavelength = WAVELENGTH, mode = mode)
+        msq.estimateInitialGuesses()
+        p0  = msq.initial_guesses
+        func = msq.funcs[mode]
+
+        for name in ["curve_fit", "ODR"]:
+            for jacobian in [False, True]:
+                counted = Counted(func)
+                if name == "curve_fit":
+                    fitter = OCFFitter(z, w_obs, w_err, counted, jacobian = jacobian)
+                else:
+                    fitter = ODRFitter(z, w_obs, 1e-3, w_err, counted, jacobian = jacobian)
+
+                fitter.fit(p0)
+                counts = dict(counted.counts)
+
+                # Without the counting wrapper for the timing
+                fitter = OCFFitter(z, w_obs, w_err, func, jacobian = jacobian) if name == "curve_fit" else ODRFitter(z, w_obs, 1e-3, w_err, func, jacobian = jacobian)
+                t = min(timeit.repeat(lambda: fitter.fit(p0), number = 1, repeat = repeats))
+
+                msq.output = fitter.output
+                msq._m_squared_calculated = False
+                print(f"{mode:>4} {name:>9} {str(jacobian):>9} {counts['f']:>8} {counts['jac']:>9} {1e3 * t:>10.3f} {msq.m_squared[0]:>9.5f}")
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+# Benchmarks the closed-form solution of ISO_MODE (MsqFitter.solveLinearISO() and fitLinear()) against the
+# nonlinear fit estimateAndFit() on a caustic of 20 points with 1% noise, and reports the difference in M^2.
+# Usage: python3 linear-iso.py [repeats]
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+import io, contextlib
+import timeit
+import numpy as np
+
+from fitting.fitter import MsqFitter, MsqOCFFitter
+import fitting.fit_functions as ff
+
+# w_0 [um], z_0 [mm], M_sq, lambda [nm]
+W_0, Z_0, M_SQ, WAVELENGTH = 100, 2, 1.3, 2300
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    z_R   = np.pi * W_0**2 / (M_SQ * WAVELENGTH)
+    z     = Z_0 + np.concatenate([np.linspace(-z_R, z_R, num = 10), np.linspace(2*z_R, 3*z_R, num = 5), -np.linspace(2*z_R, 3*z_R, num = 5)])
+    w     = ff.omega_z_lambda(wavelength = WAVELENGTH)([W_0, Z_0, M_SQ], z)
+    w_err = 0.01 * w
+    w_obs = w + w_err * np.random.default_rng(1).standard_normal(len(z))
+
+    def linear():
+        f = MsqOCFFitter(x = z, y = w_obs, yerror = w_err, wavelength = WAVELENGTH, mode = MsqFitter.ISO_MODE)
+        f.fitLinear()
+        return f
+
+    def nonlinear():
+        f = MsqOCFFitter(x = z, y = w_obs, yerror = w_err, wavelength = WAVELENGTH, mode = MsqFitter.ISO_MODE)
+        with contextlib.redirect_stdout(io.StringIO()):
+            f.estimateAndFit()
+        return f
+
+    f = linear()
+    num = max(repeats // 10, 1)
+
+    t_solve  = min(timeit.repeat(f.solveLinearISO, number = repeats, repeat = 3)) / repeats
+    t_linear = min(timeit.repeat(linear, number = num, repeat = 3)) / num
+    t_fit    = min(timeit.repeat(nonlinear, number = num, repeat = 3)) / num
+
+    diff = abs(f.m_squared[0] / nonlinear().m_squared[0] - 1)
+
+    print(f"{'solveLinearISO [us]':>20} {'fitLinear [us]':>15} {'estimateAndFit [us]':>20} {'speedup':>8} {'M2 rel. diff':>13}")
+    print(f"{1e6 * t_solve:>20.1f} {1e6 * t_linear:>15.1f} {1e6 * t_fit:>20.1f} {t_fit / t_linear:>7.0f}x {diff:>13.2e}")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+# Benchmarks loading a directory of measurement data files: the former line-by-line parsing with np.vstack
+# of Measurement.read_from_file() against measurement.loader.CausticLoader, with one and several threads, and processes.
+# The files are generated in a temporary directory, or an existing directory of runs can be given.
+# Usage: python3 loader.py [numfiles | directory]
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+import glob
+import logging
+import tempfile
+import time
+import numpy as np
+
+from measurement.loader import CausticLoader
+
+def read_vstack(filename):
+    """The former Measurement.read_from_file()"""
+    data = { "x" : None, "y" : None }
+    with open(filename, 'r') as f:
+        for line in f:
+            l = line.strip()
+            if l[0] != "#":
+                pos, x_diam, dx_diam, y_diam, dy_diam = [ float(x) for x in l.split("\t") ]
+
+                omega   = { "x" : x_diam,  "y" : y_diam  }
+                d_omega = { "x" : dx_diam, "y" : dy_diam }
+
+                for ax in ["x", "y"]:
+                    dtpt = np.array([pos, omega[ax], d_omega[ax]])
+                    data[ax] = dtpt if data[ax] is None else np.vstack((data[ax], dtpt))
+    return data
+
+def generate(directory, numfiles):
+    rng = np.random.default_rng(0)
+    for i in range(numfiles):
+        with open(os.path.join(directory, f"run_{i:05d}.dat"), 'w') as f:
+            f.write("# Data written on 2022-03-30 at 18:00:05\n# ==== Metadata ====\n#\tWavelength: 2300 nm\n")
+            f.write("# ====== Data ======\n# position[mm]\tx_diam[um]\tdx_diam[um]\ty_diam[um]\tdy_diam[um]\n")
+            for row in rng.random((21, 5)):
+                f.write("\t".join(str(x) for x in row) + "\n")
+
+def run(directory):
+    files = sorted(glob.glob(os.path.join(directory, "*.dat")))
+
+    t0 = time.perf_counter()
+    ref = [read_vstack(f) for f in files]
+    print(f"{'line-by-line + vstack':>24}: {time.perf_counter() - t0:8.3f} s")
+
+    for workers, processes in [(1, False), (None, False), (None, True)]:
+        loader = CausticLoader(workers = workers, processes = processes)
+        loader.LOGLEVEL_THRESHOLD = logging.CRITICAL
+
+        t0 = time.perf_counter()
+        runs = loader.read_files(files)
+        print(f"{'CausticLoader, ' + ('default' if workers is None else str(workers)) + (' processes' if processes else ' thread(s)'):>24}: {time.perf_counter() - t0:8.3f} s, {runs}")
+
+    assert all(np.array_equal(r["x"], runs[i]["x"]) and np.array_equal(r["y"], runs[i]["y"]) for i, r in enumerate(ref))
+
+if __name__ == '__main__':
+    arg = sys.argv[1] if len(sys.argv) > 1 else "1000"
+
+    if os.path.isdir(arg):
+        run(arg)
+    else:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            generate(tmpdir, int(arg))
+            run(tmpdir)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+# Benchmarks Measurement.take_measurements() end to end on simulated hardware: GSC01 in devMode and a NanoScan with
+# cameras.nanoscan_simulator.SimulatedNanoScan, on a shared common.clock.VirtualClock, for every combination of
+# precision, numsamples, removeOutliers and the search strategy of the center.
+# Reported per case: stage moves and the distance travelled, revolutions acquired, simulated time of the measurement,
+# CPU time in Python (best of the repeats) and the relative error of the fitted M^2 of x and y against the simulated beam.
+#
+# Every run is compared with the last run in the history (history/measurement-e2e.jsonl). The simulation is seeded, so
+# moves, revolutions, simulated time and the M^2 error are reproducible and compared exactly (within a small tolerance);
+# the CPU time is compared with a generous factor. The exit status is 1 if any case regressed.
+# Usage: python3 measurement-e2e.py [--save] [--repeat N] [--history FILE] [--filter NAME]
+#   --save    appends this run to the history, e.g. after an intended change
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+import argparse
+import contextlib
+import datetime
+import io
+import itertools
+import json
+import logging
+import platform
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+from measurement.measure import Measurement
+from cameras.nanoscan import NanoScan
+from cameras.nanoscan_simulator import SimulatedNanoScan, GaussianBeam
+from stage.controller import GSC01
+from stage.motion import ProfileOptimizer
+import stage._stage as Stg
+from common.clock import VirtualClock
+
+HISTORY = os.path.join(base_dir, "history", "measurement-e2e.jsonl")
+
+BEAM = GaussianBeam(w0 = (100, 110), z0 = (0, 0.1), wavelength = 2300, M2 = (1.1, 1.3))
+SEED = 7
+
+MATRIX = {
+    "precision"      : [10, 100],
+    "numsamples"     : [10, 50],
+    "removeOutliers" : [0, 3],
+    "strategy"       : list(Measurement.CENTER_STRATEGIES),
+}
+
+# Allowed change against the last run before it counts as a regression
+TOLERANCE = {
+    "moves"       : 0,      # absolute
+    "distance"    : 0.01,   # relative
+    "revolutions" : 0,      # absolute
+    "simulated"   : 0.01,   # relative
+    "cpu"         : 0.5,    # relative, the CPU time depends on the machine and its load
+    "m2Error"     : 0.005,  # absolute, of the relative error
+}
+
+class CountingGSC01(GSC01):
+    """GSC01 that counts its moves and the distance travelled"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.moves    = 0
+        self.distance = 0
+
+    def move(self, pos: int):
+        self.moves    += 1
+        self.distance += abs(pos - self.stage.position)
+        return super().move(pos)
+
+    def rmove(self, delta: int):
+        self.moves    += 1
+        self.distance += abs(delta)
+        return super().rmove(delta)
+
+def run(case: dict, tmpdir: str) -> dict:
+    """Measures and fits the simulated beam once with the parameters of `case`"""
+    clock = VirtualClock()
+    c     = CountingGSC01(stage = Stg.SGSP26_200(), devMode = True, clock = clock)
+    c.LOGLEVEL_THRESHOLD = logging.ERROR
+    c.optimizer = ProfileOptimizer()  # Opt-in on real hardware, kept here to compare with the history
+
+    ns = SimulatedNanoScan.fromController(c, beam = BEAM, seed = SEED)
+    with NanoScan(dll = ns, clock = clock) as n:
+        n.LOGLEVEL_THRESHOLD = logging.ERROR
+        with Measurement(devMode = False, camera = n, controller = c) as M:
+            M.LOGLEVEL_THRESHOLD = logging.ERROR
+
+            cpu   = time.process_time()
+            start = clock.now()
+            M.take_measurements(**case, writeToFile = os.path.join(tmpdir, "caustic.dat"), checkpoint = False)
+            simulated = clock.now() - start
+
+            m2 = np.array([M.fit_data(axis = ax, wavelength = BEAM.wavelength)[0] for ax in [n.AXES.X, n.AXES.Y]])
+            cpu = time.process_time() - cpu
+
+    return {
+        "moves"       : c.moves,
+        "distance"    : int(c.distance),
+        "revolutions" : ns.revolutions,
+        "simulated"   : round(simulated, 3),
+        "cpu"         : round(cpu, 4),
+        "m2Error"     : np.round(np.abs(m2 - BEAM.M2) / BEAM.M2, 4).tolist(),
+    }
+
+def caseName(case: dict) -> str:
+    return f"p{case['precision']}-n{case['numsamples']}-o{case['removeOutliers']}-{case['strategy']}"
+
+def regressions(now: dict, then: dict) -> list:
+    """Names of the metrics of `now` that are worse than `then` by more than TOLERANCE"""
+    worse = []
+    for key, tol in TOLERANCE.items():
+        a, b = np.asarray(now[key], dtype = np.float64), np.asarray(then[key], dtype = np.float64)
+        if key in ["distance", "simulated", "cpu"]:
+            bad = a > b * (1 + tol) + 1e-9
+        else:
+            bad = a > b + tol + 1e-9
+        if np.any(bad):
+            worse.append(key)
+    return worse
+
+def gitCommit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd = base_dir, capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def loadHistory(pfad: str) -> list:
+    if not os.path.isfile(pfad):
+        return []
+    with open(pfad, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "End-to-end benchmark of Measurement.take_measurements() on simulated hardware")
+    parser.add_argument("--save", action = "store_true", help = "append the results to the history")
+    parser.add_argument("--repeat", type = int, default = 3, help = "runs per case, the CPU time is the best of them")
+    parser.add_argument("--history", default = HISTORY, help = "history file (JSON lines)")
+    parser.add_argument("--filter", default = "", help = "only run the cases whose name contains this")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    cases = [dict(zip(MATRIX.keys(), values)) for values in itertools.product(*MATRIX.values())]
+    cases = [case for case in cases if args.filter in caseName(case)]
+
+    history  = loadHistory(args.history)
+    previous = history[-1]["cases"] if history else {}
+
+    print(f"{BEAM}, seed {SEED}")
+    if history:
+        print(f"Comparing with the run of {history[-1]['date']} ({history[-1]['commit'] or 'unknown commit'})")
+
+    print(f"{'case':>22} {'moves':>6} {'distance':>9} {'revs':>6} {'simulated [s]':>14} {'cpu [s]':>8} {'M2 error x, y':>16} {'vs. last':>10}")
+
+    results, regressed = {}, []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for case in cases:
+            name = caseName(case)
+            # The devices and the fitter print their progress
+            with contextlib.redirect_stdout(io.StringIO()):
+                runs = [run(case, tmpdir) for _ in range(max(args.repeat, 1))]
+            res  = { **runs[0], "cpu": min(r["cpu"] for r in runs) }
+            results[name] = res
+
+            if name in previous:
+                worse = regressions(res, previous[name])
+                regressed += [(name, worse)] if worse else []
+                change = f"{100 * (res['cpu'] / previous[name]['cpu'] - 1):+.0f}% cpu" if previous[name]["cpu"] else ""
+                status = "REGRESSED" if worse else change
+            else:
+                status = "new"
+
+            ex, ey = res["m2Error"]
+            print(f"{name:>22} {res['moves']:>6} {res['distance']:>9} {res['revolutions']:>6} {res['simulated']:>14.1f} {res['cpu']:>8.3f} {100 * ex:>7.2f}% {100 * ey:>6.2f}% {status:>10}")
+
+    for name, worse in regressed:
+        print(f"Regression in {name}: {', '.join(worse)} (was {previous[name]}, now {results[name]})")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok = True)
+        entry = {
+            "date"    : datetime.datetime.now().isoformat(timespec = "seconds"),
+            "commit"  : gitCommit(),
+            "python"  : platform.python_version(),
+            "numpy"   : np.__version__,
+            "machine" : platform.machine(),
+            "cases"   : results,
+        }
+        with open(args.history, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        print(f"Saved to {args.history}")
+
+    sys.exit(1 if regressed else 0)
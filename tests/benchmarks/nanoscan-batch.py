@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+# Benchmarks NanoScan.oneRev() in a loop against NanoScan.acquireBatch(), i.e. one request per revolution
+# against one request per batch, using the local stand-in for the 32-bit server.
+# Usage: python3 nanoscan-batch.py [n] [repeats]
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+import time
+import numpy as np
+
+from cameras.nanoscan import NanoScan
+from cameras.nanoscan_standin import StandInNanoScanDLL
+
+if __name__ == '__main__':
+    n       = int(sys.argv[1]) if len(sys.argv) > 1 else 30 # = numsamples + 10 in getAxis_avg_D4Sigma
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    with NanoScan(devMode = False, dll = StandInNanoScanDLL()) as ns:
+        ns.LOGLEVEL_THRESHOLD = 100
+
+        methods = {
+            "oneRev loop"  : lambda: np.array([list(ns.oneRev()) for _ in range(n)]),
+            "acquireBatch" : lambda: ns.acquireBatch(n)
+        }
+
+        results = {}
+        for name, f in methods.items():
+            out = f() # warm up
+            assert out.shape == (n, 2)
+
+            times = []
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                f()
+                times.append(time.perf_counter() - t0)
+
+            results[name] = np.median(times)
+            print(f"{name:>14}: {1e3 * results[name]:8.3f} ms per {n} revolutions ({1e6 * results[name] / n:8.1f} us per revolution)")
+
+        print(f"Speedup: {results['oneRev loop'] / results['acquireBatch']:.1f}x")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+# Benchmarks the raw data files: the former text raw log written line by line by Measurement._measure_at()
+# against the binary measurement.rawfile format, written directly (RawWriter) and by a background thread (AsyncRawWriter),
+# for writing a measurement and for reading the samples of one point. For the background writer, the time the acquisition
+# spends in writePoint() is given in brackets.
+# Usage: python3 raw-format.py [numpoints] [numsamples]
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+import logging
+import tempfile
+import time
+import numpy as np
+
+from measurement.rawfile import RawWriter, AsyncRawWriter, RawReader
+
+def write_text(filename, points):
+    """The former raw log of Measurement._measure_at()"""
+    with open(filename, 'w') as f:
+        for position, raw in points:
+            x_axis, y_axis = raw[:,0], raw[:,1]
+            f.write(f"# position[mm]\tx_diam[um]\ty_diam[um]\n")
+            for i in range(len(x_axis)):
+                f.write(f"{position}\t{x_axis[i]}\t{y_axis[i]}\n")
+
+def read_text(filename, point):
+    """Returns the samples of one point of a text raw log, which has to be scanned up to that point"""
+    current, samples = -1, []
+    with open(filename, 'r') as f:
+        for line in f:
+            if line[0] == "#":
+                current += 1
+                if current > point:
+                    break
+            elif current == point:
+                samples.append([float(v) for v in line.split("\t")])
+    return np.array(samples)
+
+def write_raw(filename, points):
+    with RawWriter(filename) as w:
+        w.LOGLEVEL_THRESHOLD = logging.CRITICAL
+        for position, raw in points:
+            w.writePoint(z = np.full(len(raw), position), x = raw[:,0], y = raw[:,1])
+
+def write_async(filename, points):
+    """Returns the time spent in writePoint()"""
+    t = 0
+    with AsyncRawWriter(filename) as w:
+        w.LOGLEVEL_THRESHOLD = logging.CRITICAL
+        for position, raw in points:
+            t0 = time.perf_counter()
+            w.writePoint(z = position, x = raw[:,0], y = raw[:,1])
+            t += time.perf_counter() - t0
+    return t
+
+def timed(func, *args, repeat = 3):
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        ret = func(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best, ret
+
+if __name__ == '__main__':
+    numpoints  = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    numsamples = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    rng    = np.random.default_rng(0)
+    points = [(0.01 * i, 100 + rng.random((numsamples, 2))) for i in range(numpoints)]
+    last   = numpoints - 1
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tname = os.path.join(tmpdir, "raw.log")
+        rname = os.path.join(tmpdir, "raw.raw")
+        aname = os.path.join(tmpdir, "async.raw")
+
+        t_wt, _ = timed(write_text, tname, points)
+        t_wr, _ = timed(write_raw, rname, points)
+        t_wa, t_acq = timed(write_async, aname, points)
+
+        t_rt, text = timed(read_text, tname, last)
+
+        def read_raw(point):
+            with RawReader(rname) as r:
+                return np.column_stack((r[point]["z"], r[point]["x"], r[point]["y"]))
+        t_rr, raw = timed(read_raw, last)
+
+        assert np.allclose(text, raw, rtol = 1e-6)
+
+        print(f"{numpoints} points x {numsamples} samples")
+        print(f"{'':>10} {'write [s]':>18} {'read last point [ms]':>21} {'size [MiB]':>11}")
+        print(f"{'text':>10} {t_wt:18.3f} {1e3 * t_rt:21.3f} {os.path.getsize(tname) / 2**20:11.1f}")
+        print(f"{'binary':>10} {t_wr:18.3f} {1e3 * t_rr:21.3f} {os.path.getsize(rname) / 2**20:11.1f}")
+        print(f"{'background':>10} {t_wa:9.3f} ({t_acq:6.3f}) {'':>21} {os.path.getsize(aname) / 2**20:11.1f}")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+# Compares NanoScan.remove_spikes() (removeOutliers = 2) against NanoScan.remove_spikes_windowed() (removeOutliers = 3)
+# on the recorded data in tests/outlier/datasets: which points are rejected, and how long it takes.
+# Usage: python3 remove-spikes.py [threshold]
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+import ast
+import glob
+import timeit
+import numpy as np
+
+from cameras.nanoscan import NanoScan
+
+datadir = os.path.abspath(os.path.join(base_dir, "..", "outlier", "datasets"))
+
+def load_datasets():
+    """Returns a list of rank-1 arrays, i.e. the raw samples of one axis at one point"""
+    sets = []
+
+    # dataset_NN.dat: csv with columns x, y
+    for f in sorted(glob.glob(os.path.join(datadir, "dataset_*.dat"))):
+        data = np.loadtxt(f, delimiter = ",", skiprows = 1)
+        sets += [data[:,0], data[:,1]]
+
+    # *_log.dat: log of a full run, the first 10 readings of every point are thrown away
+    for f in sorted(glob.glob(os.path.join(datadir, "*_log.dat"))):
+        points = []
+        with open(f, 'r') as logfile:
+            for line in logfile:
+                if line.startswith("INFO: Point"):
+                    points.append([])
+                elif line.startswith("DEBUG: Got 1 Reading"):
+                    points[-1].append(ast.literal_eval(line.split("(x, y): ")[1]))
+
+        for point in points:
+            data = np.array(point)[10:]
+            sets += [data[:,0], data[:,1]]
+
+    return sets
+
+if __name__ == '__main__':
+    threshold = float(sys.argv[1]) if len(sys.argv) > 1 else 0.2
+
+    sets = load_datasets()
+
+    same, differ = 0, []
+    for i, arr in enumerate(sets):
+        a = NanoScan.filter_outliers(arr, removeOutliers = 2, threshold = threshold)
+        b = NanoScan.filter_outliers(arr, removeOutliers = 3, threshold = threshold)
+
+        if len(a) == len(b) and np.array_equal(np.sort(a), np.sort(b)):
+            same += 1
+        else:
+            differ.append((i, len(arr), len(a), len(b), np.average(a), np.average(b), np.std(a), np.std(b)))
+
+    print(f"=== Equivalence (threshold = {threshold}) ===")
+    print(f"{same}/{len(sets)} series with identical results")
+    if len(differ):
+        print(f"{'series':>6} {'n':>4} {'kept(2)':>8} {'kept(3)':>8} {'avg(2)':>9} {'avg(3)':>9} {'std(2)':>8} {'std(3)':>8}")
+        for d in differ:
+            print("{:6d} {:4d} {:8d} {:8d} {:9.2f} {:9.2f} {:8.2f} {:8.2f}".format(*d))
+
+    print(f"\n=== Speed ===")
+    series = {
+        "one point (all series)"                   : sets,
+        f"long series ({sum(map(len, sets))} pts)" : [np.concatenate(sets)]
+    }
+    for name, ss in series.items():
+        res = {}
+        for mode in [2, 3]:
+            f = lambda: [NanoScan.filter_outliers(arr, removeOutliers = mode, threshold = threshold) for arr in ss]
+            num = max(1, int(1 / max(timeit.timeit(f, number = 1), 1e-6)))
+            res[mode] = min(timeit.repeat(f, number = num, repeat = 5)) / num
+            print(f"{name:>28}, mode {mode}: {1e3 * res[mode]:9.3f} ms")
+        print(f"{'':>28}  speedup: {res[2] / res[3]:.1f}x")
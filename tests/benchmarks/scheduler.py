@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+# Benchmarks the predicted travel time of the caustic scan: the points walked in sorted order against the order of
+# measurement.scheduler.PointScheduler, from the positions the search for the center may end at, with the default
+# speed profile of GSC01 and with the profile of stage.motion.ProfileOptimizer.
+# Usage: python3 scheduler.py [rayleighLength in pulses]
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+import timeit
+import numpy as np
+
+from stage.motion import MotionModel, ProfileOptimizer
+from measurement.scheduler import PointScheduler
+
+def plan(center, rayleighLength):
+    # As Measurement.plan_points() for two axes with slightly different waists
+    zR     = np.array([rayleighLength, int(rayleighLength * 1.05)])
+    within = np.linspace(start = -zR, stop = zR, endpoint = True, num = 10, dtype = np.integer)
+    beyond = np.linspace(start = 2 * zR, stop = 3 * zR, endpoint = True, num = 5, dtype = np.integer)
+    points = np.concatenate([within, beyond, -beyond, np.zeros_like(within[0:1])]) + np.array([center, center + 100])
+    return np.unique(points.flatten())
+
+if __name__ == '__main__':
+    rayleighLength = int(sys.argv[1]) if len(sys.argv) > 1 else 6859
+    models         = { "default": MotionModel(minSpeed = 500, maxSpeed = 5000, acdcTime = 200), "optimized": ProfileOptimizer().fastest }
+    points         = plan(center = 0, rayleighLength = rayleighLength)
+
+    print(f"{len(points)} points within [{points[0]}, {points[-1]}]")
+    for name, model in models.items():
+        print(f"{name}: {model}")
+
+    print(f"{'profile':>9} {'approach':>8} {'start':>7} {'sorted [s]':>11} {'scheduled [s]':>14} {'saved':>7} {'schedule [ms]':>14}")
+    for name, model in models.items():
+        for approach in [0, 1]:
+            scheduler = PointScheduler(approach = approach, backlash = 200)
+            for start in [-50000, -3 * rayleighLength, 0, rayleighLength, 3 * rayleighLength, 50000]:
+                inOrder  = scheduler.predict(points, start = start, model = model)
+                schedule = scheduler.schedule(points, start = start, model = model)
+                t        = min(timeit.repeat(lambda: scheduler.schedule(points, start = start, model = model), number = 1, repeat = 3))
+
+                # Savings against the sorted order with the default profile
+                saved = 1 - schedule.predictedTotal / scheduler.predict(points, start = start, model = models["default"]).predictedTotal
+                print(f"{name:>9} {approach:>8} {start:>7} {inOrder.predictedTotal:>11.2f} {schedule.predictedTotal:>14.2f} {100 * saved:>6.1f}% {1e3 * t:>14.1f}")
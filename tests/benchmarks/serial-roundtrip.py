@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+# Benchmarks the round trip of commands to the GSC-01: the former GSC01.read(), which sleeps 50 ms and then reads
+# byte by byte, against the read up to the CRLF terminator. The controller is emulated on a pseudo-terminal by
+# stage.emulator.GSC01Emulator, with a configurable answer latency.
+# Usage: python3 serial-roundtrip.py [latency in ms] [commands]
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+import logging
+import time
+
+import numpy as np
+
+from stage.controller import GSC01
+from stage.emulator import GSC01Emulator
+import stage._stage as Stg
+
+class LegacyGSC01(GSC01):
+    def read(self):
+        time.sleep(0.05)
+
+        out = b''
+        while self.dev.inWaiting() > 0:
+            out += self.dev.read(1)
+
+        out = out.strip().split() if len(out) else ''
+
+        out = out[0] if len(out) == 1 else b''.join([x.strip() for x in out])
+
+        return out if len(out) else None
+
+def roundtrips(c, cmd, num):
+    times = []
+    for _ in range(num):
+        t = time.perf_counter()
+        c.safesend(cmd)
+        times.append(time.perf_counter() - t)
+    return np.array(times)
+
+if __name__ == '__main__':
+    latency = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.002
+    num     = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    print(f"Emulated answer latency: {1e3 * latency:.1f} ms, {num} commands each")
+    print(f"{'reader':>10} {'command':>8} {'mean [ms]':>10} {'p95 [ms]':>9} {'cmd/s':>7}")
+
+    results = {}
+    with GSC01Emulator(latency = latency) as emu:
+        for name, cls in [("legacy", LegacyGSC01), ("terminator", GSC01)]:
+            with cls(stage = Stg.SGSP26_200(), devMode = False, devConfig = { "port": emu.port }) as c:
+                c.LOGLEVEL_THRESHOLD = logging.WARN
+                for cmd in ["!:", "Q:"]:
+                    t = roundtrips(c, cmd, num)
+                    results[(name, cmd)] = t.mean()
+                    print(f"{name:>10} {cmd:>8} {1e3 * t.mean():>10.2f} {1e3 * np.percentile(t, 95):>9.2f} {1 / t.mean():>7.0f}")
+
+                assert c.getPositionReadOut() == emu.position
+
+    for cmd in ["!:", "Q:"]:
+        print(f"{cmd} throughput: {results[('legacy', cmd)] / results[('terminator', cmd)]:.1f}x")
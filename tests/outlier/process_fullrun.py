@@ -1,4 +1,3 @@
-import pandas as pd
 import ast
 import numpy as np
 
@@ -8,10 +7,9 @@ root_dir = os.path.abspath(os.path.join(base_dir, "..", "..", "src"))
 sys.path.insert(0, root_dir)
 
 from nanosquared.cameras.nanoscan import NanoScan
+from nanosquared.measurement.loader import CausticLoader
 
-
-datafile = pd.read_csv("datasets/2022-03-30_180005_75 DEG.dat", sep = '\t', skiprows = 8, header = 0)
-positions = datafile["# position[mm]"].to_numpy()
+positions = CausticLoader().read("datasets/2022-03-30_180005_75 DEG.dat").records["z"]
 
 dataset = []
 with open("datasets/2022-03-30_180005_75 DEG_log.dat", 'r') as logfile:
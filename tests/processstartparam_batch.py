@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+# Same as processstartparam.py, but all start parameters are fitted at once with fitting.batch.MsqBatchFitter
+# on one core instead of one at a time with MsqODRFitter over MPI. 
+# x-errors are taken into account with the effective variance instead of ODR, see fitting.batch.batch_lm()
+# Usage: python3 processstartparam_batch.py [outputfile]
+
+import sys, os
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "..", "src", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+import pandas as pd
+import numpy as np
+import fitting.batch
+
+# == BEGIN SETTINGS ==
+NUM_X = 100
+NUM_Y = 100
+BEREICH = 10
+slow_axis = False
+# ==  END  SETTINGS ==
+
+if slow_axis:
+	diode_data_fast = pd.read_csv('../data/diode/slow_axis.txt', delimiter = '; ', engine='python', decimal=",")	
+	x = diode_data_fast["position[cm]"] * 10
+	y = diode_data_fast["diam_x[um]"] / 2
+else:
+	diode_data_fast = pd.read_csv('../data/diode/fast_axis.txt', delimiter = '; ', engine='python', decimal=",")	
+	x = diode_data_fast["position[mm]"]
+	y = diode_data_fast["diam_y[um]"] / 2
+
+x = np.asarray(x, dtype = 'float64')
+y = np.asarray(y, dtype = 'float64')
+
+min_w = np.argmin(y)
+
+z_0 = x[min_w]
+w_0 = y[min_w]
+
+# Variation
+z_0_values = z_0 + np.linspace(-BEREICH, BEREICH, endpoint=True, num = NUM_X, dtype = 'float64')
+w_0_values = w_0 + np.linspace(-BEREICH, BEREICH, endpoint=True, num = NUM_Y, dtype = 'float64')
+
+# Cartesian Product
+allcombi = np.transpose([np.tile(z_0_values, len(w_0_values)), np.repeat(w_0_values, len(z_0_values))])
+
+f = fitting.batch.MsqBatchFitter(
+	x              = x, 
+	y              = y, 
+	xerror         = 0.5,
+	yerror         = 1,
+	wavelength     = 1650,
+	wavelength_err = 0,
+	mode           = 0
+)
+f.setInitialGuesses(w_0 = allcombi[:,1], z_0 = allcombi[:,0])
+
+print(f"Processing {len(allcombi)} start parameters")
+f.fit()
+print(f"Processing end, {np.sum(~f.output.converged)} did not converge")
+
+m2 = np.where(f.output.converged[:, None], f.m_squared, 0)
+
+filename = sys.argv[1] if len(sys.argv) > 1 else f"{'slow' if slow_axis else 'fast'}_axis.ignore.out"
+
+with open(filename, 'w') as fi:
+	fi.write("# init_z\tinit_w\tm2\tdm2\tbeta\n")
+	for init, m, beta in zip(allcombi, m2, f.output.beta):
+		fi.write("{}\t{}\t{}\n".format('\t'.join(map(str, init)), '\t'.join(map(str, m)), '\t'.join(map(str, beta))))
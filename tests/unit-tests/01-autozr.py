@@ -13,6 +13,8 @@ from cameras.nanoscan import NanoScan
 from stage.controller import GSC01
 
 from fitting.fit_functions import omega_z
+from cameras.nanoscan_simulator import SimulatedNanoScan, GaussianBeam
+from common.clock import VirtualClock
 
 import logging
 
@@ -149,6 +151,37 @@ with Asym_Measurement(devMode = True, camera = n, controller = c) as M:
     except Exception as e:
         test_print(4, f"z_R Asymmetric (Both-Axis)...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
 
+test_print(5, "z_R Joint Search (Both-Axis, different beams)...")
+try:
+    # Each axis has its own waist and Rayleigh length
+    beam = GaussianBeam(w0 = (100, 150), z0 = (1, -2), wavelength = 2300, M2 = (1.2, 1.5))
+    reference = np.array([c.um_to_pulse(um = zr * 1000, asint = True) for zr in beam.zR])
+
+    revolutions = {}
+    for axis in ["X", "Y", "BOTH"]:
+        ns = SimulatedNanoScan.fromController(c, beam = beam, noise = 0, spikeRate = 0, clock = VirtualClock())
+        with NanoScan(dll = ns) as sn:
+            sn.LOGLEVEL_THRESHOLD = logging.ERROR
+            with Measurement(devMode = False, camera = sn, controller = c) as M:
+                M.LOGLEVEL_THRESHOLD = logging.ERROR
+                ax     = getattr(sn.AXES, axis)
+                center = M.find_center_xy(precision = 10) if axis == "BOTH" else np.array([M.find_center(axis = ax, precision = 10)])
+                start  = ns.revolutions
+                _, z_R = M.find_params(axis = ax, center = center, precision = 10)
+                revolutions[axis] = ns.revolutions - start
+
+                print(f"{axis}: z_R = {z_R}, reference = {reference}")
+                expected = reference if axis == "BOTH" else reference[[0] if axis == "X" else [1]]
+                assert np.shape(z_R) == np.shape(expected) and np.allclose(z_R, expected, atol = 50, rtol = 0), (z_R, expected)
+
+    # Every measurement of the joint search narrows the intervals of both axes
+    print(f"Revolutions: {revolutions}")
+    assert revolutions["BOTH"] < revolutions["X"] + revolutions["Y"], revolutions
+    test_print(5, f"z_R Joint Search (Both-Axis, different beams)...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(5, f"z_R Joint Search (Both-Axis, different beams)...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
 num_tests = len(test_results.keys())
 test_results_val = list(test_results.values())
 print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
\ No newline at end of file
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from measurement.measure import Measurement
+
+from cameras.nanoscan import NanoScan
+from stage.controller import GSC01
+
+from fitting.fit_functions import omega_z
+
+import logging
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+
+n = NanoScan(devMode = True)
+c = GSC01(devMode = True)
+
+class Counting_Measurement(Measurement):
+    """Simulated beam with the waist away from the stage center. Counts the number of measurements actually taken (i.e. not from the cache).
+
+    devMode = False is given to Measurement so that the searches are actually run,
+    the camera and controller are still simulated.
+    """
+    LOGLEVEL_THRESHOLD = logging.ERROR
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.numMeasurements = 0
+
+    SIMULATION_PARAMS = {
+        "z_R"   : 13.65909849, # mm
+        "w_0"   : 100        , # um
+        "z_0"   : 23.5       , # mm
+        "lambda": 2300         # nm
+    }
+
+    def _measure_at(self, *args, **kwargs):
+        self.numMeasurements += 1
+        return super()._measure_at(*args, **kwargs)
+
+    def simulate_beam(self, pos: int):
+        # z in mm
+        return [2 * omega_z(z = self.controller.pulse_to_um(pos) / 1000, params = [100,23.5,2300]), 10]
+
+PRECISION = 10
+
+with Counting_Measurement(devMode = False, camera = n, controller = c) as M:
+    referenceVal = M.controller.um_to_pulse(um = M.SIMULATION_PARAMS['z_0'] * 1000, asint = True)
+
+    results = {}
+    for strategy in M.CENTER_STRATEGIES:
+        M.numMeasurements = 0
+        M.cache.clear()
+        results[strategy] = (M.find_center(axis = M.camera.AXES.X, precision = PRECISION, strategy = strategy), M.numMeasurements)
+        print(f"{strategy}: center = {results[strategy][0]}, measurements = {results[strategy][1]}")
+
+    test_print(1, "Golden-section center (Single-Axis) same as ternary...")
+    try:
+        assert np.isclose(a = results["golden"][0], b = results["ternary"][0], atol = PRECISION, rtol = 0)
+        assert np.isclose(a = results["golden"][0], b = referenceVal, atol = PRECISION, rtol = 0)
+        test_print(1, f"Golden-section center (Single-Axis) same as ternary...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+    except AssertionError as e:
+        test_print(1, f"Golden-section center (Single-Axis) same as ternary...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+    test_print(2, "Golden-section center (Single-Axis) uses >= 40% fewer measurements...")
+    try:
+        assert results["golden"][1] <= 0.6 * results["ternary"][1]
+        test_print(2, f"Golden-section center (Single-Axis) uses >= 40% fewer measurements...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+    except AssertionError as e:
+        test_print(2, f"Golden-section center (Single-Axis) uses >= 40% fewer measurements...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+    results = {}
+    for strategy in M.CENTER_STRATEGIES:
+        M.numMeasurements = 0
+        M.cache.clear()
+        results[strategy] = (M.find_center_xy(precision = PRECISION, strategy = strategy), M.numMeasurements)
+        print(f"{strategy}: center = {results[strategy][0]}, measurements = {results[strategy][1]}")
+
+    # simulate_beam offsets the y-axis by 100 pps
+    test_print(3, "Golden-section center (Both-Axis) same as ternary...")
+    try:
+        assert np.allclose(a = results["golden"][0], b = results["ternary"][0], atol = PRECISION, rtol = 0)
+        assert np.allclose(a = results["golden"][0], b = [referenceVal, referenceVal + 100], atol = PRECISION, rtol = 0)
+        test_print(3, f"Golden-section center (Both-Axis) same as ternary...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+    except AssertionError as e:
+        test_print(3, f"Golden-section center (Both-Axis) same as ternary...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+    test_print(4, "Golden-section center (Both-Axis) uses fewer measurements...")
+    try:
+        assert results["golden"][1] < results["ternary"][1]
+        test_print(4, f"Golden-section center (Both-Axis) uses fewer measurements...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+    except AssertionError as e:
+        test_print(4, f"Golden-section center (Both-Axis) uses fewer measurements...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from fitting.fitter import MsqFitter, MsqOCFFitter, MsqODRFitter
+from fitting.fit_functions import omega_z_lambda
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+
+# w_0 [um], z_0 [mm], M_sq, lambda [nm]
+W_0, Z_0, M_SQ, WAVELENGTH = 100, 2, 1.3, 2300
+
+z_R = np.pi * W_0**2 / (M_SQ * WAVELENGTH)           # mm
+z   = Z_0 + np.concatenate([np.linspace(-z_R, z_R, num = 10), np.linspace(2*z_R, 3*z_R, num = 5), -np.linspace(2*z_R, 3*z_R, num = 5)])
+w   = omega_z_lambda(wavelength = WAVELENGTH)([W_0, Z_0, M_SQ], z)
+
+# ISO parameters of the exact caustic, d^2 = a + bz + cz^2
+c_exact = 4 * (M_SQ * WAVELENGTH / (np.pi * W_0))**2
+b_exact = -2 * Z_0 * c_exact
+a_exact = 4 * W_0**2 + c_exact * Z_0**2
+
+rng   = np.random.default_rng(1)
+w_err = 0.01 * w
+w_obs = w + w_err * rng.standard_normal(len(w))
+
+test_print(1, "Linear ISO solution is exact for noise-free data...")
+try:
+    f = MsqOCFFitter(x = z, y = w, yerror = w_err, wavelength = WAVELENGTH, mode = MsqFitter.ISO_MODE)
+    f.fitLinear()
+    assert np.allclose(f.output.beta, [a_exact, b_exact, c_exact], rtol = 1e-8, atol = 1e-6)
+    assert np.isclose(f.m_squared[0], M_SQ, rtol = 1e-8)
+    test_print(1, f"Linear ISO solution is exact for noise-free data...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    test_print(1, f"Linear ISO solution is exact for noise-free data...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(2, "Linear ISO solution agrees with the nonlinear fit on noisy data...")
+try:
+    lin = MsqOCFFitter(x = z, y = w_obs, yerror = w_err, wavelength = WAVELENGTH, mode = MsqFitter.ISO_MODE)
+    lin.fitLinear()
+
+    nonlin = MsqOCFFitter(x = z, y = w_obs, yerror = w_err, wavelength = WAVELENGTH, mode = MsqFitter.ISO_MODE)
+    nonlin.estimateAndFit()
+
+    print(f"linear: {lin.m_squared}, nonlinear: {nonlin.m_squared}")
+    assert np.isclose(lin.m_squared[0], nonlin.m_squared[0], rtol = 0.02)
+    assert np.isclose(lin.m_squared[1], nonlin.m_squared[1], rtol = 0.5)
+    assert np.allclose(lin.output.sd_beta, nonlin.output.sd_beta, rtol = 0.5)
+    test_print(2, f"Linear ISO solution agrees with the nonlinear fit on noisy data...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    test_print(2, f"Linear ISO solution agrees with the nonlinear fit on noisy data...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "Refined linear ISO solution (ODR) agrees...")
+try:
+    f = MsqODRFitter(x = z, y = w_obs, xerror = 1e-3, yerror = w_err, wavelength = WAVELENGTH, mode = MsqFitter.ISO_MODE)
+    f.fitLinear(refine = True)
+
+    print(f"refined: {f.m_squared}")
+    assert np.isclose(f.m_squared[0], lin.m_squared[0], rtol = 0.02)
+    test_print(3, f"Refined linear ISO solution (ODR) agrees...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    test_print(3, f"Refined linear ISO solution (ODR) agrees...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "Linear ISO solution of degenerate and ill-conditioned data...")
+try:
+    # Two distinct positions do not determine the parabola
+    z_two = np.repeat([Z_0 - z_R, Z_0 + z_R], 5)
+    w_two = omega_z_lambda(wavelength = WAVELENGTH)([W_0, Z_0, M_SQ], z_two)
+    for run in ["fitLinear", "estimateAndFit"]:
+        f = MsqOCFFitter(x = z_two, y = w_two, yerror = 0.01 * w_two, wavelength = WAVELENGTH, mode = MsqFitter.ISO_MODE)
+        try:
+            getattr(f, run)()
+            assert False, f"{run}() did not raise"
+        except ValueError as e:
+            print(f"{run}(): {e}")
+
+    # The normal equations of z 100 mm away have a condition number of about 1e12, which costs them about 12 digits
+    offset = 100
+    w_far  = omega_z_lambda(wavelength = WAVELENGTH)([W_0, Z_0 + offset, M_SQ], z + offset)
+    f_far  = MsqOCFFitter(x = z + offset, y = w_far, yerror = 0.01 * w_far, wavelength = WAVELENGTH, mode = MsqFitter.ISO_MODE)
+    f_near = MsqOCFFitter(x = z, y = w_far, yerror = 0.01 * w_far, wavelength = WAVELENGTH, mode = MsqFitter.ISO_MODE)
+    beta, _ = f_far.solveLinearISO()
+    (a, b, c), _ = f_near.solveLinearISO()
+    print(f"{offset} mm away: {beta}")
+    assert np.allclose(beta, [a - b * offset + c * offset**2, b - 2 * c * offset, c], rtol = 1e-12, atol = 0)
+
+    # Far from z = 0, the normal equations are too ill-conditioned to be solved directly
+    offset = 1e4
+    z_far  = z + offset
+    w_far  = omega_z_lambda(wavelength = WAVELENGTH)([W_0, Z_0 + offset, M_SQ], z_far)
+    f = MsqOCFFitter(x = z_far, y = w_far, yerror = 0.01 * w_far, wavelength = WAVELENGTH, mode = MsqFitter.ISO_MODE)
+    f.fitLinear()
+    print(f"{offset} mm away: {f.m_squared}")
+    assert np.isclose(f.m_squared[0], M_SQ, rtol = 1e-4) and f.m_squared[1] < 0.01
+    test_print(4, f"Linear ISO solution of degenerate and ill-conditioned data...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(4, f"Linear ISO solution of degenerate and ill-conditioned data...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from fitting.fitter import MsqFitter, MsqOCFFitter, MsqODRFitter
+import fitting.fit_functions as ff
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+
+
+# w_0 [um], z_0 [mm], M_sq, lambda [nm]
+W_0, Z_0, M_SQ, WAVELENGTH = 100, 2, 1.3, 2300
+
+z_R = np.pi * W_0**2 / (M_SQ * WAVELENGTH)           # mm
+z   = Z_0 + np.linspace(-3*z_R, 3*z_R, num = 21)
+w   = ff.omega_z_lambda(wavelength = WAVELENGTH)([W_0, Z_0, M_SQ], z)
+
+rng   = np.random.default_rng(2)
+w_err = 0.01 * w
+w_obs = w + w_err * rng.standard_normal(len(w))
+
+c_iso = 4 * (M_SQ * WAVELENGTH / (np.pi * W_0))**2
+
+models = {
+    "omega_z"        : (ff.omega_z, [W_0, Z_0, M_SQ * WAVELENGTH]),
+    "omega_z_lambda" : (ff.omega_z_lambda(wavelength = WAVELENGTH), [W_0, Z_0, M_SQ]),
+    "iso_omega_z"    : (ff.iso_omega_z, [4 * W_0**2 + c_iso * Z_0**2, -2 * Z_0 * c_iso, c_iso]),
+}
+
+def numerical_jacb(func, params, z, rel = 1e-6):
+    """Central differences with respect to the parameters, shape (len(params), len(z))"""
+    params = np.array(params, dtype = np.float64)
+    jac    = []
+    for i in range(len(params)):
+        h     = rel * max(abs(params[i]), 1)
+        p, m  = params.copy(), params.copy()
+        p[i] += h
+        m[i] -= h
+        jac.append((func(p, z) - func(m, z)) / (2 * h))
+    return np.array(jac)
+
+def numerical_jacd(func, params, z, rel = 1e-6):
+    h = rel * np.maximum(np.abs(z), 1)
+    return (func(params, z + h) - func(params, z - h)) / (2 * h)
+
+test_print(1, "Analytic fjacb agrees with central differences...")
+try:
+    for name, (func, params) in models.items():
+        analytic = func.fjacb(params, z)
+        assert analytic.shape == (3, len(z)), name
+        assert np.allclose(analytic, numerical_jacb(func, params, z), rtol = 1e-5, atol = 1e-8), name
+    test_print(1, f"Analytic fjacb agrees with central differences...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(1, f"Analytic fjacb agrees with central differences...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(2, "Analytic fjacd agrees with central differences...")
+try:
+    for name, (func, params) in models.items():
+        analytic = func.fjacd(params, z)
+        assert analytic.shape == z.shape, name
+        assert np.allclose(analytic, numerical_jacd(func, params, z), rtol = 1e-5, atol = 1e-8), name
+    test_print(2, f"Analytic fjacd agrees with central differences...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(2, f"Analytic fjacd agrees with central differences...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "curve_fit gives the same result with and without the analytic Jacobian...")
+try:
+    for mode in [MsqFitter.M2LAMBDA_MODE, MsqFitter.M2_MODE, MsqFitter.ISO_MODE]:
+        res = []
+        for jacobian in [True, False]:
+            f = MsqOCFFitter(x = z, y = w_obs, yerror = w_err, wavelength = WAVELENGTH, mode = mode, jacobian = jacobian)
+            f.estimateAndFit()
+            res.append(f.m_squared)
+        print(f"mode {mode}: {res[0]} (analytic) {res[1]} (numerical)")
+        assert np.allclose(res[0], res[1], rtol = 1e-4), mode
+    test_print(3, f"curve_fit gives the same result with and without the analytic Jacobian...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(3, f"curve_fit gives the same result with and without the analytic Jacobian...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "ODR gives the same result with and without the analytic Jacobians...")
+try:
+    for mode in [MsqFitter.M2LAMBDA_MODE, MsqFitter.M2_MODE, MsqFitter.ISO_MODE]:
+        res = []
+        for jacobian in [True, False]:
+            f = MsqODRFitter(x = z, y = w_obs, xerror = 1e-3, yerror = w_err, wavelength = WAVELENGTH, mode = mode, jacobian = jacobian)
+            f.estimateAndFit()
+            res.append(f.m_squared)
+        print(f"mode {mode}: {res[0]} (analytic) {res[1]} (numerical)")
+        assert np.allclose(res[0], res[1], rtol = 1e-3), mode
+    test_print(4, f"ODR gives the same result with and without the analytic Jacobians...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(4, f"ODR gives the same result with and without the analytic Jacobians...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
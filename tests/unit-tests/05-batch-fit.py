@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from fitting.fitter import MsqFitter, MsqOCFFitter, MsqODRFitter
+from fitting.batch import MsqBatchFitter, batch_lm
+import fitting.fit_functions as ff
+
+import io, contextlib, warnings
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+
+
+
+# w_0 [um], z_0 [mm], M_sq, lambda [nm]
+W_0, Z_0, M_SQ, WAVELENGTH = 100, 2, 1.3, 2300
+N = 50
+
+z_R   = np.pi * W_0**2 / (M_SQ * WAVELENGTH)           # mm
+z     = Z_0 + np.linspace(-3*z_R, 3*z_R, num = 19)
+w     = ff.omega_z_lambda(wavelength = WAVELENGTH)([W_0, Z_0, M_SQ], z)
+w_err = 0.01 * w
+
+rng   = np.random.default_rng(4)
+w_obs = w + w_err * rng.standard_normal((N, len(z)))
+
+def fit_one(mode, i):
+    f = MsqOCFFitter(x = z, y = w_obs[i], yerror = w_err, wavelength = WAVELENGTH, mode = mode)
+    with contextlib.redirect_stdout(io.StringIO()): # OCFFitter.fit() prints its output
+        f.estimateAndFit()
+    return f
+
+test_print(1, "Batch fit of N caustics agrees with curve_fit one at a time...")
+try:
+    for mode in [MsqFitter.M2LAMBDA_MODE, MsqFitter.M2_MODE, MsqFitter.ISO_MODE]:
+        b = MsqBatchFitter(x = z, y = w_obs, yerror = w_err, wavelength = WAVELENGTH, mode = mode)
+        b.estimateAndFit()
+
+        single = [fit_one(mode, i) for i in range(N)]
+
+        assert b.output.beta.shape == (N, 3) and b.output.cov_beta.shape == (N, 3, 3), mode
+        assert np.all(b.output.converged), mode
+        assert np.allclose(b.output.beta, [f.output.beta for f in single], rtol = 1e-6), mode
+        assert np.allclose(b.m_squared, [f.m_squared for f in single], rtol = 1e-5), mode
+    test_print(1, f"Batch fit of N caustics agrees with curve_fit one at a time...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(1, f"Batch fit of N caustics agrees with curve_fit one at a time...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(2, "Batch covariances agree with the pcov of curve_fit...")
+try:
+    f = fit_one(MsqFitter.M2_MODE, 0)
+    b = MsqBatchFitter(x = z, y = w_obs[0], yerror = w_err, wavelength = WAVELENGTH, mode = MsqFitter.M2_MODE)
+    b.estimateAndFit()
+
+    assert np.allclose(b.output.sd_beta[0], f.output.sd_beta, rtol = 1e-4)
+    assert np.allclose(np.diag(b.output.cov_beta[0]), f.output.sd_beta**2, rtol = 1e-4)
+    test_print(2, f"Batch covariances agree with the pcov of curve_fit...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(2, f"Batch covariances agree with the pcov of curve_fit...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "One caustic with a grid of initial guesses and x-errors agrees with ODR...")
+try:
+    warnings.simplefilter("ignore")
+
+    y      = w_obs[0]
+    min_w  = np.argmin(y)
+    z_0s   = z[min_w] + np.linspace(-z_R, z_R, num = 5)
+    w_0s   = y[min_w] * np.linspace(0.5, 1.5, num = 5)
+    grid   = np.transpose([np.tile(z_0s, len(w_0s)), np.repeat(w_0s, len(z_0s))])
+
+    b = MsqBatchFitter(x = z, y = y, xerror = 1e-3, yerror = w_err, wavelength = WAVELENGTH, mode = MsqFitter.M2_MODE)
+    b.setInitialGuesses(z_0 = grid[:,0], w_0 = grid[:,1])
+    b.fit()
+
+    o = MsqODRFitter(x = z, y = y, xerror = 1e-3, yerror = w_err, wavelength = WAVELENGTH, mode = MsqFitter.M2_MODE)
+    o.estimateAndFit()
+
+    print(f"batch: {np.median(b.m_squared, axis = 0)}, ODR: {o.m_squared}")
+    assert b.output.beta.shape == (len(grid), 3)
+    assert np.all(b.output.converged)
+    assert np.allclose(np.abs(b.m_squared[:,0]), o.m_squared[0], rtol = 1e-4)
+    test_print(3, f"One caustic with a grid of initial guesses and x-errors agrees with ODR...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(3, f"One caustic with a grid of initial guesses and x-errors agrees with ODR...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "Converged problems are masked out of the remaining iterations...")
+try:
+    # The exact data with the exact parameters converges in the first iteration, the rest needs more
+    p0 = np.array([[W_0, Z_0, M_SQ], [0.5 * W_0, Z_0 + z_R, 1]])
+    out = batch_lm(ff.omega_z_lambda(wavelength = WAVELENGTH), z, w, p0, sigma = w_err)
+
+    print(f"iterations: {out.niter}")
+    assert np.all(out.converged)
+    assert out.niter[0] == 1 and out.niter[1] > 1
+    assert np.allclose(out.beta, [W_0, Z_0, M_SQ], rtol = 1e-6)
+    test_print(4, f"Converged problems are masked out of the remaining iterations...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(4, f"Converged problems are masked out of the remaining iterations...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(5, "ISO initial guesses are the linear solution, also with a degenerate caustic...")
+try:
+    b = MsqBatchFitter(x = z, y = w_obs, yerror = w_err, wavelength = WAVELENGTH, mode = MsqFitter.ISO_MODE)
+    b.estimateInitialGuesses()
+
+    linear = np.array([MsqOCFFitter(x = z, y = w_obs[i], yerror = w_err, wavelength = WAVELENGTH, mode = MsqFitter.ISO_MODE).solveLinearISO()[0] for i in range(N)])
+    assert np.allclose(b.initial_guesses, linear, rtol = 1e-8)
+
+    # The first caustic has only 2 distinct positions, which does not stop the guesses of the others
+    x = np.tile(z, (N, 1))
+    x[0] = np.where(np.arange(len(z)) < len(z) // 2, z[0], z[-1])
+
+    b = MsqBatchFitter(x = x, y = w_obs, yerror = w_err, wavelength = WAVELENGTH, mode = MsqFitter.ISO_MODE)
+    b.estimateInitialGuesses()
+    assert np.all(np.isfinite(b.initial_guesses)) and np.allclose(b.initial_guesses[1:], linear[1:], rtol = 1e-6)
+    test_print(5, f"ISO initial guesses are the linear solution, also with a degenerate caustic...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(5, f"ISO initial guesses are the linear solution, also with a degenerate caustic...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
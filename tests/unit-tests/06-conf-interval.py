@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from fitting.fitter import MsqFitter, MsqOCFFitter, MsqODRFitter
+import fitting.fit_functions as ff
+
+import io, contextlib, timeit
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+
+
+
+# w_0 [um], z_0 [mm], M_sq, lambda [nm]
+W_0, Z_0, M_SQ, WAVELENGTH = 100, 2, 1.3, 2300
+MODES = [MsqFitter.M2LAMBDA_MODE, MsqFitter.M2_MODE, MsqFitter.ISO_MODE]
+
+z_R   = np.pi * W_0**2 / (M_SQ * WAVELENGTH)           # mm
+z     = Z_0 + np.linspace(-3*z_R, 3*z_R, num = 19)
+w     = ff.omega_z_lambda(wavelength = WAVELENGTH)([W_0, Z_0, M_SQ], z)
+w_err = 0.01 * w
+w_obs = w + w_err * np.random.default_rng(5).standard_normal(len(z))
+
+z_plot = np.linspace(z.min(), z.max(), num = 4096)
+
+fitters = {}
+for mode in MODES:
+    fitters[mode] = MsqOCFFitter(x = z, y = w_obs, yerror = w_err, wavelength = WAVELENGTH, mode = mode)
+    with contextlib.redirect_stdout(io.StringIO()): # OCFFitter.fit() prints its output
+        fitters[mode].estimateAndFit()
+
+test_print(1, "Delta method without correlations agrees with the uncertainties reference...")
+try:
+    for mode, f in fitters.items():
+        ref    = f.conf_interval(z_plot, method = "uncertainties")
+
+        # Drop the correlations
+        f.output = f.output._replace(cov_beta = np.diag(f.output.sd_beta**2))
+        errors   = f.conf_interval(z_plot)
+        f.output = f.output._replace(cov_beta = None)
+        assert np.allclose(f.conf_interval(z_plot), ref, rtol = 1e-10), mode
+        assert np.allclose(errors, ref, rtol = 1e-10), mode
+    test_print(1, f"Delta method without correlations agrees with the uncertainties reference...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(1, f"Delta method without correlations agrees with the uncertainties reference...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+# Restore the full covariance
+for mode in MODES:
+    with contextlib.redirect_stdout(io.StringIO()):
+        fitters[mode].estimateAndFit()
+
+test_print(2, "With the full covariance, all modes give the same confidence interval...")
+try:
+    # All modes fit the same curve, so they have to agree once the correlations are taken into account
+    errors = { mode: f.conf_interval(z_plot) for mode, f in fitters.items() }
+    print(f"at z_0: { {mode: f.conf_interval(Z_0) for mode, f in fitters.items()} }")
+    assert np.allclose(errors[MsqFitter.M2_MODE], errors[MsqFitter.M2LAMBDA_MODE], rtol = 1e-4)
+    assert np.allclose(errors[MsqFitter.ISO_MODE], errors[MsqFitter.M2LAMBDA_MODE], rtol = 1e-4)
+    test_print(2, f"With the full covariance, all modes give the same confidence interval...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(2, f"With the full covariance, all modes give the same confidence interval...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "ODR covariance is scaled like sd_beta, scalar z gives a float...")
+try:
+    o = MsqODRFitter(x = z, y = w_obs, xerror = 1e-3, yerror = w_err, wavelength = WAVELENGTH, mode = MsqFitter.M2_MODE)
+    o.estimateAndFit()
+
+    assert np.allclose(np.sqrt(np.diag(o.covariance())), o.output.sd_beta)
+    assert np.allclose(o.conf_interval(z_plot), fitters[MsqFitter.M2_MODE].conf_interval(z_plot), rtol = 1e-2)
+
+    e = o.conf_interval(Z_0)
+    assert isinstance(e, float) and np.isclose(e, o.conf_interval(np.array([Z_0]))[0])
+    assert isinstance(o.conf_interval(Z_0, method = "uncertainties"), float)
+    test_print(3, f"ODR covariance is scaled like sd_beta, scalar z gives a float...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(3, f"ODR covariance is scaled like sd_beta, scalar z gives a float...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "Delta method takes less than 5 ms for 4096 points...")
+try:
+    f = fitters[MsqFitter.M2LAMBDA_MODE]
+    number = 100
+    t = min(timeit.repeat(lambda: f.conf_interval(z_plot), number = number, repeat = 3)) / number
+    print(f"{t * 1e3:.3f} ms")
+    assert t < 5e-3
+    test_print(4, f"Delta method takes less than 5 ms for 4096 points...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(4, f"Delta method takes less than 5 ms for 4096 points...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from measurement.measure import Measurement
+import measurement.errors as me
+
+from cameras.nanoscan import NanoScan
+from stage.controller import GSC01
+
+from measurement.buffer import CausticBuffer
+
+import logging
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+
+import tempfile
+import timeit
+
+n = NanoScan(devMode = True)
+c = GSC01(devMode = True)
+
+test_print(1, "Per-axis data are zero-copy views and behave like the former dict...")
+try:
+    b = CausticBuffer(axes = (n.AXES.X, n.AXES.Y))
+    assert b[n.AXES.X] is None and b[n.AXES.Y] is None
+    assert list(b.keys()) == [n.AXES.X, n.AXES.Y]
+
+    b.append(1.0, 100.0, 1.0, 200.0, 2.0, n_samples = 10)
+    b.append(2.0, 110.0, 1.1, 210.0, 2.1, n_samples = 20)
+
+    x, y = b[n.AXES.X], b[n.AXES.Y]
+    assert x.shape == (2, 3) and y.shape == (2, 3)
+    assert np.array_equal(x, [[1.0, 100.0, 1.0], [2.0, 110.0, 1.1]])
+    assert np.array_equal(y, [[1.0, 200.0, 2.0], [2.0, 210.0, 2.1]])
+    assert np.shares_memory(x, b.records) and np.shares_memory(y, b.records)
+    assert np.array_equal(b.records["n_samples"], [10, 20])
+
+    # Writing through a view changes the shared z column
+    x[0, 0] = 5.0
+    assert b[n.AXES.Y][0, 0] == 5.0 and b.records["z"][0] == 5.0
+    test_print(1, f"Per-axis data are zero-copy views and behave like the former dict...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(1, f"Per-axis data are zero-copy views and behave like the former dict...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(2, "Buffer grows and keeps its content...")
+try:
+    rng  = np.random.default_rng(6)
+    rows = rng.random((1000, 5))
+
+    b = CausticBuffer(capacity = 4)
+    for row in rows[:700]:
+        b.append(*row)
+    b.extend(*rows[700:].T, n_samples = 3)
+
+    assert len(b) == 1000 and b.capacity >= 1000
+    assert np.array_equal(b["x"], rows[:, [0, 1, 2]])
+    assert np.array_equal(b["y"], rows[:, [0, 3, 4]])
+    assert np.all(b.records["n_samples"][700:] == 3)
+    test_print(2, f"Buffer grows and keeps its content...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(2, f"Buffer grows and keeps its content...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "Measurement data survive writing, reading and fitting...")
+try:
+    with Measurement(devMode = True, camera = n, controller = c) as M:
+        M.LOGLEVEL_THRESHOLD = logging.ERROR
+        M.cache.LOGLEVEL_THRESHOLD = logging.ERROR
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, "caustic.dat")
+            data  = M.take_measurements(precision = 10, numsamples = 5, writeToFile = fname)
+            m2    = M.fit_data(axis = n.AXES.X, wavelength = 2300)
+
+            assert isinstance(data, CausticBuffer) and len(data) > 0
+            assert np.all(data.records["n_samples"] > 0)
+
+            x, y = data[n.AXES.X].copy(), data[n.AXES.Y].copy()
+
+            M.data = M._new_buffer()
+            M.read_from_file(fname)
+
+        assert np.array_equal(M.data[n.AXES.X], x) and np.array_equal(M.data[n.AXES.Y], y)
+        assert np.allclose(M.fit_data(axis = n.AXES.X, wavelength = 2300), m2)
+    test_print(3, f"Measurement data survive writing, reading and fitting...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(3, f"Measurement data survive writing, reading and fitting...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "Appending is linear in the number of points...")
+try:
+    def fill(num):
+        b = CausticBuffer()
+        for i in range(num):
+            b.append(i, 1.0, 0.1, 2.0, 0.2)
+
+    t_small = min(timeit.repeat(lambda: fill(5000) , number = 1, repeat = 3))
+    t_large = min(timeit.repeat(lambda: fill(40000), number = 1, repeat = 3))
+
+    print(f"5000 points: {1e3 * t_small:.1f} ms, 40000 points: {1e3 * t_large:.1f} ms")
+    assert t_large / t_small < 8 * 2 # quadratic would be 64
+    test_print(4, f"Appending is linear in the number of points...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(4, f"Appending is linear in the number of points...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
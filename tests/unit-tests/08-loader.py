@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from measurement.measure import Measurement
+import measurement.errors as me
+
+from cameras.nanoscan import NanoScan
+from stage.controller import GSC01
+
+from measurement.buffer import CausticBuffer
+from measurement.loader import CausticLoader
+
+import logging
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+
+import glob
+import tempfile
+import time
+
+datadir = os.path.abspath(os.path.join(base_dir, "..", "outlier", "datasets"))
+
+def read_lines(filename):
+    """Reference: the former line-by-line parser of Measurement.read_from_file()"""
+    rows = []
+    with open(filename, 'r') as f:
+        for line in f:
+            l = line.strip()
+            if l[0] != "#":
+                rows.append([ float(x) for x in l.split("\t") ])
+    return np.array(rows)
+
+def write_run(filename, rows, metadata):
+    with open(filename, 'w') as f:
+        f.write("# Data written on 2022-03-30 at 18:00:05\n# ==== Metadata ====\n")
+        for key, val in metadata.items():
+            f.write(f"#\t{key}: {val}\n")
+        f.write("# ====== Data ======\n# position[mm]\tx_diam[um]\tdx_diam[um]\ty_diam[um]\tdy_diam[um]\n")
+        for row in rows:
+            f.write("\t".join(str(x) for x in row) + "\n")
+
+loader = CausticLoader()
+loader.LOGLEVEL_THRESHOLD = logging.CRITICAL
+
+test_print(1, "Loader agrees with the line-by-line parser and reads the metadata...")
+try:
+    files = sorted(f for f in glob.glob(os.path.join(datadir, "2022-*.dat")) if not f.endswith("_log.dat"))
+    assert len(files) > 0
+
+    for fname in files:
+        data = loader.read(fname)
+        ref  = read_lines(fname)
+
+        assert isinstance(data, CausticBuffer)
+        assert np.array_equal(data["x"], ref[:, [0, 1, 2]]) and np.array_equal(data["y"], ref[:, [0, 3, 4]]), fname
+        assert data.metadata["Wavelength"] == "2350.0 nm", fname
+        assert data.metadata["Data written on"].startswith("2022-03-30"), fname
+    test_print(1, f"Loader agrees with the line-by-line parser and reads the metadata...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(1, f"Loader agrees with the line-by-line parser and reads the metadata...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(2, "Directory loader skips files that are not data files...")
+try:
+    runs = loader.read_directory(datadir)
+    print(runs)
+
+    # The *_log.dat and the csv dataset_NN.dat files are skipped
+    assert len(runs) == len(files) and runs.files == files
+    assert runs.offsets[-1] == len(runs.records)
+    for i in range(len(runs)):
+        assert np.array_equal(runs.records[runs.offsets[i]:runs.offsets[i + 1]], runs[i].records)
+        assert np.all(runs.run_index[runs.offsets[i]:runs.offsets[i + 1]] == i)
+
+    # Loading in processes gives the same runs
+    procs = CausticLoader(workers = 2, processes = True)
+    procs.LOGLEVEL_THRESHOLD = logging.CRITICAL
+    other = procs.read_directory(datadir)
+    assert other.files == runs.files and other.records.tobytes() == runs.records.tobytes()
+    test_print(2, f"Directory loader skips files that are not data files...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(2, f"Directory loader skips files that are not data files...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "Samples per Point in the metadata is read into n_samples...")
+try:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fname = os.path.join(tmpdir, "run.dat")
+        rows  = np.random.default_rng(7).random((21, 5))
+        write_run(fname, rows, { "Samples per Point": ", ".join(str(i) for i in range(21)) })
+
+        data = loader.read(fname)
+        assert np.array_equal(data.records["n_samples"], np.arange(21))
+        assert np.array_equal(data["x"], rows[:, [0, 1, 2]])
+    test_print(3, f"Samples per Point in the metadata is read into n_samples...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(3, f"Samples per Point in the metadata is read into n_samples...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "A year of runs (1000 files) loads in less than 5 s...")
+try:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        rng = np.random.default_rng(8)
+        for i in range(1000):
+            write_run(os.path.join(tmpdir, f"run_{i:04d}.dat"), rng.random((21, 5)), { "Wavelength": "2300 nm" })
+
+        t0   = time.perf_counter()
+        runs = loader.read_directory(tmpdir)
+        t    = time.perf_counter() - t0
+
+    print(f"{runs}: {t:.3f} s")
+    assert len(runs) == 1000 and len(runs.records) == 21000
+    assert t < 5
+    test_print(4, f"A year of runs (1000 files) loads in less than 5 s...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(4, f"A year of runs (1000 files) loads in less than 5 s...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
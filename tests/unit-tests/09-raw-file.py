@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from measurement.measure import Measurement
+import measurement.errors as me
+
+from cameras.nanoscan import NanoScan
+from stage.controller import GSC01
+
+from measurement.rawfile import RawWriter, RawReader
+
+import logging
+import time
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+
+import tempfile
+import shutil
+import tempfile
+import timeit
+
+n = NanoScan(devMode = True)
+c = GSC01(devMode = True)
+
+rng = np.random.default_rng(9)
+
+test_print(1, "Raw samples survive writing and reading...")
+try:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fname  = os.path.join(tmpdir, "caustic.raw")
+        points = [(0.5 * i, 100 + rng.random(50), 200 + rng.random(50)) for i in range(21)]
+
+        with RawWriter(fname, metadata = { "Wavelength": "2300 nm" }) as w:
+            w.setPhase("Finding Center")
+            w.writePoint(z = 3.0, cached = True)
+            w.setPhase("Caustic")
+            for z, x, y in points:
+                w.writePoint(z = np.full(len(x), z), x = x, y = y, t = time.time())
+
+        with RawReader(fname) as r:
+            assert r.complete and len(r) == 22
+            assert r.metadata == { "Wavelength": "2300 nm" }
+            assert r.points[0]["cached"] and r.points[0]["phase"] == "Finding Center" and r.counts[0] == 0
+            assert all(p["phase"] == "Caustic" for p in r.points[1:])
+
+            for i, (z, x, y) in enumerate(points):
+                assert np.array_equal(r[i + 1]["x"], x.astype(np.float32)) and np.array_equal(r[i + 1]["y"], y.astype(np.float32))
+                assert np.all(r[i + 1]["z"] == np.float32(z)) and np.all(r[i + 1]["point_id"] == i + 1)
+
+            assert np.allclose(r.times(5), time.time(), atol = 60)
+            assert len(r.column("x")) == 21 * 50
+    test_print(1, f"Raw samples survive writing and reading...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(1, f"Raw samples survive writing and reading...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(2, "Interrupted raw file is recovered from its chunks...")
+try:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fname  = os.path.join(tmpdir, "caustic.raw")
+        copied = os.path.join(tmpdir, "interrupted.raw")
+
+        w = RawWriter(fname)
+        for i in range(5):
+            w.writePoint(z = float(i), x = rng.random(10), y = rng.random(10))
+
+        # Points are on disk before the file is closed, the last one is only partially written
+        shutil.copy(fname, copied)
+        with open(copied, 'ab') as f:
+            f.write(b"PNT\x00" + b"\x05\x00\x00\x00" + b"\x0a\x00\x00\x00")
+        w.close()
+
+        r = RawReader(copied)
+        r.LOGLEVEL_THRESHOLD = logging.ERROR
+        assert not r.complete and len(r) == 5
+        assert np.array_equal(r.offsets, RawReader(fname).offsets)
+        assert r.points[4]["position"] == 4.0
+    test_print(2, f"Interrupted raw file is recovered from its chunks...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(2, f"Interrupted raw file is recovered from its chunks...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "Raw data of a measurement are written point by point...")
+try:
+    with Measurement(devMode = True, camera = n, controller = c) as M:
+        M.LOGLEVEL_THRESHOLD = logging.ERROR
+        M.cache.LOGLEVEL_THRESHOLD = logging.ERROR
+
+        # The devMode camera is simulated by Measurement, so we let it return raw samples instead
+        def getAxis_avg_D4Sigma(axis, numsamples, returnRaw = False, **kwargs):
+            raw = np.column_stack((100 + rng.random(numsamples), 200 + rng.random(numsamples)))
+            n.lastNumSamples = numsamples
+            ret = np.column_stack((raw.mean(axis = 0), raw.std(axis = 0)))
+            return (ret, raw) if returnRaw else ret
+
+        n.getAxis_avg_D4Sigma = getAxis_avg_D4Sigma
+        n.devMode = False
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, "caustic.dat")
+            rname = os.path.join(tmpdir, "caustic.raw")
+            data = M.take_measurements(center = 5000, rayleighLength = 2, precision = 10, numsamples = 20, writeToFile = fname, saveRaw = rname)
+            x    = data[n.AXES.X].copy()
+
+            M.data = M._new_buffer()
+            meta   = M.read_from_file(fname)
+            assert meta["Raw Data File"] == os.path.realpath(rname)
+
+            with RawReader(rname) as r:
+                assert r.complete and len(r) == len(x)
+                assert np.all(r.counts == 20)
+                for i in range(len(r)):
+                    assert np.isclose(r[i]["x"].mean(), x[i, 1], rtol = 1e-6)
+                    assert np.allclose(r[i]["z"], x[i, 0])
+
+        n.devMode = True
+        del n.getAxis_avg_D4Sigma
+    test_print(3, f"Raw data of a measurement are written point by point...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(3, f"Raw data of a measurement are written point by point...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "Any point is read without scanning the file...")
+try:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fname = os.path.join(tmpdir, "large.raw")
+        with RawWriter(fname) as w:
+            for i in range(2000):
+                w.writePoint(z = float(i), x = rng.random(500), y = rng.random(500))
+
+        with RawReader(fname) as r:
+            p = r[1234]["x"]
+            assert isinstance(p.base, np.memmap) or isinstance(p, np.memmap)
+            assert r.points[1234]["position"] == 1234.0
+
+            number = 2000
+            t = min(timeit.repeat(lambda: r[rng.integers(len(r))]["x"].sum(), number = number, repeat = 3)) / number
+            print(f"{t * 1e6:.1f} us per point, {os.path.getsize(fname) / 2**20:.1f} MiB file")
+            assert t < 200e-6
+    test_print(4, f"Any point is read without scanning the file...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(4, f"Any point is read without scanning the file...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
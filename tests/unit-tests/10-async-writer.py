@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from measurement.measure import Measurement
+import measurement.errors as me
+
+from cameras.nanoscan import NanoScan
+from stage.controller import GSC01
+
+from measurement.rawfile import RawWriter, AsyncRawWriter, RawReader
+
+import logging
+import time
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+
+import tempfile
+import tempfile
+
+n = NanoScan(devMode = True)
+c = GSC01(devMode = True)
+
+rng = np.random.default_rng(10)
+
+class SlowFile():
+    """Binary file that takes `delay` s for every write, like a slow network drive"""
+    def __init__(self, name, delay):
+        self.f, self.delay, self.name = open(name, 'wb'), delay, name
+        self.writes = 0
+
+    def write(self, data):
+        time.sleep(self.delay)
+        self.writes += 1
+        return self.f.write(data)
+
+    def __getattr__(self, attr):
+        return getattr(self.f, attr)
+
+points = [(0.5 * i, 100 + rng.random(200), 200 + rng.random(200)) for i in range(40)]
+
+test_print(1, "Background writer produces the same file...")
+try:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        files = { "sync": os.path.join(tmpdir, "sync.raw"), "async": os.path.join(tmpdir, "async.raw") }
+        for kind, fname in files.items():
+            with (RawWriter(fname, t0 = 0) if kind == "sync" else AsyncRawWriter(fname, t0 = 0)) as w:
+                w.LOGLEVEL_THRESHOLD = logging.ERROR
+                for i, (z, x, y) in enumerate(points):
+                    x = x.copy()
+                    w.setPhase("Caustic" if i else "Finding Center")
+                    w.writePoint(z = z, x = x, y = y, t = 1000.0 + i)
+                    x[:] = 0 # the samples are copied when queued
+
+        sync, asyn = RawReader(files["sync"]), RawReader(files["async"])
+        assert asyn.complete and len(asyn) == len(points)
+        assert np.array_equal(sync.offsets, asyn.offsets) and sync.points == asyn.points
+        assert all(np.array_equal(sync.point(i), asyn.point(i)) for i in range(len(points)))
+        assert np.all(asyn.column("x") != 0)
+    test_print(1, f"Background writer produces the same file...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(1, f"Background writer produces the same file...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(2, "Acquisition does not wait for a slow disk...")
+try:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fname = os.path.join(tmpdir, "slow.raw")
+
+        f  = SlowFile(fname, delay = 0.02)
+        w  = AsyncRawWriter(f, flushInterval = 0.05)
+        w.LOGLEVEL_THRESHOLD = logging.ERROR
+
+        t0 = time.perf_counter()
+        for z, x, y in points:
+            w.writePoint(z = z, x = x, y = y)
+            time.sleep(0.002) # acquisition of the next point
+        t_acq = time.perf_counter() - t0
+        w.close()
+
+        print(f"Acquisition {1e3 * t_acq:.0f} ms, {f.writes - 2} writes for {len(points)} points, {w.summary()}")
+        assert t_acq < len(points) * 0.02 / 2
+        assert f.writes - 2 < len(points) # header and index
+        assert w.stats()["points"] == len(points) and w.stats()["queued"] == 0
+        assert len(RawReader(fname)) == len(points)
+    test_print(2, f"Acquisition does not wait for a slow disk...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(2, f"Acquisition does not wait for a slow disk...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "Points are flushed after flushInterval or flushBytes...")
+try:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fname = os.path.join(tmpdir, "interval.raw")
+        w = AsyncRawWriter(fname, flushInterval = 0.05, flushBytes = 1 << 30)
+        w.writePoint(z = 1.0, x = rng.random(10), y = rng.random(10))
+        time.sleep(0.5)
+
+        r = RawReader(fname)
+        r.LOGLEVEL_THRESHOLD = logging.ERROR
+        assert not r.complete and len(r) == 1
+        w.close()
+
+        fname = os.path.join(tmpdir, "bytes.raw")
+        w = AsyncRawWriter(fname, flushInterval = 1000, flushBytes = 1000)
+        for z, x, y in points[:5]:
+            w.writePoint(z = z, x = x, y = y) # 200 samples = 4000 bytes each
+        time.sleep(0.5)
+
+        r = RawReader(fname)
+        r.LOGLEVEL_THRESHOLD = logging.ERROR
+        assert not r.complete and len(r) == 5
+        w.close()
+    test_print(3, f"Points are flushed after flushInterval or flushBytes...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(3, f"Points are flushed after flushInterval or flushBytes...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "All queued points are written when the measurement is interrupted...")
+try:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fname = os.path.join(tmpdir, "interrupted.raw")
+
+        with Measurement(devMode = True, camera = n, controller = c) as M:
+            M.LOGLEVEL_THRESHOLD = logging.ERROR
+            M.rawFlushInterval   = 1000
+
+            M.openedFile = M.get_raw_file(writeToFile = fname)
+            M.openedFile.LOGLEVEL_THRESHOLD = logging.ERROR
+            for z, x, y in points:
+                M.openedFile.writePoint(z = z, x = x, y = y)
+
+            try:
+                M.KeyboardInterruptHandler(None, None)
+            except KeyboardInterrupt:
+                pass
+
+            assert M.openedFile is None
+
+        r = RawReader(fname)
+        assert r.complete and len(r) == len(points)
+        assert np.allclose(r[len(points) - 1]["y"], points[-1][2])
+    test_print(4, f"All queued points are written when the measurement is interrupted...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(4, f"All queued points are written when the measurement is interrupted...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from measurement.measure import Measurement
+import measurement.errors as me
+
+from cameras.nanoscan import NanoScan
+from stage.controller import GSC01
+
+from measurement.checkpoint import Checkpoint
+
+import logging
+import time
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+
+import tempfile
+import tempfile
+
+n = NanoScan(devMode = True)
+c = GSC01(devMode = True)
+
+class Interrupted(KeyboardInterrupt):
+    pass
+
+def interrupt_after(M, k = None):
+    """Counts the calls of M.measure_at(), and lets it raise a KeyboardInterrupt once k points of the caustic are in the checkpoint"""
+    measure_at = lambda **kwargs: Measurement.measure_at(M, **kwargs)
+    M.calls    = 0
+    def wrapped(**kwargs):
+        if k is not None and M.checkpoint is not None and len(M.checkpoint.points) >= k:
+            raise Interrupted
+        M.calls += 1
+        return measure_at(**kwargs)
+    M.measure_at = wrapped
+
+test_print(1, "Checkpoint records survive a crash while writing...")
+try:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fname = os.path.join(tmpdir, "run.ckpt")
+        with Checkpoint(fname) as ckpt:
+            ckpt.start({ "precision": 10 })
+            ckpt.setParams(np.array([5000]), np.array([400]))
+            ckpt.setPlan(np.array([4000, 5000, 6000]))
+            ckpt.addPoint(pos = 4000, z = 20.0, x = [100.0, 1.0], y = [110.0, 1.1], n_samples = 50)
+
+        # Half-written last record
+        with open(fname, 'a') as f:
+            f.write('{"type": "point", "pos": 50')
+
+        ckpt = Checkpoint.load(fname)
+        ckpt.LOGLEVEL_THRESHOLD = logging.ERROR
+        assert ckpt.params == { "precision": 10 } and ckpt.center == [5000] and ckpt.rayleighLength == [400]
+        assert ckpt.remaining() == [5000, 6000] and ckpt.points[4000]["x"] == [100.0, 1.0]
+
+        # A corrupt record in the middle is an error
+        with open(fname, 'a') as f:
+            f.write('\n{"type": "done", "file": null}\n')
+        try:
+            Checkpoint.load(fname)
+            assert False, "corrupt checkpoint was loaded"
+        except ValueError:
+            pass
+    test_print(1, f"Checkpoint records survive a crash while writing...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(1, f"Checkpoint records survive a crash while writing...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(2, "Interrupted measurement is resumed without measuring points again...")
+try:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with Measurement(devMode = True, camera = n, controller = c) as M:
+            M.LOGLEVEL_THRESHOLD = logging.ERROR
+            M.cache.LOGLEVEL_THRESHOLD = logging.ERROR
+
+            full  = M.take_measurements(precision = 10, numsamples = 5, writeToFile = os.path.join(tmpdir, "full.dat"), checkpoint = False)
+            full  = full[n.AXES.X].copy()
+
+            fname = os.path.join(tmpdir, "caustic.dat")
+            interrupt_after(M, 8)
+            try:
+                M.take_measurements(precision = 10, numsamples = 5, writeToFile = fname)
+                assert False, "measurement was not interrupted"
+            except Interrupted:
+                pass
+
+            ckpt = Checkpoint.load(fname + ".ckpt")
+            assert len(ckpt.points) == 8 and len(ckpt.remaining()) == len(full) - 8 and ckpt.finished is None
+
+        with Measurement(devMode = True, camera = n, controller = c) as M:
+            M.LOGLEVEL_THRESHOLD = logging.ERROR
+            M.cache.LOGLEVEL_THRESHOLD = logging.ERROR
+
+            interrupt_after(M)
+            data = M.resume(fname + ".ckpt")
+
+            assert M.calls == len(full) - 8
+            assert np.allclose(data[n.AXES.X], full)
+
+            meta = M.read_from_file(fname)
+            assert meta["Resumed From"] == os.path.realpath(fname + ".ckpt")
+            assert not os.path.exists(fname + ".ckpt")
+    test_print(2, f"Interrupted measurement is resumed without measuring points again...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(2, f"Interrupted measurement is resumed without measuring points again...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "Resuming homes a dirty stage and skips the search for the center...")
+try:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fname = os.path.join(tmpdir, "caustic.dat")
+
+        with Measurement(devMode = True, camera = n, controller = c) as M:
+            M.LOGLEVEL_THRESHOLD = logging.ERROR
+            M.cache.LOGLEVEL_THRESHOLD = logging.ERROR
+
+            interrupt_after(M, 3)
+            try:
+                M.take_measurements(precision = 10, numsamples = 5, writeToFile = fname)
+            except Interrupted:
+                pass
+
+            ckpt = Checkpoint.load(fname + ".ckpt")
+            assert ckpt.center is not None and len(ckpt.points) == 3
+
+            homed = []
+            homeStage = M.homeStage
+            def countHoming():
+                homed.append(True)
+                return homeStage()
+            M.homeStage = countHoming
+
+            # As after jogging the stage by hand
+            M.devMode = False
+            c.stage.dirty = True
+
+            interrupt_after(M)
+            M.resume(fname + ".ckpt")
+            M.devMode = True
+
+            assert len(homed) == 1 and not c.stage.dirty
+            assert M.calls == len(ckpt.remaining())
+    test_print(3, f"Resuming homes a dirty stage and skips the search for the center...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(3, f"Resuming homes a dirty stage and skips the search for the center...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "Resuming a completed measurement reads its data file...")
+try:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fname = os.path.join(tmpdir, "caustic.dat")
+
+        with Measurement(devMode = True, camera = n, controller = c) as M:
+            M.LOGLEVEL_THRESHOLD = logging.ERROR
+            M.cache.LOGLEVEL_THRESHOLD = logging.ERROR
+
+            full = M.take_measurements(precision = 10, numsamples = 5, writeToFile = fname)[n.AXES.X].copy()
+            assert not os.path.exists(fname + ".ckpt")
+
+            # As if the checkpoint could not be deleted
+            with Checkpoint(fname + ".ckpt") as ckpt:
+                ckpt.start({ "precision": 10 })
+                ckpt.finish(fname)
+
+            interrupt_after(M)
+            data = M.resume(fname + ".ckpt")
+            assert np.array_equal(data[n.AXES.X], full) and M.calls == 0
+    test_print(4, f"Resuming a completed measurement reads its data file...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(4, f"Resuming a completed measurement reads its data file...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(5, "Checkpoints and raw data of earlier runs are kept...")
+try:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # Appending after a crash while writing
+        fname = os.path.join(tmpdir, "run.ckpt")
+        with Checkpoint(fname) as ckpt:
+            ckpt.start({ "precision": 10 })
+            ckpt.setPlan(np.array([4000, 5000]))
+        with open(fname, 'a') as f:
+            f.write('{"type": "point", "pos": 40')
+
+        with Checkpoint(fname) as ckpt:
+            ckpt.LOGLEVEL_THRESHOLD = logging.ERROR
+            ckpt.addPoint(pos = 5000, z = 25.0, x = [100.0, 1.0], y = [110.0, 1.1])
+
+        ckpt = Checkpoint.load(fname)
+        assert ckpt.remaining() == [4000] and ckpt.points[5000]["z"] == 25.0
+
+        # Only the line break is missing
+        with open(fname, 'a') as f:
+            f.write('{"type": "point", "pos": 4000, "z": 20.0, "x": [1, 0], "y": [1, 0], "n_samples": null}')
+        with Checkpoint(fname) as ckpt:
+            ckpt.finish(None)
+        ckpt = Checkpoint.load(fname)
+        assert ckpt.remaining() == [] and ckpt.finished is None and len(open(fname).read().splitlines()) == 5
+
+        fname = os.path.join(tmpdir, "caustic.dat")
+        raw   = os.path.join(tmpdir, "caustic.raw")
+
+        with Measurement(devMode = True, camera = n, controller = c) as M:
+            M.LOGLEVEL_THRESHOLD = logging.ERROR
+            M.cache.LOGLEVEL_THRESHOLD = logging.ERROR
+
+            interrupt_after(M, 3)
+            try:
+                M.take_measurements(precision = 10, numsamples = 5, writeToFile = fname, saveRaw = raw)
+            except Interrupted:
+                pass
+            M.closeAnyOpenFile()
+            recorded = open(raw, 'rb').read()
+
+            # A new measurement to the same file does not overwrite the unfinished checkpoint
+            interrupt_after(M, 1)
+            try:
+                M.take_measurements(precision = 10, numsamples = 5, writeToFile = fname, checkpoint = True)
+            except Interrupted:
+                pass
+            M.closeAnyOpenFile()
+
+            rotated = os.path.join(tmpdir, "caustic.dat.unfinished.ckpt")
+            assert len(Checkpoint.load(rotated).points) == 3 and len(Checkpoint.load(fname + ".ckpt").points) == 1
+
+            interrupt_after(M)
+            M.resume(rotated)
+
+            assert open(raw, 'rb').read() == recorded and len(recorded)
+            meta = M.read_from_file(fname)
+            assert meta["Raw Data File (before resuming)"] == os.path.realpath(raw)
+            assert meta["Raw Data File"] == os.path.realpath(os.path.join(tmpdir, "caustic.resumed.raw"))
+            assert os.path.getsize(meta["Raw Data File"]) > 0
+            assert not os.path.exists(rotated) and os.path.exists(fname + ".ckpt")
+    test_print(5, f"Checkpoints and raw data of earlier runs are kept...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(5, f"Checkpoints and raw data of earlier runs are kept...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from measurement.measure import Measurement
+from measurement.scheduler import PointScheduler
+
+from cameras.nanoscan import NanoScan
+from stage.controller import GSC01
+from stage.motion import MotionModel
+
+import itertools
+import logging
+import tempfile
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+
+model = MotionModel(minSpeed = 500, maxSpeed = 5000, acdcTime = 200)
+rng   = np.random.default_rng(17)
+
+test_print(1, "Motion model is a trapezoid, and a triangle for short moves...")
+try:
+    # Ramps: (500 + 5000) / 2 pps for 0.2 s, twice
+    assert model.rampDistance == 1100
+    assert np.isclose(model.moveTime(1100), 0.4) and np.isclose(model.moveTime(-1100), 0.4)
+    assert np.isclose(model.moveTime(6100), 0.4 + 5000 / 5000)
+    assert model.moveTime(0) == 0
+
+    # Continuous and increasing
+    d = np.arange(0, 5000)
+    t = model.moveTime(d)
+    assert np.all(np.diff(t) > 0) and np.max(np.abs(np.diff(t))) < 1e-2
+
+    # Without acceleration, everything is at the maximum speed
+    assert np.isclose(MotionModel(minSpeed = 500, maxSpeed = 5000, acdcTime = 0).moveTime(5000), 1)
+    test_print(1, f"Motion model is a trapezoid, and a triangle for short moves...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(1, f"Motion model is a trapezoid, and a triangle for short moves...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(2, "Scheduled order is no slower than sorted order and optimal for few points...")
+try:
+    scheduler = PointScheduler()
+    points    = np.array([-9000, -7000, -5000, -1000, -500, 0, 500, 1000, 5000, 7000, 9000])
+
+    # From above the points, the sweep goes downwards
+    schedule = scheduler.schedule(points, start = 20000, model = model)
+    assert np.array_equal(schedule.points, points[::-1]) and all(v is None for v in schedule.via)
+
+    for start in [-20000, -3000, 0, 800, 8000]:
+        schedule = scheduler.schedule(points, start = start, model = model)
+        assert sorted(schedule.points.tolist()) == points.tolist()
+        assert schedule.predictedTotal <= scheduler.predict(points, start = start, model = model).predictedTotal + 1e-9
+        assert schedule.predictedTotal <= scheduler.predict(points[::-1], start = start, model = model).predictedTotal + 1e-9
+
+    for _ in range(20):
+        pts   = np.unique(rng.integers(-20000, 20000, 6))
+        start = int(rng.integers(-20000, 20000))
+        best  = min(scheduler.predict(np.array(o), start = start, model = model).predictedTotal for o in itertools.permutations(pts))
+        assert np.isclose(scheduler.schedule(pts, start = start, model = model).predictedTotal, best)
+    test_print(2, f"Scheduled order is no slower than sorted order and optimal for few points...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(2, f"Scheduled order is no slower than sorted order and optimal for few points...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "Unidirectional approach arrives at every point in the same direction...")
+try:
+    for approach in [-1, 1]:
+        scheduler = PointScheduler(approach = approach, backlash = 300)
+        for _ in range(10):
+            pts      = np.unique(rng.integers(-20000, 20000, 12))
+            start    = int(rng.integers(-20000, 20000))
+            schedule = scheduler.schedule(pts, start = start, model = model, lower = -20000, upper = 20000)
+
+            pos = start
+            for pt, via in schedule:
+                if via is not None:
+                    assert via == np.clip(pt - approach * 300, -20000, 20000)
+                    pos = via
+                assert np.sign(pt - pos) == approach
+                pos = pt
+
+            # Going up from the lowest point needs no detours
+            first = scheduler.schedule(pts, start = -30000 if approach > 0 else 30000, model = model)
+            assert all(v is None for v in first.via) and np.array_equal(first.points, pts if approach > 0 else pts[::-1])
+    test_print(3, f"Unidirectional approach arrives at every point in the same direction...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(3, f"Unidirectional approach arrives at every point in the same direction...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "take_measurements() records the travel times and keeps the data sorted...")
+try:
+    n = NanoScan(devMode = True)
+    c = GSC01(devMode = True)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with Measurement(devMode = True, camera = n, controller = c) as M:
+            M.LOGLEVEL_THRESHOLD = logging.ERROR
+            M.cache.LOGLEVEL_THRESHOLD = logging.ERROR
+
+            fname    = os.path.join(tmpdir, "any.dat")
+            anyOrder = M.take_measurements(precision = 10, numsamples = 5, writeToFile = fname)[n.AXES.X].copy()
+
+            schedule = M.lastSchedule
+            # Points measured during the search come from the cache without moving
+            assert len(schedule) == len(anyOrder) and np.count_nonzero(np.isfinite(schedule.actual)) + M.cache.hits >= len(schedule)
+            assert np.all(np.diff(anyOrder[:, 0]) > 0)
+
+            with open(fname, 'r') as f:
+                assert "Travel Time: predicted" in f.read()
+
+            M.scheduler = PointScheduler(approach = -1, backlash = 200)
+            unidirectional = M.take_measurements(precision = 10, numsamples = 5, writeToFile = os.path.join(tmpdir, "uni.dat"))[n.AXES.X]
+
+            assert np.array_equal(unidirectional, anyOrder)
+            assert M.lastSchedule.predictedTotal >= schedule.predictedTotal or M.lastSchedule.start != schedule.start
+    test_print(4, f"take_measurements() records the travel times and keeps the data sorted...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(4, f"take_measurements() records the travel times and keeps the data sorted...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
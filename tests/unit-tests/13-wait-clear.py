@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from stage.controller import GSC01
+from stage.motion import MotionModel
+import stage.errors
+
+import logging
+import time
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+
+class FakeSerial():
+    """Answers the commands of GSC01 like the controller, moves take the time given by `model`"""
+    def __init__(self, model: MotionModel):
+        self.model     = model
+        self.buffer    = b''
+        self.pos       = 0
+        self.target    = 0
+        self.busyUntil = 0
+        self.polls     = 0
+
+    def isOpen(self):
+        return True
+
+    def close(self):
+        pass
+
+    def write(self, cmd):
+        cmd   = cmd.decode("ascii").strip()
+        reply = "OK"
+        if cmd[:2] in ["A:", "M:"]:
+            delta       = (-1 if cmd[3] == "-" else 1) * int(cmd[5:])
+            self.target = delta if cmd[0] == "A" else self.pos + delta
+        elif cmd == "G:":
+            self.busyUntil = time.monotonic() + self.model.moveTime(self.target - self.pos)
+            self.pos       = self.target
+        elif cmd == "!:":
+            self.polls += 1
+            reply = "B" if time.monotonic() < self.busyUntil else "R"
+        self.buffer += reply.encode("ascii") + b"\r\n"
+
+    def inWaiting(self):
+        return len(self.buffer)
+
+    def read(self, n = 1):
+        out, self.buffer = self.buffer[:n], self.buffer[n:]
+        return out
+
+c = GSC01(devMode = True)
+c.LOGLEVEL_THRESHOLD = logging.ERROR
+c.optimizer = None  # Keep the set speeds, see 14-speed-profile.py
+
+def connect(model = None):
+    """Lets `c` talk to a FakeSerial, whose moves take as long as predicted by `model`"""
+    c.devMode = False
+    c.dev     = FakeSerial(model if model is not None else c.motion)
+    c.dev.pos = c.stage.position
+    return c.dev
+
+def timed_move(pos):
+    """Returns the time from the end of the move until waitClear() returns"""
+    c.move(pos)
+    c.waitClear()
+    return time.monotonic() - c.dev.busyUntil
+
+test_print(1, "Predictions follow the speed settings and need a clean position...")
+try:
+    c.setSpeed(minSpeed = 500, maxSpeed = 5000, acdcTime = 200)
+    assert (c.motion.minSpeed, c.motion.maxSpeed, c.motion.acdcTime) == (500, 5000, 200)
+    assert np.isclose(c.predictMove(c.stage.position + 6100), 1.4) and np.isclose(c.predictRmove(-6100), 1.4)
+
+    c.setSpeed(maxSpeed = 10000, acdcTime = 100)
+    assert c.predictRmove(20000) < MotionModel(500, 5000, 200).moveTime(20000)
+    assert np.isclose(c.motion.pathTime([1000, 0], start = 0), 2 * c.motion.moveTime(1000))
+    c.setSpeed(init = True)
+
+    c.stage.dirty = True
+    assert c.predictMove(0) is None
+    c.stage.dirty = False
+    test_print(1, f"Predictions follow the speed settings and need a clean position...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(1, f"Predictions follow the speed settings and need a clean position...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(2, "waitClear() sleeps through the move and polls near the end...")
+try:
+    dev = connect()
+    for pos in [3000, 500, -4000, -4000]:
+        dev.polls = 0
+        late      = timed_move(pos)
+        assert 0 <= late < 0.03 and dev.polls <= 3, (late, dev.polls)
+    c.devMode = True
+    test_print(2, f"waitClear() sleeps through the move and polls near the end...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    c.devMode = True
+    print(e)
+    test_print(2, f"waitClear() sleeps through the move and polls near the end...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "waitClear() still waits for moves slower than predicted...")
+try:
+    dev = connect(MotionModel(minSpeed = 250, maxSpeed = 2500, acdcTime = 400))
+    for pos in [2000, 0]:
+        late = timed_move(pos)
+        assert late >= 0 and c.isBusy() is False, late
+
+    c.rmove(-1000)
+    c.stop()
+    assert c._moveEnd is None
+    c.waitClear()
+    c.devMode = True
+    test_print(3, f"waitClear() still waits for moves slower than predicted...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    c.devMode = True
+    print(e)
+    test_print(3, f"waitClear() still waits for moves slower than predicted...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "Less dead time after a move than with blind polling...")
+try:
+    moves = [1500, -1500, 2500, 0]
+
+    connect()
+    predicted = [timed_move(pos) for pos in moves]
+
+    motion, c.motion = c.motion, None
+    connect(motion)
+    blind = [timed_move(pos) for pos in moves]
+    c.motion  = motion
+    c.devMode = True
+
+    print(f"Dead time: {1e3 * np.mean(predicted):.0f} ms with prediction, {1e3 * np.mean(blind):.0f} ms with blind polling")
+    assert np.mean(predicted) < np.mean(blind)
+    test_print(4, f"Less dead time after a move than with blind polling...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    c.devMode = True
+    print(e)
+    test_print(4, f"Less dead time after a move than with blind polling...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
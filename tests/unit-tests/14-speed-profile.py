@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from stage.controller import GSC01
+from stage.motion import MotionModel, ProfileOptimizer
+import stage.errors
+
+import logging
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+
+class RecordingSerial():
+    """Records the commands sent by GSC01 and answers OK (R for the busy status)"""
+    def __init__(self):
+        self.commands = []
+        self.buffer   = b''
+
+    def isOpen(self):
+        return True
+
+    def close(self):
+        pass
+
+    def write(self, cmd):
+        cmd = cmd.decode("ascii").strip()
+        self.commands.append(cmd)
+        self.buffer += (b"R" if cmd == "!:" else b"OK") + b"\r\n"
+
+    def inWaiting(self):
+        return len(self.buffer)
+
+    def read(self, n = 1):
+        out, self.buffer = self.buffer[:n], self.buffer[n:]
+        return out
+
+    def sent(self, prefix):
+        return [c for c in self.commands if c.startswith(prefix)]
+
+c = GSC01(devMode = True)
+c.LOGLEVEL_THRESHOLD = logging.ERROR
+
+def connect():
+    c.devMode = False
+    c.dev     = RecordingSerial()
+    return c.dev
+
+test_print(1, "Fastest profile keeps within the limits and the legal range...")
+try:
+    for maxSpeed, maxStart, maxAcc in [(10000, 500, 22500), (30000, 50, 1e6), (5000, 500, 1000), (12345, 678, None)]:
+        fastest = ProfileOptimizer(maxSpeed = maxSpeed, maxStartSpeed = maxStart, maxAcceleration = maxAcc).fastest
+        S, F, R = fastest.profile
+
+        assert all(v % 100 == 0 and 100 <= v <= 20000 for v in [S, F]) and isinstance(R, int) and 0 <= R <= 1000, fastest
+        assert S <= max(maxStart, 100) and F <= max(maxSpeed, S)
+        if maxAcc is not None and R > 0:
+            assert (F - S) / (R / 1000) <= maxAcc
+        elif maxAcc is None:
+            assert R == 0
+
+    default = ProfileOptimizer().fastest
+    assert default.profile == (500, 10000, 423)
+    test_print(1, f"Fastest profile keeps within the limits and the legal range...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(1, f"Fastest profile keeps within the limits and the legal range...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(2, "Short moves keep the current profile, long moves switch...")
+try:
+    optimizer = ProfileOptimizer()
+    current   = MotionModel(minSpeed = 500, maxSpeed = 5000, acdcTime = 200)
+
+    assert optimizer.choose(300, current = current) is current
+    assert optimizer.choose(40000, current = current) is optimizer.fastest
+    assert optimizer.choose(40000, current = optimizer.fastest) is optimizer.fastest
+
+    # Never slower, except for the rounding of the acceleration time to ms
+    d = np.arange(0, 100000, 100)
+    assert np.all(optimizer.fastest.moveTime(d) <= current.moveTime(d) + 1e-3)
+
+    speedup = current.moveTime(40000) / optimizer.fastest.moveTime(40000)
+    print(f"Move of 40000 pulses: {current.moveTime(40000):.2f} s -> {optimizer.fastest.moveTime(40000):.2f} s ({speedup:.1f}x)")
+    assert speedup > 1.5
+    test_print(2, f"Short moves keep the current profile, long moves switch...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(2, f"Short moves keep the current profile, long moves switch...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "setSpeed() only sends changed values...")
+try:
+    dev = connect()
+    c.setSpeed(init = True)
+    c.setSpeed(minSpeed = 500, maxSpeed = 5000, acdcTime = 200)
+    c.setSpeed(jogSpeed = 500)
+    assert dev.commands == [], dev.commands
+
+    c.setSpeed(jogSpeed = 4000)
+    c.setSpeed(jogSpeed = 500)
+    assert dev.sent("S:") == ["S:J4000", "S:J500"] and dev.sent("D:") == []
+
+    c.setSpeed(maxSpeed = 6000)
+    c.setSpeed(maxSpeed = 6000)
+    assert dev.sent("D:") == ["D:1S500F6000R200"]
+
+    c.setSpeed(init = True, force = False)
+    c.setSpeed(force = True)
+    assert dev.sent("D:") == ["D:1S500F6000R200", "D:1S500F5000R200", "D:1S500F5000R200"] and len(dev.sent("S:")) == 3
+    c.devMode = True
+    test_print(3, f"setSpeed() only sends changed values...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    c.devMode = True
+    print(e)
+    test_print(3, f"setSpeed() only sends changed values...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "Moves send the fastest profile once, before the first long move...")
+try:
+    dev = connect()
+    c.setSpeed(init = True)
+
+    # Opt-in
+    assert c.optimizer is None
+    c.optimizer = ProfileOptimizer()
+
+    for pos in [100, 300, 200]:
+        c.move(pos)
+    assert dev.sent("D:") == [] and c.motion.profile == (500, 5000, 200)
+
+    for pos in [-30000, 30000, 200, -200]:
+        distance = pos - c.stage.position
+        c.move(pos)
+        assert np.isclose(c.lastDuration, c.optimizer.fastest.moveTime(distance))
+    assert dev.sent("D:") == ["D:1S500F10000R423"] and c.motion.profile == c.scanMotion.profile
+    assert np.isclose(c.predictMove(c.stage.position + 40000), c.optimizer.fastest.moveTime(40000))
+
+    # A move out of range is refused before the profile is sent
+    c.setSpeed(init = True)
+    sent = len(dev.commands)
+    for move in [lambda: c.move(c.stage.LIMIT_UPPER + 40000), lambda: c.rmove(-(c.stage.position - c.stage.LIMIT_LOWER) - 40000)]:
+        try:
+            move()
+            assert False, "move out of range was sent"
+        except stage.errors.PositionOutOfBoundsError:
+            pass
+    assert len(dev.commands) == sent and c.motion.profile == (500, 5000, 200)
+
+    c.optimizer = None
+    c.setSpeed(init = True)
+    c.move(30000)
+    assert dev.sent("D:")[-1] == "D:1S500F5000R200" and c.scanMotion.profile == (500, 5000, 200)
+    c.devMode = True
+    test_print(4, f"Moves send the fastest profile once, before the first long move...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    c.devMode = True
+    print(e)
+    test_print(4, f"Moves send the fastest profile once, before the first long move...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from stage.controller import GSC01
+from stage.emulator import GSC01Emulator
+import stage._stage as Stg
+
+import logging
+import time
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+
+class TrickleSerial():
+    """Delivers the queued bytes one at a time, without announcing them in inWaiting()"""
+    def __init__(self, data: bytes = b''):
+        self.data    = bytearray(data)
+        self.written = []
+
+    def write(self, cmd):
+        self.written.append(cmd)
+
+    def inWaiting(self):
+        return 0
+
+    def read(self, n = 1):
+        out = bytes(self.data[:1])
+        del self.data[:1]
+        return out
+
+c = GSC01(devMode = True)
+c.LOGLEVEL_THRESHOLD = logging.ERROR
+
+test_print(1, "Commands round trip through the emulated controller...")
+try:
+    with GSC01Emulator() as emu:
+        emu.LOGLEVEL_THRESHOLD = logging.ERROR
+        with GSC01(stage = Stg.SGSP26_200(), devMode = False, devConfig = { "port": emu.port }) as s:
+            s.LOGLEVEL_THRESHOLD = logging.ERROR
+            assert s.getPositionReadOut() == 0 and s.isBusy() is False
+
+            for pos in [1234, -5678, 0]:
+                s.move(pos)
+                s.waitClear()
+                assert s.getPositionReadOut() == pos == emu.position
+                assert s.getStatus1() == [str(pos).encode("ascii"), b"K", b"K", b"R"]
+    test_print(1, f"Commands round trip through the emulated controller...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(1, f"Commands round trip through the emulated controller...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(2, "Answers arriving in pieces are reassembled, following answers are kept...")
+try:
+    c.dev = TrickleSerial(b"-     1000,K,K,R\r\nOK\r\n")
+    assert c.read() == b"-1000,K,K,R"
+    assert c.read() == b"OK"
+    assert c.read() is None
+
+    assert GSC01.parseResponse(b"  OK ") == b"OK" and GSC01.parseResponse(b"   ") is None
+    test_print(2, f"Answers arriving in pieces are reassembled, following answers are kept...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(2, f"Answers arriving in pieces are reassembled, following answers are kept...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "Missing terminators and stale answers do not shift the answers...")
+try:
+    # Incomplete answer
+    c.dev = TrickleSerial(b"O")
+    assert c.read() == b"O"
+
+    # A late answer to an earlier command is discarded before the next command
+    c._rxbuf += b"B\r\n"
+    c.dev     = TrickleSerial(b"R\r\n")
+    c.devMode = False
+    assert c.isBusy() is False and c.dev.written == [b"!:\r\n"]
+    c.devMode = True
+    test_print(3, f"Missing terminators and stale answers do not shift the answers...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    c.devMode = True
+    print(e)
+    test_print(3, f"Missing terminators and stale answers do not shift the answers...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "A round trip takes as long as the controller, not 50 ms...")
+try:
+    with GSC01Emulator(latency = 0.002) as emu:
+        emu.LOGLEVEL_THRESHOLD = logging.ERROR
+        with GSC01(stage = Stg.SGSP26_200(), devMode = False, devConfig = { "port": emu.port }) as s:
+            s.LOGLEVEL_THRESHOLD = logging.ERROR
+
+            times = []
+            for _ in range(20):
+                t = time.perf_counter()
+                s.isBusy()
+                times.append(time.perf_counter() - t)
+
+            print(f"Round trip: {1e3 * np.median(times):.1f} ms")
+            assert np.median(times) < 0.02
+    test_print(4, f"A round trip takes as long as the controller, not 50 ms...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(4, f"A round trip takes as long as the controller, not 50 ms...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
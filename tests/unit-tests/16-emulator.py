@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from stage.controller import GSC01
+from stage.emulator import GSC01Emulator
+import stage._stage as Stg
+
+import json
+import logging
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+
+def connect(emu, **kwargs):
+    s = GSC01(stage = Stg.SGSP26_200(), devMode = False, devConfig = emu.devConfig, **kwargs)
+    s.LOGLEVEL_THRESHOLD = logging.ERROR
+    return s
+
+test_print(1, "The emulator implements the command set of GSC01...")
+try:
+    with GSC01Emulator() as emu:
+        emu.LOGLEVEL_THRESHOLD = logging.ERROR
+        with connect(emu) as s:
+            s.setSpeed(jogSpeed = 1000, minSpeed = 200, maxSpeed = 8000, acdcTime = 100)
+            assert (emu.jogSpeed, emu.minSpeed, emu.maxSpeed, emu.acdcTime) == (1000, 200, 8000, 100)
+            assert s.send("D:1S9000F8000R100") == b"NG" and s.send("D:1S100F8000R5000") == b"NG"
+
+            s.rmove(-300)
+            s.waitClear()
+            assert emu.position == -300
+            s.resetPositionToZero()
+            assert emu.position == 0 and s.getPositionReadOut() == 0
+
+            # The mechanical origin is now 300 pulses above
+            s.rmove(200)
+            s.waitClear()
+
+            s.releaseMotor()
+            assert not emu.powered and s.send("G:") == b"NG"
+            s.powerMotor()
+            assert emu.powered
+
+            s.homeStage()
+            assert emu.position == 0 and emu.target == 0 and s.getStatus1() == [b"0", b"K", b"K", b"R"]
+            s.rmove(-300)
+            s.waitClear()
+            assert s.getPositionReadOut() == -300
+            assert s.send("X:") == b"NG" and s.getStatus1()[1] == b"X"
+    test_print(1, f"The emulator implements the command set of GSC01...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(1, f"The emulator implements the command set of GSC01...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(2, "Moves take as long as the speed settings predict...")
+try:
+    with GSC01Emulator(latency = 0.001) as emu:
+        emu.LOGLEVEL_THRESHOLD = logging.ERROR
+        with connect(emu) as s:
+            t = time.monotonic()
+            s.move(4000)
+            assert s.isBusy() and s.send("G:") == b"NG"
+            assert 0 < abs(s.getPositionReadOut()) < 4000
+
+            s.waitClear()
+            elapsed = time.monotonic() - t
+            print(f"Move: predicted {s.lastDuration:.3f} s, took {elapsed:.3f} s")
+            assert abs(elapsed - s.lastDuration) < 0.05
+            assert s.getPositionReadOut() == 4000 and not s.isBusy()
+    test_print(2, f"Moves take as long as the speed settings predict...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(2, f"Moves take as long as the speed settings predict...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "Jogging runs until stopped or until the limit sensors...")
+try:
+    with GSC01Emulator(lower = -1500, upper = 2500) as emu:
+        emu.LOGLEVEL_THRESHOLD = logging.ERROR
+        with connect(emu) as s:
+            s.setSpeed(jogSpeed = 5000)
+            s.jog(positive = True, secs = 0.1)
+            assert 300 < emu.position < 700 and not emu.busy
+
+            assert s.findRange() == 4000
+            assert (s.stage.LIMIT_LOWER, s.stage.LIMIT_UPPER) == (-1500, 2500)
+            assert s.getStatus1()[2] == b"L"
+
+            # GSC01 refuses such moves, the limit sensor stops them anyway
+            assert s.send("A:1+P3000") == s.send("G:") == b"OK"
+            s.waitClear()
+            assert emu.position == 2500 and s.getStatus1() == [b"2500", b"K", b"L", b"R"]
+    test_print(3, f"Jogging runs until stopped or until the limit sensors...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(3, f"Jogging runs until stopped or until the limit sensors...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "Injected errors reach GSC01 through a config file...")
+try:
+    with GSC01Emulator(seed = 1) as emu, tempfile.TemporaryDirectory() as tmp:
+        emu.LOGLEVEL_THRESHOLD = logging.ERROR
+
+        conf = os.path.join(tmp, "config.local.json")
+        with open(conf, "w") as f:
+            json.dump(emu.devConfig, f)
+
+        with GSC01(stage = Stg.SGSP26_200(), devMode = False, devConfig = conf) as s:
+            s.LOGLEVEL_THRESHOLD = logging.ERROR
+            assert s.cfg["port"] == emu.port
+
+            emu.failNext(command = "G:")
+            with warnings.catch_warnings(record = True) as w:
+                warnings.simplefilter("always")
+                assert s.move(100) is None and len(w) == 1
+            assert emu.position == 0 and s.getStatus1()[1] == b"X"
+
+            emu.errorRate = 0.5
+            answers = [s.send("!:") for _ in range(40)]
+            emu.errorRate = 0
+            assert 5 < answers.count(b"NG") < 35 and set(answers) == {b"NG", b"R"}
+    test_print(4, f"Injected errors reach GSC01 through a config file...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(4, f"Injected errors reach GSC01 through a config file...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
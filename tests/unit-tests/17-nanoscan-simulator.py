@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from measurement.measure import Measurement
+
+from cameras.nanoscan import NanoScan
+from cameras.nanoscan_simulator import SimulatedNanoScan, GaussianBeam
+from stage.controller import GSC01
+import stage._stage as Stg
+from common.clock import VirtualClock
+
+import logging
+import struct
+import time
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+
+c = GSC01(devMode = True)
+c.LOGLEVEL_THRESHOLD = logging.ERROR
+
+beam = GaussianBeam(w0 = (100, 150), z0 = (1, -2), wavelength = 2300, M2 = (1.2, 1.5))
+
+def simulated(**kwargs):
+    return SimulatedNanoScan.fromController(c, beam = beam, **kwargs)
+
+test_print(1, "Widths follow the Gaussian beam at the position of the stage...")
+try:
+    ns = simulated(noise = 0, spikeRate = 0, clock = VirtualClock())
+    with NanoScan(dll = ns) as n:
+        n.LOGLEVEL_THRESHOLD = logging.ERROR
+        for pos in [0, 8000, -20000]:
+            c.move(pos)
+            z   = c.pulse_to_um(pos) / 1000
+            ret = n.getAxis_avg_D4Sigma(n.AXES.BOTH, numsamples = 5)
+            assert np.allclose(ret[:, 0], beam.diameter(z), rtol = 1e-5) and np.allclose(ret[:, 1], 0, atol = 1e-3), ret
+            assert ns.z == z
+
+    # At the Rayleigh length, the beam is wider by sqrt(2)
+    for k in range(2):
+        assert np.isclose(beam.diameter(beam.z0[k] + beam.zR[k])[k], np.sqrt(2) * 2 * beam.w0[k])
+    test_print(1, f"Widths follow the Gaussian beam at the position of the stage...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(1, f"Widths follow the Gaussian beam at the position of the stage...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(2, "Revolutions are paced by the rotation frequency...")
+try:
+    ns = simulated(rotationFrequency = 20.0)
+    ns.AcquireSync1Rev()
+    t = time.monotonic()
+    buf = ns.AcquireD4SigmaBatch(10)
+    assert abs(time.monotonic() - t - 0.5) < 0.03 and len(struct.unpack("<20f", buf)) == 20
+
+    with NanoScan(dll = ns) as n:
+        n.LOGLEVEL_THRESHOLD = logging.ERROR
+        n.rotationFrequency = 5.0
+        t = time.monotonic()
+        n.acquireBatch(3)
+        assert ns.GetRotationFrequency() == 5.0 and abs(time.monotonic() - t - 0.6) < 0.03
+
+    # On the simulated clock, no time passes but the revolutions are counted
+    ns = simulated(rotationFrequency = 2.5, clock = VirtualClock())
+    t  = time.monotonic()
+    ns.AcquireD4SigmaBatch(40)
+    assert time.monotonic() - t < 0.1 and np.isclose(ns.elapsed, 40 / 2.5) and ns.revolutions == 40
+    test_print(2, f"Revolutions are paced by the rotation frequency...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(2, f"Revolutions are paced by the rotation frequency...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "Noise and spikes match tests/outlier/datasets, and are removed by the outlier filter...")
+try:
+    c.move(0)
+    ns    = simulated(clock = VirtualClock(), seed = 3)
+    n     = 4000
+    out   = np.frombuffer(ns.AcquireD4SigmaBatch(n), dtype = "<f4").reshape(n, 2)
+    truth = beam.diameter(ns.z)
+
+    rel    = out / truth - 1
+    spikes = rel > SimulatedNanoScan.SPIKE_MIN - 0.05
+    robust = 1.4826 * np.median(np.abs(rel), axis = 0)
+    print(f"Robust noise {robust}, spikes {np.mean(spikes, axis = 0)}")
+
+    assert np.allclose(robust, SimulatedNanoScan.NOISE, rtol = 0.15)
+    assert abs(np.mean(spikes[:, 0]) - SimulatedNanoScan.SPIKE_RATE[0]) < 0.015 and np.mean(spikes[:, 1]) < 0.001
+
+    # The spikes bias the average of x, which the windowed filter removes
+    filtered = NanoScan.filter_outliers(out[:, 0].astype(np.float64), removeOutliers = 3)
+    assert np.mean(out[:, 0]) / truth[0] - 1 > 0.02
+    assert abs(np.mean(filtered) / truth[0] - 1) < 0.01
+    test_print(3, f"Noise and spikes match tests/outlier/datasets, and are removed by the outlier filter...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(3, f"Noise and spikes match tests/outlier/datasets, and are removed by the outlier filter...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "A measurement runs against the simulated NanoScan...")
+try:
+    ns = simulated(clock = VirtualClock(), seed = 4)
+    assert ns.GetCentroidPosition(0, 0) == 0
+
+    with NanoScan(dll = ns) as n:
+        n.LOGLEVEL_THRESHOLD = logging.ERROR
+        with Measurement(devMode = False, camera = n, controller = c) as M:
+            M.LOGLEVEL_THRESHOLD = logging.ERROR
+            for pos in [-10000, 10000]:
+                ret = M.measure_at(axis = n.AXES.BOTH, pos = pos, numsamples = 20, removeOutliers = 3)
+                assert np.allclose(ret[:, 0], beam.diameter(c.pulse_to_um(pos) / 1000), rtol = 0.03)
+
+    # Waiting for data took a revolution each time
+    assert ns.elapsed >= ns.revolutions / ns.rotFreq + 3 * 0.1 - 1e-6
+    test_print(4, f"A measurement runs against the simulated NanoScan...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(4, f"A measurement runs against the simulated NanoScan...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(5, "The beam follows the stage during a fly-scan...")
+try:
+    clock = VirtualClock()
+    cf    = GSC01(stage = Stg.SGSP26_200(), devMode = True, clock = clock)
+    cf.LOGLEVEL_THRESHOLD = logging.ERROR
+
+    ns = SimulatedNanoScan.fromController(cf, beam = beam, noise = 0, spikeRate = 0)
+    assert ns.clock is clock
+
+    # The position of the stage is dirty while jogging
+    cf.jog(positive = True)
+    clock.sleep(2)
+    assert cf.stage.dirty and np.isclose(ns.position(), cf.pulse_to_um(cf.jogPosition()) / 1000) and ns.position() > 0
+    cf.stop()
+
+    with NanoScan(dll = ns, clock = clock) as n:
+        n.LOGLEVEL_THRESHOLD = logging.ERROR
+        with Measurement(devMode = False, camera = n, controller = cf) as M:
+            M.LOGLEVEL_THRESHOLD = logging.ERROR
+            data = M.fly_scan(start = -15000, stop = 15000, jogSpeed = 1000, numbins = 30, sweeps = 2, warmup = 2)
+            assert len(data) == 30
+
+            expected = np.array([beam.diameter(z) for z in data.records["z"]])
+            for k in range(2):
+                assert np.allclose(data.axis(k)[:, 1], expected[:, k], rtol = 0.01), (data.axis(k)[:, 1], expected[:, k])
+    test_print(5, f"The beam follows the stage during a fly-scan...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(5, f"The beam follows the stage during a fly-scan...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
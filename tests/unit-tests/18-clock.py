@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from measurement.measure import Measurement
+
+from cameras.nanoscan import NanoScan
+from cameras.nanoscan_simulator import SimulatedNanoScan, GaussianBeam
+from stage.controller import GSC01
+from stage.emulator import GSC01Emulator
+import stage._stage as Stg
+from common.clock import RealClock, VirtualClock
+
+import logging
+import tempfile
+import time
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+
+test_print(1, "The virtual clock advances only when slept on...")
+try:
+    clock = VirtualClock(start = 10, epoch = 1000)
+    t = time.monotonic()
+    clock.sleep(3600)
+    clock.sleep(-1)
+    clock.advance(0.5)
+    assert time.monotonic() - t < 0.01 and clock.now() == 3610.5 and clock.elapsed == 3600.5 and clock.time() == 4600.5
+    assert clock.simulated and not RealClock.simulated
+
+    real = RealClock()
+    t    = real.now()
+    real.sleep(0.05)
+    assert 0.05 <= real.now() - t < 0.08 and abs(real.time() - time.time()) < 0.01
+    test_print(1, f"The virtual clock advances only when slept on...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(1, f"The virtual clock advances only when slept on...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(2, "In devMode, moves take their predicted time on the virtual clock only...")
+try:
+    clock = VirtualClock()
+    c     = GSC01(stage = Stg.SGSP26_200(), devMode = True, clock = clock)
+    c.LOGLEVEL_THRESHOLD = logging.ERROR
+    c.optimizer = None
+
+    t = time.monotonic()
+    c.move(20000)
+    c.waitClear()
+    assert np.isclose(clock.elapsed, c.lastDuration) and c.lastDuration > 4
+    c.waitClear()
+    assert np.isclose(clock.elapsed, c.lastDuration)
+
+    moved = clock.elapsed
+    c.jog(secs = 3)
+    assert np.isclose(clock.elapsed, moved + 3) and time.monotonic() - t < 0.1
+    c.syncPosition()
+
+    # With the real clock, devMode does not wait
+    r = GSC01(stage = Stg.SGSP26_200(), devMode = True)
+    r.LOGLEVEL_THRESHOLD = logging.ERROR
+    t = time.monotonic()
+    r.move(20000)
+    r.waitClear()
+    assert time.monotonic() - t < 0.05
+    test_print(2, f"In devMode, moves take their predicted time on the virtual clock only...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(2, f"In devMode, moves take their predicted time on the virtual clock only...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "The emulated controller moves on the shared virtual clock...")
+try:
+    clock = VirtualClock()
+    t     = time.monotonic()
+    with GSC01Emulator(clock = clock) as emu:
+        emu.LOGLEVEL_THRESHOLD = logging.ERROR
+        with GSC01(stage = Stg.SGSP26_200(), devMode = False, devConfig = emu.devConfig, clock = clock) as s:
+            s.LOGLEVEL_THRESHOLD = logging.ERROR
+            assert clock.elapsed >= 2 # Initialisation of the serial port
+
+            start = clock.now()
+            s.move(20000)
+            s.waitClear()
+            assert emu.position == s.getPositionReadOut() == 20000
+            assert s.lastDuration - 1e-6 <= clock.now() - start < s.lastDuration + 0.05
+
+    print(f"Real time: {time.monotonic() - t:.2f} s, virtual time: {clock.elapsed:.2f} s")
+    assert time.monotonic() - t < 1
+    test_print(3, f"The emulated controller moves on the shared virtual clock...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(3, f"The emulated controller moves on the shared virtual clock...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "A simulated caustic runs faster than real time...")
+try:
+    clock = VirtualClock()
+    c     = GSC01(stage = Stg.SGSP26_200(), devMode = True, clock = clock)
+    c.LOGLEVEL_THRESHOLD = logging.ERROR
+
+    beam = GaussianBeam(w0 = 100, z0 = 0, wavelength = 2300, M2 = 1.2)
+    t    = time.monotonic()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with NanoScan(dll = SimulatedNanoScan.fromController(c, beam = beam, seed = 5), clock = clock) as n:
+            n.LOGLEVEL_THRESHOLD = logging.ERROR
+            with Measurement(devMode = False, camera = n, controller = c, useCache = False) as M:
+                M.LOGLEVEL_THRESHOLD = logging.ERROR
+                M.take_measurements(precision = 10, numsamples = 10, removeOutliers = 3, writeToFile = os.path.join(tmpdir, "caustic.dat"), checkpoint = False)
+
+                # Travel times are those of the model
+                s = M.lastSchedule
+                assert np.allclose(s.actual, s.predicted)
+
+    real = time.monotonic() - t
+    print(f"Real time: {real:.2f} s, virtual time: {clock.elapsed:.1f} s, {n.NS.revolutions} revolutions")
+    assert clock.elapsed > n.NS.revolutions / n.rotationFrequency > 10 * real
+    test_print(4, f"A simulated caustic runs faster than real time...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(4, f"A simulated caustic runs faster than real time...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
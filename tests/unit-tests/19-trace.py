@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from measurement.measure import Measurement
+
+from cameras.nanoscan import NanoScan
+from cameras.nanoscan_simulator import SimulatedNanoScan, GaussianBeam
+from stage.controller import GSC01
+import stage._stage as Stg
+from common.clock import VirtualClock
+from common.trace import Tracer, traced, tracer
+
+import json
+import logging
+import tempfile
+import threading
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+
+test_print(1, "Spans are kept in a ring buffer...")
+try:
+    clock = VirtualClock()
+    t     = Tracer(capacity = 3, clock = clock)
+    for i in range(5):
+        with t.span(f"s{i}", cat = "test", i = i):
+            clock.sleep(1)
+    assert len(t) == 3 and t.dropped == 2
+    assert [s.name for s in t.spans()] == ["s2", "s3", "s4"] and t.spans()[0].args == { "i": 2 }
+    assert [s.name for s in t.spans(since = 4)] == ["s4"]
+
+    t.enabled = False
+    with t.span("off"):
+        clock.sleep(1)
+    assert len(t) == 3
+    test_print(1, f"Spans are kept in a ring buffer...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(1, f"Spans are kept in a ring buffer...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(2, "The summary subtracts the time of nested spans...")
+try:
+    clock = VirtualClock()
+    t     = Tracer(clock = clock)
+
+    # outer [0, 10] with inner [2, 5] (containing leaf [3, 4]) and inner [6, 7]; other [10, 12]
+    with t.span("outer"):
+        clock.sleep(2)
+        with t.span("inner"):
+            clock.sleep(1)
+            with t.span("leaf"):
+                clock.sleep(1)
+            clock.sleep(1)
+        clock.sleep(1)
+        with t.span("inner"):
+            clock.sleep(1)
+        clock.sleep(3)
+    with t.span("other"):
+        clock.sleep(2)
+
+    s = t.summary()
+    assert s["outer"]["total"] == 10 and s["outer"]["self"] == 6
+    assert s["inner"]["count"] == 2 and s["inner"]["total"] == 4 and s["inner"]["self"] == 3 and s["inner"]["max"] == 3
+    assert s["leaf"]["self"] == 1 and s["other"]["self"] == 2
+
+    table = t.summaryTable()
+    print(table)
+    assert table.splitlines()[1].startswith("outer") and "5 spans in 12.000 s" in table
+    test_print(2, f"The summary subtracts the time of nested spans...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(2, f"The summary subtracts the time of nested spans...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "Decorated functions are exported as a Chrome trace...")
+try:
+    class Device():
+        @traced(cat = "test")
+        def work(self, x):
+            return 2 * x
+
+    tracer.clear()
+    mark = tracer.mark()
+    assert Device().work(21) == 42 and Device.work.__name__ == "work"
+
+    worker = threading.Thread(target = lambda: Device().work(1), name = "worker")
+    worker.start()
+    worker.join()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        pfad = tracer.exportChromeTrace(os.path.join(tmpdir, "trace.json"), since = mark)
+        with open(pfad) as f:
+            events = json.load(f)["traceEvents"]
+
+    spans   = [e for e in events if e["ph"] == "X"]
+    threads = { e["tid"]: e["args"]["name"] for e in events if e["ph"] == "M" }
+    assert [e["name"] for e in spans] == ["Device.work", "Device.work"] and all(e["cat"] == "test" and e["dur"] >= 0 for e in spans)
+    assert threads[spans[1]["tid"]] == "worker" and spans[0]["tid"] != spans[1]["tid"]
+    test_print(3, f"Decorated functions are exported as a Chrome trace...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(3, f"Decorated functions are exported as a Chrome trace...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "A simulated caustic writes its trace next to the data file...")
+try:
+    clock = VirtualClock()
+    c     = GSC01(stage = Stg.SGSP26_200(), devMode = True, clock = clock)
+    c.LOGLEVEL_THRESHOLD = logging.ERROR
+
+    mark = tracer.mark()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with NanoScan(dll = SimulatedNanoScan.fromController(c, beam = GaussianBeam(M2 = 1.2), seed = 3), clock = clock) as n:
+            n.LOGLEVEL_THRESHOLD = logging.ERROR
+            with Measurement(devMode = False, camera = n, controller = c) as M:
+                M.LOGLEVEL_THRESHOLD = logging.ERROR
+                M.take_measurements(precision = 10, numsamples = 10, removeOutliers = 3, writeToFile = os.path.join(tmpdir, "caustic.dat"), checkpoint = False, trace = True)
+
+        with open(os.path.join(tmpdir, "caustic.trace.json")) as f:
+            names = { e["name"] for e in json.load(f)["traceEvents"] if e["ph"] == "X" }
+
+    print(tracer.summaryTable(since = mark))
+    assert { "caustic", "Measurement.find_params", "Measurement.measure_at", "Measurement.write_to_file", "GSC01.move", "GSC01.waitClear" } <= names
+    assert { "NanoScan.getAxis_avg_D4Sigma", "NanoScan.acquireBatch", "NanoScan.wait_stable", "NanoScan.remove_spikes_windowed" } <= names
+    test_print(4, f"A simulated caustic writes its trace next to the data file...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(4, f"A simulated caustic writes its trace next to the data file...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from measurement.cache import MeasurementCache
+from cameras.nanoscan_constants import NsAxes
+from common.clock import VirtualClock
+
+import logging
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+test_print(1, "A result is missed before it is stored and hit afterwards...")
+try:
+    cache = MeasurementCache(ttl = None)
+    cache.LOGLEVEL_THRESHOLD = logging.ERROR
+    assert cache.get(pos = 1000, axis = "x", numsamples = 10) is None
+    cache.put(pos = 1000, axis = "x", numsamples = 10, result = (500, 10))
+    assert cache.get(pos = 1000, axis = "x", numsamples = 10) == (500, 10)
+    assert cache.get(pos = 1001, axis = "x", numsamples = 10) is None
+    assert cache.get(pos = 1000, axis = "y", numsamples = 10) is None
+    assert cache.hits == 1 and cache.misses == 3 and len(cache) == 1
+    print(cache.summary())
+    assert cache.summary() == "1 hits, 3 misses (25.0% hit rate)"
+    test_print(1, f"A result is missed before it is stored and hit afterwards...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(1, f"A result is missed before it is stored and hit afterwards...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(2, "The key differs by numsamples and the outlier settings...")
+try:
+    cache = MeasurementCache(ttl = None)
+    cache.LOGLEVEL_THRESHOLD = logging.ERROR
+    cache.put(pos = 0, axis = "x", numsamples = 20, result = (500, 10), removeOutliers = 2, threshold = 0.2)
+
+    # More samples than requested are good enough, fewer are not
+    assert cache.get(pos = 0, axis = "x", numsamples = 10, removeOutliers = 2, threshold = 0.2, returnNumsamples = True) == ((500, 10), 20)
+    assert cache.get(pos = 0, axis = "x", numsamples = 30, removeOutliers = 2, threshold = 0.2, returnNumsamples = True) == (None, None)
+    assert cache.get(pos = 0, axis = "x", numsamples = 20, removeOutliers = 0) is None
+    assert cache.get(pos = 0, axis = "x", numsamples = 20, removeOutliers = 2, threshold = 0.3) is None
+
+    # The result with the most samples is used
+    cache.put(pos = 0, axis = "x", numsamples = 50, result = (510, 5), removeOutliers = 2, threshold = 0.2)
+    assert cache.get(pos = 0, axis = "x", numsamples = 10, removeOutliers = 2, threshold = 0.2, returnNumsamples = True) == ((510, 5), 50)
+    assert len(cache) == 2
+    test_print(2, f"The key differs by numsamples and the outlier settings...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(2, f"The key differs by numsamples and the outlier settings...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "Results expire after the TTL...")
+try:
+    # The TTL runs on the clock of the cache, e.g. the simulated time of the controller
+    clock = VirtualClock()
+    cache = MeasurementCache(ttl = 300, clock = clock)
+    cache.LOGLEVEL_THRESHOLD = logging.ERROR
+    cache.put(pos = 0, axis = "x", numsamples = 10, result = (500, 10))
+    clock.sleep(299)
+    assert cache.get(pos = 0, axis = "x", numsamples = 10) == (500, 10)
+    clock.sleep(2)
+    assert cache.get(pos = 0, axis = "x", numsamples = 10) is None and len(cache) == 0
+
+    forever = MeasurementCache(ttl = None, clock = clock)
+    forever.put(pos = 0, axis = "x", numsamples = 10, result = (500, 10))
+    clock.sleep(1e6)
+    assert forever.get(pos = 0, axis = "x", numsamples = 10) == (500, 10)
+    test_print(3, f"Results expire after the TTL...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(3, f"Results expire after the TTL...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "A result of both axes serves a single axis until the stage is homed...")
+try:
+    cache = MeasurementCache(ttl = None, bothAxis = NsAxes.BOTH, axesIndex = { NsAxes.X: 0, NsAxes.Y: 1 })
+    cache.LOGLEVEL_THRESHOLD = logging.ERROR
+    both = np.array([[500, 10], [600, 25]])
+    cache.put(pos = 0, axis = NsAxes.BOTH, numsamples = 10, result = both)
+    assert np.array_equal(cache.get(pos = 0, axis = NsAxes.Y, numsamples = 10), [600, 25])
+    assert cache.get(pos = 0, axis = NsAxes.X, numsamples = 20) is None
+
+    cache.homed()
+    assert cache.get(pos = 0, axis = NsAxes.BOTH, numsamples = 10) is None and cache.hits == 1 and cache.misses == 2
+
+    kept = MeasurementCache(ttl = None, invalidateOnHome = False)
+    kept.put(pos = 0, axis = "x", numsamples = 10, result = (500, 10))
+    kept.homed()
+    assert len(kept) == 1
+    test_print(4, f"A result of both axes serves a single axis until the stage is homed...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(4, f"A result of both axes serves a single axis until the stage is homed...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
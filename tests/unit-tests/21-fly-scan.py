@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from measurement.measure import Measurement
+
+from cameras.nanoscan import NanoScan
+from cameras.nanoscan_simulator import SimulatedNanoScan, GaussianBeam
+from stage.controller import GSC01
+import stage._stage as Stg
+from measurement.rawfile import RawWriter, RawReader
+from common.clock import VirtualClock
+
+import logging
+import tempfile
+import time
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+test_print(1, "The stage jogs at the jog speed in devMode...")
+try:
+    clock = VirtualClock()
+    c = GSC01(stage = Stg.SGSP26_200(), devMode = True, clock = clock)
+    c.LOGLEVEL_THRESHOLD = logging.ERROR
+    c.homeStage()
+    c.findRange()
+    c.setSpeed(jogSpeed = 1000)
+    speed = c.stage.speed.jog
+
+    c.move(-5000)
+    c.waitClear()
+    assert c.jogPosition() is None and c.getPositionReadOut() == -5000
+
+    c.jog(positive = True)
+    clock.sleep(2)
+    assert c.stage.dirty and c.jogPosition() == -5000 + 2 * speed and c.getPositionReadOut() == -5000 + 2 * speed
+
+    c.stop()
+    clock.sleep(1)
+    assert c.jogPosition() is None and not c.stage.dirty and c.stage.position == -5000 + 2 * speed
+    assert c.getPositionReadOut() == -5000 + 2 * speed
+
+    # The jog stops at the limits of the stage
+    c.jog(positive = False, secs = 1000)
+    assert c.stage.position == c.stage.LIMIT_LOWER
+    test_print(1, f"The stage jogs at the jog speed in devMode...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(1, f"The stage jogs at the jog speed in devMode...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(2, "A fly-scan in devMode runs on the simulated clock...")
+try:
+    with Measurement(devMode = True, camera = NanoScan(devMode = True)) as M:
+        M.LOGLEVEL_THRESHOLD = logging.ERROR
+        M.controller.LOGLEVEL_THRESHOLD = logging.ERROR
+        clock = M.controller.clock
+        assert clock.simulated
+
+        t, start = time.monotonic(), clock.now()
+        data = M.fly_scan(start = -20000, stop = 20000, jogSpeed = 1000, numbins = 40, sweeps = 2)
+        print(f"{len(data)} bins, {clock.now() - start:.1f} s simulated in {time.monotonic() - t:.2f} s")
+
+        assert time.monotonic() - t < 10 and clock.now() - start >= 2 * 40000 / 1000
+        assert len(data) == 40 and np.all(data.records["n_samples"] >= 15)
+
+        pos = M.controller.um_to_pulse(um = data.axis(0)[:, 0] * 1000)
+        expected = np.array([M.simulate_beam(pos = p)[0] for p in pos])
+        assert np.allclose(data.axis(0)[:, 1], expected, rtol = 0.01), (data.axis(0)[:, 1], expected)
+    test_print(2, f"A fly-scan in devMode runs on the simulated clock...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(2, f"A fly-scan in devMode runs on the simulated clock...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "A fly-scan with the stage in devMode and a simulated NanoScan...")
+try:
+    clock = VirtualClock()
+    c = GSC01(stage = Stg.SGSP26_200(), devMode = True, clock = clock)
+    c.LOGLEVEL_THRESHOLD = logging.ERROR
+
+    beam = GaussianBeam(w0 = (100, 150), z0 = (1, -2), wavelength = 2300, M2 = (1.2, 1.5))
+    ns   = SimulatedNanoScan(position = lambda: c.pulse_to_um(c.getPositionReadOut()) / 1000, beam = beam, noise = 0, spikeRate = 0, clock = clock)
+
+    with NanoScan(dll = ns, clock = clock) as n:
+        n.LOGLEVEL_THRESHOLD = logging.ERROR
+        with Measurement(devMode = False, camera = n, controller = c) as M:
+            M.LOGLEVEL_THRESHOLD = logging.ERROR
+            start = clock.now()
+            data  = M.fly_scan(start = -15000, stop = 15000, jogSpeed = 1000, numbins = 30, sweeps = 2, warmup = 2)
+
+            # The camera advances the clock of the stage
+            assert clock.now() - start >= 2 * 30000 / 1000 and ns.revolutions >= 30 * ns.rotFreq * 2
+            assert len(data) == 30
+
+            expected = np.array([beam.diameter(z) for z in data.records["z"]])
+            for k in range(2):
+                assert np.allclose(data.axis(k)[:, 1], expected[:, k], rtol = 0.01), (data.axis(k)[:, 1], expected[:, k])
+    test_print(3, f"A fly-scan with the stage in devMode and a simulated NanoScan...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(3, f"A fly-scan with the stage in devMode and a simulated NanoScan...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "take_measurements_flyscan() fits the simulated beam...")
+try:
+    clock = VirtualClock()
+    c = GSC01(stage = Stg.SGSP26_200(), devMode = True, clock = clock)
+    c.LOGLEVEL_THRESHOLD = logging.ERROR
+
+    beam = GaussianBeam(w0 = (100, 110), z0 = (0, 0.1), wavelength = 2300, M2 = (1.1, 1.3))
+    ns   = SimulatedNanoScan(position = lambda: c.pulse_to_um(c.getPositionReadOut()) / 1000, beam = beam, clock = clock, seed = 21)
+
+    with NanoScan(dll = ns, clock = clock) as n:
+        n.LOGLEVEL_THRESHOLD = logging.ERROR
+        with Measurement(devMode = False, camera = n, controller = c) as M:
+            M.LOGLEVEL_THRESHOLD = logging.ERROR
+            with tempfile.TemporaryDirectory() as tmpdir:
+                M.take_measurements_flyscan(precision = 10, jogSpeed = 1000, sweeps = 2, removeOutliers = 3, writeToFile = os.path.join(tmpdir, "caustic.dat"))
+            m2 = np.array([M.fit_data(axis = ax, wavelength = beam.wavelength)[0] for ax in [n.AXES.X, n.AXES.Y]])
+            print(f"M2 = {m2}, simulated {beam.M2}")
+            assert np.allclose(m2, beam.M2, rtol = 0.05)
+
+            # The bins of x and y with different centres and Rayleigh lengths do not overlap, and cover those of each axis
+            center, z_R = np.array([-2000, 1500]), np.array([3000, 4000])
+            bins = M.plan_bins(center = center, rayleighLength = z_R)
+            assert np.all(bins[:, 0] < bins[:, 1]) and np.all(bins[1:, 0] >= bins[:-1, 1])
+            for c_ax, z_ax in zip(center, z_R):
+                own = M.plan_bins(center = c_ax, rayleighLength = z_ax)
+                assert len(own) == 20 and np.all(np.isin(own.flatten(), bins.flatten()))
+                covered = lambda b, z: np.any((z[:, None] >= b[:, 0]) & (z[:, None] < b[:, 1]), axis = 1)
+                zs = np.linspace(own.min(), own.max(), 1001)[:-1]
+                assert np.all(covered(bins, zs)[covered(own, zs)])
+    test_print(4, f"take_measurements_flyscan() fits the simulated beam...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(4, f"take_measurements_flyscan() fits the simulated beam...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(5, "The raw samples of a fly-scan are read back with their time since the epoch...")
+try:
+    clock = VirtualClock()
+    c = GSC01(stage = Stg.SGSP26_200(), devMode = True, clock = clock)
+    c.LOGLEVEL_THRESHOLD = logging.ERROR
+
+    beam = GaussianBeam(w0 = (100, 150), z0 = (1, -2), wavelength = 2300, M2 = (1.2, 1.5))
+    ns   = SimulatedNanoScan(position = lambda: c.pulse_to_um(c.getPositionReadOut()) / 1000, beam = beam, noise = 0, spikeRate = 0, clock = clock)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        pfad = os.path.join(tmpdir, "flyscan.raw")
+
+        with NanoScan(dll = ns, clock = clock) as n:
+            n.LOGLEVEL_THRESHOLD = logging.ERROR
+            with Measurement(devMode = False, camera = n, controller = c) as M:
+                M.LOGLEVEL_THRESHOLD = logging.ERROR
+                start = time.time()
+                with RawWriter(pfad) as raw:
+                    raw.setPhase("Fly-Scan")
+                    M.fly_scan(start = -15000, stop = 15000, jogSpeed = 1000, numbins = 30, sweeps = 2, warmup = 2, saveRaw = raw)
+
+        with RawReader(pfad) as r:
+            assert r.complete and len(r) == 2 and [p["sweep"] for p in r.points] == [1, 2]
+
+            # The simulated time goes on from the start of the fly-scan
+            t = [r.times(i) for i in range(len(r))]
+            print(f"Sweeps from {t[0][0] - start:.2f} s to {t[-1][-1] - start:.2f} s")
+            assert start <= t[0][0] < start + 10 and np.all(np.diff(np.concatenate(t)) > 0)
+            assert np.allclose(np.median(np.diff(t[0])), 1 / ns.rotFreq, rtol = 1e-3)
+            assert np.isclose(t[0][-1] - t[0][0], 30000 / 1000, rtol = 0.01), t[0][-1] - t[0][0]
+
+            z = r.column("z")
+            assert np.allclose(r.column("x"), [beam.diameter(zz)[0] for zz in z], rtol = 0.01)
+    test_print(5, f"The raw samples of a fly-scan are read back with their time since the epoch...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(5, f"The raw samples of a fly-scan are read back with their time since the epoch...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")
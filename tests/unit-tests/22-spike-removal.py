@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+import os, sys
+
+base_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(base_dir, "../../src/", "nanosquared"))
+sys.path.insert(0, root_dir)
+
+from cameras.nanoscan import NanoScan
+
+import scipy.signal
+
+import numpy as np
+
+# https://stackoverflow.com/a/287944/3211506
+class bcolors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+test_results = {}
+
+def test_print(num, message, success = None):
+    global test_results
+
+    if success is not None:
+        test_results = test_results | { num: success }
+
+    print(f"{bcolors.HEADER}=======>{bcolors.ENDC} [{bcolors.HEADER}Test {num}{bcolors.ENDC}]: {message}")
+test_print(1, "Isolated spikes are removed and the other samples are kept in order...")
+try:
+    rng    = np.random.default_rng(1)
+    arr    = 500 + 5 * rng.standard_normal(200)
+    spikes = [0, 17, 18, 60, 123, 199]
+    arr[spikes] += 150
+
+    out = NanoScan.remove_spikes_windowed(arr, threshold = 100)
+    assert np.array_equal(out, np.delete(arr, spikes)), np.setdiff1d(arr, out)
+
+    # Without spikes, nothing is removed
+    clean = np.delete(arr, spikes)
+    assert np.array_equal(NanoScan.remove_spikes_windowed(clean, threshold = 100), clean)
+    test_print(1, f"Isolated spikes are removed and the other samples are kept in order...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(1, f"Isolated spikes are removed and the other samples are kept in order...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(2, "The prominence of a peak matches scipy.signal.peak_prominences within the window...")
+try:
+    rng    = np.random.default_rng(2)
+    window = 10
+
+    def removedIndices(arr, out):
+        return np.flatnonzero(~np.isin(arr, out))
+
+    for _ in range(20):
+        # Spikes further apart than the window, so that scipy does not stop the search of a base at a higher neighbour
+        arr = 500 + 5 * rng.standard_normal(300)
+        idx = (2 * window + 2) * rng.choice(np.arange(1, 13), size = 8, replace = False)
+        arr[idx] += rng.uniform(20, 200, size = 8)
+
+        peaks, _    = scipy.signal.find_peaks(arr)
+        prominences = scipy.signal.peak_prominences(arr, peaks, wlen = 2 * window + 1)[0]
+
+        for threshold in [30, 80, 150]:
+            removed = removedIndices(arr, NanoScan.remove_spikes_windowed(arr, threshold = threshold, window = window))
+            assert np.array_equal(removed, peaks[prominences > threshold]), (threshold, removed, peaks[prominences > threshold])
+
+        # With denser spikes, the base of a peak may be lower than scipy's, so at least the same peaks are removed
+        arr[1::7] += rng.uniform(20, 200, size = len(arr[1::7]))
+        peaks, _    = scipy.signal.find_peaks(arr)
+        prominences = scipy.signal.peak_prominences(arr, peaks, wlen = 2 * window + 1)[0]
+        removed     = removedIndices(arr, NanoScan.remove_spikes_windowed(arr, threshold = 80, window = window))
+        assert np.all(np.isin(peaks[prominences > 80], removed))
+    test_print(2, f"The prominence of a peak matches scipy.signal.peak_prominences within the window...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(2, f"The prominence of a peak matches scipy.signal.peak_prominences within the window...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(3, "Runs of spikes are removed together, steps and slopes are kept...")
+try:
+    # Neighbouring spikes share their base
+    arr = np.full(60, 300.0)
+    arr[20:23] = [450, 480, 460]
+    out = NanoScan.remove_spikes_windowed(arr, threshold = 100)
+    assert len(out) == 57 and np.all(out == 300)
+
+    # A run longer than the window is a plateau, not a spike
+    arr = np.full(60, 300.0)
+    arr[20:45] = 450
+    assert np.array_equal(NanoScan.remove_spikes_windowed(arr, threshold = 100, window = 10), arr)
+
+    # A step and a slope of the beam width are no spikes
+    step  = np.concatenate((np.full(30, 300.0), np.full(30, 600.0)))
+    slope = np.linspace(300, 600, 60)
+    assert np.array_equal(NanoScan.remove_spikes_windowed(step, threshold = 100), step)
+    assert np.array_equal(NanoScan.remove_spikes_windowed(slope, threshold = 100), slope)
+
+    # Dips are no spikes. The first and last points only have a base on one side, so the dip is not within their window.
+    arr = np.full(40, 300.0)
+    arr[20] = 100
+    assert np.array_equal(NanoScan.remove_spikes_windowed(arr, threshold = 100), arr)
+    test_print(3, f"Runs of spikes are removed together, steps and slopes are kept...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(3, f"Runs of spikes are removed together, steps and slopes are kept...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+test_print(4, "removeOutliers = 3 uses the windowed removal with a relative or absolute threshold...")
+try:
+    rng = np.random.default_rng(3)
+    arr = 500 + 5 * rng.standard_normal(100)
+    arr[[5, 50, 51, 99]] *= 1.4
+
+    # A threshold <= 1 is relative to the average, so 0.2 is 100 um here
+    out = NanoScan.filter_outliers(arr, removeOutliers = 3, threshold = 0.2)
+    assert np.array_equal(out, NanoScan.remove_spikes_windowed(arr, threshold = 0.2 * np.average(arr)))
+    assert np.array_equal(out, np.delete(arr, [5, 50, 51, 99]))
+    assert np.array_equal(NanoScan.filter_outliers(arr, removeOutliers = 3, threshold = 250), arr)
+
+    # The same samples as the iterative removal of mode 2
+    assert np.array_equal(out, NanoScan.filter_outliers(arr, removeOutliers = 2, threshold = 0.2))
+
+    # Too few samples to tell spikes apart
+    for short in [np.array([]), np.array([500.0]), np.array([500.0, 900.0])]:
+        assert np.array_equal(NanoScan.filter_outliers(short, removeOutliers = 3), short)
+    test_print(4, f"removeOutliers = 3 uses the windowed removal with a relative or absolute threshold...[{bcolors.OKGREEN}OK{bcolors.ENDC}]", success = True)
+except AssertionError as e:
+    print(e)
+    test_print(4, f"removeOutliers = 3 uses the windowed removal with a relative or absolute threshold...[{bcolors.FAIL}FAIL{bcolors.ENDC}]", success = False)
+
+num_tests = len(test_results.keys())
+test_results_val = list(test_results.values())
+print(f"\n======================\nTest Result: {bcolors.OKGREEN}OK: {test_results_val.count(True)}/{num_tests}{bcolors.ENDC}\t{bcolors.FAIL}FAIL: {test_results_val.count(False)}/{num_tests}{bcolors.ENDC}\n======================\n")